@@ -14,6 +14,7 @@ import inspect
 import logging
 import os
 import re
+import traceback
 from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
@@ -184,21 +185,36 @@ _OrderedDictType = collections.OrderedDict
 class _ConfigWriterInfo:
     """
     Store information on the function that writes a value into a Config.
+
+    Marking a value as used happens for every key of a config, so only the
+    file name, line number, and function name of each frame in the stack are
+    captured. The source lines are read and the traceback is formatted only
+    when requested, e.g., by `repr()` or when reporting a `ClobberError`.
     """
 
     def __init__(self):
         # Capture information about who is constructing this object.
-        self._full_traceback = self._get_full_traceback()
-        self._shorthand_caller = self._get_shorthand_caller()
+        self._stack = self._get_stack()
+        # Cache the shorthand and the traceback, which are computed on demand.
+        self._shorthand_caller: Optional[str] = None
+        self._full_traceback: Optional[str] = None
 
     def __str__(self) -> str:
+        if self._shorthand_caller is None:
+            self._shorthand_caller = self._get_shorthand_caller()
         return self._shorthand_caller
 
     def __repr__(self) -> str:
-        return self._full_traceback
+        return self.get_full_traceback()
 
-    @staticmethod
-    def _get_full_traceback() -> str:
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # Objects pickled before the stack was stored have only the formatted
+        # shorthand and traceback.
+        state.setdefault("_stack", [])
+        state.setdefault("_shorthand_caller", None)
+        self.__dict__.update(state)
+
+    def get_full_traceback(self) -> str:
         """
         Return full traceback as str.
 
@@ -209,16 +225,43 @@ class _ConfigWriterInfo:
         File "/app/config_root/config/test/test_config.py", line 2037, in test4
             actual_value = test_config.get_and_mark_as_used("key2")
         ...
-        File "/app/config_root/config/config_.py", line 188, in _get_full_traceback
-            return hintros.stacktrace_to_str()
-        File "/app/helpers/hintrospection.py", line 254, in stacktrace_to_str
-            txt = traceback.format_stack()
+        File "/app/config_root/config/config_.py", line 475, in _mark_as_used
+            writer = _ConfigWriterInfo()
         ```
         """
-        return hintros.stacktrace_to_str()
+        if self._full_traceback is None:
+            # Read the source lines only now.
+            stack = traceback.StackSummary.from_list(
+                [
+                    (filename, lineno, function, None)
+                    for filename, lineno, function in self._stack
+                ]
+            )
+            self._full_traceback = "".join(stack.format())
+        return self._full_traceback
 
     @staticmethod
-    def _get_shorthand_caller() -> str:
+    def _get_stack() -> List[Tuple[str, int, str]]:
+        """
+        Return (file name, line, function name) of the callers.
+
+        The frames are ordered from the outermost to the innermost call, like
+        in a traceback, excluding the frames of this class.
+        """
+        stack = []
+        frame = inspect.currentframe()
+        # Skip this function and the constructor.
+        for _ in range(2):
+            hdbg.dassert_is_not(frame, None)
+            frame = frame.f_back
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _get_shorthand_caller(self) -> str:
         """
         Return a shorthand for the latest outside caller of the function.
 
@@ -231,26 +274,21 @@ class _ConfigWriterInfo:
 
         'dataflow/system/system_builder_utils.py::49::get_config_template'
         """
-        stack = inspect.stack()
-        # Select the current filename.
-        filename = stack[0].filename
         # Select the latest caller that is outside of the current module.
         # Due to abundance of internal recursive calls, we want to get the first
-        # call outside of the current module. E.g. for the stacktrace:
+        # call outside of the current module. E.g. for the stack:
         # ```
-        # FrameInfo(frame=<frame at 0x7fdce4734230, file '/app/config_root/config/test/test_config.py', line 2037, code test4>, filename='/app/config_root/config/test/test_config.py', lineno=2037, function='test4', code_context=['        actual_value = test_config.get_and_mark_as_used("key2")\n'], index=0)
-        # FrameInfo(frame=<frame at 0x4cafb50, file '/app/config_root/config/config_.py', line 1198, code _get_item>, filename='/app/config_root/config/config_.py', lineno=1198, function='_get_item', code_context=['        ret = self._config.__getitem__(key, mark_key_as_used=mark_key_as_used)  # type: ignore\n'], index=0)
-        # FrameInfo(frame=<frame at 0x7fdce471edd0, file '/app/config_root/config/config_.py', line 475, code _mark_as_used>, filename='/app/config_root/config/config_.py', lineno=475, function='_mark_as_used', code_context=['            writer = _ConfigWriterInfo()\n'], index=0)
-        # FrameInfo(frame=<frame at 0x4d0cd70, file '/app/config_root/config/config_.py', line 178, code __init__>, filename='/app/config_root/config/config_.py', lineno=178, function='__init__', code_context=['        self._shorthand_caller = self._get_shorthand_caller()\n'], index=0)
-        # FrameInfo(frame=<frame at 0x7fdce471e230, file '/app/config_root/config/config_.py', line 210, code _get_shorthand_caller>, filename='/app/config_root/config/config_.py', lineno=207, function='_get_shorthand_caller', code_context=['        stack = inspect.stack()\n'], index=0)
+        # ('/app/config_root/config/test/test_config.py', 2037, 'test4')
+        # ('/app/config_root/config/config_.py', 1198, '_get_item')
+        # ('/app/config_root/config/config_.py', 475, '_mark_as_used')
         # ```
-        # We select the first one with a different file, i.e.:
-        # `FrameInfo(frame=<frame at 0x7fdce4734230, file '/app/config_root/config/test/test_config.py', line 2037, code test4>, filename='/app/config_root/config/test/test_config.py', lineno=2037, function='test4', code_context=['        actual_value = test_config.get_and_mark_as_used("key2")\n'], index=0)`
-        #
-        caller = next(call for call in stack if call.filename != filename)
-        latest_outside_caller = (
-            f"{caller.filename}::{caller.lineno}::{caller.function}"
+        # we select the first one with a different file, i.e.:
+        # `('/app/config_root/config/test/test_config.py', 2037, 'test4')`
+        filename = inspect.currentframe().f_code.co_filename
+        filename_, lineno, function = next(
+            call for call in reversed(self._stack) if call[0] != filename
         )
+        latest_outside_caller = f"{filename_}::{lineno}::{function}"
         return latest_outside_caller
 
 
@@ -298,7 +336,13 @@ class _OrderedConfig(_OrderedDictType):
         the modes are set up as less restrictive, but are inherited from
         `Config` in most actual uses.
         """
-        _LOG.debug(hprint.to_str("key val update_mode clobber_mode"))
+        _LOG.debug(
+            "key=%s val=%s update_mode=%s clobber_mode=%s",
+            key,
+            val,
+            update_mode,
+            clobber_mode,
+        )
         hdbg.dassert_isinstance(key, ScalarKeyValidTypes)
         # TODO(gp): Difference between amp and cmamp.
         if isinstance(val, dict):
@@ -307,7 +351,7 @@ class _OrderedConfig(_OrderedDictType):
             )
         # 1) Handle `update_mode`.
         is_key_present = key in self
-        _LOG.debug(hprint.to_str("is_key_present"))
+        _LOG.debug("is_key_present=%s", is_key_present)
         _LOG.debug("Checking update_mode...")
         if update_mode == "assert_on_overwrite":
             # It is not allowed to overwrite a value.
@@ -366,7 +410,10 @@ class _OrderedConfig(_OrderedDictType):
                     )
                     is_been_changed = True
                 _LOG.debug(
-                    hprint.to_str("marked_as_used old_val is_been_changed")
+                    "marked_as_used=%s old_val=%s is_been_changed=%s",
+                    marked_as_used,
+                    old_val,
+                    is_been_changed,
                 )
                 if marked_as_used and is_been_changed:
                     # The value has already been read and we are trying to change
@@ -376,13 +423,18 @@ class _OrderedConfig(_OrderedDictType):
                         f"Trying to overwrite old value '{old_val}' with new value '{val}'"
                         f" for key '{key}' with clobber_mode={clobber_mode}"
                     )
+                    if writer is not None:
+                        msg.append(
+                            f"The value was marked as used by {writer}:\n"
+                            + hprint.indent(writer.get_full_traceback())
+                        )
                     msg.append("self=\n" + hprint.indent(str(self)))
                     msg = "\n".join(msg)
                     raise ClobberError(msg)
         else:
             raise RuntimeError(f"Invalid clobber_mode='{clobber_mode}'")
         # 3) Assign the value, if needed.
-        _LOG.debug(hprint.to_str("assign_new_value"))
+        _LOG.debug("assign_new_value=%s", assign_new_value)
         if assign_new_value:
             if is_key_present:
                 # If replacing value, use the same `mark_as_used` as the old value.
@@ -522,7 +574,12 @@ class _OrderedConfig(_OrderedDictType):
         # Retrieve the value and the metadata.
         hdbg.dassert_isinstance(key, ScalarKeyValidTypes)
         marked_as_used, writer, val = super().__getitem__(key)
-        _LOG.debug(hprint.to_str("marked_as_used val used_state"))
+        _LOG.debug(
+            "marked_as_used=%s val=%s used_state=%s",
+            marked_as_used,
+            val,
+            used_state,
+        )
         if used_state:
             if isinstance(val, (Config, _OrderedConfig)):
                 # If a value is a subconfig, mark all values down the tree.
@@ -599,7 +656,12 @@ class Config:
             variables that were not used by the time `check_unused_variables`
             is called (see above)
         """
-        _LOG.debug(hprint.to_str("update_mode clobber_mode report_mode"))
+        _LOG.debug(
+            "update_mode=%s clobber_mode=%s report_mode=%s",
+            update_mode,
+            clobber_mode,
+            report_mode,
+        )
         self._config = _OrderedConfig()
         self.update_mode = update_mode
         self.clobber_mode = clobber_mode
@@ -711,7 +773,12 @@ class Config:
             - `None` to use the value set in the constructor
         """
         _LOG.debug(
-            "-> " + hprint.to_str("key val update_mode clobber_mode self")
+            "-> key=%s val=%s update_mode=%s clobber_mode=%s self=%s",
+            key,
+            val,
+            update_mode,
+            clobber_mode,
+            self,
         )
         clobber_mode = self._resolve_clobber_mode(clobber_mode)
         report_mode = self._resolve_report_mode(report_mode)
@@ -737,7 +804,7 @@ class Config:
           to explicitely say when they want the value to be marked as read.
         :raises KeyError: if the compound key is not found in the `Config`
         """
-        _LOG.debug("-> " + hprint.to_str("key report_mode self"))
+        _LOG.debug("-> key=%s report_mode=%s self=%s", key, report_mode, self)
         report_mode = self._resolve_report_mode(report_mode)
         try:
             ret = self._get_item(key, level=0, mark_key_as_used=mark_key_as_used)
@@ -759,7 +826,7 @@ class Config:
         """
         Return whether `key` is marked as used.
         """
-        _LOG.debug("-> " + hprint.to_str("key report_mode self"))
+        _LOG.debug("-> key=%s report_mode=%s self=%s", key, report_mode, self)
         try:
             ret = self._get_item(
                 key, level=0, mark_key_as_used=False, get_marked_as_used=True
@@ -885,7 +952,13 @@ class Config:
         :param expected_type: expected type of `value`
         :return: config[key] if available, else `default_value`
         """
-        _LOG.debug(hprint.to_str("key default_value expected_type report_mode"))
+        _LOG.debug(
+            "key=%s default_value=%s expected_type=%s report_mode=%s",
+            key,
+            default_value,
+            expected_type,
+            report_mode,
+        )
         # The implementation of this function is similar to `hdict.typed_get()`.
         report_mode = self._resolve_report_mode(report_mode)
         try:
@@ -924,11 +997,11 @@ class Config:
             - `config` values overwrite any existing values, assert depending on the
             value of `mode`
         """
-        _LOG.debug(hprint.to_str("config update_mode"))
+        _LOG.debug("config=%s update_mode=%s", config, update_mode)
         # `update()` is just a series of set.
         flattened_config = config.flatten()
         for key, val in flattened_config.items():
-            _LOG.debug(hprint.to_str("key val"))
+            _LOG.debug("key=%s val=%s", key, val)
             self.__setitem__(
                 key,
                 val,
@@ -958,7 +1031,7 @@ class Config:
     # ////////////////////////////////////////////////////////////////////////////
 
     def add_subconfig(self, key: CompoundKey) -> "Config":
-        _LOG.debug(hprint.to_str("key"))
+        _LOG.debug("key=%s", key)
         hdbg.dassert_not_in(key, self._config.keys(), "Key already present")
         config = Config(
             update_mode=self._update_mode,
@@ -1008,7 +1081,7 @@ class Config:
 
         Note: the read-only mode is applied recursively, i.e. for all sub-configs.
         """
-        _LOG.debug(hprint.to_str("value"))
+        _LOG.debug("value=%s", value)
         self._read_only = value
         for v in self._config.values():
             if isinstance(v, Config):
@@ -1121,7 +1194,7 @@ class Config:
 
         :param keep_leaves: keep or skip empty leaves
         """
-        _LOG.debug(hprint.to_str("self keep_leaves"))
+        _LOG.debug("self=%s keep_leaves=%s", self, keep_leaves)
         # pylint: disable=unsubscriptable-object
         dict_: _OrderedDictType[ScalarKey, Any] = collections.OrderedDict()
         for key, (marked_as_used, writer, val) in self._config.items():
@@ -1294,7 +1367,14 @@ class Config:
             write-after-use (see above)
             - `None` to use the value set in the constructor
         """
-        _LOG.debug(hprint.to_str("key val update_mode clobber_mode self"))
+        _LOG.debug(
+            "key=%s val=%s update_mode=%s clobber_mode=%s self=%s",
+            key,
+            val,
+            update_mode,
+            clobber_mode,
+            self,
+        )
         # # Used to debug who is setting a certain key.
         # if False:
         #     _LOG.info("key.set=%s", str(key))
@@ -1472,7 +1552,12 @@ class Config:
         - OverwriteError
         - ReadOnlyConfigError
         """
-        _LOG.debug(hprint.to_str("exception key report_mode"))
+        _LOG.debug(
+            "exception=%s key=%s report_mode=%s",
+            exception,
+            key,
+            report_mode,
+        )
         hdbg.dassert_in(report_mode, _VALID_REPORT_MODES)
         if report_mode in ("verbose_log_error", "verbose_exception"):
             msg = []
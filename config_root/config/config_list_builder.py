@@ -246,9 +246,12 @@ def build_config_list_varying_tiled_periods(
         features)
     """
     _LOG.debug(
-        hprint.to_str(
-            "start_timestamp end_timestamp freq_as_pd_str lookback_as_pd_str"
-        )
+        "start_timestamp=%s end_timestamp=%s freq_as_pd_str=%s "
+        "lookback_as_pd_str=%s",
+        start_timestamp,
+        end_timestamp,
+        freq_as_pd_str,
+        lookback_as_pd_str,
     )
     hdbg.dassert_isinstance(config_list, cconfig.ConfigList)
     hdbg.dassert_eq(len(config_list), 1)
@@ -271,13 +274,17 @@ def build_config_list_varying_tiled_periods(
     end_timestamp_tmp -= pd.Timedelta("1D")
     offset = pd.tseries.frequencies.to_offset(freq_as_pd_str)
     end_timestamp_tmp += offset
-    _LOG.debug(hprint.to_str("start_timestamp end_timestamp_tmp"))
+    _LOG.debug(
+        "start_timestamp=%s end_timestamp_tmp=%s",
+        start_timestamp,
+        end_timestamp_tmp,
+    )
     dates = pd.date_range(
         start_timestamp, end_timestamp_tmp, freq=freq_as_pd_str
     )
     dates = dates.to_list()
     hdbg.dassert_lte(1, len(dates))
-    _LOG.debug(hprint.to_str("dates"))
+    _LOG.debug("dates=%s", dates)
     #
     config = config_list.get_only_config()
     for end_ts in dates:
@@ -291,7 +298,7 @@ def build_config_list_varying_tiled_periods(
         # E.g., if a user passes `2022-05-31` it becomes `2022-05-31 00:00:00`
         # but should be `2022-05-31 23:59:00` to include all the data.
         end_ts = end_ts + pd.Timedelta(days=1, seconds=-1)
-        _LOG.debug(hprint.to_str("start_ts end_ts"))
+        _LOG.debug("start_ts=%s end_ts=%s", start_ts, end_ts)
         #
         config_tmp = config.copy()
         config_tmp[("backtest_config", "start_timestamp_with_lookback")] = (
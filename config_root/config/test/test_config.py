@@ -1,9 +1,11 @@
 import collections
+import copy
 import datetime
 import logging
 import os
 import pprint
 import re
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
@@ -12,8 +14,10 @@ import pytest
 import config_root.config as cconfig
 import helpers.hdbg as hdbg
 import helpers.hintrospection as hintros
+import helpers.hpickle as hpickle
 import helpers.hprint as hprint
 import helpers.hsystem as hsystem
+import helpers.htimer as htimer
 import helpers.hunit_test as hunitest
 
 _LOG = logging.getLogger(__name__)
@@ -2192,6 +2196,154 @@ class Test_mark_as_used1(hunitest.TestCase):
         )
 
 
+# #############################################################################
+# Test_ConfigWriterInfo1
+# #############################################################################
+
+
+class Test_ConfigWriterInfo1(hunitest.TestCase):
+    """
+    Check the provenance of the values marked as used.
+    """
+
+    def test1(self) -> None:
+        """
+        Check the shorthand and the lazily formatted traceback.
+        """
+        config = cconfig.Config.from_dict({"key1": "value1"})
+        config.get_and_mark_as_used("key1")
+        writer = config._config.get("key1")[1]
+        # Check the shorthand.
+        actual = remove_line_numbers(str(writer))
+        expected = (
+            "$GIT_ROOT/config_root/config/test/test_config.py::***::test1"
+        )
+        self.assert_equal(actual, expected, purify_text=True)
+        # Check that the traceback contains the source line of the caller.
+        actual = repr(writer)
+        self.assertIn('config.get_and_mark_as_used("key1")', actual)
+        self.assertTrue(actual.rstrip().endswith("writer = _ConfigWriterInfo()"))
+
+    def test2(self) -> None:
+        """
+        Check that the provenance can be copied and pickled.
+        """
+        config = cconfig.Config.from_dict({"key1": "value1"})
+        config.get_and_mark_as_used("key1")
+        writer = config._config.get("key1")[1]
+        file_name = os.path.join(self.get_scratch_space(), "writer.pkl")
+        # Run.
+        hpickle.to_pickle(writer, file_name)
+        writers = [copy.deepcopy(writer), hpickle.from_pickle(file_name)]
+        # Check output.
+        for writer_tmp in writers:
+            self.assertEqual(str(writer_tmp), str(writer))
+            self.assertEqual(repr(writer_tmp), repr(writer))
+
+    def test4(self) -> None:
+        """
+        Check that a provenance pickled without the stack can be unpickled.
+        """
+        writer = cconfig.config_._ConfigWriterInfo.__new__(
+            cconfig.config_._ConfigWriterInfo
+        )
+        # Store only the formatted strings, like an old version of the class.
+        writer.__dict__ = {
+            "_full_traceback": "full_traceback",
+            "_shorthand_caller": "file.py::1::func",
+        }
+        file_name = os.path.join(self.get_scratch_space(), "writer.pkl")
+        hpickle.to_pickle(writer, file_name)
+        # Run.
+        writer = hpickle.from_pickle(file_name)
+        # Check output.
+        self.assertEqual(str(writer), "file.py::1::func")
+        self.assertEqual(repr(writer), "full_traceback")
+        self.assertEqual(writer.get_full_traceback(), "full_traceback")
+
+    def test3(self) -> None:
+        """
+        Check that a `ClobberError` reports who used the value.
+        """
+        config = cconfig.Config.from_dict({"key1": "value1"})
+        config.get_and_mark_as_used("key1")
+        # Run.
+        with self.assertRaises(cconfig.ClobberError) as cm:
+            config.__setitem__(
+                "key1", "value2", update_mode="overwrite", report_mode="none"
+            )
+        # Check output.
+        actual = str(cm.exception)
+        self.assertIn("The value was marked as used by ", actual)
+        self.assertIn('config.get_and_mark_as_used("key1")', actual)
+
+
+@pytest.mark.slow("~1 seconds.")
+class Test_ConfigWriterInfo_performance1(hunitest.TestCase):
+    """
+    Measure the time to build a config and mark all its values as used.
+    """
+
+    def test1(self) -> None:
+        num_keys = 100
+        nested = {f"key{i}": {"a": i, "b": str(i)} for i in range(num_keys)}
+        # Run.
+        with htimer.TimedScope(logging.INFO, "Build config") as ts_build:
+            config = cconfig.Config.from_dict(nested)
+        with htimer.TimedScope(logging.INFO, "Mark as used") as ts_mark:
+            for i in range(num_keys):
+                config.get_and_mark_as_used((f"key{i}", "a"))
+        _LOG.info(
+            "num_keys=%s build=%.3fs mark_as_used=%.3fs",
+            num_keys,
+            ts_build.elapsed_time,
+            ts_mark.elapsed_time,
+        )
+        # Check output.
+        self.assertTrue(config.get_marked_as_used(("key0", "a")))
+
+
+@pytest.mark.slow("~2 seconds.")
+class Test_Config_performance1(hunitest.TestCase):
+    """
+    Check that building and reading a config scales linearly with its size.
+    """
+
+    @staticmethod
+    def _get_elapsed_time(num_keys: int) -> float:
+        """
+        Return the time to write and read `num_keys` nested keys.
+        """
+        # Use the best of a few runs to reduce the noise.
+        elapsed_times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            config = cconfig.Config(update_mode="overwrite")
+            for i in range(num_keys):
+                config[("dag_config", f"node{i % 10}", f"key{i}")] = i
+            for i in range(num_keys):
+                config.get_and_mark_as_used(
+                    ("dag_config", f"node{i % 10}", f"key{i}")
+                )
+            elapsed_times.append(time.perf_counter() - start)
+        return min(elapsed_times)
+
+    def test1(self) -> None:
+        # Run.
+        elapsed_time1 = self._get_elapsed_time(1000)
+        elapsed_time2 = self._get_elapsed_time(4000)
+        # Check output.
+        ratio = elapsed_time2 / elapsed_time1
+        _LOG.info(
+            "elapsed_time1=%.3fs elapsed_time2=%.3fs ratio=%.1f",
+            elapsed_time1,
+            elapsed_time2,
+            ratio,
+        )
+        # The ratio is ~4 for linear scaling and ~16 for quadratic scaling.
+        self.assertLess(ratio, 8)
+
+
 # #############################################################################
 # Test_get_marked_as_used1
 # #############################################################################
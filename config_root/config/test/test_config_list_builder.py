@@ -1,12 +1,15 @@
 import logging
+import time
 from typing import Any
 
 import config_root.config as cconfig
 import pandas as pd
+import pytest
 
 # TODO(gp): Reuse cconfig
 import config_root.config.config_list_builder as cccolibu
 
+import helpers.hdbg as hdbg
 import helpers.hunit_test as hunitest
 
 _LOG = logging.getLogger(__name__)
@@ -145,6 +148,54 @@ class Test_build_config_list_varying_tiled_periods1(hunitest.TestCase):
         )
 
 
+@pytest.mark.slow("~2 seconds.")
+class Test_build_config_list_varying_tiled_periods_performance1(
+    hunitest.TestCase
+):
+    """
+    Check that building the configs scales linearly with the number of tiles.
+    """
+
+    @staticmethod
+    def _get_elapsed_time(config: cconfig.Config, num_weeks: int) -> float:
+        start_timestamp = pd.Timestamp("2020-01-06 00:00:00+0000", tz="UTC")
+        end_timestamp = (
+            start_timestamp
+            + pd.Timedelta(weeks=num_weeks)
+            - pd.Timedelta("1D")
+        )
+        # Use the best of a few runs to reduce the noise.
+        elapsed_times = []
+        for _ in range(3):
+            config_list = cconfig.ConfigList([config])
+            start = time.perf_counter()
+            config_list = cccolibu.build_config_list_varying_tiled_periods(
+                config_list, start_timestamp, end_timestamp, "W", "10D"
+            )
+            elapsed_times.append(time.perf_counter() - start)
+            hdbg.dassert_eq(len(config_list), num_weeks)
+        return min(elapsed_times)
+
+    def test1(self) -> None:
+        # Prepare inputs.
+        config = cconfig.Config(update_mode="overwrite")
+        for i in range(200):
+            config[("dag_config", f"node{i % 10}", f"key{i}")] = i
+        # Run.
+        elapsed_time1 = self._get_elapsed_time(config, 25)
+        elapsed_time2 = self._get_elapsed_time(config, 100)
+        # Check output.
+        ratio = elapsed_time2 / elapsed_time1
+        _LOG.info(
+            "elapsed_time1=%.3fs elapsed_time2=%.3fs ratio=%.1f",
+            elapsed_time1,
+            elapsed_time2,
+            ratio,
+        )
+        # The ratio is ~4 for linear scaling and ~16 for quadratic scaling.
+        self.assertLess(ratio, 8)
+
+
 # #############################################################################
 # Test_build_config_list_with_tiled_universe
 # #############################################################################
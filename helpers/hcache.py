@@ -380,6 +380,10 @@ class _Cached:
         tag: Optional[str] = None,
         disk_cache_path: Optional[str] = None,
         aws_profile: Optional[str] = "am",
+        mem_cache_max_entries: Optional[int] = None,
+        mem_cache_max_bytes: Optional[int] = None,
+        mem_cache_ttl: Optional[float] = None,
+        mem_cache_eviction_policy: str = "lru",
     ):
         """
         Construct the class.
@@ -396,6 +400,14 @@ class _Cached:
             when running unit tests we want to use a different cache)
         :param disk_cache_path: path of the function-specific cache
         :param aws_profile: the AWS profile to use in case of S3 backend
+        :param mem_cache_max_entries: max number of entries of this function
+            in the memory cache, `None` for no limit
+        :param mem_cache_max_bytes: max size in bytes of the entries of this
+            function in the memory cache, `None` for no limit
+        :param mem_cache_ttl: seconds after which an entry of the memory cache
+            expires, `None` for no expiration
+        :param mem_cache_eviction_policy: how to pick the entries to evict
+            from the memory cache when over the limits ("lru" or "lfu")
         """
         # Make the class have the same attributes (e.g., `__name__`, `__doc__`,
         # `__dict__`) as the called function.
@@ -412,6 +424,23 @@ class _Cached:
         self._tag = tag
         self._disk_cache_path = disk_cache_path
         self._aws_profile = aws_profile
+        hdbg.dassert_in(mem_cache_eviction_policy, ("lru", "lfu"))
+        self._mem_cache_max_entries = mem_cache_max_entries
+        self._mem_cache_max_bytes = mem_cache_max_bytes
+        self._mem_cache_ttl = mem_cache_ttl
+        self._mem_cache_eviction_policy = mem_cache_eviction_policy
+        # Track the use of the memory cache entries in this process to
+        # implement the eviction policies.
+        # args_id -> last access time.
+        self._mem_cache_last_access: Dict[str, float] = {}
+        # args_id -> number of accesses.
+        self._mem_cache_num_accesses: Dict[str, int] = {}
+        self._mem_cache_num_evictions = 0
+        self._mem_cache_num_expirations = 0
+        # Track the entries of the memory cache, so that enforcing the limits
+        # doesn't need to list the cache dir on each miss.
+        # func_id -> args_id -> (size in bytes, creation time).
+        self._mem_cache_items: Dict[str, Dict[str, Tuple[int, float]]] = {}
         #
         self._reset_cache_tracing()
         # Create the memory and disk cache objects for this function.
@@ -498,6 +527,17 @@ class _Cached:
             # Function-specific cache: print the paths of the local cache.
             cache_type = "disk"
             txt.append(f"local {cache_type} cache path={self._disk_cache_path}")
+        if self._has_mem_cache_limits():
+            txt.append(
+                f"mem cache limits: max_entries={self._mem_cache_max_entries} "
+                f"max_bytes={self._mem_cache_max_bytes} "
+                f"ttl={self._mem_cache_ttl} "
+                f"eviction_policy={self._mem_cache_eviction_policy}"
+            )
+            txt.append(
+                f"mem cache evictions={self._mem_cache_num_evictions} "
+                f"expirations={self._mem_cache_num_expirations}"
+            )
         txt = "\n".join(txt)
         return txt
 
@@ -878,6 +918,186 @@ class _Cached:
         memorized_result.store_backend.dump_item([func_id, args_id], obj)
         #
 
+    # ///////////////////////////////////////////////////////////////////////////
+    # Memory cache limits.
+    # ///////////////////////////////////////////////////////////////////////////
+
+    def _has_mem_cache_limits(self) -> bool:
+        has_limits = (
+            self._mem_cache_max_entries is not None
+            or self._mem_cache_max_bytes is not None
+            or self._mem_cache_ttl is not None
+        )
+        return has_limits
+
+    def _get_mem_cache_item(
+        self, func_id: str, args_id: str
+    ) -> Optional[Tuple[int, float]]:
+        """
+        Get the size and the creation time of an entry of the memory cache.
+
+        :return: (size in bytes, creation time) or `None` if the entry is not
+            stored
+        """
+        memorized_result = self._get_memorized_result("mem")
+        item_dir = os.path.join(
+            memorized_result.store_backend.location, func_id, args_id
+        )
+        output_file = os.path.join(item_dir, "output.pkl")
+        if not os.path.exists(output_file):
+            # Skip `func_code.py` and partially written entries.
+            return None
+        try:
+            size = sum(
+                os.path.getsize(os.path.join(item_dir, file_name))
+                for file_name in os.listdir(item_dir)
+            )
+            creation_time = os.path.getmtime(output_file)
+        except OSError:
+            # The entry was removed concurrently.
+            return None
+        return size, creation_time
+
+    def _get_mem_cache_items(self, func_id: str) -> List[Tuple[str, int, float]]:
+        """
+        Get the entries of this function stored in the memory cache.
+
+        The cache dir is listed only the first time, and then the entries are
+        tracked when they are stored and evicted.
+
+        :return: list of (args_id, size in bytes, creation time)
+        """
+        if func_id not in self._mem_cache_items:
+            memorized_result = self._get_memorized_result("mem")
+            func_dir = os.path.join(
+                memorized_result.store_backend.location, func_id
+            )
+            args_ids = os.listdir(func_dir) if os.path.isdir(func_dir) else []
+            self._mem_cache_items[func_id] = {}
+            for args_id in args_ids:
+                item = self._get_mem_cache_item(func_id, args_id)
+                if item is not None:
+                    self._mem_cache_items[func_id][args_id] = item
+        items = [
+            (args_id, size, creation_time)
+            for args_id, (size, creation_time) in self._mem_cache_items[
+                func_id
+            ].items()
+        ]
+        return items
+
+    def _add_mem_cache_item(self, func_id: str, args_id: str) -> None:
+        """
+        Track an entry just stored in the memory cache.
+        """
+        items = self._mem_cache_items.get(func_id)
+        if items is None:
+            # The entry is found when listing the cache dir.
+            return
+        if args_id in items:
+            # The entry was removed from outside this object (e.g., by
+            # clearing the global cache), so the tracked entries are stale.
+            del self._mem_cache_items[func_id]
+            return
+        item = self._get_mem_cache_item(func_id, args_id)
+        if item is not None:
+            items[args_id] = item
+
+    def _evict_mem_cache_item(self, func_id: str, args_id: str) -> None:
+        memorized_result = self._get_memorized_result("mem")
+        _LOG.debug("Evicting func_id=%s args_id=%s", func_id, args_id)
+        memorized_result.store_backend.clear_item([func_id, args_id])
+        self._mem_cache_items.get(func_id, {}).pop(args_id, None)
+        self._mem_cache_last_access.pop(args_id, None)
+        self._mem_cache_num_accesses.pop(args_id, None)
+
+    def _is_mem_cache_item_expired(self, creation_time: float) -> bool:
+        if self._mem_cache_ttl is None:
+            return False
+        is_expired = time.time() - creation_time > self._mem_cache_ttl
+        return is_expired
+
+    def _expire_mem_cache_item(self, func_id: str, args_id: str) -> None:
+        """
+        Evict an entry of the memory cache if its TTL expired.
+        """
+        if self._mem_cache_ttl is None:
+            return
+        memorized_result = self._get_memorized_result("mem")
+        output_file = os.path.join(
+            memorized_result.store_backend.location,
+            func_id,
+            args_id,
+            "output.pkl",
+        )
+        try:
+            creation_time = os.path.getmtime(output_file)
+        except OSError:
+            # The entry is not cached.
+            return
+        if self._is_mem_cache_item_expired(creation_time):
+            self._evict_mem_cache_item(func_id, args_id)
+            self._mem_cache_num_expirations += 1
+
+    def _record_mem_cache_access(self, args_id: str) -> None:
+        self._mem_cache_last_access[args_id] = time.time()
+        self._mem_cache_num_accesses[args_id] = (
+            self._mem_cache_num_accesses.get(args_id, 0) + 1
+        )
+
+    def _enforce_mem_cache_limits(self, func_id: str, new_args_id: str) -> None:
+        """
+        Evict entries of this function from the memory cache until it respects
+        the limits.
+
+        The entry just stored is never evicted.
+        """
+        if not self._has_mem_cache_limits():
+            return
+        items = self._get_mem_cache_items(func_id)
+        # Drop the expired entries.
+        live_items = []
+        for args_id, size, creation_time in items:
+            if args_id != new_args_id and self._is_mem_cache_item_expired(
+                creation_time
+            ):
+                self._evict_mem_cache_item(func_id, args_id)
+                self._mem_cache_num_expirations += 1
+            else:
+                live_items.append((args_id, size, creation_time))
+        # Sort the candidates from the first to the last to evict. Entries not
+        # accessed by this process are ranked by their creation time.
+        candidates = [item for item in live_items if item[0] != new_args_id]
+        if self._mem_cache_eviction_policy == "lru":
+            candidates.sort(
+                key=lambda item: self._mem_cache_last_access.get(
+                    item[0], item[2]
+                )
+            )
+        else:
+            candidates.sort(
+                key=lambda item: (
+                    self._mem_cache_num_accesses.get(item[0], 0),
+                    self._mem_cache_last_access.get(item[0], item[2]),
+                )
+            )
+        num_entries = len(live_items)
+        num_bytes = sum(item[1] for item in live_items)
+        for args_id, size, _ in candidates:
+            is_over_limits = (
+                self._mem_cache_max_entries is not None
+                and num_entries > self._mem_cache_max_entries
+            ) or (
+                self._mem_cache_max_bytes is not None
+                and num_bytes > self._mem_cache_max_bytes
+            )
+            if not is_over_limits:
+                break
+            self._evict_mem_cache_item(func_id, args_id)
+            self._mem_cache_num_evictions += 1
+            num_entries -= 1
+            num_bytes -= size
+
     # ///////////////////////////////////////////////////////////////////////////
 
     def _reset_cache_tracing(self) -> None:
@@ -941,10 +1161,13 @@ class _Cached:
         )
         # Get the function signature.
         func_id, args_id = self._get_identifiers("mem", *args, **kwargs)
+        self._expire_mem_cache_item(func_id, args_id)
         if self._has_cached_version("mem", func_id, args_id):
             _LOG.debug("There is a mem cached version")
             if self._check_only_if_present:
                 raise CachedValueException(func_info)
+            if self._has_mem_cache_limits():
+                self._record_mem_cache_access(args_id)
             # The function execution was cached in the mem cache.
             with htimer.TimedScope(
                 logging.INFO, "Loading cached version from memory"
@@ -968,6 +1191,10 @@ class _Cached:
             # The function was not cached in memory, so now we need to update the
             # memory cache.
             self._store_cached_version("mem", func_id, args_id, obj)
+            if self._has_mem_cache_limits():
+                self._add_mem_cache_item(func_id, args_id)
+                self._record_mem_cache_access(args_id)
+                self._enforce_mem_cache_limits(func_id, args_id)
         return obj
 
     def _execute_intrinsic_function(self, *args: Any, **kwargs: Any) -> Any:
@@ -1030,6 +1257,10 @@ def cache(
     tag: Optional[str] = None,
     disk_cache_path: Optional[str] = None,
     aws_profile: Optional[str] = None,
+    mem_cache_max_entries: Optional[int] = None,
+    mem_cache_max_bytes: Optional[int] = None,
+    mem_cache_ttl: Optional[float] = None,
+    mem_cache_eviction_policy: str = "lru",
 ) -> Union[Callable, _Cached]:
     """
     Decorate a function with a cache.
@@ -1045,6 +1276,10 @@ def cache(
         return x + y
 
     @hcache.cache(use_mem_cache=False)
+    def add(x: int, y: int) -> int:
+        return x + y
+
+    @hcache.cache(mem_cache_max_entries=1000, mem_cache_eviction_policy="lfu")
     def add(x: int, y: int) -> int:
         return x + y
     ```
@@ -1059,6 +1294,10 @@ def cache(
             tag=tag,
             disk_cache_path=disk_cache_path,
             aws_profile=aws_profile,
+            mem_cache_max_entries=mem_cache_max_entries,
+            mem_cache_max_bytes=mem_cache_max_bytes,
+            mem_cache_ttl=mem_cache_ttl,
+            mem_cache_eviction_policy=mem_cache_eviction_policy,
         )
 
     return wrapper
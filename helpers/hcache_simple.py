@@ -1,13 +1,38 @@
+import asyncio
+import collections
+import collections.abc as cabc
+import contextlib
+import fcntl
 import functools
 import glob
+import hashlib
 import json
 import logging
 import os
 import pickle
 import re
-from typing import Any, Callable, Dict, List, Union, cast
+import shutil
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import helpers.hdbg as hdbg
+import helpers.hintrospection as hintros
 import helpers.hprint as hprint
 import helpers.hsystem as hsystem
 
@@ -38,7 +63,15 @@ def enable_cache_perf(func_name: str) -> None:
     """
     Enable cache performance statistics for a given function.
     """
-    _CACHE_PERF[func_name] = {"tot": 0, "hits": 0, "misses": 0}
+    _CACHE_PERF[func_name] = {
+        "tot": 0,
+        "hits": 0,
+        "misses": 0,
+        # Entries dropped from the memory cache to respect its size limits.
+        "evictions": 0,
+        # Entries dropped from the memory cache since their TTL expired.
+        "expirations": 0,
+    }
 
 
 def disable_cache_perf(func_name: str) -> None:
@@ -72,14 +105,322 @@ def get_cache_perf_stats(func_name: str) -> str:
     hits = perf["hits"]
     misses = perf["misses"]
     tot = perf["tot"]
+    evictions = perf.get("evictions", 0)
+    expirations = perf.get("expirations", 0)
     hit_rate = hits / tot if tot > 0 else 0
     txt = (
         f"{func_name}: hits={hits} misses={misses} tot={tot} hit_rate"
-        f"={hit_rate:.2f}"
+        f"={hit_rate:.2f} evictions={evictions} expirations={expirations}"
     )
     return txt
 
 
+# #############################################################################
+# BoundedMemCache
+# #############################################################################
+
+
+def _get_size_in_bytes(obj: Any) -> int:
+    """
+    Estimate the memory used by a cached value.
+    """
+    if hasattr(obj, "memory_usage"):
+        # Pandas objects: `DataFrame.memory_usage()` returns a series, while
+        # `Series.memory_usage()` returns an int.
+        size = obj.memory_usage(deep=True)
+        if hasattr(size, "sum"):
+            size = size.sum()
+    elif hasattr(obj, "nbytes"):
+        # Numpy arrays.
+        size = obj.nbytes
+    else:
+        size = hintros.get_size_in_bytes(obj)
+    size = int(size)
+    return size
+
+
+class BoundedMemCache(cabc.MutableMapping):
+    """
+    Dict-like memory cache with a bounded size and an optional TTL.
+
+    When the cache exceeds `max_entries` or `max_bytes`, entries are evicted
+    according to `eviction_policy`:
+    - "lru": the least recently used entry
+    - "lfu": the least frequently used entry, breaking ties by recency
+
+    Entries older than `ttl` seconds are dropped lazily when accessed or when
+    making room for new entries.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        eviction_policy: str = "lru",
+        on_evict: Optional[Callable[[str, Any, str], None]] = None,
+    ) -> None:
+        """
+        Constructor.
+
+        :param max_entries: maximum number of entries, `None` for no limit
+        :param max_bytes: maximum estimated size of the values in bytes,
+            `None` for no limit
+        :param ttl: time-to-live of an entry in seconds, `None` for no
+            expiration
+        :param eviction_policy: "lru" or "lfu"
+        :param on_evict: function called as `on_evict(key, value, reason)`
+            when an entry is dropped, where reason is "capacity" or "ttl"
+        """
+        hdbg.dassert_in(eviction_policy, ("lru", "lfu"))
+        if max_entries is not None:
+            hdbg.dassert_lt(0, max_entries)
+        if max_bytes is not None:
+            hdbg.dassert_lt(0, max_bytes)
+        if ttl is not None:
+            hdbg.dassert_lt(0, ttl)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._eviction_policy = eviction_policy
+        self._on_evict = on_evict
+        # key -> value, in order of last use for LRU.
+        self._data: collections.OrderedDict = collections.OrderedDict()
+        # key -> time of insertion, in order of insertion.
+        self._timestamps: Dict[str, float] = {}
+        # key -> estimated size in bytes.
+        self._sizes: Dict[str, int] = {}
+        self._num_bytes = 0
+        # For LFU: key -> number of accesses and number of accesses -> keys in
+        # order of last use, so that eviction is O(1).
+        self._freqs: Dict[str, int] = {}
+        self._freq_to_keys: Dict[int, collections.OrderedDict] = {}
+        self._min_freq = 0
+
+    def __contains__(self, key: object) -> bool:
+        # Checking membership doesn't count as a use of the entry.
+        if key not in self._data:
+            return False
+        key = cast(str, key)
+        if self._is_expired(key):
+            self._evict(key, "ttl")
+            return False
+        return True
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self:
+            raise KeyError(key)
+        self._touch(key)
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._data:
+            self._remove(key)
+        size = 0
+        if self._max_bytes is not None:
+            size = _get_size_in_bytes(value)
+        self._insert(key, value, size)
+        self._enforce_limits(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._data:
+            raise KeyError(key)
+        self._remove(key)
+
+    def __iter__(self) -> Iterator[str]:
+        # Iterate over a snapshot, since the caller might modify the cache.
+        keys = [key for key in self._data if not self._is_expired(key)]
+        return iter(keys)
+
+    def items(self) -> List[Tuple[str, Any]]:  # type: ignore[override]
+        """
+        Return the entries that are not expired, without counting as a use.
+        """
+        items = [
+            (key, value)
+            for key, value in self._data.items()
+            if not self._is_expired(key)
+        ]
+        return items
+
+    def __len__(self) -> int:
+        # Drop the expired entries, so that they are not counted.
+        self._evict_expired(new_key=None)
+        return len(self._data)
+
+    def set_on_evict(
+        self, on_evict: Optional[Callable[[str, Any, str], None]]
+    ) -> None:
+        """
+        Set the function called when an entry is dropped.
+
+        E.g., a cache can be filled with `update()` before setting the
+        callback, so that the entries dropped while loading are not reported.
+        """
+        self._on_evict = on_evict
+
+    def get_num_bytes(self) -> int:
+        """
+        Return the estimated size of the values in bytes.
+        """
+        return self._num_bytes
+
+    def add_if_room(self, key: str, value: Any) -> bool:
+        """
+        Insert a new entry only if it fits without evicting other entries.
+
+        The entry is inserted as the first one to evict, e.g., so that the
+        entries loaded from disk don't change the eviction order of the
+        entries in use.
+
+        :return: whether the entry was inserted
+        """
+        hdbg.dassert_not_in(key, self._data)
+        self._evict_expired(new_key=None)
+        if (
+            self._max_entries is not None
+            and len(self._data) >= self._max_entries
+        ):
+            return False
+        size = 0
+        if self._max_bytes is not None:
+            size = _get_size_in_bytes(value)
+            if self._num_bytes + size > self._max_bytes:
+                return False
+        self._insert(key, value, size)
+        if self._eviction_policy == "lru":
+            self._data.move_to_end(key, last=False)
+        else:
+            self._freq_to_keys[1].move_to_end(key, last=False)
+        return True
+
+    # /////////////////////////////////////////////////////////////////////////
+
+    def _insert(self, key: str, value: Any, size: int) -> None:
+        """
+        Insert a new entry as the most recently used, without evicting.
+        """
+        self._data[key] = value
+        self._timestamps[key] = time.monotonic()
+        self._sizes[key] = size
+        self._num_bytes += size
+        if self._eviction_policy == "lfu":
+            self._freqs[key] = 1
+            self._freq_to_keys.setdefault(1, collections.OrderedDict())[
+                key
+            ] = None
+            self._min_freq = 1
+
+    def _is_expired(self, key: str) -> bool:
+        if self._ttl is None:
+            return False
+        is_expired = time.monotonic() - self._timestamps[key] > self._ttl
+        return is_expired
+
+    def _evict_expired(self, new_key: Optional[str]) -> None:
+        """
+        Evict the expired entries.
+
+        `_timestamps` is ordered by time of insertion, since an entry is
+        removed before being inserted again, so the expired entries are a
+        prefix of it and the cost is proportional to the number of expired
+        entries.
+
+        :param new_key: entry just inserted, which is never evicted
+        """
+        if self._ttl is None:
+            return
+        expired_keys = []
+        for key in self._timestamps:
+            if not self._is_expired(key):
+                break
+            if key != new_key:
+                expired_keys.append(key)
+        for key in expired_keys:
+            self._evict(key, "ttl")
+
+    def _touch(self, key: str) -> None:
+        """
+        Record a use of an entry.
+        """
+        if self._eviction_policy == "lru":
+            self._data.move_to_end(key)
+            return
+        freq = self._freqs[key]
+        keys = self._freq_to_keys[freq]
+        del keys[key]
+        if not keys:
+            del self._freq_to_keys[freq]
+            if self._min_freq == freq:
+                self._min_freq = freq + 1
+        self._freqs[key] = freq + 1
+        self._freq_to_keys.setdefault(freq + 1, collections.OrderedDict())[
+            key
+        ] = None
+
+    def _remove(self, key: str) -> Any:
+        value = self._data.pop(key)
+        del self._timestamps[key]
+        self._num_bytes -= self._sizes.pop(key)
+        if self._eviction_policy == "lfu":
+            freq = self._freqs.pop(key)
+            keys = self._freq_to_keys[freq]
+            del keys[key]
+            if not keys:
+                del self._freq_to_keys[freq]
+        return value
+
+    def _evict(self, key: str, reason: str) -> None:
+        value = self._remove(key)
+        _LOG.debug("Evicting key='%s' reason=%s", key, reason)
+        if self._on_evict is not None:
+            self._on_evict(key, value, reason)
+
+    def _get_victim(self, new_key: str) -> str:
+        """
+        Return the entry to evict according to the eviction policy.
+
+        :param new_key: entry just inserted, which is never evicted
+        """
+        if self._eviction_policy == "lru":
+            # The new entry is the most recently used, i.e., the last one.
+            key = next(iter(self._data))
+        else:
+            if self._min_freq not in self._freq_to_keys:
+                self._min_freq = min(self._freq_to_keys)
+            keys = self._freq_to_keys[self._min_freq]
+            # The new entry is the last one among the least frequently used.
+            key = next(iter(keys))
+            if key == new_key:
+                # The new entry is alone in its bucket: use the next bucket.
+                freq = min(f for f in self._freq_to_keys if f != self._min_freq)
+                key = next(iter(self._freq_to_keys[freq]))
+        key = cast(str, key)
+        return key
+
+    def _is_over_limits(self) -> bool:
+        if self._max_entries is not None and len(self._data) > self._max_entries:
+            return True
+        if self._max_bytes is not None and self._num_bytes > self._max_bytes:
+            return True
+        return False
+
+    def _enforce_limits(self, new_key: str) -> None:
+        """
+        Evict entries until the cache respects its limits.
+
+        The entry just inserted is never evicted, even if it alone exceeds
+        `max_bytes`.
+        """
+        if not self._is_over_limits():
+            return
+        # Drop the expired entries first.
+        self._evict_expired(new_key)
+        while self._is_over_limits() and len(self._data) > 1:
+            key = self._get_victim(new_key)
+            self._evict(key, "capacity")
+
 # #############################################################################
 # Cache properties.
 # #############################################################################
@@ -99,6 +440,26 @@ def get_cache_property_file(type_: str) -> str:
     return val
 
 
+def _get_tmp_file_name(file_name: str) -> str:
+    """
+    Return a temporary file name to write `file_name` atomically.
+    """
+    dir_name, base_name = os.path.split(file_name)
+    # Use a hidden file, so that it doesn't look like a cache file.
+    tmp_file_name = os.path.join(dir_name, f".{base_name}.{os.getpid()}.tmp")
+    return tmp_file_name
+
+
+def _dump_pickle_atomically(obj: Any, file_name: str) -> None:
+    """
+    Save an object so that concurrent readers never see a partial file.
+    """
+    tmp_file_name = _get_tmp_file_name(file_name)
+    with open(tmp_file_name, "wb") as file:
+        pickle.dump(obj, file)
+    os.replace(tmp_file_name, file_name)
+
+
 def _get_initial_cache_property(type_: str) -> _CacheType:
     file_name_ = get_cache_property_file(type_)
     if os.path.exists(file_name_):
@@ -139,7 +500,12 @@ def _check_valid_cache_property(type_: str, property_name: str) -> None:
         ]
     elif type_ == "system":
         valid_properties = [
+            # Serialization format of the values ("json" or "pickle").
             "type",
+            # Layout of the disk cache ("single_file" or "sharded").
+            "disk_backend",
+            # Whether the disk cache is shared among processes.
+            "process_safe",
         ]
     else:
         raise ValueError(f"Invalid type '{type_}'")
@@ -177,8 +543,7 @@ def set_cache_property(
     # Update values on the disk.
     file_name = get_cache_property_file(type_)
     _LOG.debug("Updating %s", file_name)
-    with open(file_name, "wb") as file:
-        pickle.dump(cache_property, file)
+    _dump_pickle_atomically(cache_property, file_name)
 
 
 def get_cache_property(type_: str, func_name: str, property_name: str) -> bool:
@@ -209,8 +574,7 @@ def reset_cache_property(type_: str) -> None:
         raise ValueError(f"Invalid type '{type_}'")
     # Update values on the disk.
     _LOG.debug("Updating %s", file_name)
-    with open(file_name, "wb") as file:
-        pickle.dump(cache_property, file)
+    _dump_pickle_atomically(cache_property, file_name)
 
 
 def cache_property_to_str(type_: str, func_name: str = "") -> str:
@@ -241,6 +605,592 @@ def cache_property_to_str(type_: str, func_name: str = "") -> str:
     return result
 
 
+# #############################################################################
+# ShardedDiskCache
+# #############################################################################
+
+
+# Header of each record: length of the key and length of the value in bytes.
+_RECORD_HEADER = struct.Struct("<II")
+# Each shard file starts with a random id, which changes when the file is
+# rewritten. We can't rely on the inode, since it can be reused.
+_FILE_ID_SIZE = 16
+
+
+@contextlib.contextmanager
+def _file_lock(file_name: str, *, exclusive: bool = True) -> Iterator[None]:
+    """
+    Hold an advisory lock on a file, shared among processes.
+
+    :param file_name: lock file, created if it doesn't exist
+    :param exclusive: whether to take an exclusive lock for writing or a
+        shared lock for reading
+    """
+    with open(file_name, "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class ShardedDiskCache:
+    """
+    Append-only disk cache sharded by key hash.
+
+    The cache is stored in a directory with one file per shard. Each shard is
+    a file id followed by a sequence of records `header | key | value`, where
+    a key that is written again simply appends a new record superseding the
+    old one. This makes writing an entry O(1) instead of re-serializing the
+    entire cache.
+
+    Only the keys and the offsets of the values are kept in memory (the
+    index), while values are read lazily from disk on access. When the
+    fraction of superseded bytes in a shard exceeds `compact_ratio`, the shard
+    is rewritten in a background thread.
+
+    With `process_safe=True` many processes can share the same cache: each
+    shard is protected by a file lock, and each process catches up with the
+    records appended by the others by scanning only the tail of the shard
+    that it hasn't seen yet.
+    """
+
+    def __init__(
+        self,
+        dir_name: str,
+        cache_type: str,
+        *,
+        num_shards: int = 16,
+        compact_ratio: float = 0.5,
+        compact_min_bytes: int = 1024**2,
+        process_safe: bool = False,
+    ) -> None:
+        """
+        Constructor.
+
+        :param dir_name: directory storing the shards
+        :param cache_type: how values are serialized ('json' or 'pickle')
+        :param num_shards: number of shards for a new cache; an existing
+            cache keeps the number of shards it was created with
+        :param compact_ratio: fraction of superseded bytes in a shard that
+            triggers a background compaction
+        :param compact_min_bytes: shards smaller than this are never
+            compacted automatically
+        :param process_safe: whether to lock the shards so that they can be
+            read and written concurrently by many processes
+        """
+        hdbg.dassert_in(cache_type, ("json", "pickle"))
+        hdbg.dassert_lt(0, num_shards)
+        hdbg.dassert_lt(0.0, compact_ratio)
+        self._dir_name = dir_name
+        self._cache_type = cache_type
+        self._compact_ratio = compact_ratio
+        self._compact_min_bytes = compact_min_bytes
+        self._process_safe = process_safe
+        os.makedirs(self._dir_name, exist_ok=True)
+        self._num_shards = self._load_or_save_num_shards(num_shards)
+        # One lock per shard, so that writers of different shards don't block
+        # each other.
+        self._locks = [threading.Lock() for _ in range(self._num_shards)]
+        # shard_idx -> key -> (value offset, value length).
+        self._index: List[Dict[str, Tuple[int, int]]] = [
+            {} for _ in range(self._num_shards)
+        ]
+        # Size of the part of each shard file that has been indexed.
+        self._file_sizes = [0] * self._num_shards
+        # Bytes of records that have been superseded in each shard.
+        self._dead_bytes = [0] * self._num_shards
+        # Id of each indexed shard file, used to detect that another process
+        # has rewritten it. `None` means that the shard was never indexed and
+        # an empty id that the file doesn't exist.
+        self._file_ids: List[Optional[bytes]] = [None] * self._num_shards
+        # shard_idx -> background compaction thread.
+        self._compaction_threads: Dict[int, threading.Thread] = {}
+        for shard_idx in range(self._num_shards):
+            with self._lock_shard(shard_idx):
+                self._sync_index(shard_idx, truncate=True)
+
+    def __contains__(self, key: str) -> bool:
+        shard_idx = self._get_shard_idx(key)
+        if self._process_safe:
+            with self._lock_shard(shard_idx, exclusive=False):
+                self._sync_index(shard_idx)
+        return key in self._index[shard_idx]
+
+    def __len__(self) -> int:
+        self.refresh()
+        return sum(len(index) for index in self._index)
+
+    def keys(self) -> List[str]:
+        """
+        Return all the keys stored in the cache.
+        """
+        self.refresh()
+        keys = [key for index in self._index for key in index]
+        return keys
+
+    def refresh(self) -> None:
+        """
+        Index the records appended by other processes.
+        """
+        if not self._process_safe:
+            return
+        for shard_idx in range(self._num_shards):
+            with self._lock_shard(shard_idx, exclusive=False):
+                self._sync_index(shard_idx)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Read the value of a key from disk.
+
+        :return: whether the key was found and its value (or None)
+        """
+        shard_idx = self._get_shard_idx(key)
+        with self._lock_shard(shard_idx, exclusive=False):
+            # Catch up with the writes of the other processes, if needed.
+            self._sync_index(shard_idx)
+            if key not in self._index[shard_idx]:
+                return False, None
+            value_offset, value_len = self._index[shard_idx][key]
+            with open(self._get_shard_path(shard_idx), "rb") as file:
+                file.seek(value_offset)
+                data = file.read(value_len)
+        value = self._decode(data)
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Append a key-value pair to the cache.
+        """
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """
+        Append many key-value pairs, opening each shard file only once.
+        """
+        # Serialize outside the locks and group the records by shard.
+        records_by_shard: Dict[int, List[Tuple[str, bytes]]] = {}
+        for key, value in items:
+            shard_idx = self._get_shard_idx(key)
+            records_by_shard.setdefault(shard_idx, []).append(
+                (key, self._encode(value))
+            )
+        for shard_idx, records in records_by_shard.items():
+            with self._lock_shard(shard_idx):
+                # Append after the records written by the other processes.
+                self._sync_index(shard_idx, truncate=True)
+                self._append_records(shard_idx, records)
+            self._maybe_compact(shard_idx)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Load the entire cache in memory.
+        """
+        data = {}
+        for shard_idx in range(self._num_shards):
+            with self._lock_shard(shard_idx, exclusive=False):
+                self._sync_index(shard_idx)
+                index = dict(self._index[shard_idx])
+                path = self._get_shard_path(shard_idx)
+                if not index:
+                    continue
+                with open(path, "rb") as file:
+                    for key, (value_offset, value_len) in index.items():
+                        file.seek(value_offset)
+                        data[key] = file.read(value_len)
+        data = {key: self._decode(value) for key, value in data.items()}
+        return data
+
+    def compact(self) -> None:
+        """
+        Rewrite all the shards synchronously, dropping superseded records.
+        """
+        self.wait_for_compaction()
+        self.refresh()
+        for shard_idx in range(self._num_shards):
+            if self._dead_bytes[shard_idx] > 0:
+                self._compact_shard(shard_idx)
+
+    def wait_for_compaction(self) -> None:
+        """
+        Block until all the background compactions are done.
+        """
+        for thread in list(self._compaction_threads.values()):
+            thread.join()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Return the number of entries, the total and the superseded bytes.
+        """
+        num_entries = len(self)
+        stats = {
+            "num_entries": num_entries,
+            "num_bytes": sum(self._file_sizes),
+            "dead_bytes": sum(self._dead_bytes),
+        }
+        return stats
+
+    # /////////////////////////////////////////////////////////////////////////
+
+    def _load_or_save_num_shards(self, num_shards: int) -> int:
+        """
+        Read the number of shards of an existing cache or save it for a new
+        one.
+        """
+        file_name = os.path.join(self._dir_name, "meta.json")
+        lock_file_name = file_name + ".lock"
+        with _file_lock(lock_file_name):
+            if os.path.exists(file_name):
+                with open(file_name, "r", encoding="utf-8") as file:
+                    meta = json.load(file)
+                hdbg.dassert_eq(meta["cache_type"], self._cache_type)
+                num_shards = int(meta["num_shards"])
+            else:
+                meta = {"cache_type": self._cache_type, "num_shards": num_shards}
+                with open(file_name, "w", encoding="utf-8") as file:
+                    json.dump(meta, file)
+        return num_shards
+
+    @contextlib.contextmanager
+    def _lock_shard(
+        self, shard_idx: int, *, exclusive: bool = True
+    ) -> Iterator[None]:
+        """
+        Lock a shard against the other threads and, if needed, processes.
+        """
+        with self._locks[shard_idx]:
+            if not self._process_safe:
+                yield
+                return
+            lock_file_name = os.path.join(
+                self._dir_name, f"shard_{shard_idx:03d}.lock"
+            )
+            with _file_lock(lock_file_name, exclusive=exclusive):
+                yield
+
+    def _get_shard_idx(self, key: str) -> int:
+        # We can't use `hash()` since it's salted differently in each process.
+        shard_idx = zlib.crc32(key.encode("utf-8")) % self._num_shards
+        return shard_idx
+
+    def _get_shard_path(self, shard_idx: int) -> str:
+        path = os.path.join(self._dir_name, f"shard_{shard_idx:03d}.bin")
+        return path
+
+    def _encode(self, value: Any) -> bytes:
+        if self._cache_type == "pickle":
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            data = json.dumps(value, sort_keys=True, ensure_ascii=False)
+            data = data.encode("utf-8")
+        return data
+
+    def _decode(self, data: bytes) -> Any:
+        if self._cache_type == "pickle":
+            value = pickle.loads(data)
+        else:
+            value = json.loads(data.decode("utf-8"))
+        return value
+
+    @staticmethod
+    def _iter_records(
+        file: Any, start: int, end: int
+    ) -> Iterator[Tuple[str, int, int, int]]:
+        """
+        Scan the record headers in `[start, end)` without reading the values.
+
+        The scan stops at the first truncated record, e.g., left by a crash in
+        the middle of a write.
+
+        :return: iterator over (key, record offset, value offset, value length)
+        """
+        offset = start
+        file.seek(offset)
+        while offset + _RECORD_HEADER.size <= end:
+            key_len, value_len = _RECORD_HEADER.unpack(
+                file.read(_RECORD_HEADER.size)
+            )
+            value_offset = offset + _RECORD_HEADER.size + key_len
+            if value_offset + value_len > end:
+                break
+            key = file.read(key_len).decode("utf-8")
+            yield key, offset, value_offset, value_len
+            offset = value_offset + value_len
+            file.seek(offset)
+
+    def _sync_index(self, shard_idx: int, *, truncate: bool = False) -> None:
+        """
+        Update the index of a shard with the records not indexed yet.
+
+        Only the part of the shard file after the last indexed record is
+        scanned, unless the file was rewritten by another process, in which
+        case the entire file is indexed again. The caller must hold the lock
+        of the shard.
+
+        :param truncate: whether to drop a partially written record at the
+            end of the file (the caller must hold an exclusive lock)
+        """
+        if not self._process_safe and self._file_ids[shard_idx] is not None:
+            # No other process can write to the shard.
+            return
+        path = self._get_shard_path(shard_idx)
+        if not os.path.exists(path):
+            self._reset_index(shard_idx, b"")
+            return
+        with open(path, "rb") as file:
+            file_id = file.read(_FILE_ID_SIZE)
+            file_size = os.fstat(file.fileno()).st_size
+            if len(file_id) < _FILE_ID_SIZE:
+                # The file was not completely created.
+                file_id = b""
+            if file_id != self._file_ids[shard_idx]:
+                # The file is new or has been compacted: index it from scratch.
+                self._reset_index(shard_idx, file_id)
+            start = self._file_sizes[shard_idx]
+            if file_size == start:
+                return
+            index = self._index[shard_idx]
+            valid_end = start
+            for key, _, value_offset, value_len in self._iter_records(
+                file, start, file_size
+            ):
+                if key in index:
+                    self._dead_bytes[shard_idx] += self._get_record_size(
+                        key, index[key]
+                    )
+                index[key] = (value_offset, value_len)
+                valid_end = value_offset + value_len
+        if valid_end < file_size and truncate:
+            # Drop a partially written record, so that the next appends are
+            # aligned.
+            _LOG.warning(
+                "Truncating corrupted tail of '%s' from %s to %s bytes",
+                path,
+                file_size,
+                valid_end,
+            )
+            with open(path, "r+b") as file:
+                file.truncate(valid_end)
+        self._file_sizes[shard_idx] = valid_end
+
+    def _reset_index(self, shard_idx: int, file_id: bytes) -> None:
+        self._index[shard_idx] = {}
+        self._dead_bytes[shard_idx] = 0
+        self._file_ids[shard_idx] = file_id
+        # The records start after the file id.
+        self._file_sizes[shard_idx] = _FILE_ID_SIZE if file_id else 0
+
+    @staticmethod
+    def _get_record_size(key: str, entry: Tuple[int, int]) -> int:
+        record_size = _RECORD_HEADER.size + len(key.encode("utf-8")) + entry[1]
+        return record_size
+
+    @staticmethod
+    def _pack_record(key: str, data: bytes) -> bytes:
+        key_data = key.encode("utf-8")
+        record = _RECORD_HEADER.pack(len(key_data), len(data)) + key_data + data
+        return record
+
+    def _append_records(
+        self, shard_idx: int, records: List[Tuple[str, bytes]]
+    ) -> None:
+        """
+        Append records to a shard and update its index.
+
+        The caller must hold an exclusive lock of the shard.
+        """
+        index = self._index[shard_idx]
+        offset = self._file_sizes[shard_idx]
+        chunks = []
+        if offset == 0:
+            # Create the file.
+            file_id = os.urandom(_FILE_ID_SIZE)
+            chunks.append(file_id)
+            offset = _FILE_ID_SIZE
+            self._file_ids[shard_idx] = file_id
+        for key, data in records:
+            record = self._pack_record(key, data)
+            value_offset = offset + len(record) - len(data)
+            if key in index:
+                self._dead_bytes[shard_idx] += self._get_record_size(
+                    key, index[key]
+                )
+            index[key] = (value_offset, len(data))
+            offset += len(record)
+            chunks.append(record)
+        with open(self._get_shard_path(shard_idx), "ab") as file:
+            file.write(b"".join(chunks))
+        self._file_sizes[shard_idx] = offset
+
+    def _maybe_compact(self, shard_idx: int) -> None:
+        """
+        Start a background compaction of a shard if it has too much garbage.
+        """
+        dead_bytes = self._dead_bytes[shard_idx]
+        file_size = self._file_sizes[shard_idx]
+        if file_size < self._compact_min_bytes:
+            return
+        if dead_bytes < self._compact_ratio * file_size:
+            return
+        thread = self._compaction_threads.get(shard_idx)
+        if thread is not None and thread.is_alive():
+            return
+        _LOG.debug(
+            "Compacting shard %s of '%s' in the background",
+            shard_idx,
+            self._dir_name,
+        )
+        thread = threading.Thread(
+            target=self._compact_shard, args=(shard_idx,), daemon=True
+        )
+        self._compaction_threads[shard_idx] = thread
+        thread.start()
+
+    def _compact_shard(self, shard_idx: int) -> None:
+        """
+        Rewrite a shard keeping only the live records.
+
+        The bulk of the copy is done without holding the lock of the shard,
+        so that readers and writers are not blocked. The records appended in
+        the meantime are copied under the lock right before swapping the
+        files.
+        """
+        path = self._get_shard_path(shard_idx)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock_shard(shard_idx, exclusive=False):
+            self._sync_index(shard_idx)
+            index = dict(self._index[shard_idx])
+            end = self._file_sizes[shard_idx]
+            file_id = self._file_ids[shard_idx]
+            src = open(path, "rb")  # pylint: disable=consider-using-with
+        new_index: Dict[str, Tuple[int, int]] = {}
+        new_file_id = os.urandom(_FILE_ID_SIZE)
+        new_offset = _FILE_ID_SIZE
+        with src, open(tmp_path, "wb") as dst:
+            dst.write(new_file_id)
+            # Copy the live records as of the snapshot.
+            for key, (value_offset, value_len) in index.items():
+                src.seek(value_offset)
+                record = self._pack_record(key, src.read(value_len))
+                dst.write(record)
+                new_index[key] = (new_offset + len(record) - value_len, value_len)
+                new_offset += len(record)
+            with self._lock_shard(shard_idx):
+                with open(path, "rb") as file:
+                    is_rewritten = file.read(_FILE_ID_SIZE) != file_id
+                if is_rewritten:
+                    # Another process compacted the shard in the meantime.
+                    _LOG.debug("Skipping compaction of '%s'", path)
+                    os.remove(tmp_path)
+                    return
+                # Copy the records appended after the snapshot.
+                new_dead_bytes = 0
+                tail = list(
+                    self._iter_records(src, end, os.fstat(src.fileno()).st_size)
+                )
+                for key, _, value_offset, value_len in tail:
+                    src.seek(value_offset)
+                    record = self._pack_record(key, src.read(value_len))
+                    dst.write(record)
+                    if key in new_index:
+                        new_dead_bytes += self._get_record_size(
+                            key, new_index[key]
+                        )
+                    new_index[key] = (
+                        new_offset + len(record) - value_len,
+                        value_len,
+                    )
+                    new_offset += len(record)
+                dst.flush()
+                os.fsync(dst.fileno())
+                os.replace(tmp_path, path)
+                self._index[shard_idx] = new_index
+                self._file_sizes[shard_idx] = new_offset
+                self._dead_bytes[shard_idx] = new_dead_bytes
+                self._file_ids[shard_idx] = new_file_id
+
+
+if "_SHARDED_DISK_CACHES" not in globals():
+    _LOG.debug("Creating _SHARDED_DISK_CACHES")
+    # func_name -> sharded disk cache.
+    _SHARDED_DISK_CACHES: Dict[str, ShardedDiskCache] = {}
+
+
+# Keys updated in memory and not yet written to a sharded disk cache.
+if "_SHARDED_DIRTY_KEYS" not in globals():
+    # func_name -> keys.
+    _SHARDED_DIRTY_KEYS: Dict[str, Set[str]] = {}
+
+
+def _get_disk_backend(func_name: str) -> str:
+    """
+    Return the disk backend for a function ('single_file' or 'sharded').
+    """
+    disk_backend = get_cache_property("system", func_name, "disk_backend")
+    if not disk_backend:
+        disk_backend = "single_file"
+    disk_backend = cast(str, disk_backend)
+    return disk_backend
+
+
+def _is_sharded(func_name: str) -> bool:
+    return _get_disk_backend(func_name) == "sharded"
+
+
+def get_sharded_disk_cache(func_name: str) -> ShardedDiskCache:
+    """
+    Get the sharded disk cache of a function, opening it if needed.
+    """
+    hdbg.dassert(
+        _is_sharded(func_name),
+        "Function '%s' doesn't use a sharded disk cache",
+        func_name,
+    )
+    if func_name not in _SHARDED_DISK_CACHES:
+        dir_name = _get_cache_file_name(func_name)
+        cache_type = get_cache_property("system", func_name, "type")
+        process_safe = get_cache_property("system", func_name, "process_safe")
+        _SHARDED_DISK_CACHES[func_name] = ShardedDiskCache(
+            dir_name, cache_type, process_safe=process_safe
+        )
+    return _SHARDED_DISK_CACHES[func_name]
+
+
+def _get_cached_value(
+    func_name: str, cache: Dict[str, Any], key: str
+) -> Tuple[bool, Any]:
+    """
+    Look up a key in the memory cache and then in the sharded disk cache.
+
+    :return: whether the key was found and its value (or None)
+    """
+    if key in cache:
+        return True, cache[key]
+    if not _is_sharded(func_name):
+        return False, None
+    found, value = get_sharded_disk_cache(func_name).get(key)
+    if found:
+        # Promote the value to the memory cache.
+        cache[key] = value
+    return found, value
+
+
+def _flush_sharded_cache_to_disk(func_name: str) -> None:
+    """
+    Append to the sharded disk cache only the entries that are not on disk.
+    """
+    mem_cache = get_mem_cache(func_name)
+    disk_cache = get_sharded_disk_cache(func_name)
+    dirty_keys = _SHARDED_DIRTY_KEYS.pop(func_name, set())
+    items = [
+        (key, value)
+        for key, value in mem_cache.items()
+        if key in dirty_keys or key not in disk_cache
+    ]
+    _LOG.debug("Appending %s entries to disk", len(items))
+    disk_cache.put_many(items)
+
+
 # #############################################################################
 # Disk cache.
 # #############################################################################
@@ -248,6 +1198,10 @@ def cache_property_to_str(type_: str, func_name: str = "") -> str:
 
 def _get_cache_file_name(func_name: str) -> str:
     file_name = f"cache.{func_name}"
+    if _is_sharded(func_name):
+        # The sharded cache is a directory.
+        file_name += ".shards"
+        return file_name
     cache_type = get_cache_property("system", func_name, "type")
     _LOG.debug(hprint.to_str("cache_type"))
     if cache_type == "pickle":
@@ -267,24 +1221,53 @@ def _save_cache_dict_to_disk(func_name: str, data: Dict) -> None:
     file_name = _get_cache_file_name(func_name)
     cache_type = get_cache_property("system", func_name, "type")
     _LOG.debug(hprint.to_str("file_name cache_type"))
+    # Write to a temporary file and rename it, so that readers in other
+    # processes never see a partially written cache.
+    tmp_file_name = _get_tmp_file_name(file_name)
     if cache_type == "pickle":
-        with open(file_name, "wb") as file:
+        with open(tmp_file_name, "wb") as file:
             pickle.dump(data, file)
     elif cache_type == "json":
-        with open(file_name, "w", encoding="utf-8") as file:
+        with open(tmp_file_name, "w", encoding="utf-8") as file:
             json.dump(data, file, indent=4, sort_keys=True, ensure_ascii=False)
     else:
         raise ValueError(f"Invalid cache type '{cache_type}'")
+    os.replace(tmp_file_name, file_name)
 
 
-def get_disk_cache(func_name: str) -> Dict:
+def _get_lock_file_name(func_name: str) -> str:
+    """
+    Return the file used to lock the single file disk cache of a function.
+    """
+    file_name = _get_cache_file_name(func_name)
+    # Use a hidden file, so that it doesn't look like a cache file.
+    lock_file_name = f".{file_name}.lock"
+    return lock_file_name
+
+
+@contextlib.contextmanager
+def _lock_disk_cache(func_name: str) -> Iterator[None]:
+    """
+    Lock the single file disk cache of a function against other processes,
+    if the function is process safe.
+    """
+    if get_cache_property("system", func_name, "process_safe"):
+        with _file_lock(_get_lock_file_name(func_name)):
+            yield
+    else:
+        yield
+
+
+def _load_disk_cache(func_name: str) -> Dict:
+    """
+    Load the single file disk cache of a function, without locking it.
+
+    :return: the cache or an empty dict if the file doesn't exist
+    """
     file_name = _get_cache_file_name(func_name)
-    # If the disk cache doesn't exist, create it.
     if not os.path.exists(file_name):
         _LOG.debug("No cache from disk")
-        data: _CacheType = {}
-        _save_cache_dict_to_disk(func_name, data)
-    # Load data.
+        return {}
     cache_type = get_cache_property("system", func_name, "type")
     _LOG.debug(hprint.to_str("cache_type"))
     if cache_type == "pickle":
@@ -298,6 +1281,23 @@ def get_disk_cache(func_name: str) -> Dict:
     return data
 
 
+def get_disk_cache(func_name: str) -> Dict:
+    if _is_sharded(func_name):
+        # Load all the shards.
+        data = get_sharded_disk_cache(func_name).to_dict()
+        return data
+    file_name = _get_cache_file_name(func_name)
+    # If the disk cache doesn't exist, create it.
+    if not os.path.exists(file_name):
+        with _lock_disk_cache(func_name):
+            # Another process might have created it in the meantime.
+            if not os.path.exists(file_name):
+                data: _CacheType = {}
+                _save_cache_dict_to_disk(func_name, data)
+    data = _load_disk_cache(func_name)
+    return data
+
+
 def force_cache_from_disk(func_name: str = "") -> None:
     """
     Force to get the cache from disk and update the memory cache.
@@ -313,8 +1313,7 @@ def force_cache_from_disk(func_name: str = "") -> None:
     disk_cache = get_disk_cache(func_name)
     _LOG.debug("disk_cache=%s", len(disk_cache))
     # Update the memory cache.
-    global _CACHE
-    _CACHE[func_name] = disk_cache
+    _set_mem_cache(func_name, disk_cache)
 
 
 def flush_cache_to_disk(func_name: str = "") -> None:
@@ -328,19 +1327,26 @@ def flush_cache_to_disk(func_name: str = "") -> None:
         _LOG.info("After:\n%s", cache_stats_to_str())
         return
     _LOG.debug("func_name='%s'", func_name)
+    if _is_sharded(func_name):
+        # Append only the new entries instead of rewriting the entire cache.
+        _flush_sharded_cache_to_disk(func_name)
+        return
     # Get memory cache.
     mem_cache = get_mem_cache(func_name)
     _LOG.debug("mem_cache=%s", len(mem_cache))
-    # Get disk cache.
-    disk_cache = get_disk_cache(func_name)
-    _LOG.debug("disk_cache=%s", len(disk_cache))
-    # Merge disk cache with memory cache.
-    disk_cache.update(mem_cache)
-    # Save merged cache to disk.
-    _save_cache_dict_to_disk(func_name, disk_cache)
+    # Hold the lock from reading to writing the disk cache, so that the
+    # entries written by other processes in the meantime are not lost.
+    with _lock_disk_cache(func_name):
+        # Get disk cache. The lock is not re-entrant, so we can't use
+        # `get_disk_cache()`, which takes it to create a missing file.
+        disk_cache = _load_disk_cache(func_name)
+        _LOG.debug("disk_cache=%s", len(disk_cache))
+        # Merge disk cache with memory cache.
+        disk_cache.update(mem_cache.items())
+        # Save merged cache to disk.
+        _save_cache_dict_to_disk(func_name, disk_cache)
     # Update the memory cache.
-    global _CACHE
-    _CACHE[func_name] = disk_cache
+    _add_to_mem_cache(func_name, disk_cache)
 
 
 # #############################################################################
@@ -367,7 +1373,7 @@ def get_cache_func_names(type_: str) -> List[str]:
     elif type_ == "disk":
         disk_func_names = glob.glob("cache.*")
         disk_func_names = [
-            re.sub(r"cache\.(.*)\.(json|pkl)", r"\1", cache)
+            re.sub(r"cache\.(.*)\.(json|pkl|shards)$", r"\1", cache)
             for cache in disk_func_names
         ]
         disk_func_names = sorted(disk_func_names)
@@ -377,6 +1383,98 @@ def get_cache_func_names(type_: str) -> List[str]:
     return val
 
 
+if "_MEM_CACHE_LIMITS" not in globals():
+    # func_name -> kwargs of `BoundedMemCache`.
+    _MEM_CACHE_LIMITS: Dict[str, Dict[str, Any]] = {}
+
+
+def set_mem_cache_limits(
+    func_name: str,
+    *,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    ttl: Optional[float] = None,
+    eviction_policy: str = "lru",
+) -> None:
+    """
+    Bound the memory cache of a function.
+
+    The limits apply from the next time the memory cache is created, e.g.,
+    after `reset_mem_cache()`. Passing no limits makes the memory cache
+    unbounded again.
+
+    :param func_name: The name of the function.
+    :param max_entries: The maximum number of entries.
+    :param max_bytes: The maximum estimated size of the values in bytes.
+    :param ttl: The time-to-live of an entry in seconds.
+    :param eviction_policy: The eviction policy ('lru' or 'lfu').
+    """
+    hdbg.dassert_in(eviction_policy, ("lru", "lfu"))
+    if max_entries is None and max_bytes is None and ttl is None:
+        _MEM_CACHE_LIMITS.pop(func_name, None)
+        return
+    _MEM_CACHE_LIMITS[func_name] = {
+        "max_entries": max_entries,
+        "max_bytes": max_bytes,
+        "ttl": ttl,
+        "eviction_policy": eviction_policy,
+    }
+
+
+def _on_mem_cache_evict(func_name: str, key: str, value: Any, reason: str) -> None:
+    """
+    Update the stats and save unflushed entries evicted from the memory cache.
+    """
+    cache_perf = get_cache_perf(func_name)
+    if cache_perf:
+        if reason == "ttl":
+            cache_perf["expirations"] += 1
+        else:
+            cache_perf["evictions"] += 1
+    dirty_keys = _SHARDED_DIRTY_KEYS.get(func_name, set())
+    if key in dirty_keys:
+        # The entry is not on disk yet: write it before dropping it.
+        dirty_keys.discard(key)
+        get_sharded_disk_cache(func_name).put(key, value)
+
+
+def _set_mem_cache(func_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Set the memory cache of a function, bounding it if it has limits.
+    """
+    cache: Dict[str, Any]
+    if func_name in _MEM_CACHE_LIMITS:
+        cache = BoundedMemCache(  # type: ignore[assignment]
+            **_MEM_CACHE_LIMITS[func_name]
+        )
+        # The entries dropped while loading are already on disk and were
+        # never used, so they are not reported as evictions.
+        cache.update(data)
+        cache.set_on_evict(  # type: ignore[attr-defined]
+            functools.partial(_on_mem_cache_evict, func_name)
+        )
+    else:
+        cache = data
+    _CACHE[func_name] = cache
+    return cache
+
+
+def _add_to_mem_cache(func_name: str, data: Dict[str, Any]) -> None:
+    """
+    Add to the memory cache of a function the entries that it doesn't have.
+
+    A bounded memory cache is updated in place and only while it has room, so
+    that the recency and frequency of the entries in use are preserved.
+    """
+    cache = _CACHE.get(func_name)
+    if not isinstance(cache, BoundedMemCache):
+        _set_mem_cache(func_name, data)
+        return
+    for key, value in data.items():
+        if key not in cache and not cache.add_if_room(key, value):
+            break
+
+
 def get_mem_cache(func_name: str) -> _CacheType:
     mem_cache = _CACHE.get(func_name, {})
     return mem_cache
@@ -390,14 +1488,17 @@ def get_cache(func_name: str) -> _CacheType:
         retrieved.
     :return: A dictionary containing the cache data.
     """
-    global _CACHE
     if func_name in _CACHE:
         _LOG.debug("Loading mem cache for '%s'", func_name)
         cache = get_mem_cache(func_name)
+    elif _is_sharded(func_name):
+        # The values are loaded lazily from the sharded disk cache on a miss.
+        _LOG.debug("Creating empty mem cache for '%s'", func_name)
+        cache = _set_mem_cache(func_name, {})
     else:
         _LOG.debug("Loading disk cache for '%s'", func_name)
         cache = get_disk_cache(func_name)
-        _CACHE[func_name] = cache
+        cache = _set_mem_cache(func_name, cache)
     return cache
 
 
@@ -436,7 +1537,10 @@ def cache_stats_to_str(func_name: str = "") -> "pd.DataFrame":  # noqa: F821
         result["memory"] = "-"
     # Disk cache.
     file_name = _get_cache_file_name(func_name)
-    if os.path.exists(file_name):
+    if _is_sharded(func_name):
+        # Count the keys from the index without loading the values.
+        result["disk"] = len(get_sharded_disk_cache(func_name))
+    elif os.path.exists(file_name):
         disk_cache = get_disk_cache(func_name)
         result["disk"] = len(disk_cache)
     else:
@@ -479,11 +1583,27 @@ def reset_disk_cache(func_name: str = "", interactive: bool = True) -> None:
     if func_name == "":
         cache_files = glob.glob("cache.*")
         _LOG.warning("Resetting disk cache")
+        for sharded_disk_cache in _SHARDED_DISK_CACHES.values():
+            sharded_disk_cache.wait_for_compaction()
+        _SHARDED_DISK_CACHES.clear()
+        _SHARDED_DIRTY_KEYS.clear()
         for file_name in cache_files:
-            os.remove(file_name)
+            if os.path.isdir(file_name):
+                shutil.rmtree(file_name)
+            else:
+                os.remove(file_name)
         return
+    if func_name in _SHARDED_DISK_CACHES:
+        _SHARDED_DISK_CACHES.pop(func_name).wait_for_compaction()
+    _SHARDED_DIRTY_KEYS.pop(func_name, None)
     file_name = _get_cache_file_name(func_name)
-    if os.path.exists(file_name):
+    lock_file_name = _get_lock_file_name(func_name)
+    if os.path.exists(lock_file_name):
+        os.remove(lock_file_name)
+    if os.path.isdir(file_name):
+        _LOG.warning(f"Removing cache dir '{file_name}'")
+        shutil.rmtree(file_name)
+    elif os.path.exists(file_name):
         _LOG.warning(f"Removing cache file '{file_name}'")
         os.remove(file_name)
 
@@ -493,15 +1613,316 @@ def reset_cache(func_name: str = "", interactive=True) -> None:
     reset_disk_cache(func_name, interactive=interactive)
 
 
+# #############################################################################
+# Cache key.
+# #############################################################################
+
+
+_encode_str = json.encoder.encode_basestring_ascii  # type: ignore[attr-defined]
+
+
+def _encode_float(val: float) -> str:
+    # Same representation as `json.dumps()`.
+    if val != val:
+        return "NaN"
+    if val == float("inf"):
+        return "Infinity"
+    if val == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(val)
+
+
+# Encoders of the arguments that can be serialized exactly and cheaply in a
+# key, producing the same representation as `json.dumps()`.
+_SCALAR_ENCODERS: Dict[type, Callable[[Any], str]] = {
+    int: int.__repr__,
+    float: _encode_float,
+    bool: lambda val: "true" if val else "false",
+    str: _encode_str,
+    type(None): lambda val: "null",
+}
+
+
+def _hash_ndarray(arr: Any) -> str:
+    """
+    Hash a numpy array by its dtype, shape and content.
+    """
+    import numpy as np
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{arr.dtype.str}{arr.shape}".encode("utf-8"))
+    if arr.dtype.hasobject:
+        # There is no buffer with the values of the objects.
+        hasher.update(pickle.dumps(arr.tolist()))
+    else:
+        # Hash the buffer without copying it, if possible.
+        hasher.update(np.ascontiguousarray(arr).data)
+    digest = hasher.hexdigest()
+    return digest
+
+
+def _hash_pandas_obj(obj: Any) -> str:
+    """
+    Hash a pandas DataFrame, Series or Index by its metadata and content.
+    """
+    import pandas as pd
+
+    hasher = hashlib.blake2b(digest_size=16)
+    if isinstance(obj, pd.DataFrame):
+        metadata = [list(obj.columns), [str(dtype) for dtype in obj.dtypes]]
+    else:
+        metadata = [obj.name, str(obj.dtype)]
+    hasher.update(repr(metadata).encode("utf-8"))
+    try:
+        # Hash the values and the index in vectorized form.
+        row_hashes = pd.util.hash_pandas_object(obj, index=True)
+        hasher.update(row_hashes.to_numpy().data)
+    except TypeError:
+        # E.g., cells with unhashable objects like lists.
+        hasher.update(pickle.dumps(obj))
+    digest = hasher.hexdigest()
+    return digest
+
+
+def _encode_key_obj(obj: Any) -> str:
+    """
+    Encode an argument that can't be serialized in JSON.
+
+    Numpy and pandas objects are replaced by a hash of their content, while
+    other objects are converted to string.
+    """
+    # Use the modules only if they were already imported by the caller, since
+    # otherwise `obj` can't be one of their objects.
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(obj, np.ndarray):
+        return f"ndarray:{_hash_ndarray(obj)}"
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        return f"{type(obj).__name__}:{_hash_pandas_obj(obj)}"
+    return str(obj)
+
+
+# Build the encoder once, since `json.dumps()` with non-default parameters
+# creates a new encoder on every call.
+_KEY_ENCODER = json.JSONEncoder(sort_keys=True, default=_encode_key_obj)
+
+
+def get_cache_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """
+    Build the cache key for the arguments of a function call.
+
+    The key is the JSON representation of the arguments, e.g.,
+    `{"args": [2], "kwargs": {}}`. Numpy arrays and pandas objects are
+    represented by a hash of their content, instead of a (truncated) string.
+
+    :param args: The positional arguments of the call.
+    :param kwargs: The keyword arguments of the call.
+    :return: The cache key.
+    """
+    # Fast path: build the JSON string directly for scalar arguments.
+    args_strs = []
+    for arg in args:
+        encoder = _SCALAR_ENCODERS.get(type(arg))
+        if encoder is None:
+            break
+        args_strs.append(encoder(arg))
+    else:
+        kwargs_strs = []
+        for k in sorted(kwargs):
+            encoder = _SCALAR_ENCODERS.get(type(kwargs[k]))
+            if encoder is None or type(k) is not str:
+                break
+            kwargs_strs.append(_encode_str(k) + ": " + encoder(kwargs[k]))
+        else:
+            key = (
+                '{"args": ['
+                + ", ".join(args_strs)
+                + '], "kwargs": {'
+                + ", ".join(kwargs_strs)
+                + "}}"
+            )
+            return key
+    # Slow path: some arguments need a custom encoding.
+    key = _KEY_ENCODER.encode({"args": args, "kwargs": kwargs})
+    return key
+
+
 # #############################################################################
 # Decorator
 # #############################################################################
 
 
+def _get_func_name(func: Callable[..., Any]) -> str:
+    """
+    Get the name used to identify the cache of a function.
+    """
+    func_name = getattr(func, "__name__", "unknown_function")
+    if func_name.endswith("_intrinsic"):
+        func_name = func_name[: -len("_intrinsic")]
+    return func_name
+
+
+def _set_up_cache(
+    func_name: str,
+    cache_type: str,
+    disk_backend: str,
+    process_safe: bool,
+    max_entries: Optional[int],
+    max_bytes: Optional[int],
+    ttl: Optional[float],
+    eviction_policy: str,
+) -> None:
+    """
+    Set the properties of the cache of a decorated function.
+    """
+    hdbg.dassert_in(cache_type, ("json", "pickle"))
+    hdbg.dassert_in(disk_backend, ("single_file", "sharded"))
+    set_cache_property("system", func_name, "type", cache_type)
+    set_cache_property("system", func_name, "disk_backend", disk_backend)
+    set_cache_property("system", func_name, "process_safe", process_safe)
+    set_mem_cache_limits(
+        func_name,
+        max_entries=max_entries,
+        max_bytes=max_bytes,
+        ttl=ttl,
+        eviction_policy=eviction_policy,
+    )
+
+
+def _parse_cache_mode(
+    kwargs: Dict[str, Any], force_refresh: bool, abort_on_cache_miss: bool
+) -> Tuple[bool, bool, bool]:
+    """
+    Apply the `cache_mode` passed to a decorated function, if any.
+
+    :return: force_refresh, abort_on_cache_miss, whether to disable the
+        cache
+    """
+    disable_cache = False
+    if "cache_mode" in kwargs:
+        cache_mode = kwargs.get("cache_mode")
+        _LOG.debug("cache_mode=%s", cache_mode)
+        if cache_mode == "REFRESH_CACHE":
+            # Force to refresh the cache.
+            _LOG.debug("Forcing cache refresh")
+            force_refresh = True
+        if cache_mode == "HIT_CACHE_OR_ABORT":
+            # Abort if the cache is not hit.
+            _LOG.debug("Abort on cache miss")
+            abort_on_cache_miss = True
+        if cache_mode == "DISABLE_CACHE":
+            # Disable the cache.
+            _LOG.debug("Disabling cache")
+            disable_cache = True
+    return force_refresh, abort_on_cache_miss, disable_cache
+
+
+def _update_cache_perf(func_name: str, is_hit: bool) -> None:
+    """
+    Update the performance stats after a cache access.
+    """
+    cache_perf = get_cache_perf(func_name)
+    _LOG.debug("cache_perf is None=%s", cache_perf is None)
+    if cache_perf:
+        hdbg.dassert_in("tot", cache_perf)
+        cache_perf["tot"] += 1
+        if is_hit:
+            cache_perf["hits"] += 1
+        else:
+            cache_perf["misses"] += 1
+
+
+def _is_force_refresh(func_name: str, force_refresh: bool) -> bool:
+    force_refresh = (
+        get_cache_property("user", func_name, "force_refresh") or force_refresh
+    )
+    _LOG.debug("force_refresh=%s", force_refresh)
+    return force_refresh
+
+
+def _handle_cache_miss(
+    func_name: str, key: str, abort_on_cache_miss: bool
+) -> bool:
+    """
+    Abort or report a cache miss, if requested.
+
+    :return: whether to return `_cache_miss_` instead of accessing the
+        real value
+    """
+    _LOG.debug("Cache miss for key='%s'", key)
+    # Abort on cache miss.
+    abort_on_cache_miss = (
+        get_cache_property("user", func_name, "abort_on_cache_miss")
+        or abort_on_cache_miss
+    )
+    _LOG.debug("abort_on_cache_miss=%s", abort_on_cache_miss)
+    if abort_on_cache_miss:
+        raise ValueError(f"Cache miss for key='{key}'")
+    # Report on cache miss.
+    report_on_cache_miss = get_cache_property(
+        "user", func_name, "report_on_cache_miss"
+    )
+    _LOG.debug("report_on_cache_miss=%s", report_on_cache_miss)
+    if report_on_cache_miss:
+        _LOG.debug("Cache miss for key='%s'", key)
+    return report_on_cache_miss
+
+
+def _update_cache(
+    func_name: str,
+    cache: Dict[str, Any],
+    key: str,
+    value: Any,
+    write_through: bool,
+) -> None:
+    """
+    Store a value computed after a cache miss.
+    """
+    _update_cache_many(func_name, cache, [key], [value], write_through)
+
+
+def _update_cache_many(
+    func_name: str,
+    cache: Dict[str, Any],
+    keys: List[str],
+    values: List[Any],
+    write_through: bool,
+) -> None:
+    """
+    Store the values computed after some cache misses.
+
+    With the 'single_file' backend the cache is written to disk once for all
+    the values, instead of once per value.
+    """
+    for key, value in zip(keys, values):
+        cache[key] = value
+        _LOG.debug("Updating cache with key='%s' value='%s'", key, value)
+    #
+    if _is_sharded(func_name):
+        if write_through:
+            # Append only the new entries.
+            _LOG.debug("Writing through to disk")
+            disk_cache = get_sharded_disk_cache(func_name)
+            for key, value in zip(keys, values):
+                disk_cache.put(key, value)
+        else:
+            _SHARDED_DIRTY_KEYS.setdefault(func_name, set()).update(keys)
+    elif write_through:
+        _LOG.debug("Writing through to disk")
+        flush_cache_to_disk(func_name)
+
+
 def simple_cache(
     cache_type: str = "json",
     write_through: bool = False,
     exclude_keys: List[str] = [],
+    disk_backend: str = "single_file",
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    ttl: Optional[float] = None,
+    eviction_policy: str = "lru",
+    key_func: Callable[[Tuple[Any, ...], Dict[str, Any]], str] = get_cache_key,
+    process_safe: bool = False,
 ) -> Callable[..., Any]:
     """
     Decorate a function to cache its results.
@@ -511,15 +1932,40 @@ def simple_cache(
     :param write_through: If True, the cache is written to disk after
         each access.
     :param exclude_keys: A list of keys to exclude from the cache key.
+    :param disk_backend: The layout of the disk cache:
+        - 'single_file': one file with the entire cache, which is
+          rewritten on every flush
+        - 'sharded': an append-only `ShardedDiskCache`, where values are
+          loaded lazily and writing through costs O(1) per entry
+    :param max_entries, max_bytes, ttl, eviction_policy: The limits of
+        the memory cache (see `set_mem_cache_limits()`). With the
+        'sharded' backend, entries evicted from memory are written to disk
+        if needed. With the 'single_file' backend, the disk cache is a
+        snapshot of the memory cache, so entries evicted before a flush
+        are not saved (use `write_through=True` to save each entry).
+    :param key_func: The function building the cache key from the
+        positional and keyword arguments (see `get_cache_key()`).
+    :param process_safe: If True, the disk cache can be shared by many
+        processes (e.g., the workers of `hjoblib.parallel_execute()`)
+        using file locks. With `disk_backend="sharded"` and
+        `write_through=True`, a value computed by a process is visible
+        to the other processes as soon as it is computed, without
+        reloading the entire cache.
     :return: A decorator that can be applied to a function.
     """
 
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
-        hdbg.dassert_in(cache_type, ("json", "pickle"))
-        func_name = getattr(func, "__name__", "unknown_function")
-        if func_name.endswith("_intrinsic"):
-            func_name = func_name[: -len("_intrinsic")]
-        set_cache_property("system", func_name, "type", cache_type)
+        func_name = _get_func_name(func)
+        _set_up_cache(
+            func_name,
+            cache_type,
+            disk_backend,
+            process_safe,
+            max_entries,
+            max_bytes,
+            ttl,
+            eviction_policy,
+        )
 
         @functools.wraps(func)
         def wrapper(
@@ -545,91 +1991,306 @@ def simple_cache(
             :return: The cached value or the result of the function.
             """
             # Get the function name.
-            func_name = getattr(func, "__name__", "unknown_function")
-            if func_name.endswith("_intrinsic"):
-                func_name = func_name[: -len("_intrinsic")]
+            func_name = _get_func_name(func)
             # Get the cache.
             cache = get_cache(func_name)
             # Remove keys that should not be cached.
             kwargs_for_cache_key = {
                 k: v for k, v in kwargs.items() if k not in exclude_keys
             }
-            if "cache_mode" in kwargs:
-                cache_mode = kwargs.get("cache_mode")
-                _LOG.debug("cache_mode=%s", cache_mode)
-                if cache_mode == "REFRESH_CACHE":
-                    # Force to refresh the cache.
-                    _LOG.debug("Forcing cache refresh")
-                    force_refresh = True
-                if cache_mode == "HIT_CACHE_OR_ABORT":
-                    # Abort if the cache is not hit.
-                    _LOG.debug("Abort on cache miss")
-                    abort_on_cache_miss = True
-                if cache_mode == "DISABLE_CACHE":
-                    # Disable the cache.
-                    _LOG.debug("Disabling cache")
-                    value = func(*args, **kwargs)
-                    return value
-
-            # Get the key.
-            key = json.dumps(
-                {"args": args, "kwargs": kwargs_for_cache_key},
-                sort_keys=True,
-                default=str,
+            force_refresh, abort_on_cache_miss, disable_cache = (
+                _parse_cache_mode(kwargs, force_refresh, abort_on_cache_miss)
             )
+            if disable_cache:
+                value = func(*args, **kwargs)
+                return value
+            # Get the key.
+            key = key_func(args, kwargs_for_cache_key)
             _LOG.debug("key=%s", key)
-            # Get the cache properties.
-            cache_perf = get_cache_perf(func_name)
-            _LOG.debug("cache_perf is None=%s", cache_perf is None)
-            # Update the performance stats.
-            if cache_perf:
-                hdbg.dassert_in("tot", cache_perf)
-                cache_perf["tot"] += 1
             # Handle a forced refresh.
-            force_refresh = (
-                get_cache_property("user", func_name, "force_refresh")
-                or force_refresh
-            )
-            _LOG.debug("force_refresh=%s", force_refresh)
-            if not force_refresh and key in cache:
-                _LOG.debug("Cache hit for key='%s'", key)
-                # Update the performance stats.
-                if cache_perf:
-                    cache_perf["hits"] += 1
+            force_refresh = _is_force_refresh(func_name, force_refresh)
+            is_hit = False
+            if not force_refresh:
                 # Retrieve the value from the cache.
-                value = cache[key]
+                is_hit, value = _get_cached_value(func_name, cache, key)
+            # Update the performance stats.
+            _update_cache_perf(func_name, is_hit)
+            if is_hit:
+                _LOG.debug("Cache hit for key='%s'", key)
             else:
-                _LOG.debug("Cache miss for key='%s'", key)
-                # Update the performance stats.
-                if cache_perf:
-                    cache_perf["misses"] += 1
-                # Abort on cache miss.
-                abort_on_cache_miss = (
-                    get_cache_property("user", func_name, "abort_on_cache_miss")
-                    or abort_on_cache_miss
-                )
-                _LOG.debug("abort_on_cache_miss=%s", abort_on_cache_miss)
-                if abort_on_cache_miss:
-                    raise ValueError(f"Cache miss for key='{key}'")
-                # Report on cache miss.
-                report_on_cache_miss = get_cache_property(
-                    "user", func_name, "report_on_cache_miss"
-                )
-                _LOG.debug("report_on_cache_miss=%s", report_on_cache_miss)
-                if report_on_cache_miss:
-                    _LOG.debug("Cache miss for key='%s'", key)
+                if _handle_cache_miss(func_name, key, abort_on_cache_miss):
                     return "_cache_miss_"
                 # Access the intrinsic function.
                 value = func(*args, **kwargs)
                 # Update cache.
-                cache[key] = value
-                _LOG.debug("Updating cache with key='%s' value='%s'", key, value)
-                #
-                if write_through:
-                    _LOG.debug("Writing through to disk")
-                    flush_cache_to_disk(func_name)
+                _update_cache(func_name, cache, key, value, write_through)
             return value
 
         return wrapper
 
     return decorator
+
+
+# #############################################################################
+# Async decorator
+# #############################################################################
+
+
+if "_IN_FLIGHT" not in globals():
+    # Calls of async cached functions that are being computed.
+    # (func_name, key) -> future with the value.
+    _IN_FLIGHT: Dict[Tuple[str, str], "asyncio.Future"] = {}
+
+
+# Result of an in-flight call whose caller was cancelled, telling the callers
+# waiting for it to compute the value themselves.
+_IN_FLIGHT_CANCELLED = object()
+
+
+def _start_in_flight(func_name: str, keys: List[str]) -> List["asyncio.Future"]:
+    """
+    Register the computation of the values of some keys.
+    """
+    loop = asyncio.get_running_loop()
+    futures = []
+    for key in keys:
+        future = loop.create_future()
+        _IN_FLIGHT[(func_name, key)] = future
+        futures.append(future)
+    return futures
+
+
+def _end_in_flight(
+    func_name: str,
+    keys: List[str],
+    futures: List["asyncio.Future"],
+    values: Optional[List[Any]],
+    exception: Optional[BaseException],
+) -> None:
+    """
+    Publish the result of a computation to the callers waiting for it.
+
+    If the computation was cancelled, the waiting callers are not cancelled
+    but receive `_IN_FLIGHT_CANCELLED`, so that they can compute the values
+    themselves.
+    """
+    if exception is None:
+        hdbg.dassert_is_not(values, None)
+        values = cast(List[Any], values)
+    else:
+        values = [None] * len(keys)
+    for key, future, value in zip(keys, futures, values):
+        if _IN_FLIGHT.get((func_name, key)) is future:
+            del _IN_FLIGHT[(func_name, key)]
+        if future.done():
+            continue
+        if isinstance(exception, asyncio.CancelledError):
+            future.set_result(_IN_FLIGHT_CANCELLED)
+        elif exception is not None:
+            future.set_exception(exception)
+            # Avoid the "exception was never retrieved" warning when nobody
+            # is waiting.
+            future.exception()
+        else:
+            future.set_result(value)
+
+
+def async_simple_cache(
+    cache_type: str = "json",
+    write_through: bool = False,
+    exclude_keys: List[str] = [],
+    disk_backend: str = "single_file",
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    ttl: Optional[float] = None,
+    eviction_policy: str = "lru",
+    key_func: Callable[[Tuple[Any, ...], Dict[str, Any]], str] = get_cache_key,
+    process_safe: bool = False,
+    batch: bool = False,
+) -> Callable[..., Any]:
+    """
+    Decorate a coroutine function to cache its results.
+
+    The cache is shared with `simple_cache()` and the parameters have the same
+    meaning. In addition:
+    - concurrent calls with the same key are executed only once, and all the
+      callers wait for the same result (single-flight)
+    - with `batch=True`, the decorated function must accept a list of items as
+      first argument and return the list of the corresponding results. Each
+      item is cached separately, and only the items that are not cached are
+      passed to the function in a single call, e.g.,
+      ```
+      @hcacsimp.async_simple_cache(batch=True)
+      async def get_completions(prompts: List[str], model: str) -> List[str]:
+          ...
+
+      # Only the prompts that are not cached are sent to the model.
+      completions = await get_completions(prompts, model="gpt-4o")
+      ```
+
+    :param batch: Whether the decorated function works on a list of items.
+    :return: A decorator that can be applied to a coroutine function.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        hdbg.dassert(
+            asyncio.iscoroutinefunction(func),
+            "'%s' is not a coroutine function",
+            func,
+        )
+        func_name = _get_func_name(func)
+        _set_up_cache(
+            func_name,
+            cache_type,
+            disk_backend,
+            process_safe,
+            max_entries,
+            max_bytes,
+            ttl,
+            eviction_policy,
+        )
+
+        async def _get_values(
+            items: List[Any],
+            args: Tuple[Any, ...],
+            kwargs: Dict[str, Any],
+            force_refresh: bool,
+            abort_on_cache_miss: bool,
+        ) -> List[Any]:
+            """
+            Get the values of a list of calls, computing only the missing ones.
+
+            In non-batch mode there is a single item, which is the tuple of the
+            positional arguments.
+            """
+            cache = get_cache(func_name)
+            # Remove keys that should not be cached.
+            kwargs_for_cache_key = {
+                k: v for k, v in kwargs.items() if k not in exclude_keys
+            }
+            if batch:
+                keys = [
+                    key_func((item,) + args, kwargs_for_cache_key)
+                    for item in items
+                ]
+            else:
+                keys = [key_func(args, kwargs_for_cache_key)]
+            # Handle a forced refresh.
+            force_refresh = _is_force_refresh(func_name, force_refresh)
+            # key -> value or future with the value.
+            values: Dict[str, Any] = {}
+            waiting: Dict[str, "asyncio.Future"] = {}
+            waiting_items: Dict[str, Any] = {}
+            # The items to compute, without duplicates.
+            miss_keys: List[str] = []
+            miss_items: List[Any] = []
+            for item, key in zip(items, keys):
+                if key in values or key in waiting or key in miss_keys:
+                    # Duplicated item.
+                    continue
+                _LOG.debug("key=%s", key)
+                is_hit = False
+                if not force_refresh:
+                    # Retrieve the value from the cache.
+                    is_hit, value = _get_cached_value(func_name, cache, key)
+                    if not is_hit and (func_name, key) in _IN_FLIGHT:
+                        # Another caller is computing the same value.
+                        _LOG.debug("Waiting for in-flight key='%s'", key)
+                        waiting[key] = _IN_FLIGHT[(func_name, key)]
+                        waiting_items[key] = item
+                        is_hit = True
+                # Update the performance stats.
+                _update_cache_perf(func_name, is_hit)
+                if is_hit:
+                    if key not in waiting:
+                        _LOG.debug("Cache hit for key='%s'", key)
+                        values[key] = value
+                    continue
+                if _handle_cache_miss(func_name, key, abort_on_cache_miss):
+                    values[key] = "_cache_miss_"
+                    continue
+                miss_keys.append(key)
+                miss_items.append(item)
+            if miss_keys:
+                # Access the intrinsic function once for all the misses.
+                futures = _start_in_flight(func_name, miss_keys)
+                try:
+                    if batch:
+                        miss_values = await func(miss_items, *args, **kwargs)
+                        miss_values = list(miss_values)
+                        hdbg.dassert_eq(len(miss_values), len(miss_items))
+                    else:
+                        miss_values = [await func(*args, **kwargs)]
+                except BaseException as e:
+                    _end_in_flight(func_name, miss_keys, futures, None, e)
+                    raise
+                # Update cache.
+                _update_cache_many(
+                    func_name, cache, miss_keys, miss_values, write_through
+                )
+                values.update(zip(miss_keys, miss_values))
+                _end_in_flight(func_name, miss_keys, futures, miss_values, None)
+            # The items whose in-flight computation was cancelled.
+            retry_keys: List[str] = []
+            for key, future in waiting.items():
+                value = await future
+                if value is _IN_FLIGHT_CANCELLED:
+                    retry_keys.append(key)
+                else:
+                    values[key] = value
+            if retry_keys:
+                # Compute the values, unless another caller already did it.
+                _LOG.debug("Retrying cancelled keys=%s", retry_keys)
+                retry_values = await _get_values(
+                    [waiting_items[key] for key in retry_keys],
+                    args,
+                    kwargs,
+                    force_refresh,
+                    abort_on_cache_miss,
+                )
+                values.update(zip(retry_keys, retry_values))
+            result = [values[key] for key in keys]
+            return result
+
+        @functools.wraps(func)
+        async def wrapper(
+            *args: Any,
+            force_refresh: bool = False,
+            abort_on_cache_miss: bool = False,
+            **kwargs: Any,
+        ) -> Any:
+            """
+            Cache the results of the decorated coroutine function.
+
+            :param args: Positional arguments for the function. In batch
+                mode the first one is the list of items.
+            :param force_refresh: If True, the cache is refreshed
+                  regardless of whether the key exists in the cache.
+            :param abort_on_cache_miss: If True, an exception is raised
+                  if a key is not found in the cache.
+            :param kwargs: Keyword arguments for the function.
+            :return: The cached value or the result of the function. In
+                batch mode, the list of values for the items.
+            """
+            force_refresh, abort_on_cache_miss, disable_cache = (
+                _parse_cache_mode(kwargs, force_refresh, abort_on_cache_miss)
+            )
+            if disable_cache:
+                value = await func(*args, **kwargs)
+                return value
+            if batch:
+                hdbg.dassert_lte(1, len(args), "The list of items is missing")
+                items = list(args[0])
+                args = args[1:]
+            else:
+                items = [args]
+            values = await _get_values(
+                items, args, kwargs, force_refresh, abort_on_cache_miss
+            )
+            if batch:
+                return values
+            return values[0]
+
+        return wrapper
+
+    return decorator
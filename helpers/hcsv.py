@@ -5,11 +5,18 @@ import helpers.hcsv as hcsv
 """
 
 import ast
+import collections
+import concurrent.futures
+import itertools
 import logging
 import os
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
 import helpers.hdbg as hdbg
 import helpers.hio as hio
@@ -18,16 +25,6 @@ import helpers.hs3 as hs3
 _LOG = logging.getLogger(__name__)
 
 
-def _append_csv(
-    df: pd.DataFrame, path: str, *, index: bool = False, **kwargs: Any
-) -> None:
-    """
-    Append a df to the CSV file `path` without header.
-    """
-    with open(path, "a") as f:
-        df.to_csv(f, header=False, index=index, **kwargs)
-
-
 def _read_csv_range(
     csv_path: str, from_: int, to: int, **kwargs: Any
 ) -> pd.DataFrame:
@@ -149,43 +146,183 @@ def find_first_matching_row(
 # CSV to PQ conversion
 # #############################################################################
 
+# Key of the rows with a null value in the partition column, which is read
+# back as null with Hive partitioning.
+_NULL_PARTITION_KEY = "__HIVE_DEFAULT_PARTITION__"
 
-def _csv_mapreduce(
-    csv_path: str,
-    out_dir: str,
-    key_func: Callable,
+
+def _split_batch_by_key(
+    batch: pa.RecordBatch,
+    partition_col: Optional[str],
+    key_func: Optional[Callable],
     chunk_preprocessor: Optional[Callable],
+) -> List[Tuple[str, pa.Table]]:
+    """
+    Split a chunk of a CSV file by key.
+
+    See `convert_csv_to_partitioned_pq()` for the parameters.
+
+    :return: list of (key, table with the rows of the key). When splitting by
+        `partition_col` the tables don't contain the partition column, which
+        is encoded in the path of the files
+    """
+    if chunk_preprocessor is None and key_func is None:
+        # Split natively in Arrow, without converting to pandas.
+        table = pa.Table.from_batches([batch])
+        # Sort the rows by key, so that the rows of each key are contiguous
+        # and can be sliced without scanning the table once per key. The sort
+        # is stable, so the rows of each key keep their order, and the rows
+        # with a null key are placed at the end.
+        idxs = pc.sort_indices(table, sort_keys=[(partition_col, "ascending")])
+        table = table.take(idxs)
+        runs = pc.run_end_encode(table[partition_col].combine_chunks())
+        table = table.drop([partition_col])
+        groups = []
+        start = 0
+        for key, end in zip(runs.values.to_pylist(), runs.run_ends.to_pylist()):
+            key = _NULL_PARTITION_KEY if key is None else str(key)
+            groups.append((key, table.slice(start, end - start)))
+            start = end
+    else:
+        df = batch.to_pandas()
+        if chunk_preprocessor is not None:
+            df = chunk_preprocessor(df)
+        if key_func is not None:
+            keyed_dfs = key_func(df)
+        else:
+            # Keep the rows with a null key, using the same key as Arrow.
+            keyed_dfs = (
+                (
+                    _NULL_PARTITION_KEY if pd.isna(key) else key,
+                    df_tmp.drop(columns=partition_col),
+                )
+                for key, df_tmp in df.groupby(
+                    partition_col, sort=False, dropna=False
+                )
+            )
+        groups = [
+            (str(key), pa.Table.from_pandas(df_tmp, preserve_index=False))
+            for key, df_tmp in keyed_dfs
+        ]
+    return groups
+
+
+def convert_csv_to_partitioned_pq(
+    csv_path: str,
+    pq_dir: str,
     *,
-    chunk_size: int = 1000000,
-) -> None:
+    partition_col: Optional[str] = None,
+    key_func: Optional[Callable] = None,
+    chunk_preprocessor: Optional[Callable] = None,
+    block_size_in_bytes: int = 64 * 1024**2,
+    num_threads: int = 4,
+    compression: str = "snappy",
+) -> Dict[str, str]:
     """
-    Map-reduce-type processing of CSV.
-
-    The phases are:
-      - Read the CSV in chunks as DataFrame
-      - Key each row of the DataFrame using a `groupby`
-      - "Reduce" keyed groups by writing and appending to a CSV
-
-    :param csv_path: input CSV path
-    :param out_dir: output dir for CSV with filenames corresponding to keys
-    :param key_func: function to apply to each chunk DataFrame to key rows
-        Should return an iterable with elements like (key, df)
-    :param chunk_preprocessor: function to apply to each chunk DataFrame before
-        applying key_func
-    :param chunk_size: chunk_size of input to process
+    Convert a CSV file to Parquet files, one for each key, streaming the data.
+
+    The CSV file is parsed in chunks of `block_size_in_bytes` by Arrow using
+    multiple threads, up to `num_threads` chunks are split by key in parallel,
+    and each key is appended to a Parquet file with an incremental writer, so
+    the memory used doesn't depend on the size of the CSV file.
+
+    The Parquet files are written with a temporary name and renamed once the
+    conversion is complete.
+
+    :param csv_path: input CSV path, optionally compressed (e.g., `.csv.gz`)
+    :param pq_dir: output dir
+    :param partition_col: column whose values are used as keys. The data for
+        the key `value` is saved as
+        `{pq_dir}/{partition_col}={value}/data.parquet`, without the column
+        `partition_col`, so that `pq_dir` can be read as a Hive-partitioned
+        dataset. The rows with a null value are saved with the key
+        `__HIVE_DEFAULT_PARTITION__`
+    :param key_func: function to apply to each chunk to key rows, in place of
+        `partition_col`. It should return an iterable with elements like
+        `(key, df)`. The data for `key` is saved as `{pq_dir}/{key}.parquet`
+    :param chunk_preprocessor: function to apply to each chunk before keying
+    :param block_size_in_bytes: size of the chunks to parse
+    :param num_threads: number of chunks to process at the same time
+    :param compression: Parquet compression codec
+    :return: key -> path of the Parquet file
     """
-    # Read CSV data in chunks.
-    chunks = pd.read_csv(csv_path, chunksize=chunk_size)
-    # Preprocess chunk, if needed.
-    if chunk_preprocessor is not None:
-        chunks = map(chunk_preprocessor, chunks)
-    # Apply key_func to each chunk.
-    keyed_group_blocks = map(key_func, chunks)
-    # Append results.
-    for block in keyed_group_blocks:
-        for idx, df in block:
-            file_name = os.path.join(out_dir, idx + ".csv")
-            _append_csv(df, file_name)
+    hdbg.dassert_eq(
+        [partition_col is None, key_func is None].count(True),
+        1,
+        "Exactly one of partition_col and key_func needs to be specified",
+    )
+    hdbg.dassert_lte(1, num_threads)
+    hio.create_dir(pq_dir, incremental=True)
+    read_options = pacsv.ReadOptions(
+        use_threads=True, block_size=block_size_in_bytes
+    )
+    reader = pacsv.open_csv(csv_path, read_options=read_options)
+    # Get the output file for a key.
+    if partition_col is not None:
+        get_file_name = lambda key: os.path.join(
+            pq_dir, f"{partition_col}={key}", "data.parquet"
+        )
+    else:
+        get_file_name = lambda key: os.path.join(pq_dir, f"{key}.parquet")
+    # key -> writer.
+    writers: Dict[str, pq.ParquetWriter] = {}
+
+    def _write(key: str, tables: List[pa.Table]) -> None:
+        writer = writers[key]
+        for table in tables:
+            if table.schema != writer.schema:
+                # The types inferred for different chunks can differ, e.g., a
+                # column with nulls in a chunk is inferred as float.
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+
+    split_batch = lambda batch: _split_batch_by_key(
+        batch, partition_col, key_func, chunk_preprocessor
+    )
+    try:
+        with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+            # Split the chunks in parallel, keeping the order of the chunks so
+            # that the rows of each key are in the original order.
+            futures: Deque[concurrent.futures.Future] = collections.deque()
+            batches = iter(reader)
+            while True:
+                num_batches = num_threads - len(futures)
+                for batch in itertools.islice(batches, num_batches):
+                    futures.append(executor.submit(split_batch, batch))
+                if not futures:
+                    break
+                groups = futures.popleft().result()
+                tables_by_key: Dict[str, List[pa.Table]] = {}
+                for key, table in groups:
+                    tables_by_key.setdefault(key, []).append(table)
+                # Create the writers serially.
+                for key, tables in tables_by_key.items():
+                    if key not in writers:
+                        file_name = get_file_name(key)
+                        hio.create_enclosing_dir(file_name, incremental=True)
+                        writers[key] = pq.ParquetWriter(
+                            file_name + ".tmp",
+                            tables[0].schema,
+                            compression=compression,
+                        )
+                # Write the keys in parallel, since each key has its own writer.
+                write_futures = [
+                    executor.submit(_write, key, tables)
+                    for key, tables in tables_by_key.items()
+                ]
+                for future in write_futures:
+                    future.result()
+    finally:
+        for writer in writers.values():
+            writer.close()
+    # Rename the files once all the data is written.
+    file_names = {}
+    for key in writers:
+        file_name = get_file_name(key)
+        os.replace(file_name + ".tmp", file_name)
+        file_names[key] = file_name
+    _LOG.debug("Converted '%s' into %s files", csv_path, len(file_names))
+    return file_names
 
 
 def convert_csv_to_pq(
@@ -199,10 +336,9 @@ def convert_csv_to_pq(
     """
     Convert CSV file to Parquet file.
 
-    Output of `csv_map_reduce()` is typically header-less to support append mode,
-    and so `normalizer` may be used to add appropriate headers. Note that Parquet
-    requires string column names, whereas Pandas by default uses integer column
-    names.
+    `normalizer` may be used to add appropriate headers to header-less CSV
+    files. Note that Parquet requires string column names, whereas Pandas by
+    default uses integer column names.
 
     :param csv_path: full path of CSV
     :param pq_path: full path of parquet
@@ -222,6 +358,7 @@ def convert_csv_dir_to_pq_dir(
     *,
     normalizer: Optional[Callable] = None,
     header: Optional[int] = None,
+    num_threads: int = 1,
 ) -> None:
     """
     Apply `convert_csv_to_pq()` to all files in `csv_dir`.
@@ -231,6 +368,7 @@ def convert_csv_dir_to_pq_dir(
         filesystem)
     :param header: header specification of CSV
     :param normalizer: function to apply to df before writing to PQ
+    :param num_threads: number of files to convert at the same time
     """
     # Get the filenames in `csv_dir`.
     if hs3.is_s3_path(csv_dir):
@@ -245,7 +383,9 @@ def convert_csv_dir_to_pq_dir(
     hdbg.dassert(filenames, "No files in the directory '%s'", csv_dir)
     # Process all the filenames.
     # TODO(gp): Add tqdm.
-    # TODO(gp): Consider parallelizing.
+    hdbg.dassert_lte(1, num_threads)
+    executor = concurrent.futures.ThreadPoolExecutor(num_threads)
+    futures = []
     for filename in filenames:
         # Remove .csv/.csv.gz.
         csv_stem = hio.remove_extension(
@@ -265,12 +405,18 @@ def convert_csv_dir_to_pq_dir(
             continue
         # Convert file to PQ.
         pq_filename = csv_stem + ".pq"
-        convert_csv_to_pq(
+        future = executor.submit(
+            convert_csv_to_pq,
             os.path.join(csv_dir, filename),
             os.path.join(pq_dir, pq_filename),
             normalizer=normalizer,
             header=header,
         )
+        futures.append(future)
+    with executor:
+        # Propagate the errors.
+        for future in futures:
+            future.result()
 
 
 # #############################################################################
@@ -924,6 +924,7 @@ def init_logger(
     in_pytest: bool = False,
     report_memory_usage: bool = False,
     report_cpu_usage: bool = False,
+    use_queue_handler: bool = False,
 ) -> None:
     """
     Send stderr and stdout to logging (optionally teeing the logs to file).
@@ -943,6 +944,8 @@ def init_logger(
         can overwrite the default logger from pytest
     :param report_memory_usage: turn on reporting memory usage
     :param report_cpu_usage: turn on reporting CPU usage
+    :param use_queue_handler: format and write the logs in a background
+        thread, so that the logging calls only enqueue the records
     """
     # Try to minimize dependencies.
     import helpers.hlogging as hloggin
@@ -994,6 +997,7 @@ def init_logger(
         report_memory_usage,
         report_cpu_usage,
     )
+    handlers: List[logging.Handler] = [ch]
     # Find name of the log file.
     if use_exec_path and log_filename is None:
         dassert_is(log_filename, None, msg="Can't specify conflicting filenames")
@@ -1026,8 +1030,12 @@ def init_logger(
         file_handler = logging.FileHandler(log_filename)
         root_logger.addHandler(file_handler)
         file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
         #
         _LOG.info("Saving log to file '%s'", log_filename)
+    # Move formatting and I/O to a background thread.
+    if use_queue_handler:
+        hloggin.set_queue_handler(root_logger, handlers)
     #
     _LOG.debug("Effective logging level=%s", _LOG.getEffectiveLevel())
     # Shut up chatty modules.
@@ -5,16 +5,38 @@ import helpers.hjoblib as hjoblib
 """
 
 import concurrent.futures
+import functools
+import hashlib
+import heapq
+import itertools
 import logging
 import math
+import multiprocessing
+import multiprocessing.connection
 import os
+import pickle
 import pprint
+import queue
 import random
+import resource
 import sys
+import threading
+import time
 import traceback
 from functools import wraps
 from multiprocessing import Process, Queue
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import joblib
 from joblib._store_backends import StoreBackendBase, StoreBackendMixin
@@ -345,6 +367,213 @@ def workload_to_string(workload: Workload, *, use_pprint: bool = True) -> str:
     return txt
 
 
+# #############################################################################
+# Cost-aware scheduling
+# #############################################################################
+
+# The execution time of a workload is determined by the thread finishing last
+# (the makespan). If a few long tasks are scheduled last, the other threads are
+# idle while they complete. Ordering the tasks longest-first, so that short
+# tasks fill the gaps at the end, gives a makespan within 4/3 of the optimal
+# one.
+
+
+def get_task_key(task: Task) -> str:
+    """
+    Return a key identifying a task across executions of a workload.
+
+    The parameters added by `parallel_execute()` are ignored.
+    """
+    args, kwargs = task
+    kwargs = {
+        k: v
+        for k, v in kwargs.items()
+        if k not in ("incremental", "num_attempts")
+    }
+    txt = task_to_string((args, kwargs), use_pprint=False)
+    key = hashlib.md5(txt.encode("utf-8")).hexdigest()
+    return key
+
+
+def get_task_runtimes_from_log(log_file: str) -> Dict[str, float]:
+    """
+    Read the runtimes of the tasks executed successfully from a log file.
+
+    :param log_file: log file written by `parallel_execute()`
+    :return: task key (see `get_task_key()`) -> elapsed time in secs of
+        the most recent successful execution
+    """
+    runtimes: Dict[str, float] = {}
+    if not os.path.exists(log_file):
+        _LOG.warning("Log file '%s' doesn't exist", log_file)
+        return runtimes
+    task_key = None
+    elapsed_time = None
+    with open(log_file, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("task_key="):
+                task_key = line[len("task_key=") :].strip()
+                elapsed_time = None
+            elif line.startswith("elapsed_time_in_secs="):
+                elapsed_time = float(line[len("elapsed_time_in_secs=") :])
+            elif line.startswith("error="):
+                is_error = line.strip() == "error=True"
+                if task_key is not None and elapsed_time is not None:
+                    if not is_error:
+                        runtimes[task_key] = elapsed_time
+                task_key = None
+                elapsed_time = None
+    _LOG.debug("Read runtimes of %s tasks from '%s'", len(runtimes), log_file)
+    return runtimes
+
+
+def estimate_task_costs(
+    workload: Workload,
+    *,
+    log_file: Optional[str] = None,
+    cost_func: Optional[Callable[[Task], float]] = None,
+) -> List[float]:
+    """
+    Estimate the cost of each task of a workload.
+
+    :param log_file: log file with the runtimes of previous executions of
+        the workload
+    :param cost_func: function returning the cost of a task, which
+        overrides the runtimes in `log_file`
+    :return: cost of each task. The tasks without a cost get the average
+        cost of the other tasks
+    """
+    validate_workload(workload)
+    _, _, tasks = workload
+    hdbg.dassert(
+        log_file is not None or cost_func is not None,
+        "Either log_file or cost_func needs to be specified",
+    )
+    costs: List[Optional[float]] = []
+    if cost_func is not None:
+        costs = [cost_func(task) for task in tasks]
+    else:
+        log_file = cast(str, log_file)
+        runtimes = get_task_runtimes_from_log(log_file)
+        costs = [runtimes.get(get_task_key(task)) for task in tasks]
+    # Use the average cost for the unknown tasks.
+    known_costs = [cost for cost in costs if cost is not None]
+    _LOG.info("Found the cost of %s / %s tasks", len(known_costs), len(costs))
+    default_cost = (
+        sum(known_costs) / len(known_costs) if known_costs else 1.0
+    )
+    costs_out = [default_cost if cost is None else cost for cost in costs]
+    return costs_out
+
+
+def predict_makespan(costs: List[float], num_threads: int) -> float:
+    """
+    Predict the makespan of tasks executed in order on `num_threads` threads.
+
+    Each task is assigned to the first thread that becomes available, like
+    the executors of `parallel_execute()` do.
+
+    :return: time when the last task completes
+    """
+    hdbg.dassert_lte(1, num_threads)
+    finish_times = [0.0] * num_threads
+    for cost in costs:
+        finish_time = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, finish_time + cost)
+    makespan = max(finish_times)
+    return makespan
+
+
+def schedule_workload_by_cost(
+    workload: Workload,
+    num_threads: int,
+    *,
+    log_file: Optional[str] = None,
+    cost_func: Optional[Callable[[Task], float]] = None,
+) -> Tuple[Workload, float]:
+    """
+    Order the tasks of a workload longest-first to minimize the makespan.
+
+    The parameters have the same meaning as in `estimate_task_costs()`.
+
+    :return: the scheduled workload and its predicted makespan in secs
+    """
+    idxs, makespan = _get_task_order_by_cost(
+        workload, num_threads, log_file=log_file, cost_func=cost_func
+    )
+    # Build a new workload.
+    workload_func, func_name, tasks = workload
+    tasks = [tasks[i] for i in idxs]
+    workload = (workload_func, func_name, tasks)
+    validate_workload(workload)
+    return workload, makespan
+
+
+def _get_task_order_by_cost(
+    workload: Workload,
+    num_threads: int,
+    *,
+    log_file: Optional[str] = None,
+    cost_func: Optional[Callable[[Task], float]] = None,
+) -> Tuple[List[int], float]:
+    """
+    Compute the longest-first order of the tasks of a workload.
+
+    The parameters have the same meaning as in `schedule_workload_by_cost()`.
+
+    :return: the indices of the tasks in order of execution and the predicted
+        makespan in secs
+    """
+    costs = estimate_task_costs(workload, log_file=log_file, cost_func=cost_func)
+    makespan_before = predict_makespan(costs, num_threads)
+    # Sort longest-first.
+    idxs = sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+    makespan = predict_makespan([costs[i] for i in idxs], num_threads)
+    _LOG.info(
+        "Predicted makespan: before scheduling=%.2f secs, after=%.2f secs",
+        makespan_before,
+        makespan,
+    )
+    return idxs, makespan
+
+
+def split_list_in_tasks_by_cost(
+    list_in: List[Any], costs: List[float], n: int
+) -> List[List[Any]]:
+    """
+    Split a list in `n` tasks with approximately the same total cost.
+
+    Elements are assigned longest-first to the task with the smallest total
+    cost so far.
+
+    E.g., [a, b, c, d, e] with costs [5, 4, 3, 3, 3] on 2 threads gives
+    ```
+    1 -> [a, d]
+    2 -> [b, c, e]
+    ```
+    Note that the total costs are 8 and 10, while `split_list_in_tasks()`
+    gives 12 and 6.
+
+    :param costs: cost of each element of `list_in`
+    :return: list of lists of elements, where each list can be assigned to an
+        execution thread
+    """
+    hdbg.dassert_lte(1, n)
+    hdbg.dassert_lte(n, len(list_in), "There are fewer tasks than threads")
+    hdbg.dassert_eq(len(list_in), len(costs))
+    idxs = sorted(range(len(list_in)), key=lambda i: costs[i], reverse=True)
+    # Heap of (total cost, task index).
+    loads = [(0.0, i) for i in range(n)]
+    list_out: List[List[Any]] = [[] for _ in range(n)]
+    for idx in idxs:
+        load, i = heapq.heappop(loads)
+        list_out[i].append(list_in[idx])
+        heapq.heappush(loads, (load + costs[idx], i))
+    # Ensure that the elements are all distributed.
+    hdbg.dassert_eq(sum(len(l_) for l_ in list_out), len(list_in))
+    return list_out
+
+
 # #############################################################################
 # Template for functions to execute in parallel.
 # #############################################################################
@@ -440,20 +669,339 @@ def processify(func):
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        q = Queue()
-        p = Process(
-            target=_run_in_process, args=[func] + [q] + list(args), kwargs=kwargs
+        ret = _run_in_subprocess(func, None, *args, **kwargs)
+        return ret
+
+    return wrapper
+
+
+# Interval between checks of the state of a subprocess.
+_SUBPROCESS_POLL_INTERVAL_IN_SECS = 0.1
+
+
+class TaskTimeoutError(TimeoutError):
+    """
+    Raised when the execution of a task in a process exceeds its timeout.
+
+    It is distinct from a `TimeoutError` raised by the task itself.
+    """
+
+
+def _run_in_subprocess(
+    func: Callable,
+    timeout_in_secs: Optional[float],
+    *args: Any,
+    **kwargs: Any,
+) -> Any:
+    """
+    Run a function in a new process and return its result.
+
+    :param timeout_in_secs: maximum wall-clock time of the execution. If
+        exceeded, the process is killed and `TaskTimeoutError` is raised
+        - `None` means no timeout
+    :raises ChildProcessError: if the process dies without returning a
+        result (e.g., it is killed by the OOM killer)
+    """
+    func_name = getattr(func, "__name__", "unknown_function")
+    q: Queue = Queue()
+    p = Process(
+        target=_run_in_process, args=[func] + [q] + list(args), kwargs=kwargs
+    )
+    start_time = time.monotonic()
+    p.start()
+    while True:
+        try:
+            ret, error = q.get(timeout=_SUBPROCESS_POLL_INTERVAL_IN_SECS)
+            break
+        except queue.Empty:
+            pass
+        if not p.is_alive():
+            # The result might have been sent right before exiting.
+            try:
+                ret, error = q.get(timeout=_SUBPROCESS_POLL_INTERVAL_IN_SECS)
+                break
+            except queue.Empty:
+                p.join()
+                raise ChildProcessError(
+                    f"Process {p.pid} running '{func_name}' died with "
+                    f"exitcode={p.exitcode}"
+                )
+        elapsed_time = time.monotonic() - start_time
+        if timeout_in_secs is not None and elapsed_time > timeout_in_secs:
+            p.terminate()
+            p.join()
+            raise TaskTimeoutError(
+                f"Process {p.pid} running '{func_name}' timed out after "
+                f"{elapsed_time:.1f} secs"
+            )
+    p.join()
+    if error:
+        _raise_subprocess_error(error)
+    return ret
+
+
+def _raise_subprocess_error(error: Tuple[Any, Any, str]) -> None:
+    """
+    Raise in the caller an exception captured in a subprocess.
+    """
+    ex_type, ex_value, tb_str = error
+    message = f"{str(ex_value)} (in subprocess)\n{tb_str}"
+    raise ex_type(message)
+
+
+# #############################################################################
+# WorkerPool
+# #############################################################################
+
+
+def _get_rss_in_bytes() -> int:
+    """
+    Return the resident set size of the current process.
+    """
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            rss_in_pages = int(f.read().split()[1])
+        rss: int = rss_in_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # E.g., on macOS use the peak resident set size, which is in bytes.
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss
+
+
+def _worker_loop(conn: multiprocessing.connection.Connection) -> None:
+    """
+    Execute the functions received from a `WorkerPool` until `None` is
+    received.
+    """
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        func, args, kwargs = msg
+        try:
+            ret = func(*args, **kwargs)
+        except Exception:  # pylint: disable=broad-except
+            ex_type, ex_value, tb = sys.exc_info()
+            error = ex_type, ex_value, "".join(traceback.format_tb(tb))
+            ret = None
+        else:
+            error = None
+        conn.send((ret, error, _get_rss_in_bytes()))
+    conn.close()
+
+
+class _Worker:
+    """
+    A process executing functions sent by a `WorkerPool`.
+    """
+
+    def __init__(self) -> None:
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = Process(target=_worker_loop, args=(child_conn,))
+        self.process.start()
+        child_conn.close()
+        self.num_tasks = 0
+
+    def stop(self, *, kill: bool) -> None:
+        if kill:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Pool of processes reused across tasks, as a cheaper alternative to
+    `processify`.
+
+    Running each task in a new process releases the memory allocated by the
+    task, but pays the cost of starting a process and importing modules for
+    each task. A worker of the pool is instead replaced by a new process only
+    after it has executed `max_tasks_per_worker` tasks or its resident set
+    size exceeds `max_rss_in_mb`, which bounds the memory leaked by the
+    tasks.
+
+    E.g.,
+    ```
+    with hjoblib.WorkerPool(4, max_tasks_per_worker=100) as worker_pool:
+        res = hjoblib.parallel_execute(
+            workload, dry_run, 4, incremental, abort_on_error, num_attempts,
+            log_file, backend="threading", worker_pool=worker_pool,
         )
-        p.start()
-        ret, error = q.get()
-        p.join()
+    ```
+
+    The pool can be used from multiple threads.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        *,
+        max_tasks_per_worker: Optional[int] = None,
+        max_rss_in_mb: Optional[float] = None,
+    ) -> None:
+        """
+        Constructor.
+
+        The workers are started lazily.
+
+        :param num_workers: maximum number of workers executing tasks at the
+            same time
+        :param max_tasks_per_worker: number of tasks after which a worker is
+            replaced
+            - `None` means no limit
+        :param max_rss_in_mb: resident set size after which a worker is
+            replaced
+            - `None` means no limit
+        """
+        hdbg.dassert_lte(1, num_workers)
+        if max_tasks_per_worker is not None:
+            hdbg.dassert_lte(1, max_tasks_per_worker)
+        if max_rss_in_mb is not None:
+            hdbg.dassert_lt(0, max_rss_in_mb)
+        self._max_tasks_per_worker = max_tasks_per_worker
+        self._max_rss_in_mb = max_rss_in_mb
+        # Workers available to execute a task. `None` corresponds to a worker
+        # that has not been started yet.
+        self._idle_workers: queue.Queue = queue.Queue()
+        for _ in range(num_workers):
+            self._idle_workers.put(None)
+        self._num_workers = num_workers
+        self._lock = threading.Lock()
+        self._num_tasks = 0
+        self._num_started_workers = 0
+        self._num_recycled_workers = 0
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def run(
+        self,
+        func: Callable,
+        timeout_in_secs: Optional[float],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Execute a function in a worker and return its result.
+
+        The function and its arguments need to be pickleable.
+
+        :param timeout_in_secs: same as in `_run_in_subprocess()`
+        """
+        worker = self._idle_workers.get()
+        try:
+            if worker is None:
+                worker = _Worker()
+                with self._lock:
+                    self._num_started_workers += 1
+            ret, error, rss = self._execute(
+                worker, func, timeout_in_secs, args, kwargs
+            )
+        except BaseException:
+            # The worker is in an unknown state, so replace it.
+            if worker is not None:
+                worker.stop(kill=True)
+            self._idle_workers.put(None)
+            raise
+        worker.num_tasks += 1
+        with self._lock:
+            self._num_tasks += 1
+        if self._should_recycle(worker, rss):
+            worker.stop(kill=False)
+            worker = None
+            with self._lock:
+                self._num_recycled_workers += 1
+        self._idle_workers.put(worker)
         if error:
-            ex_type, ex_value, tb_str = error
-            message = f"{ex_value.message} (in subprocess)\n{tb_str}"
-            raise ex_type(message)
+            _raise_subprocess_error(error)
         return ret
 
-    return wrapper
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Return the number of executed tasks, and started and recycled workers.
+        """
+        with self._lock:
+            stats = {
+                "num_tasks": self._num_tasks,
+                "num_started_workers": self._num_started_workers,
+                "num_recycled_workers": self._num_recycled_workers,
+            }
+        return stats
+
+    def close(self) -> None:
+        """
+        Stop all the workers, waiting for the running tasks to complete.
+        """
+        for _ in range(self._num_workers):
+            worker = self._idle_workers.get()
+            if worker is not None:
+                worker.stop(kill=False)
+        _LOG.debug("Stopped worker pool: %s", self.get_stats())
+        # Allow to use the pool again.
+        for _ in range(self._num_workers):
+            self._idle_workers.put(None)
+
+    def _execute(
+        self,
+        worker: _Worker,
+        func: Callable,
+        timeout_in_secs: Optional[float],
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+    ) -> Tuple[Any, Any, int]:
+        func_name = getattr(func, "__name__", "unknown_function")
+        pid = worker.process.pid
+        start_time = time.monotonic()
+        worker.conn.send((func, args, kwargs))
+        while not worker.conn.poll(_SUBPROCESS_POLL_INTERVAL_IN_SECS):
+            if not worker.process.is_alive():
+                raise ChildProcessError(
+                    f"Process {pid} running '{func_name}' died with "
+                    f"exitcode={worker.process.exitcode}"
+                )
+            elapsed_time = time.monotonic() - start_time
+            if timeout_in_secs is not None and elapsed_time > timeout_in_secs:
+                raise TaskTimeoutError(
+                    f"Process {pid} running '{func_name}' timed out after "
+                    f"{elapsed_time:.1f} secs"
+                )
+        try:
+            ret, error, rss = worker.conn.recv()
+        except EOFError as e:
+            raise ChildProcessError(
+                f"Process {pid} running '{func_name}' died"
+            ) from e
+        return ret, error, rss
+
+    def _should_recycle(self, worker: _Worker, rss: int) -> bool:
+        if (
+            self._max_tasks_per_worker is not None
+            and worker.num_tasks >= self._max_tasks_per_worker
+        ):
+            _LOG.debug(
+                "Recycling worker %s after %s tasks",
+                worker.process.pid,
+                worker.num_tasks,
+            )
+            return True
+        rss_in_mb = rss / 1024**2
+        if self._max_rss_in_mb is not None and rss_in_mb > self._max_rss_in_mb:
+            _LOG.debug(
+                "Recycling worker %s with rss=%.1f MB",
+                worker.process.pid,
+                rss_in_mb,
+            )
+            return True
+        return False
 
 
 def _parallel_execute_decorator(
@@ -470,6 +1018,11 @@ def _parallel_execute_decorator(
     task: Task,
     enable_file_logging: bool,
     verbose_log: bool,
+    *,
+    retry_delay_in_secs: float = 0.0,
+    retry_backoff_factor: float = 2.0,
+    timeout_in_secs: Optional[float] = None,
+    worker_pool: Optional[WorkerPool] = None,
 ) -> Any:
     """
     Parameters have the same meaning as in `parallel_execute()`.
@@ -481,6 +1034,8 @@ def _parallel_execute_decorator(
               propagated and the return value is `None`
             - if `abort_on_error=False` the exception is not propagated, but the
               return value is the string representation of the exception
+        - The task is attempted up to `num_attempts` times before declaring
+          an error, while the workload function receives `num_attempts=1`
     :param processify_func: switch to enable wrapping a function into a process
     :param enable_file_logging: see same parameter in `parallel_execute()`
     :param verbose_log: see same parameter in `parallel_execute()`
@@ -492,6 +1047,10 @@ def _parallel_execute_decorator(
     hdbg.dassert_isinstance(incremental, bool)
     hdbg.dassert_isinstance(abort_on_error, bool)
     hdbg.dassert_lte(1, num_attempts)
+    hdbg.dassert_lte(0, retry_delay_in_secs)
+    hdbg.dassert_lte(1, retry_backoff_factor)
+    if timeout_in_secs is not None:
+        hdbg.dassert_lt(0, timeout_in_secs)
     hdbg.dassert_isinstance(log_file, str)
     hdbg.dassert_isinstance(workload_func, Callable)
     hdbg.dassert_isinstance(func_name, str)
@@ -521,29 +1080,68 @@ def _parallel_execute_decorator(
     workload_func_str = getattr(workload_func, "__name__", "unknown_function")
     txt.append(f"workload_func={workload_func_str}")
     txt.append(f"func_name={func_name}")
+    if worker_pool is not None:
+        execution_mode = "worker_pool"
+    elif processify_func or timeout_in_secs is not None:
+        execution_mode = "processify"
+    else:
+        execution_mode = "in_process"
+    txt.append(f"execution_mode={execution_mode}")
+    txt.append(f"task_key={get_task_key(task)}")
     txt.append(task_to_string(task))
     # Run the workload.
     args, kwargs = task
-    kwargs.update({"incremental": incremental, "num_attempts": num_attempts})
+    # The retries are handled here, so the workload function must attempt
+    # the execution only once.
+    kwargs.update({"incremental": incremental, "num_attempts": 1})
+    num_retries = 0
+    num_timeouts = 0
     with htimer.TimedScope(
         logging.DEBUG, f"Execute '{workload_func_str}'"
     ) as ts:
-        try:
-            if processify_func:
-                _LOG.debug("Using processify")
-                # Wrap the function into a process to enforce de-allocating
-                # memory at the end of the execution (see
-                # CmampTask5854: Resolve backtest memory leakage).
-                _LOG.debug("pid before processify=%s", os.getpid())
-                workload_func = processify(workload_func)
-            res = workload_func(*args, **kwargs)
-            error = False
-        except Exception as e:  # pylint: disable=broad-except
-            exception = e
-            txt.append(f"exception='{str(e)}'")
-            res = None
-            error = True
-            _LOG.error("Execution failed")
+        for attempt in range(1, num_attempts + 1):
+            try:
+                if worker_pool is not None:
+                    # Execute in a process of the pool, which is recycled
+                    # after some tasks to release memory.
+                    res = worker_pool.run(
+                        workload_func, timeout_in_secs, *args, **kwargs
+                    )
+                elif execution_mode == "processify":
+                    # Wrap the function into a process to enforce de-allocating
+                    # memory at the end of the execution (see
+                    # CmampTask5854: Resolve backtest memory leakage), and to
+                    # be able to kill it on timeout.
+                    _LOG.debug("pid before processify=%s", os.getpid())
+                    res = _run_in_subprocess(
+                        workload_func, timeout_in_secs, *args, **kwargs
+                    )
+                else:
+                    res = workload_func(*args, **kwargs)
+                error = False
+                break
+            except Exception as e:  # pylint: disable=broad-except
+                exception = e
+                res = None
+                error = True
+                if isinstance(e, TaskTimeoutError):
+                    num_timeouts += 1
+                _LOG.error(
+                    "Execution failed at attempt %s / %s", attempt, num_attempts
+                )
+                if attempt < num_attempts:
+                    # Retry with exponential backoff.
+                    txt.append(
+                        f"attempt {attempt}/{num_attempts} exception='{str(e)}'"
+                    )
+                    delay_in_secs = retry_delay_in_secs * (
+                        retry_backoff_factor ** (attempt - 1)
+                    )
+                    _LOG.warning("Retrying in %s secs", delay_in_secs)
+                    time.sleep(delay_in_secs)
+                    num_retries += 1
+                else:
+                    txt.append(f"exception='{str(e)}'")
     # Save information about the execution of the function.
     elapsed_time = ts.elapsed_time
     end_ts = hdateti.get_current_timestamp_as_string("naive_ET")
@@ -553,6 +1151,8 @@ def _parallel_execute_decorator(
     else:
         txt.append("func_res=<omitted>")
     txt.append(f"elapsed_time_in_secs={elapsed_time}")
+    txt.append(f"num_retries={num_retries}")
+    txt.append(f"num_timeouts={num_timeouts}")
     txt.append(f"start_ts={start_ts}")
     txt.append(f"end_ts={end_ts}")
     txt.append(f"error={error}")
@@ -577,6 +1177,23 @@ def _parallel_execute_decorator(
     return res
 
 
+def _use_processify(backend: str) -> bool:
+    """
+    Return whether to wrap the workload function into a process.
+    """
+    if backend == "threading":
+        # Enable wrapping a function into a process for threading backend
+        # to force memory de-allocation.
+        # TODO(Grisha): unclear if there are cases when we want to use
+        #  `False` with `threading` backends, consider exposing to the
+        #  interface.
+        # TODO(Grisha): should we enable the switch for `num_threads="serial"`? will it work?
+        processify_func = True
+    else:
+        processify_func = False
+    return processify_func
+
+
 # TODO(gp): Pass a `task_dst_dir` to each task so it can write there.
 #  This is a generalization of `experiment_result_dir` for `run_config_list` and
 #  `run_notebook`.
@@ -593,6 +1210,12 @@ def parallel_execute(
     backend: str = "loky",
     enable_file_logging: bool = True,
     verbose_log: bool = False,
+    retry_delay_in_secs: float = 0.0,
+    retry_backoff_factor: float = 2.0,
+    timeout_in_secs: Optional[float] = None,
+    schedule_by_cost: bool = False,
+    cost_func: Optional[Callable[[Task], float]] = None,
+    worker_pool: Optional[WorkerPool] = None,
 ) -> Optional[List[Any]]:
     """
     Run a workload in parallel using joblib or asyncio.
@@ -612,12 +1235,39 @@ def parallel_execute(
         - If False, the execution continues
     :param num_attempts: number of times to attempt running a function before
         declaring an error
+        - A task that fails, times out, or whose process dies is re-executed
+        - The retries are handled by the framework, so the workload function
+          receives `num_attempts=1`
     :param log_file: file used to log information about the execution
     :param backend: specify the backend type (e.g., joblib `loky` or `asyncio_process_executor`)
     :param enable_file_logging: if False, skip writing any log file
     :param verbose_log: if True, write detailed task results to the log file
         - If False, large outputs will be omitted from the log to reduce file size
-    :return: results from executing `func` or the exception of the failing function
+    :param retry_delay_in_secs: seconds to wait before the first retry of a
+        failed task
+    :param retry_backoff_factor: factor multiplying the delay before each
+        following retry
+    :param timeout_in_secs: maximum wall-clock time of each attempt of a task
+        - If not None, each attempt runs in its own process, which is killed
+          on timeout. This also allows to retry a task whose process died
+          (e.g., because it ran out of memory)
+        - The number of retries and timeouts of each task is saved in the log
+          file
+    :param schedule_by_cost: if True, execute the tasks longest-first, using
+        `cost_func` or the runtimes of the previous executions saved in
+        `log_file` (see `schedule_workload_by_cost()`)
+        - The predicted and actual makespan are saved in the log file
+        - The results are still in the order of the tasks
+    :param cost_func: function returning the cost of a task
+    :param worker_pool: pool of processes executing the tasks, instead of
+        creating a process for each task with `backend="threading"` (see
+        `WorkerPool`)
+        - Only backends running in the caller process ("threading",
+          "asyncio_threading", serial) are supported
+        - The execution mode of each task is saved in the log file, together
+          with its elapsed time
+    :return: results from executing `func` or the exception of the failing
+        function, in the order of the tasks
     """
     # Print the parameters.
     _LOG.info(hprint.frame("Workload"))
@@ -638,129 +1288,370 @@ def parallel_execute(
         num_threads,
     )
     _LOG.info("Number of tasks=%s", len(tasks))
+    # Index of each task in the workload and the task, in order of execution.
+    indexed_tasks = list(enumerate(tasks))
+    if schedule_by_cost:
+        idxs, predicted_makespan = _get_task_order_by_cost(
+            workload,
+            get_num_executing_threads(num_threads),
+            log_file=log_file,
+            cost_func=cost_func,
+        )
+        indexed_tasks = [indexed_tasks[i] for i in idxs]
     #
     if dry_run:
         file_name = "./tmp.parallel_execute.workload.txt"
+        workload = (workload_func, func_name, [t for _, t in indexed_tasks])
         workload_as_str = workload_to_string(workload, use_pprint=False)
         hio.to_file(file_name, workload_as_str)
         _LOG.warning("Workload saved at '%s'", file_name)
         _LOG.warning("Exiting without executing workload, as per user request")
         return None
     # Run.
+    start_time = time.monotonic()
     task_len = len(tasks)
+    res = [None] * task_len
+    for task_idx, res_tmp in _execute_tasks_iter(
+        workload_func,
+        func_name,
+        indexed_tasks,
+        num_threads,
+        backend,
+        None,
+        None,
+        incremental,
+        abort_on_error,
+        num_attempts,
+        log_file,
+        enable_file_logging,
+        verbose_log,
+        retry_delay_in_secs=retry_delay_in_secs,
+        retry_backoff_factor=retry_backoff_factor,
+        timeout_in_secs=timeout_in_secs,
+        worker_pool=worker_pool,
+    ):
+        res[task_idx] = res_tmp
+    if schedule_by_cost:
+        actual_makespan = time.monotonic() - start_time
+        txt = (
+            f"predicted_makespan_in_secs={predicted_makespan}\n"
+            f"actual_makespan_in_secs={actual_makespan}"
+        )
+        _LOG.info("Makespan:\n%s", txt)
+        if enable_file_logging:
+            hio.to_file(log_file, "\n" + txt, mode="a")
+    _LOG.info("Saved log info in '%s'", log_file)
+    return res
+
+
+def _spill_result(
+    spill_dir: str, func_name: str, task_idx: int, task_len: int, res: Any
+) -> str:
+    """
+    Save the result of a task in a pickle file.
+
+    The file is written atomically, so that a reader never sees a partially
+    written result.
+
+    :return: the name of the file with the result
+    """
+    file_name = os.path.join(
+        spill_dir, f"{func_name}.{task_idx + 1}_{task_len}.pkl"
+    )
+    tmp_file_name = f"{file_name}.{os.getpid()}.tmp"
+    with open(tmp_file_name, "wb") as f:
+        pickle.dump(res, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file_name, file_name)
+    return file_name
+
+
+def load_spilled_result(file_name: str) -> Any:
+    """
+    Load the result of a task saved by `parallel_execute_iter()`.
+    """
+    hdbg.dassert_file_exists(file_name)
+    with open(file_name, "rb") as f:
+        res = pickle.load(f)
+    return res
+
+
+def _execute_task_and_spill(
+    task_idx: int,
+    task: Task,
+    *,
+    spill_dir: Optional[str],
+    task_len: int,
+    incremental: bool,
+    abort_on_error: bool,
+    num_attempts: int,
+    log_file: str,
+    workload_func: Callable,
+    func_name: str,
+    processify_func: bool,
+    enable_file_logging: bool,
+    verbose_log: bool,
+    **kwargs: Any,
+) -> Tuple[int, Any]:
+    """
+    Execute a task and optionally save its result to disk.
+
+    The result is saved by the worker, so that it is not sent back to the
+    caller.
+
+    :param kwargs: options for `_parallel_execute_decorator()`
+    :return: the index of the task and its result, or the name of the file
+        with the result if `spill_dir` is not None
+    """
+    res = _parallel_execute_decorator(
+        task_idx,
+        task_len,
+        incremental,
+        abort_on_error,
+        num_attempts,
+        log_file,
+        #
+        workload_func,
+        func_name,
+        processify_func,
+        task,
+        enable_file_logging,
+        verbose_log,
+        **kwargs,
+    )
+    if spill_dir is not None:
+        res = _spill_result(spill_dir, func_name, task_idx, task_len, res)
+    return task_idx, res
+
+
+def _execute_tasks_iter(
+    workload_func: Callable,
+    func_name: str,
+    tasks: List[Tuple[int, Task]],
+    num_threads: Union[str, int],
+    backend: str,
+    max_num_in_flight: Optional[int],
+    spill_dir: Optional[str],
+    incremental: bool,
+    abort_on_error: bool,
+    num_attempts: int,
+    log_file: str,
+    enable_file_logging: bool,
+    verbose_log: bool,
+    **kwargs: Any,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Execute tasks with a backend, yielding the results as they complete.
+
+    This is the execution engine of `parallel_execute()` and
+    `parallel_execute_iter()`, whose parameters have the same meaning.
+
+    :param tasks: index of each task in the workload and the task, in order
+        of submission
+    :param kwargs: options for `_parallel_execute_decorator()`
+    :return: iterator over the index of each task and its result, in order
+        of completion
+    """
+    worker_pool = kwargs.get("worker_pool")
+    if worker_pool is not None:
+        hdbg.dassert(
+            num_threads == "serial"
+            or backend in ("threading", "asyncio_threading"),
+            "backend='%s' doesn't support a worker pool",
+            backend,
+        )
+    if max_num_in_flight is None:
+        max_num_in_flight = 2 * get_num_executing_threads(num_threads)
+    hdbg.dassert_lte(1, max_num_in_flight)
+    func = functools.partial(
+        _execute_task_and_spill,
+        spill_dir=spill_dir,
+        task_len=len(tasks),
+        incremental=incremental,
+        abort_on_error=abort_on_error,
+        num_attempts=num_attempts,
+        log_file=log_file,
+        workload_func=workload_func,
+        func_name=func_name,
+        processify_func=_use_processify(backend),
+        enable_file_logging=enable_file_logging,
+        verbose_log=verbose_log,
+        **kwargs,
+    )
     tqdm_out = htqdm.TqdmToLogger(_LOG, level=logging.INFO)
-    tqdm_iter = tqdm(
-        enumerate(tasks),
-        total=task_len,
+    pbar = tqdm(
+        total=len(tasks),
         file=tqdm_out,
         desc=f"num_threads={num_threads} backend={backend}",
     )
-    if backend == "threading":
-        # Enable wrapping a function into a process for threading backend
-        # to force memory de-allocation.
-        # TODO(Grisha): unclear if there are cases when we want to use
-        #  `False` with `threading` backends, consider exposing to the
-        #  interface.
-        # TODO(Grisha): should we enable the switch for `num_threads="serial"`? will it work?
-        processify_func = True
-    else:
-        processify_func = False
-    if num_threads == "serial":
-        # Execute the tasks serially.
-        res = []
-        for task_idx, task in tqdm_iter:
-            _LOG.debug("\n%s", hprint.frame(f"Task {task_idx + 1} / {task_len}"))
-            # Execute.
-            res_tmp = _parallel_execute_decorator(
-                task_idx,
-                task_len,
-                incremental,
-                abort_on_error,
-                num_attempts,
-                log_file,
-                #
-                workload_func,
-                func_name,
-                processify_func,
-                task,
-                enable_file_logging,
-                verbose_log,
-            )
-            res.append(res_tmp)
-    else:
-        # Execute the tasks in parallel.
-        num_threads = int(num_threads)
-        # -1 is interpreted by joblib like for all cores.
-        _LOG.info("Using %d threads, backend='%s'", num_threads, backend)
-        if backend in ("loky", "threading", "multiprocessing"):
-            # from joblib.externals.loky import set_loky_pickler
-            # set_loky_pickler('cloudpickle')
-            # Removed `verbose` param which causes issues in HelpersTask715.
-            res = joblib.Parallel(n_jobs=num_threads, backend=backend)(
-                joblib.delayed(_parallel_execute_decorator)(
-                    task_idx,
-                    task_len,
-                    incremental,
-                    abort_on_error,
-                    num_attempts,
-                    log_file,
-                    #
-                    workload_func,
-                    func_name,
-                    processify_func,
-                    task,
-                    enable_file_logging,
-                    verbose_log,
+    with pbar:
+        if num_threads == "serial":
+            # Execute the tasks serially.
+            for task_idx, task in tasks:
+                _LOG.debug(
+                    "\n%s", hprint.frame(f"Task {task_idx + 1} / {len(tasks)}")
                 )
-                # We can't use `tqdm_iter` since this only shows the submission of
-                # the jobs but not their completion.
-                for task_idx, task in enumerate(tasks)
-            )
+                yield func(task_idx, task)
+                pbar.update(1)
+        elif backend in ("loky", "threading", "multiprocessing"):
+            # -1 is interpreted by joblib like for all cores.
+            _LOG.info("Using %s threads, backend='%s'", num_threads, backend)
+            # `pre_dispatch` bounds only the number of tasks dispatched ahead
+            # of the workers: the results of the completed tasks are buffered
+            # by joblib until they are consumed, so they can pile up if the
+            # caller is slower than the workers.
+            # Removed `verbose` param which causes issues in HelpersTask715.
+            res_iter = joblib.Parallel(
+                n_jobs=int(num_threads),
+                backend=backend,
+                return_as="generator_unordered",
+                pre_dispatch=max_num_in_flight,
+            )(joblib.delayed(func)(task_idx, task) for task_idx, task in tasks)
+            for res in res_iter:
+                yield res
+                pbar.update(1)
         elif backend in ("asyncio_threading", "asyncio_multiprocessing"):
+            _LOG.info("Using %s threads, backend='%s'", num_threads, backend)
             if backend == "asyncio_threading":
                 executor = concurrent.futures.ThreadPoolExecutor
-            elif backend == "asyncio_multiprocessing":
-                executor = concurrent.futures.ProcessPoolExecutor
             else:
-                raise ValueError(f"Invalid backend='{backend}'")
-            func = lambda args_: _parallel_execute_decorator(
-                args_[0],
-                task_len,
-                incremental,
-                abort_on_error,
-                num_attempts,
-                log_file,
-                #
-                workload_func,
-                func_name,
-                processify_func,
-                args_[1],
-                enable_file_logging,
-                verbose_log,
-            )
-            args = list(enumerate(tasks))
-            use_progress_bar = True
-            if not use_progress_bar:
-                # Implementation without progress bar.
-                with executor(max_workers=num_threads) as executor_:
-                    res = list(executor_.map(func, args))
-            else:
-                # Implementation with progress bar.
-                res = []
-                with tqdm_iter as pbar:
-                    with executor(max_workers=num_threads) as executor_:
-                        futures = {
-                            executor_.submit(func, arg): arg for arg in args
-                        }
-                        _LOG.debug("done submitting")
-                        for future in concurrent.futures.as_completed(futures):
-                            res_tmp = future.result()
-                            res.append(res_tmp)
+                executor = concurrent.futures.ProcessPoolExecutor
+            task_iter = iter(tasks)
+            with executor(max_workers=int(num_threads)) as executor_:
+                futures: Set[concurrent.futures.Future] = set()
+                try:
+                    while True:
+                        # Top up the submitted tasks.
+                        num_tasks = max_num_in_flight - len(futures)
+                        for task_idx, task in itertools.islice(
+                            task_iter, num_tasks
+                        ):
+                            future = executor_.submit(func, task_idx, task)
+                            futures.add(future)
+                        if not futures:
+                            break
+                        done, futures = concurrent.futures.wait(
+                            futures,
+                            return_when=concurrent.futures.FIRST_COMPLETED,
+                        )
+                        for future in done:
+                            yield future.result()
                             pbar.update(1)
+                finally:
+                    # Don't execute the pending tasks on error or when the
+                    # caller stops iterating.
+                    for future in futures:
+                        future.cancel()
         else:
             raise ValueError(f"Invalid backend='{backend}'")
+    if worker_pool is not None:
+        _LOG.info("Worker pool stats: %s", worker_pool.get_stats())
+
+
+def parallel_execute_iter(
+    workload: Workload,
+    # Options for the `parallel_execute` framework.
+    num_threads: Union[str, int],
+    incremental: bool,
+    abort_on_error: bool,
+    num_attempts: int,
+    log_file: str,
+    *,
+    backend: str = "asyncio_threading",
+    max_num_in_flight: Optional[int] = None,
+    spill_dir: Optional[str] = None,
+    enable_file_logging: bool = True,
+    verbose_log: bool = False,
+    retry_delay_in_secs: float = 0.0,
+    retry_backoff_factor: float = 2.0,
+    timeout_in_secs: Optional[float] = None,
+    schedule_by_cost: bool = False,
+    cost_func: Optional[Callable[[Task], float]] = None,
+    worker_pool: Optional[WorkerPool] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Run a workload in parallel yielding the results as they complete.
+
+    Unlike `parallel_execute()`, the results are not accumulated. With the
+    "asyncio_*" backends at most `max_num_in_flight` tasks are submitted to
+    the executor at the same time, so the memory used doesn't depend on the
+    number of tasks. The joblib backends ("loky", "threading",
+    "multiprocessing") only limit the tasks dispatched ahead of the workers,
+    and the results of completed tasks are buffered until they are consumed,
+    so a slow caller should use `spill_dir` to bound the memory used.
+
+    E.g., to process a workload with many tasks returning large dataframes
+    ```
+    for task_idx, file_name in hjoblib.parallel_execute_iter(
+        workload, 4, incremental, abort_on_error, num_attempts, log_file,
+        spill_dir="./tmp.results",
+    ):
+        df = hjoblib.load_spilled_result(file_name)
+        ...
+    ```
+
+    The parameters have the same meaning as in `parallel_execute()`.
+
+    :param max_num_in_flight: maximum number of tasks that have been
+        submitted and whose result has not been yielded yet, for the
+        "asyncio_*" backends, or number of tasks dispatched ahead of the
+        workers (i.e., joblib `pre_dispatch`), for the joblib backends
+        - `None` corresponds to twice the number of threads
+    :param spill_dir: if not None, each result is pickled to a file in this
+        dir by the worker and the name of the file is yielded instead of the
+        result
+    :param schedule_by_cost: if True, submit the tasks longest-first (see
+        `parallel_execute()`)
+    :return: iterator over the index of each task in the workload and its
+        result, in order of completion
+    """
+    _LOG.info(
+        hprint.to_str(
+            "num_threads incremental num_attempts abort_on_error "
+            "max_num_in_flight spill_dir"
+        )
+    )
+    # Parse the workload.
+    validate_workload(workload)
+    workload_func, func_name, tasks = workload
+    _LOG.info("Saving log info in '%s'", log_file)
+    num_executing_threads = get_num_executing_threads(num_threads)
+    _LOG.info(
+        "Number of executing threads=%s (%s)", num_executing_threads, num_threads
+    )
+    _LOG.info("Number of tasks=%s", len(tasks))
+    if spill_dir is not None:
+        hio.create_dir(spill_dir, incremental=True)
+    # Index of each task in the workload and the task, in order of execution.
+    indexed_tasks = list(enumerate(tasks))
+    if schedule_by_cost:
+        idxs, _ = _get_task_order_by_cost(
+            workload,
+            num_executing_threads,
+            log_file=log_file,
+            cost_func=cost_func,
+        )
+        indexed_tasks = [indexed_tasks[i] for i in idxs]
+    # Run.
+    yield from _execute_tasks_iter(
+        workload_func,
+        func_name,
+        indexed_tasks,
+        num_threads,
+        backend,
+        max_num_in_flight,
+        spill_dir,
+        incremental,
+        abort_on_error,
+        num_attempts,
+        log_file,
+        enable_file_logging,
+        verbose_log,
+        retry_delay_in_secs=retry_delay_in_secs,
+        retry_backoff_factor=retry_backoff_factor,
+        timeout_in_secs=timeout_in_secs,
+        worker_pool=worker_pool,
+    )
     _LOG.info("Saved log info in '%s'", log_file)
-    return res
 
 
 # #############################################################################
@@ -5,14 +5,21 @@ import helpers.hlogging as hloggin
 """
 
 import asyncio
+import atexit
 import contextlib
 import copy
 import datetime
 import logging
+import logging.handlers
+import queue
+import threading
+import time
 from typing import Any, Iterable, List, Optional, Tuple, Union
 
 # Avoid dependency from other helpers modules since this is used when the code
 # is bootstrapped.
+# `hwall_clock_time` depends only on Python standard libraries.
+import helpers.hwall_clock_time as hwacltim
 
 
 _LOG = logging.getLogger(__name__)
@@ -58,8 +65,9 @@ def get_memory_usage(process: Optional[Any] = None) -> MemoryUsage:
         import psutil
 
         process = psutil.Process()
-    rss_in_GB = process.memory_info().rss / (1024**3)
-    vms_in_GB = process.memory_info().vms / (1024**3)
+    memory_info = process.memory_info()
+    rss_in_GB = memory_info.rss / (1024**3)
+    vms_in_GB = memory_info.vms / (1024**3)
     mem_pct = process.memory_percent()
     return (rss_in_GB, vms_in_GB, mem_pct)
 
@@ -86,6 +94,61 @@ def get_memory_usage_as_str(process: Optional[Any] = None) -> str:
     return txt
 
 
+class ResourceUsageSampler:
+    """
+    Sample memory and CPU usage of the current process at a fixed interval.
+
+    Querying `psutil` on every log record is expensive, so the samples are
+    cached and refreshed at most once every `sampling_interval_in_secs`.
+    """
+
+    def __init__(
+        self,
+        report_cpu_usage: bool,
+        *,
+        sampling_interval_in_secs: float = 1.0,
+    ) -> None:
+        """
+        Constructor.
+
+        :param report_cpu_usage: sample also the CPU usage
+        :param sampling_interval_in_secs: how long a sample is reused
+        """
+        import psutil
+
+        self._process = psutil.Process()
+        self._report_cpu_usage = report_cpu_usage
+        self._sampling_interval_in_secs = sampling_interval_in_secs
+        if self._report_cpu_usage:
+            # Start sampling the CPU usage.
+            self._process.cpu_percent(interval=None)
+        self._lock = threading.Lock()
+        self._sample: Optional[Tuple[MemoryUsage, Optional[float]]] = None
+        self._sample_time = 0.0
+
+    def get_usage(self) -> Tuple[MemoryUsage, Optional[float]]:
+        """
+        Return the latest memory usage and CPU usage.
+
+        :return: memory usage as in `get_memory_usage()` and CPU usage in
+            percent since the previous sample (`None` if not reported)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._sample is None
+                or now - self._sample_time >= self._sampling_interval_in_secs
+            ):
+                memory_use = get_memory_usage(self._process)
+                cpu_use = None
+                if self._report_cpu_usage:
+                    # CPU usage since the previous sample.
+                    cpu_use = self._process.cpu_percent(interval=None)
+                self._sample = (memory_use, cpu_use)
+                self._sample_time = now
+            return self._sample
+
+
 # #############################################################################
 # Utils.
 # #############################################################################
@@ -374,25 +437,17 @@ class ResourceUsageFilter(logging.Filter):
 
     def __init__(self, report_cpu_usage: bool):
         super().__init__()
-        import psutil
-
-        self._process = psutil.Process()
-        self._report_cpu_usage = report_cpu_usage
-        if self._report_cpu_usage:
-            # Start sampling the CPU usage.
-            self._process.cpu_percent(interval=1.0)
+        self._sampler = ResourceUsageSampler(report_cpu_usage)
 
     def filter(self, record: logging.LogRecord) -> bool:
         """
         Override `logging.Filter()`, adding several fields to the logger.
         """
-        p = self._process
+        memory_use, cpu_use = self._sampler.get_usage()
         # Report memory usage.
-        resource_use = get_memory_usage_as_str(p)
+        resource_use = memory_to_str(memory_use)
         # Report CPU usage.
-        if self._report_cpu_usage:
-            # CPU usage since the previous call.
-            cpu_use = p.cpu_percent(interval=None)
+        if cpu_use is not None:
             resource_use += " cpu=%.0f%%" % cpu_use
         record.resource_use = resource_use  # type: ignore
         return True
@@ -564,12 +619,7 @@ class CustomFormatter(logging.Formatter):
         self._report_memory_usage = report_memory_usage
         self._report_cpu_usage = report_cpu_usage
         if self._report_memory_usage or self._report_cpu_usage:
-            import psutil
-
-            self._process = psutil.Process()
-            if self._report_cpu_usage:
-                # Start sampling the CPU usage.
-                self._process.cpu_percent(interval=1.0)
+            self._sampler = ResourceUsageSampler(self._report_cpu_usage)
 
     def format(self, record: logging.LogRecord) -> str:
         # record = copy.copy(record)
@@ -598,24 +648,23 @@ class CustomFormatter(logging.Formatter):
         msg = ""
         # Add the wall clock time.
         msg += self._get_wall_clock_time()
+        if self._report_memory_usage or self._report_cpu_usage:
+            memory_use, cpu_use = self._sampler.get_usage()
         # Report memory usage, if needed.
         # rss=0.240GB vms=1.407GB mem_pct=2% cpu=92%
         if self._report_memory_usage:
-            msg_tmp = get_memory_usage_as_str(self._process)
-            # Escape the % to avoid confusing for a string to expand.
-            msg_tmp = msg_tmp.replace("%", "%%")
-            msg += " " + msg_tmp
+            msg += " " + memory_to_str(memory_use)
         # Report CPU usage, if needed.
         if self._report_cpu_usage:
-            # CPU usage since the previous call.
-            msg_tmp = " cpu=%.0f" % self._process.cpu_percent(interval=None)
-            # Escape the % to avoid confusing for a string to expand.
-            msg_tmp += "%%"
-            msg += msg_tmp
-        # Get the (typically) simulated wall clock time.
-        import helpers.hwall_clock_time as hwacltim
-
-        simulated_wall_clock_time = hwacltim.get_wall_clock_time()
+            # CPU usage since the previous sample.
+            msg += " cpu=%.0f%%" % cpu_use
+        # Get the (typically) simulated wall clock time, using the value
+        # captured by `_ContextQueueHandler` when formatting in a background
+        # thread.
+        if hasattr(record, "simulated_wall_clock_time"):
+            simulated_wall_clock_time = record.simulated_wall_clock_time
+        else:
+            simulated_wall_clock_time = hwacltim.get_wall_clock_time()
         if simulated_wall_clock_time is not None:
             date_fmt = "%Y-%m-%d %I:%M:%S"
             msg += " @ " + self._convert_time_to_string(
@@ -625,13 +674,12 @@ class CustomFormatter(logging.Formatter):
         if record.levelno != logging.DEBUG:
             msg += f" - {self._colorize_level(record.levelname)}"
         # Add information about which coroutine we are running in.
-        try:
-            asyncio.get_running_loop()
-            task = asyncio.current_task()
-            if task is not None:
-                msg += f" {task.get_name()}"
-        except (RuntimeError, AttributeError):
-            pass
+        if hasattr(record, "task_name"):
+            task_name = record.task_name
+        else:
+            task_name = _get_current_task_name()
+        if task_name is not None:
+            msg += f" {task_name}"
         # Add information about the caller.
         # ```
         # /helpers/hunit_test.py setUp:932
@@ -647,6 +695,9 @@ class CustomFormatter(logging.Formatter):
             msg = "%-60s" % msg
         else:
             msg = "%-80s" % msg
+        if record.args:
+            # Escape the % to avoid confusing for a string to expand.
+            msg = msg.replace("%", "%%")
         # Add the caller string.
         msg += f" {record.msg}"
         record.msg = msg
@@ -746,6 +797,82 @@ def set_v2_formatter(
     return formatter
 
 
+# #############################################################################
+# Queue-based logging
+# #############################################################################
+
+
+def _get_current_task_name() -> Optional[str]:
+    """
+    Return the name of the asyncio task we are running in, if any.
+    """
+    try:
+        asyncio.get_running_loop()
+        task = asyncio.current_task()
+    except (RuntimeError, AttributeError):
+        task = None
+    task_name = None if task is None else task.get_name()
+    return task_name
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records rendering only their message.
+
+    The standard `QueueHandler` formats the entire record on the calling
+    thread. This handler renders only the message, since its args can be
+    modified after the log call, and defers the formatting of the prefix
+    (e.g., time, resource usage, caller) to the `QueueListener` thread. It
+    also captures the context that `CustomFormatter` can't compute from a
+    different thread, i.e., the asyncio task and the simulated wall clock time.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Don't modify the record seen by the other handlers.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.task_name = _get_current_task_name()  # type: ignore
+        record.simulated_wall_clock_time = (  # type: ignore
+            hwacltim.get_wall_clock_time()
+        )
+        return record
+
+
+def set_queue_handler(
+    logger: logging.Logger, handlers: List[logging.Handler]
+) -> logging.handlers.QueueListener:
+    """
+    Move `handlers` of `logger` to a background thread.
+
+    The handlers are replaced in `logger` with a handler that only enqueues
+    the records, while a `QueueListener` formats and emits them.
+
+    :param logger: logger to process
+    :param handlers: handlers to run in the background thread
+    :return: the started listener, which is stopped (flushing the pending
+        records) at exit or by `stop_queue_listener()`
+    """
+    for handler in handlers:
+        logger.removeHandler(handler)
+    queue_: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(_ContextQueueHandler(queue_))
+    listener = logging.handlers.QueueListener(
+        queue_, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def stop_queue_listener(listener: logging.handlers.QueueListener) -> None:
+    """
+    Stop a listener started by `set_queue_handler()`, flushing the records.
+    """
+    atexit.unregister(listener.stop)
+    listener.stop()
+
+
 # TODO(gp): Not sure it works properly.
 @contextlib.contextmanager
 def set_level(logger: Any, level: int) -> None:
@@ -576,8 +576,8 @@ def apply_columns_mode(
         df1_copy = df1_copy[common_columns]
         df2_copy = df2_copy[common_columns]
         # Log the string representation of 2 dfs.
-        _LOG.debug("df1 after filtering=\n%s", df_to_str(df1))
-        _LOG.debug("df2 after filtering=\n%s", df_to_str(df2))
+        _LOG.debug("df1 after filtering=\n%s", df_to_str_lazy(df1))
+        _LOG.debug("df2 after filtering=\n%s", df_to_str_lazy(df2))
     elif mode == "leave_unchanged":
         # Ignore mismatch.
         _LOG.debug(
@@ -924,13 +924,15 @@ def trim_df(
     """
     if _TRACE:
         _LOG.trace(
-            df_to_str(df, print_dtypes=True, print_shape_info=True, tag="df")
+            df_to_str_lazy(
+                df, print_dtypes=True, print_shape_info=True, tag="df"
+            )
         )
     _LOG.debug(
         hprint.to_str("ts_col_name start_ts end_ts left_close right_close")
     )
     if _TRACE:
-        _LOG.trace("df=\n%s", df_to_str(df))
+        _LOG.trace("df=\n%s", df_to_str_lazy(df))
     if df.empty:
         # If the df is empty, there is nothing to trim.
         return df
@@ -1081,7 +1083,7 @@ def drop_duplicated(
     """
     Implement `df.duplicated` but considering also the index and ignoring nans.
     """
-    _LOG.debug("before df=\n%s", df_to_str(df))
+    _LOG.debug("before df=\n%s", df_to_str_lazy(df))
     # Move the index to the df.
     old_index_name = df.index.name
     new_index_name = "_index.tmp"
@@ -1096,18 +1098,20 @@ def drop_duplicated(
     # Report the result of the operation.
     if duplicated.sum() > 0:
         num_rows_before = df.shape[0]
-        _LOG.debug("Removing duplicates df=\n%s", df_to_str(df.loc[duplicated]))
+        _LOG.debug(
+            "Removing duplicates df=\n%s", df_to_str_lazy(df.loc[duplicated])
+        )
         df = df.loc[~duplicated]
         num_rows_after = df.shape[0]
         _LOG.warning(
             "Removed repeated rows num_rows=%s",
             hprint.perc(num_rows_before - num_rows_after, num_rows_before),
         )
-    _LOG.debug("after removing duplicates df=\n%s", df_to_str(df))
+    _LOG.debug("after removing duplicates df=\n%s", df_to_str_lazy(df))
     # Set the index back.
     df.set_index(new_index_name, inplace=True)
     df.index.name = old_index_name
-    _LOG.debug("after df=\n%s", df_to_str(df))
+    _LOG.debug("after df=\n%s", df_to_str_lazy(df))
     return df
 
 
@@ -1258,6 +1262,21 @@ def _display(log_level: int, df: pd.DataFrame) -> None:
         display(df)
 
 
+def _remove_signed_zeros(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the so-called "negative zeros" `-0.0` to `0.0` in float columns.
+
+    The input is not modified and it's copied only if it has float columns.
+    """
+    float_col_names = df.select_dtypes(include=[np.float64, float]).columns
+    if len(float_col_names) == 0:
+        return df
+    df = df.copy()
+    for col_name in float_col_names:
+        df[col_name] = df[col_name].where(df[col_name] != -0.0, 0.0)
+    return df
+
+
 def _df_to_str(
     df: pd.DataFrame,
     num_rows: Optional[int],
@@ -1268,9 +1287,22 @@ def _df_to_str(
     display_width: int,
     use_tabulate: bool,
     log_level: int,
+    *,
+    handle_signed_zeros: bool = False,
 ) -> str:
     is_in_ipynb = hsystem.is_running_in_ipynb()
     out = []
+    if num_rows is None or df.shape[0] <= num_rows:
+        if handle_signed_zeros:
+            df = _remove_signed_zeros(df)
+    else:
+        # Copy and normalize only the rows that are printed.
+        nr = num_rows // 2
+        df_head = df.head(nr)
+        df_tail = df.tail(nr)
+        if handle_signed_zeros:
+            df_head = _remove_signed_zeros(df_head)
+            df_tail = _remove_signed_zeros(df_tail)
     # Set dataframe print options.
     with pd.option_context(
         "display.max_colwidth",
@@ -1288,7 +1320,14 @@ def _df_to_str(
         if use_tabulate:
             import tabulate
 
-            out.append(tabulate.tabulate(df, headers="keys", tablefmt="psql"))
+            tabulate_df = df
+            if handle_signed_zeros and num_rows is not None:
+                if df.shape[0] > num_rows:
+                    # The entire df is printed, not only the normalized rows.
+                    tabulate_df = _remove_signed_zeros(df)
+            out.append(
+                tabulate.tabulate(tabulate_df, headers="keys", tablefmt="psql")
+            )
         # TODO(Grisha): Add an option to display all rows since if `num_rows`
         # is `None`, only first and last 5 rows are displayed. Consider using
         # `df.to_string()` instead of `str(df)`.
@@ -1300,12 +1339,11 @@ def _df_to_str(
                 # Display dataframe.
                 _display(log_level, df)
         else:
-            nr = num_rows // 2
             if not is_in_ipynb:
                 # Print top and bottom of df.
-                out.append(str(df.head(nr)))
+                out.append(str(df_head))
                 out.append("...")
-                tail_str = str(df.tail(nr))
+                tail_str = str(df_tail)
                 # Remove index and columns from tail_df.
                 skipped_rows = 1
                 if df.index.name:
@@ -1316,11 +1354,11 @@ def _df_to_str(
                 # TODO(gp): @all use this approach also above and update all the
                 #  unit tests.
                 df = [
-                    df.head(nr),
+                    df_head,
                     pd.DataFrame(
                         [["..."] * df.shape[1]], index=[" "], columns=df.columns
                     ),
-                    df.tail(nr),
+                    df_tail,
                 ]
                 df = pd.concat(df)
                 # Display dataframe.
@@ -1389,11 +1427,8 @@ def df_to_str(
         df = df.to_frame(index=False)
     hdbg.dassert_isinstance(df, pd.DataFrame)
     # For some reason there are so-called "negative zeros", but we consider
-    # them equal to `0.0`.
-    df = df.copy()
-    if handle_signed_zeros:
-        for col_name in df.select_dtypes(include=[np.float64, float]).columns:
-            df[col_name] = df[col_name].where(df[col_name] != -0.0, 0.0)
+    # them equal to `0.0`. To avoid copying the entire df, they are converted
+    # only in the values that are printed.
     out = []
     # Print the tag.
     if tag is not None:
@@ -1423,6 +1458,12 @@ def df_to_str(
                 """
                 row: List[Any] = []
                 first_elem = srs.values[0]
+                if (
+                    handle_signed_zeros
+                    and isinstance(first_elem, float)
+                    and first_elem == 0.0
+                ):
+                    first_elem = type(first_elem)(0.0)
                 num_unique = srs.nunique()
                 num_nans = srs.isna().sum()
                 row.extend(
@@ -1543,6 +1584,7 @@ def df_to_str(
         display_width,
         use_tabulate,
         log_level,
+        handle_signed_zeros=handle_signed_zeros,
     )
     if not hsystem.is_running_in_ipynb():
         out.append(df_as_str)
@@ -1550,6 +1592,46 @@ def df_to_str(
     return txt
 
 
+class _LazyDfToStr:
+    """
+    Convert a dataframe to string with `df_to_str()` only when it's printed.
+    """
+
+    def __init__(
+        self, df: Union[pd.DataFrame, pd.Series, pd.Index], **kwargs: Any
+    ) -> None:
+        self._df = df
+        self._kwargs = kwargs
+
+    def __str__(self) -> str:
+        return df_to_str(self._df, **self._kwargs)
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def df_to_str_lazy(
+    df: Union[pd.DataFrame, pd.Series, pd.Index], **kwargs: Any
+) -> _LazyDfToStr:
+    """
+    Return an object that is converted to string with `df_to_str()` only when
+    printed.
+
+    This is used to pass a dataframe to a logging call without paying for the
+    conversion when the message is not emitted, e.g.,
+    ```
+    _LOG.debug("df=\n%s", hpandas.df_to_str_lazy(df, num_rows=3))
+    ```
+
+    Note that the dataframe is converted when the log record is emitted, so it
+    should not be modified before that.
+
+    :param df: dataframe to convert
+    :param kwargs: params for `df_to_str()`
+    """
+    return _LazyDfToStr(df, **kwargs)
+
+
 def _assemble_df_rows(rows_values: RowsValues) -> RowsValues:
     """
     Organize dataframe values into a column-row structure.
@@ -2123,9 +2205,10 @@ def compare_dfs(
         dassert_indices_equal(df1, df2)
     elif row_mode == "inner":
         # TODO(gp): Add sorting on demand, otherwise keep the columns in order.
-        same_rows = list((set(df1.index)).intersection(set(df2.index)))
-        df1 = df1[df1.index.isin(same_rows)]
-        df2 = df2[df2.index.isin(same_rows)]
+        # Use vectorized membership checks instead of building Python sets of
+        # the index values.
+        df1 = df1[df1.index.isin(df2.index)]
+        df2 = df2[df2.index.isin(df1.index)]
     else:
         raise ValueError(f"Invalid row_mode='{row_mode}'")
     #
@@ -2139,13 +2222,10 @@ def compare_dfs(
     else:
         raise ValueError(f"Invalid column_mode='{column_mode}'")
     # Round small numbers to 0 to exclude them from the diff computation.
-    close_to_zero_threshold_mask = lambda x: abs(x) < close_to_zero_threshold
-    df1[close_to_zero_threshold_mask] = df1[close_to_zero_threshold_mask].round(
-        0
-    )
-    df2[close_to_zero_threshold_mask] = df2[close_to_zero_threshold_mask].round(
-        0
-    )
+    # Build new dfs instead of assigning in place, since `df1` and `df2` can
+    # still be the caller's data.
+    df1 = df1.mask(df1.abs() < close_to_zero_threshold, 0)
+    df2 = df2.mask(df2.abs() < close_to_zero_threshold, 0)
     # Compute the difference df.
     if diff_mode == "diff":
         # Test and convert the assertion into a boolean.
@@ -2173,7 +2253,9 @@ def compare_dfs(
     elif diff_mode == "pct_change":
         # Compare NaN values in dataframes.
         nan_diff_df = compare_nans_in_dataframes(df1, df2)
-        _LOG.debug("Dataframe with NaN differences=\n%s", df_to_str(nan_diff_df))
+        _LOG.debug(
+            "Dataframe with NaN differences=\n%s", df_to_str_lazy(nan_diff_df)
+        )
         msg = "There are NaN values in one of the dataframes that are not in the other one."
         hdbg.dassert_eq(
             0, nan_diff_df.shape[0], msg=msg, only_warning=only_warning
@@ -2230,6 +2312,176 @@ def compare_dfs(
     return df_diff
 
 
+def _get_aligned_positions(
+    df1: pd.DataFrame, df2: pd.DataFrame, row_mode: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the integer positions of the rows of `df1` and `df2` to compare.
+
+    :param row_mode: same as in `compute_df_diff_summary()`
+    :return: positions in `df1` and in `df2` so that the i-th elements refer
+        to rows with the same index value
+    """
+    if row_mode == "equal":
+        dassert_indices_equal(df1, df2)
+        pos1 = np.arange(df1.shape[0])
+        pos2 = pos1
+    elif row_mode == "inner":
+        hdbg.dassert(df2.index.is_unique, "df2 has duplicated index values")
+        pos1 = np.flatnonzero(df1.index.isin(df2.index))
+        pos2 = df2.index.get_indexer(df1.index[pos1])
+    else:
+        raise ValueError(f"Invalid row_mode='{row_mode}'")
+    return pos1, pos2
+
+
+def compute_df_diff_summary(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    *,
+    row_mode: str = "equal",
+    column_mode: str = "equal",
+    diff_mode: str = "diff",
+    diff_threshold: float = 1e-3,
+    close_to_zero_threshold: float = 1e-6,
+    num_offending_cells: int = 10,
+    chunk_size: int = 1000000,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Compare two numeric dataframes and summarize the differences.
+
+    Unlike `compare_dfs()`, this never builds a diff dataframe of the size of
+    the inputs: the data is processed one column at a time in chunks of rows,
+    so the memory overhead is bounded by `chunk_size`. The inputs are not
+    modified.
+
+    The relative difference is expressed in percent, like the "pct_change"
+    mode of `compare_dfs()`. A cell is a violation when its difference is
+    above `diff_threshold` or when only one of the values is NaN.
+
+    :param row_mode: control how the rows are handled
+        - "equal": rows need to be the same for the two dataframes
+        - "inner": compare the common rows, `df2` must have a unique index
+    :param column_mode: same as `row_mode`
+    :param diff_mode: difference to compare with `diff_threshold`
+        - "diff": use the absolute difference
+        - "pct_change": use the relative difference
+    :param diff_threshold: maximum allowed difference for a cell
+    :param close_to_zero_threshold: round numbers below the threshold to 0
+    :param num_offending_cells: max number of offending cells to report
+    :param chunk_size: number of rows to process at once
+    :return:
+        - dataframe indexed by column name with the max absolute difference,
+          the max relative difference, and the number of violations
+        - dataframe with the first offending cells in row-major order
+    """
+    hdbg.dassert_isinstance(df1, pd.DataFrame)
+    hdbg.dassert_isinstance(df2, pd.DataFrame)
+    hdbg.dassert_in(diff_mode, ("diff", "pct_change"))
+    hdbg.dassert_lte(0.0, diff_threshold)
+    hdbg.dassert_lte(0, num_offending_cells)
+    hdbg.dassert_lt(0, chunk_size)
+    # Align the rows.
+    pos1, pos2 = _get_aligned_positions(df1, df2, row_mode)
+    # Align the columns.
+    if column_mode == "equal":
+        hdbg.dassert_eq(sorted(df1.columns), sorted(df2.columns))
+        columns = df1.columns
+    elif column_mode == "inner":
+        columns = df1.columns[df1.columns.isin(df2.columns)]
+    else:
+        raise ValueError(f"Invalid column_mode='{column_mode}'")
+    hdbg.dassert_no_duplicates(columns.to_list())
+    stats = []
+    offending_cells = []
+    for col in columns:
+        srs1 = df1[col]
+        srs2 = df2[col]
+        hdbg.dassert(
+            pd.api.types.is_numeric_dtype(srs1)
+            and pd.api.types.is_numeric_dtype(srs2),
+            "Column '%s' is not numeric",
+            col,
+        )
+        # Use the underlying arrays to avoid building intermediate series.
+        values1 = srs1.to_numpy()
+        values2 = srs2.to_numpy()
+        max_abs_diff = -np.inf
+        max_rel_diff = -np.inf
+        num_violations = 0
+        for start in range(0, len(pos1), chunk_size):
+            chunk_pos1 = pos1[start : start + chunk_size]
+            a = values1.take(chunk_pos1).astype(np.float64)
+            b = values2.take(pos2[start : start + chunk_size]).astype(
+                np.float64
+            )
+            a[np.abs(a) < close_to_zero_threshold] = 0.0
+            b[np.abs(b) < close_to_zero_threshold] = 0.0
+            with np.errstate(invalid="ignore", divide="ignore"):
+                abs_diff = np.abs(a - b)
+                # Equal values (including 0 vs 0 and inf vs inf) have no diff.
+                abs_diff[a == b] = 0.0
+                rel_diff = 100 * abs_diff / np.abs(b)
+                # Find the violations, counting a non-zero value vs 0 or inf
+                # as a violation.
+                diff = abs_diff if diff_mode == "diff" else rel_diff
+                is_violation = np.isnan(a) != np.isnan(b)
+                is_violation |= diff > diff_threshold
+            rel_diff[~np.isfinite(rel_diff)] = np.nan
+            abs_diff[np.isinf(abs_diff)] = np.nan
+            max_abs_diff = np.max(
+                abs_diff, initial=max_abs_diff, where=~np.isnan(abs_diff)
+            )
+            max_rel_diff = np.max(
+                rel_diff, initial=max_rel_diff, where=~np.isnan(rel_diff)
+            )
+            idxs = np.flatnonzero(is_violation)
+            # Keep only the cells that can still be among the first ones.
+            num_missing = num_offending_cells - num_violations
+            if num_missing > 0:
+                idxs_to_report = idxs[:num_missing]
+                offending_cells.append(
+                    pd.DataFrame(
+                        {
+                            "row_pos": chunk_pos1[idxs_to_report],
+                            "column": col,
+                            "df1": a[idxs_to_report],
+                            "df2": b[idxs_to_report],
+                            "abs_diff": abs_diff[idxs_to_report],
+                            "rel_diff": rel_diff[idxs_to_report],
+                        }
+                    )
+                )
+            num_violations += len(idxs)
+        # Report NaN when there are no values to compare.
+        stats.append(
+            {
+                "max_abs_diff": max_abs_diff if max_abs_diff >= 0 else np.nan,
+                "max_rel_diff": max_rel_diff if max_rel_diff >= 0 else np.nan,
+                "num_violations": num_violations,
+            }
+        )
+    stats_df = pd.DataFrame(stats, index=columns)
+    # Merge the offending cells of all the columns and keep the first ones in
+    # row-major order.
+    offending_cells_df = pd.DataFrame(
+        columns=["row_pos", "column", "df1", "df2", "abs_diff", "rel_diff"]
+    )
+    if offending_cells:
+        offending_cells_df = pd.concat(offending_cells, ignore_index=True)
+    col_pos = pd.Index(columns).get_indexer(offending_cells_df["column"])
+    offending_cells_df = offending_cells_df.iloc[
+        np.lexsort((col_pos, offending_cells_df["row_pos"].to_numpy()))
+    ].head(num_offending_cells)
+    # Replace the positions with the index values.
+    offending_cells_df.index = df1.index[
+        offending_cells_df["row_pos"].to_numpy(dtype=np.int64)
+    ]
+    offending_cells_df = offending_cells_df.drop(columns="row_pos")
+    _LOG.debug("stats_df=\n%s", df_to_str_lazy(stats_df))
+    return stats_df, offending_cells_df
+
+
 # #############################################################################
 # Multi-index dfs
 # #############################################################################
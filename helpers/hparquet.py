@@ -5,11 +5,28 @@ import helpers.hparquet as hparque
 """
 
 import collections
+import concurrent.futures
 import datetime
+import functools
 import glob
+import itertools
+import json
 import logging
 import os
-from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+import threading
+import uuid
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
@@ -110,7 +127,7 @@ class ParquetDataFrameGenerator:
     def _wrap_all_assets_df(df: List[pd.DataFrame]) -> pd.DataFrame:
         # Create a single dataframe for all the assets.
         df = pd.concat(df)
-        _LOG.debug(hpandas.df_to_str(df, print_shape_info=True, tag="df"))
+        _LOG.debug(hpandas.df_to_str_lazy(df, print_shape_info=True, tag="df"))
         return df
 
     def _get_core_dataframes(self) -> List[pd.DataFrame]:
@@ -135,7 +152,7 @@ class ParquetDataFrameGenerator:
                 index=self._dataframe_index,
             )
             _LOG.debug(
-                hpandas.df_to_str(
+                hpandas.df_to_str_lazy(
                     asset_df, print_shape_info=True, tag="asset_df"
                 )
             )
@@ -302,7 +319,7 @@ def get_pyarrow_s3fs(*args: Any, **kwargs: Any) -> PyArrowS3FileSystem:
     Return an Pyarrow S3Fs object from a given AWS profile.
 
     Same as `hs3.get_s3fs`, used specifically for accessing Parquet
-    datasets.
+    datasets. The objects are cached like in `hs3.get_s3fs`.
     """
     # Check if S3FileSystem is available
     hdbg.dassert(
@@ -312,16 +329,21 @@ def get_pyarrow_s3fs(*args: Any, **kwargs: Any) -> PyArrowS3FileSystem:
     # When deploying jobs via ECS the container obtains credentials based on passed
     #  task role specified in the ECS task-definition, refer to:
     #  https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-iam-roles.html
+    key = ("pyarrow_s3fs", args, tuple(sorted(kwargs.items())))
     if hserver.is_inside_ecs_container():
         _LOG.info("Fetching credentials from task IAM role")
-        s3fs_ = PyArrowS3FileSystem()
+        s3fs_ = hs3.get_cached_filesystem(key, PyArrowS3FileSystem)
     else:
         aws_credentials = hs3.get_aws_credentials(*args, **kwargs)
-        s3fs_ = PyArrowS3FileSystem(
-            access_key=aws_credentials["aws_access_key_id"],
-            secret_key=aws_credentials["aws_secret_access_key"],
-            session_token=aws_credentials["aws_session_token"],
-            region=aws_credentials["aws_region"],
+        s3fs_ = hs3.get_cached_filesystem(
+            key,
+            lambda: PyArrowS3FileSystem(
+                access_key=aws_credentials["aws_access_key_id"],
+                secret_key=aws_credentials["aws_secret_access_key"],
+                session_token=aws_credentials["aws_session_token"],
+                region=aws_credentials["aws_region"],
+            ),
+            version=hs3.get_aws_credentials_version(aws_credentials),
         )
     return s3fs_
 
@@ -347,6 +369,133 @@ def _get_parquet_tiles_from_file_path(file_path: str) -> List[Tuple[str, Any]]:
     return tiles
 
 
+def _get_parquet_filesystem(
+    file_name: str, aws_profile: hs3.AwsProfile
+) -> Tuple[Any, str]:
+    """
+    Check that a Parquet dataset exists and get the filesystem to read it.
+
+    :param file_name: see `from_parquet()`
+    :param aws_profile: see `from_parquet()`
+    :return: filesystem (`None` for local filesystem) and path to pass to it
+    """
+    hdbg.dassert_isinstance(file_name, str)
+    hs3.dassert_is_valid_aws_profile(file_name, aws_profile)
+    if hs3.is_s3_path(file_name):
+        if isinstance(aws_profile, str):
+            filesystem = get_pyarrow_s3fs(aws_profile)
+        else:
+            # Note: `s3fs` filesystem is only to be used on exact file path
+            # as `pq.ParquetDataset` is not properly handling directory path.
+            filesystem = aws_profile
+        # Pyarrow S3FileSystem does not have `exists` method.
+        s3_filesystem = hs3.get_s3fs(aws_profile)
+        hs3.dassert_path_exists(file_name, s3_filesystem)
+        file_name = file_name.removeprefix("s3://")
+    else:
+        filesystem = None
+        hdbg.dassert_path_exists(file_name)
+    return filesystem, file_name
+
+
+def _get_arrow_dataset(
+    file_name: str,
+    *,
+    filters: Optional[List[Any]],
+    schema: Optional[List[Tuple[str, pa.DataType]]],
+    aws_profile: hs3.AwsProfile,
+    use_manifest: bool,
+) -> Tuple[ds.Dataset, Optional[ds.Expression]]:
+    """
+    Get the Arrow dataset to read a Parquet dataset and the filter to apply.
+
+    The params are the same as in `from_parquet()`.
+    """
+    manifest = None
+    if use_manifest:
+        manifest = load_parquet_manifest(file_name, aws_profile=aws_profile)
+        if manifest is not None and not manifest["files"]:
+            manifest = None
+        _LOG.debug("Using manifest=%s", manifest is not None)
+    filesystem, file_name = _get_parquet_filesystem(file_name, aws_profile)
+    if schema is not None:
+        # Pass partition columns types explicitly.
+        schema = pa.schema(schema)
+    if manifest is not None:
+        dataset = _get_dataset_with_manifest(
+            file_name, manifest, filesystem, filters, schema
+        )
+    else:
+        partitioning = ds.partitioning(schema, flavor="hive")
+        # This is the dataset built by `pq.ParquetDataset`.
+        dataset = ds.dataset(
+            file_name,
+            filesystem=filesystem,
+            format="parquet",
+            partitioning=partitioning,
+        )
+    filter_expression = None
+    if filters:
+        filter_expression = pq.filters_to_expression(filters)
+    return dataset, filter_expression
+
+
+def _get_columns_with_index(
+    columns: Optional[List[str]], dataset_schema: pa.Schema
+) -> Optional[List[str]]:
+    """
+    Add the columns storing the Pandas index to the columns to read.
+
+    This is what `pq.ParquetDataset.read_pandas()` does, so that the index is
+    restored when converting to Pandas.
+    """
+    if not columns:
+        return None
+    # Note: `schema.names` also includes and index.
+    hdbg.dassert_is_subset(columns, dataset_schema.names)
+    pandas_metadata = dataset_schema.pandas_metadata or {}
+    index_columns = [
+        col
+        for col in pandas_metadata.get("index_columns", [])
+        if isinstance(col, str) and col not in columns
+    ]
+    columns = columns + index_columns
+    return columns
+
+
+def arrow_to_pandas(
+    table: pa.Table, *, self_destruct: bool = False
+) -> pd.DataFrame:
+    """
+    Convert an Arrow table into a dataframe minimizing the memory overhead.
+
+    Each column is converted into a separate block, avoiding copying the data
+    to consolidate columns with the same type, which allows zero-copy
+    conversion for numeric columns without nulls.
+
+    :param table: table to convert
+    :param self_destruct: release the memory of each column of `table` as
+        soon as it is converted, so that the peak memory is not the sum of
+        the two representations; `table` can't be used afterwards
+    :return: dataframe with timestamp columns and index with `ns` resolution
+    """
+    # Convert the Pandas Dataframe timestamp columns and index to `ns`
+    # resolution. The general approach is to preserve the time unit
+    # information after reading data back from Parquet files.
+    # Currently, it's challenging to resolve this issue since Parquet
+    # data is mixed with data from CSV files, which convert the time
+    # unit to `ns` by default. Refer to CmampTask7331 for details.
+    # https://github.com/cryptokaizen/cmamp/issues/7331
+    df = table.to_pandas(
+        coerce_temporal_nanoseconds=True,
+        split_blocks=True,
+        self_destruct=self_destruct,
+    )
+    if isinstance(df.index, pd.DatetimeIndex):
+        df.index = df.index.as_unit("ns")
+    return df
+
+
 # TODO(Dan): Add mode to allow querying even when some non-existing columns are passed.
 def from_parquet(
     file_name: str,
@@ -358,6 +507,7 @@ def from_parquet(
     log_level: int = logging.DEBUG,
     report_stats: bool = False,
     aws_profile: hs3.AwsProfile = None,
+    use_manifest: bool = False,
 ) -> pd.DataFrame:
     """
     Load a dataframe from a Parquet file.
@@ -376,32 +526,22 @@ def from_parquet(
     :param report_stats: whether to report Parquet file size or not
     :param aws_profile: AWS profile to use if and only if using an S3 path,
         otherwise `None` for local path
+    :param use_manifest: whether to use the manifest of the dataset, if it
+        exists, to read only the files and row groups that can satisfy
+        `filters`, without listing the dataset dirs (see
+        `build_parquet_manifest()`)
     :return: data from Parquet dataset
     """
     _LOG.debug(hprint.to_str("file_name columns filters schema"))
-    hdbg.dassert_isinstance(file_name, str)
-    hs3.dassert_is_valid_aws_profile(file_name, aws_profile)
-    if hs3.is_s3_path(file_name):
-        if isinstance(aws_profile, str):
-            filesystem = get_pyarrow_s3fs(aws_profile)
-        else:
-            # Note: `s3fs` filesystem is only to be used on exact file path
-            # as `pq.ParquetDataset` is not properly handling directory path.
-            filesystem = aws_profile
-        # Pyarrow S3FileSystem does not have `exists` method.
-        s3_filesystem = hs3.get_s3fs(aws_profile)
-        hs3.dassert_path_exists(file_name, s3_filesystem)
-        file_name = file_name.lstrip("s3://")
-    else:
-        filesystem = None
-        hdbg.dassert_path_exists(file_name)
     # Load data.
     with htimer.TimedScope(
         logging.DEBUG, f"# Reading Parquet file '{file_name}'"
     ) as ts:
         if n_rows:
+            _, path = _get_parquet_filesystem(file_name, aws_profile)
+            s3_filesystem = hs3.get_s3fs(aws_profile)
             # Get the latest parquet file in the directory.
-            last_pq_file = hs3.get_latest_pq_in_s3_dir(file_name, aws_profile)
+            last_pq_file = hs3.get_latest_pq_in_s3_dir(path, aws_profile)
             file = s3_filesystem.open(last_pq_file, "rb")
             # Load the data.
             parquet_file = pq.ParquetFile(file)
@@ -420,34 +560,19 @@ def from_parquet(
             for col, value in tiles:
                 df[col] = value
         else:
-            if schema is not None:
-                # Pass partition columns types explicitly.
-                schema = pa.schema(schema)
-            partitioning = ds.partitioning(schema, flavor="hive")
-            dataset = pq.ParquetDataset(
-                # Replace URI with path.
+            dataset, filter_expression = _get_arrow_dataset(
                 file_name,
-                filesystem=filesystem,
                 filters=filters,
-                partitioning=partitioning,
+                schema=schema,
+                aws_profile=aws_profile,
+                use_manifest=use_manifest,
             )
-            if columns:
-                # Note: `schema.names` also includes and index.
-                hdbg.dassert_is_subset(columns, dataset.schema.names)
-            # To read also the index we need to use `read_pandas()`, instead of
-            # `read_table()`.
+            # To read also the index we need to add the index columns, like
+            # `pq.ParquetDataset.read_pandas()` does.
             # See https://arrow.apache.org/docs/python/parquet.html#reading-and-writing-single-files.
-            table = dataset.read_pandas(columns=columns)
-            # Convert the Pandas Dataframe timestamp columns and index to `ns`
-            # resolution. The general approach is to preserve the time unit
-            # information after reading data back from Parquet files.
-            # Currently, it's challenging to resolve this issue since Parquet
-            # data is mixed with data from CSV files, which convert the time
-            # unit to `ns` by default. Refer to CmampTask7331 for details.
-            # https://github.com/cryptokaizen/cmamp/issues/7331
-            df = table.to_pandas(coerce_temporal_nanoseconds=True)
-            if isinstance(df.index, pd.DatetimeIndex):
-                df.index = df.index.as_unit("ns")
+            columns = _get_columns_with_index(columns, dataset.schema)
+            table = dataset.to_table(columns=columns, filter=filter_expression)
+            df = arrow_to_pandas(table, self_destruct=True)
     # Report stats about the df.
     _LOG.debug("df.shape=%s", str(df.shape))
     mem = df.memory_usage().sum()
@@ -465,6 +590,61 @@ def from_parquet(
     return df
 
 
+def from_parquet_as_arrow(
+    file_name: str,
+    *,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Any]] = None,
+    schema: Optional[List[Tuple[str, pa.DataType]]] = None,
+    aws_profile: hs3.AwsProfile = None,
+    use_manifest: bool = False,
+    as_batches: bool = False,
+    batch_size: int = 2**16,
+    batch_readahead: int = 2,
+) -> Union[pa.Table, Iterator[pa.RecordBatch]]:
+    """
+    Load an Arrow table from a Parquet file, without converting to Pandas.
+
+    This is useful to process only a few columns or compute aggregates without
+    the memory and time overhead of `from_parquet()`. Only the requested
+    columns are read and `filters` is used to skip files, row groups and rows.
+
+    :param file_name: see `from_parquet()`
+    :param columns: see `from_parquet()`; the columns storing the Pandas index
+        are always read, so that `arrow_to_pandas()` can restore it
+    :param filters: see `from_parquet()`
+    :param schema: see `from_parquet()`
+    :param aws_profile: see `from_parquet()`
+    :param use_manifest: see `from_parquet()`
+    :param as_batches: return a lazy iterator of record batches instead of a
+        table, so that only one batch at a time is in memory
+    :param batch_size: max number of rows per batch
+    :param batch_readahead: number of batches to read ahead of the consumer;
+        larger values increase the throughput and the memory footprint
+    :return: a table or an iterator of batches
+    """
+    _LOG.debug(hprint.to_str("file_name columns filters schema as_batches"))
+    dataset, filter_expression = _get_arrow_dataset(
+        file_name,
+        filters=filters,
+        schema=schema,
+        aws_profile=aws_profile,
+        use_manifest=use_manifest,
+    )
+    columns = _get_columns_with_index(columns, dataset.schema)
+    if as_batches:
+        ret = dataset.to_batches(
+            columns=columns,
+            filter=filter_expression,
+            batch_size=batch_size,
+            batch_readahead=batch_readahead,
+            fragment_readahead=1,
+        )
+    else:
+        ret = dataset.to_table(columns=columns, filter=filter_expression)
+    return ret
+
+
 # Copied from `hio.create_enclosing_dir()` to avoid circular dependencies.
 def _create_enclosing_dir(file_name: str) -> Optional[str]:
     dir_name = os.path.dirname(file_name)
@@ -513,7 +693,7 @@ def to_parquet(
     if hs3.is_s3_path(file_name):
         filesystem = hs3.get_s3fs(aws_profile)
         hs3.dassert_path_not_exists(file_name, filesystem)
-        file_name = file_name.lstrip("s3://")
+        file_name = file_name.removeprefix("s3://")
     else:
         filesystem = None
         hdbg.dassert_path_not_exists(file_name)
@@ -559,16 +739,420 @@ def to_parquet(
 
 
 # #############################################################################
+# Manifest
+# #############################################################################
+
+# A manifest is a sidecar file in the root dir of a partitioned Parquet dataset
+# storing, for each file, the partition values and the number of rows and
+# min / max statistics of each row group, e.g.,
+# ```
+# {
+#   "version": 1,
+#   "files": {
+#     "asset_id=1/year=2021/month=12/data.parquet": {
+#       "partition": {"asset_id": 1, "year": 2021, "month": 12},
+#       "num_rows": 744,
+#       "row_groups": [
+#         {"num_rows": 744, "stats": {"close": [99.5, 103.1], ...}}
+#       ]
+#     },
+#     ...
+#   }
+# }
+# ```
+# This allows to select the files and the row groups to read given a filter
+# without listing the dirs of the dataset and opening the files, which is slow
+# on S3 for datasets with thousands of tiles.
+#
+# The updates of a manifest are serialized only among the threads of a
+# process, so writers in different processes (or different machines, on S3)
+# can lose each other's updates. These writers need to be coordinated
+# externally or the manifest needs to be rebuilt with
+# `build_parquet_manifest()` after writing.
+
+_MANIFEST_FILE_NAME = "_manifest.json"
+
+_MANIFEST_VERSION = 1
+
+# Serialize updates of the manifests from multiple threads.
+_MANIFEST_LOCK = threading.Lock()
+
+
+def _get_manifest_path(dir_name: str) -> str:
+    return os.path.join(dir_name.rstrip("/"), _MANIFEST_FILE_NAME)
+
+
+def _encode_manifest_value(value: Any) -> Any:
+    """
+    Convert a statistics value into a JSON-serializable value.
+
+    :return: the encoded value or `None` if the value can't be encoded
+    """
+    if isinstance(value, (bool, int, float, str)):
+        if isinstance(value, float) and not np.isfinite(value):
+            return None
+        return value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return {"timestamp": pd.Timestamp(value).isoformat()}
+    return None
+
 
+def _decode_manifest_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return pd.Timestamp(value["timestamp"])
+    return value
+
+
+def _get_file_manifest(
+    metadata: pq.FileMetaData,
+    partition: Dict[str, Any],
+    stats_columns: Optional[List[str]],
+) -> Dict[str, Any]:
+    """
+    Build the manifest entry of a Parquet file from its metadata.
+
+    :param stats_columns: columns to store statistics for, `None` for all
+        the columns
+    """
+    row_groups = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        stats = {}
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            col_name = column.path_in_schema
+            if stats_columns is not None and col_name not in stats_columns:
+                continue
+            statistics = column.statistics
+            if statistics is None or not statistics.has_min_max:
+                continue
+            min_ = _encode_manifest_value(statistics.min)
+            max_ = _encode_manifest_value(statistics.max)
+            if min_ is None or max_ is None:
+                continue
+            stats[col_name] = [min_, max_]
+        row_groups.append({"num_rows": row_group.num_rows, "stats": stats})
+    file_manifest = {
+        "partition": partition,
+        "num_rows": metadata.num_rows,
+        "row_groups": row_groups,
+    }
+    return file_manifest
+
+
+def load_parquet_manifest(
+    dir_name: str, *, aws_profile: hs3.AwsProfile = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Load the manifest of a Parquet dataset.
+
+    :return: the manifest or `None` if the dataset has no manifest
+    """
+    manifest_path = _get_manifest_path(dir_name)
+    if hs3.is_s3_path(dir_name):
+        s3fs_ = hs3.get_s3fs(aws_profile)
+        if not s3fs_.exists(manifest_path):
+            return None
+        with s3fs_.open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    else:
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    hdbg.dassert_eq(manifest["version"], _MANIFEST_VERSION)
+    return manifest
+
+
+def _save_parquet_manifest(
+    dir_name: str,
+    manifest: Dict[str, Any],
+    *,
+    aws_profile: hs3.AwsProfile = None,
+) -> None:
+    """
+    Save the manifest of a Parquet dataset atomically.
+    """
+    manifest_path = _get_manifest_path(dir_name)
+    txt = json.dumps(manifest)
+    if hs3.is_s3_path(dir_name):
+        # Objects on S3 are replaced atomically.
+        s3fs_ = hs3.get_s3fs(aws_profile)
+        with s3fs_.open(manifest_path, "w") as f:
+            f.write(txt)
+    else:
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(txt)
+        os.replace(tmp_path, manifest_path)
+
+
+def update_parquet_manifest(
+    dir_name: str,
+    *,
+    added_files: Optional[Dict[str, pq.FileMetaData]] = None,
+    removed_files: Optional[List[str]] = None,
+    stats_columns: Optional[List[str]] = None,
+    aws_profile: hs3.AwsProfile = None,
+) -> Dict[str, Any]:
+    """
+    Update the manifest of a Parquet dataset after some files are written.
 
-def _yield_parquet_tile(
+    The manifest is created if it doesn't exist. This is safe only against
+    updates from other threads of the same process (see the note about
+    concurrency above).
+
+    :param dir_name: root dir of the Parquet dataset
+    :param added_files: path of each written file -> its metadata
+    :param removed_files: paths of the removed files
+    :param stats_columns: see `_get_file_manifest()`
+    :return: the updated manifest
+    """
+    added_files = added_files or {}
+    removed_files = removed_files or []
+    root_dir = dir_name.rstrip("/")
+    if hs3.is_s3_path(root_dir):
+        # The paths returned by the S3 filesystems don't have the scheme.
+        root_dir = root_dir[len("s3://") :]
+    with _MANIFEST_LOCK:
+        manifest = load_parquet_manifest(dir_name, aws_profile=aws_profile)
+        if manifest is None:
+            manifest = {"version": _MANIFEST_VERSION, "files": {}}
+        for path in removed_files:
+            rel_path = os.path.relpath(path, root_dir)
+            manifest["files"].pop(rel_path, None)
+        for path, metadata in added_files.items():
+            rel_path = os.path.relpath(path, root_dir)
+            partition = dict(_get_parquet_tiles_from_file_path(rel_path))
+            manifest["files"][rel_path] = _get_file_manifest(
+                metadata, partition, stats_columns
+            )
+        _save_parquet_manifest(dir_name, manifest, aws_profile=aws_profile)
+    return manifest
+
+
+def build_parquet_manifest(
+    dir_name: str,
+    *,
+    stats_columns: Optional[List[str]] = None,
+    aws_profile: hs3.AwsProfile = None,
+) -> Dict[str, Any]:
+    """
+    Build the manifest of an existing Parquet dataset from scratch.
+
+    This lists the dataset and reads the footer of all the files, so it is
+    expensive, but it needs to be done only once. After that
+    `to_partitioned_parquet()` can keep the manifest up to date.
+
+    :param dir_name: root dir of the Parquet dataset
+    :param stats_columns: see `_get_file_manifest()`
+    :return: the manifest
+    """
+    if hs3.is_s3_path(dir_name):
+        s3fs_ = hs3.get_s3fs(aws_profile)
+        file_names = s3fs_.glob(f"{dir_name.rstrip('/')}/**/*.parquet")
+        open_func = s3fs_.open
+    else:
+        s3fs_ = None
+        file_names = glob.glob(f"{dir_name}/**/*.parquet", recursive=True)
+        open_func = open
+    added_files = {}
+    for file_name in file_names:
+        with open_func(file_name, "rb") as f:
+            added_files[file_name] = pq.ParquetFile(f).metadata
+    _LOG.debug("Building manifest for %s files", len(added_files))
+    with _MANIFEST_LOCK:
+        # Discard the existing manifest.
+        manifest: Dict[str, Any] = {"version": _MANIFEST_VERSION, "files": {}}
+        _save_parquet_manifest(dir_name, manifest, aws_profile=aws_profile)
+    manifest = update_parquet_manifest(
+        dir_name,
+        added_files=added_files,
+        stats_columns=stats_columns,
+        aws_profile=aws_profile,
+    )
+    return manifest
+
+
+def _may_match(op: str, value: Any, min_: Any, max_: Any) -> bool:
+    """
+    Return whether values in [min_, max_] can satisfy `col op value`.
+    """
+    try:
+        if op in ("==", "="):
+            ret = min_ <= value <= max_
+        elif op == "!=":
+            ret = not min_ == max_ == value
+        elif op == "<":
+            ret = min_ < value
+        elif op == "<=":
+            ret = min_ <= value
+        elif op == ">":
+            ret = max_ > value
+        elif op == ">=":
+            ret = max_ >= value
+        elif op == "in":
+            ret = any(min_ <= v <= max_ for v in value)
+        elif op == "not in":
+            ret = not (min_ == max_ and min_ in value)
+        else:
+            raise ValueError(f"Invalid op='{op}'")
+    except TypeError:
+        # The values are not comparable, e.g., timestamps with and without
+        # timezone, so the data can't be excluded.
+        ret = True
+    return bool(ret)
+
+
+def _may_match_and_filter(
+    and_filter: List[Tuple[str, str, Any]],
+    partition: Dict[str, Any],
+    stats: Dict[str, List[Any]],
+) -> bool:
+    for col, op, value in and_filter:
+        if col in partition:
+            min_ = max_ = partition[col]
+        elif col in stats:
+            min_, max_ = map(_decode_manifest_value, stats[col])
+        else:
+            # There is no information about the column.
+            continue
+        if not _may_match(op, value, min_, max_):
+            return False
+    return True
+
+
+def prune_parquet_files(
+    manifest: Dict[str, Any], filters: Optional[List[Any]]
+) -> Dict[str, List[int]]:
+    """
+    Select the files and row groups of a dataset that can satisfy a filter.
+
+    :param manifest: manifest of a Parquet dataset
+    :param filters: filter in the format of `from_parquet()`
+    :return: relative path of each file -> indices of its row groups to read
+    """
+    or_and_filter: List[List[Tuple[str, str, Any]]] = []
+    if filters:
+        if isinstance(filters[0], tuple):
+            or_and_filter = [filters]
+        else:
+            or_and_filter = filters
+    res = {}
+    for rel_path, file_manifest in sorted(manifest["files"].items()):
+        partition = file_manifest["partition"]
+        row_group_idxs = []
+        for i, row_group in enumerate(file_manifest["row_groups"]):
+            stats = row_group["stats"]
+            if not or_and_filter or any(
+                _may_match_and_filter(and_filter, partition, stats)
+                for and_filter in or_and_filter
+            ):
+                row_group_idxs.append(i)
+        if row_group_idxs:
+            res[rel_path] = row_group_idxs
+    _LOG.debug(
+        "Selected %s / %s files using the manifest",
+        len(res),
+        len(manifest["files"]),
+    )
+    return res
+
+
+def _get_partition_fields(
+    manifest: Dict[str, Any], schema: Optional[pa.Schema]
+) -> Dict[str, pa.Field]:
+    """
+    Get the fields of the partition columns of a Parquet dataset.
+
+    The type of a column not in `schema` is inferred from all its values, like
+    `pq.ParquetDataset` does, i.e., int32 if all the values are ints and
+    string otherwise.
+
+    :param manifest: manifest of a Parquet dataset
+    :param schema: see `from_parquet()`
+    :return: partition column -> field
+    """
+    values: Dict[str, List[Any]] = {}
+    for file_manifest in manifest["files"].values():
+        for col, value in file_manifest["partition"].items():
+            values.setdefault(col, []).append(value)
+    partition_fields = {}
+    for col, col_values in values.items():
+        if schema is not None and col in schema.names:
+            partition_fields[col] = schema.field(col)
+        else:
+            is_int = all(isinstance(value, int) for value in col_values)
+            type_ = pa.int32() if is_int else pa.string()
+            partition_fields[col] = pa.field(col, type_)
+    return partition_fields
+
+
+def _get_dataset_with_manifest(
+    file_name: str,
+    manifest: Dict[str, Any],
+    filesystem: Any,
+    filters: Optional[List[Any]],
+    schema: Optional[pa.Schema],
+) -> ds.Dataset:
+    """
+    Build a dataset with only the files and row groups of a Parquet dataset
+    selected using its manifest.
+
+    The parameters are the same as in `from_parquet()`.
+    """
+    if filesystem is None:
+        filesystem = pafs.LocalFileSystem()
+    elif not isinstance(filesystem, pafs.FileSystem):
+        # Wrap a `fsspec` filesystem, e.g., `s3fs`.
+        filesystem = pafs.PyFileSystem(pafs.FSSpecHandler(filesystem))
+    partition_fields = _get_partition_fields(manifest, schema)
+    selected_files = prune_parquet_files(manifest, filters)
+    if not selected_files:
+        # Read a file anyway to get the schema. The filter excludes all the
+        # rows.
+        rel_path = sorted(manifest["files"])[0]
+        selected_files = {rel_path: []}
+    # Build a dataset with only the selected row groups.
+    file_format = ds.ParquetFileFormat()
+    fragments = []
+    for rel_path, row_group_idxs in selected_files.items():
+        partition = manifest["files"][rel_path]["partition"]
+        partition_expression = ds.scalar(True)
+        for col, value in partition.items():
+            if pa.types.is_string(partition_fields[col].type):
+                value = str(value)
+            partition_expression &= ds.field(col) == value
+        fragment = file_format.make_fragment(
+            os.path.join(file_name, rel_path),
+            filesystem=filesystem,
+            partition_expression=partition_expression,
+            row_groups=row_group_idxs,
+        )
+        fragments.append(fragment)
+    dataset_schema = fragments[0].physical_schema
+    for field in partition_fields.values():
+        if field.name not in dataset_schema.names:
+            dataset_schema = dataset_schema.append(field)
+    dataset = ds.FileSystemDataset(
+        fragments, dataset_schema, file_format, filesystem
+    )
+    return dataset
+
+
+# #############################################################################
+
+
+def _read_parquet_tile(
     file_name: str,
     columns: List[str],
     filters: List[Any],
     asset_id_col: str,
-) -> Iterator[pd.DataFrame]:
+    *,
+    use_manifest: bool = False,
+) -> pd.DataFrame:
     """
-    Yield Parquet data in a single tile given the filters.
+    Read Parquet data in a single tile given the filters.
 
     It is assumed that data is partitioned by asset_id, year and month, i.e.
     the file layout is:
@@ -596,7 +1180,8 @@ def _yield_parquet_tile(
     :param columns: see `from_parquet()`
     :param filters: see `from_parquet()`
     :param asset_id_col: name of the column with asset ids
-    :return: a generator of `from_parquet()` dataframe
+    :param use_manifest: see `from_parquet()`
+    :return: `from_parquet()` dataframe
     """
     # Without the schema being provided `pyarrow` incorrectly infers
     # type of the asset id column, i.e. `pyarrow` reads assets as
@@ -615,9 +1200,53 @@ def _yield_parquet_tile(
         columns=columns,
         filters=filters,
         schema=schema,
+        use_manifest=use_manifest,
     )
     hpandas.dassert_series_type_is(tile[asset_id_col], int_type)
-    yield tile
+    return tile
+
+
+def _yield_prefetched_tiles(
+    read_tile_funcs: Iterable[Callable[[], pd.DataFrame]],
+    num_prefetched_tiles: int,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the tiles read by the passed functions, in order.
+
+    The next `num_prefetched_tiles` tiles are read by background threads while
+    the consumer processes the current one, so that reading the data (e.g.,
+    from S3) and processing it overlap. At most `num_prefetched_tiles` tiles
+    are kept in memory besides the one returned to the consumer.
+
+    :param read_tile_funcs: functions reading a tile each
+    :param num_prefetched_tiles: number of tiles to read ahead; 0 to read
+        each tile only when requested by the consumer
+    :return: a generator of tiles
+    """
+    hdbg.dassert_lte(0, num_prefetched_tiles)
+    if num_prefetched_tiles == 0:
+        for read_tile_func in read_tile_funcs:
+            yield read_tile_func()
+        return
+    read_tile_funcs = iter(read_tile_funcs)
+    futures: Deque[concurrent.futures.Future] = collections.deque()
+    executor = concurrent.futures.ThreadPoolExecutor(num_prefetched_tiles)
+    try:
+        while True:
+            # Keep the queue of tiles being read full.
+            for read_tile_func in itertools.islice(
+                read_tile_funcs, num_prefetched_tiles - len(futures)
+            ):
+                futures.append(executor.submit(read_tile_func))
+            if not futures:
+                break
+            # Wait for the oldest tile, removing its future from the queue so
+            # that the tile is freed once the consumer is done with it.
+            yield futures.popleft().result()
+    finally:
+        # Don't read the remaining tiles if the consumer stops early or a read
+        # fails.
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 def yield_parquet_tiles_by_year(
@@ -628,6 +1257,8 @@ def yield_parquet_tiles_by_year(
     *,
     asset_ids: Optional[List[int]] = None,
     asset_id_col: str = "asset_id",
+    use_manifest: bool = False,
+    num_prefetched_tiles: int = 0,
 ) -> Iterator[pd.DataFrame]:
     """
     Yield Parquet data in tiles up to one year in length.
@@ -637,7 +1268,9 @@ def yield_parquet_tiles_by_year(
     :param end_date: last date to load; day is ignored
     :param cols: if an `int` is supplied, it is cast to a string before reading
     :param asset_ids: asset ids to load
-    :param asset_id_col: see `_yield_parquet_tile()`
+    :param asset_id_col: see `_read_parquet_tile()`
+    :param use_manifest: see `from_parquet()`
+    :param num_prefetched_tiles: see `_yield_prefetched_tiles()`
     :return: a generator of `from_parquet()` dataframes
     """
     time_filters = build_year_month_filter(start_date, end_date)
@@ -650,6 +1283,7 @@ def yield_parquet_tiles_by_year(
     if asset_ids is None:
         asset_ids = []
     asset_id_filter = build_asset_id_filter(asset_ids, asset_id_col)
+    read_tile_funcs = []
     for time_filter in time_filters:
         if asset_id_filter:
             combined_filter = [
@@ -657,9 +1291,16 @@ def yield_parquet_tiles_by_year(
             ]
         else:
             combined_filter = time_filter
-        yield from _yield_parquet_tile(
-            file_name, columns, combined_filter, asset_id_col
+        read_tile_func = functools.partial(
+            _read_parquet_tile,
+            file_name,
+            columns,
+            combined_filter,
+            asset_id_col,
+            use_manifest=use_manifest,
         )
+        read_tile_funcs.append(read_tile_func)
+    yield from _yield_prefetched_tiles(read_tile_funcs, num_prefetched_tiles)
 
 
 def build_asset_id_filter(
@@ -679,15 +1320,20 @@ def yield_parquet_tiles_by_assets(
     asset_id_col: str,
     asset_batch_size: int,
     cols: Optional[List[Union[int, str]]],
+    *,
+    use_manifest: bool = False,
+    num_prefetched_tiles: int = 0,
 ) -> Iterator[pd.DataFrame]:
     """
     Yield Parquet data in tiles batched by asset ids.
 
     :param file_name: as in `from_parquet()`
     :param asset_ids: asset ids to load
-    :param asset_id_col: see `_yield_parquet_tile()`
+    :param asset_id_col: see `_read_parquet_tile()`
     :param asset_batch_size: the number of asset to load in a single batch
     :param cols: if an `int` is supplied, it is cast to a string before reading
+    :param use_manifest: see `from_parquet()`
+    :param num_prefetched_tiles: see `_yield_prefetched_tiles()`
     :return: a generator of `from_parquet()` dataframes
     """
     hdbg.dassert_isinstance(asset_id_col, str)
@@ -699,10 +1345,18 @@ def yield_parquet_tiles_by_assets(
     columns: Optional[List[str]] = None
     if cols:
         columns = [str(col) for col in cols]
-    for batch in tqdm(batches):
-        _LOG.debug("assets=%s", batch)
-        filter_ = build_asset_id_filter(batch, asset_id_col)
-        yield from _yield_parquet_tile(file_name, columns, filter_, asset_id_col)
+    read_tile_funcs = (
+        functools.partial(
+            _read_parquet_tile,
+            file_name,
+            columns,
+            build_asset_id_filter(batch, asset_id_col),
+            asset_id_col,
+            use_manifest=use_manifest,
+        )
+        for batch in tqdm(batches)
+    )
+    yield from _yield_prefetched_tiles(read_tile_funcs, num_prefetched_tiles)
 
 
 def build_year_month_filter(
@@ -1094,12 +1748,190 @@ def add_date_partition_columns(
     return df, partition_columns
 
 
+def _list_parquet_tile_files(tile_dir: str, filesystem: Any) -> List[str]:
+    """
+    Return the Parquet files in a tile dir, if it exists.
+    """
+    if filesystem:
+        if not filesystem.exists(tile_dir):
+            return []
+        file_paths = filesystem.ls(tile_dir)
+    else:
+        if not os.path.isdir(tile_dir):
+            return []
+        file_paths = [os.path.join(tile_dir, f) for f in os.listdir(tile_dir)]
+    # Skip temporary files left by an interrupted write.
+    file_paths = sorted(f for f in file_paths if f.endswith(".parquet"))
+    return file_paths
+
+
+def _write_parquet_tile(
+    table: pa.Table,
+    tile_dir: str,
+    filesystem: Any,
+    write_mode: str,
+    max_rows_per_file: Optional[int],
+    row_group_size: Optional[int],
+    drop_duplicates_mode: Optional[str],
+) -> Tuple[List[str], Dict[str, pq.FileMetaData]]:
+    """
+    Write the data of a tile.
+
+    The params are the same as in `to_partitioned_parquet()`.
+
+    :param table: data of the tile without the partition columns
+    :param tile_dir: dir of the tile, e.g., `dst_dir/asset=A/year=2021`
+    :return: the removed files and the metadata of each written file
+    """
+    old_file_paths = _list_parquet_tile_files(tile_dir, filesystem)
+    if write_mode == "merge" and old_file_paths:
+        # Merge the new data with the data in the tile, keeping the new rows
+        # in case of duplicates.
+        old_table = pq.ParquetDataset(
+            old_file_paths, filesystem=filesystem, partitioning=None
+        ).read_pandas()
+        old_df = old_table.to_pandas()
+        new_df = table.to_pandas()
+        df = pd.concat([new_df, old_df])
+        # Identify the rows by their index, e.g., the timestamp, and by the
+        # key columns of `drop_duplicates_mode`, if any. A default index
+        # doesn't identify the rows, so in this case all the columns are used
+        # if there are no key columns.
+        has_default_index = isinstance(new_df.index, pd.RangeIndex)
+        index_names = df.index.names
+        index_columns = [f"__index_level_{i}__" for i in range(df.index.nlevels)]
+        df = df.rename_axis(index_columns).reset_index()
+        duplicate_columns = [] if has_default_index else list(index_columns)
+        if drop_duplicates_mode is not None or has_default_index:
+            key_columns, _ = _get_drop_duplicates_params(
+                new_df.columns.to_list(), drop_duplicates_mode
+            )
+            duplicate_columns.extend(key_columns)
+        # The new rows come first.
+        df = df.drop_duplicates(subset=duplicate_columns, keep="first")
+        df = df.set_index(index_columns).rename_axis(index_names)
+        if has_default_index:
+            df = df.reset_index(drop=True)
+        else:
+            df = df.sort_index(kind="stable")
+        table = pa.Table.from_pandas(df)
+    # Split the data in files with at most `max_rows_per_file` rows.
+    num_rows_per_file = max_rows_per_file or max(table.num_rows, 1)
+    num_files = max(1, -(-table.num_rows // num_rows_per_file))
+    if write_mode == "append":
+        # Use a unique name like `pq.write_to_dataset()`.
+        basename = uuid.uuid4().hex
+        file_names = [f"{basename}-{i}.parquet" for i in range(num_files)]
+    elif num_files == 1:
+        file_names = ["data.parquet"]
+    else:
+        file_names = [f"data-{i}.parquet" for i in range(num_files)]
+    if filesystem:
+        filesystem.makedirs(tile_dir, exist_ok=True)
+    else:
+        os.makedirs(tile_dir, exist_ok=True)
+    # Write the data to temporary files first, so that the data in the tile is
+    # not lost if the process is interrupted. The names start with "." so that
+    # the readers of the dataset ignore them.
+    written_files = {}
+    tmp_file_paths = {}
+    for i, file_name in enumerate(file_names):
+        file_path = f"{tile_dir}/{file_name}"
+        tmp_file_paths[file_path] = f"{tile_dir}/.{file_name}.tmp"
+        metadata_collector: List[pq.FileMetaData] = []
+        pq.write_table(
+            table.slice(i * num_rows_per_file, num_rows_per_file),
+            tmp_file_paths[file_path],
+            filesystem=filesystem,
+            row_group_size=row_group_size,
+            metadata_collector=metadata_collector,
+        )
+        written_files[file_path] = metadata_collector[0]
+    for file_path, tmp_file_path in tmp_file_paths.items():
+        if filesystem:
+            filesystem.mv(tmp_file_path, file_path)
+        else:
+            os.replace(tmp_file_path, file_path)
+    # Remove the old data, if needed.
+    removed_files = []
+    if write_mode in ("overwrite", "merge"):
+        removed_files = [f for f in old_file_paths if f not in written_files]
+        for file_path in removed_files:
+            if filesystem:
+                filesystem.rm(file_path)
+            else:
+                os.remove(file_path)
+    return removed_files, written_files
+
+
+def _write_parquet_tiles(
+    df: pd.DataFrame,
+    table: pa.Table,
+    partition_columns: List[str],
+    dst_dir: str,
+    filesystem: Any,
+    write_mode: str,
+    num_threads: int,
+    max_rows_per_file: Optional[int],
+    row_group_size: Optional[int],
+    drop_duplicates_mode: Optional[str],
+) -> Tuple[List[str], Dict[str, pq.FileMetaData]]:
+    """
+    Write a dataframe as a partitioned dataset writing tiles in parallel.
+
+    The params are the same as in `to_partitioned_parquet()`.
+
+    :param table: `df` converted to Arrow
+    :return: the removed files and the metadata of each written file
+    """
+    hdbg.dassert_in(write_mode, ("append", "overwrite", "merge"))
+    hdbg.dassert_lte(1, num_threads)
+    data_table = table.drop_columns(partition_columns)
+    # Split the data by tile.
+    tile_idxs = df.groupby(partition_columns, sort=True).indices
+    write_args = []
+    for key, idxs in tile_idxs.items():
+        if not isinstance(key, tuple):
+            key = (key,)
+        tile_dir = "/".join(
+            [dst_dir]
+            + [f"{col}={value}" for col, value in zip(partition_columns, key)]
+        )
+        write_args.append((data_table.take(idxs), tile_dir))
+    _LOG.debug("Writing %s tiles", len(write_args))
+    func = functools.partial(
+        _write_parquet_tile,
+        filesystem=filesystem,
+        write_mode=write_mode,
+        max_rows_per_file=max_rows_per_file,
+        row_group_size=row_group_size,
+        drop_duplicates_mode=drop_duplicates_mode,
+    )
+    if num_threads == 1:
+        results = [func(*args) for args in write_args]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+            results = list(executor.map(lambda args: func(*args), write_args))
+    removed_files: List[str] = []
+    written_files: Dict[str, pq.FileMetaData] = {}
+    for tile_removed_files, tile_written_files in results:
+        removed_files.extend(tile_removed_files)
+        written_files.update(tile_written_files)
+    return removed_files, written_files
+
+
 def to_partitioned_parquet(
     df: pd.DataFrame,
     partition_columns: List[str],
     dst_dir: str,
     *,
     aws_profile: hs3.AwsProfile = None,
+    update_manifest: Optional[bool] = None,
+    write_mode: Optional[str] = None,
+    num_threads: int = 1,
+    max_rows_per_file: Optional[int] = None,
+    row_group_size: Optional[int] = None,
+    drop_duplicates_mode: Optional[str] = None,
 ) -> None:
     """
     Save the given dataframe as Parquet file partitioned along the given
@@ -1109,6 +1941,29 @@ def to_partitioned_parquet(
     :param partition_columns: partitioning columns
     :param dst_dir: location of partitioned dataset
     :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :param update_manifest: whether to add the written files to the manifest
+        of the dataset (see `build_parquet_manifest()`), creating it if needed
+        - `None`: update the manifest only if it exists, so that the readers
+          using it don't miss the written files
+        - `False`: don't update the manifest, which is then stale
+    :param write_mode: how to write the data of each tile
+        - `None`: use `pq.write_to_dataset()`, adding a file to each tile
+        - "append": add files to each tile
+        - "overwrite": replace the data of each tile
+        - "merge": merge the data with the data of each tile, replacing the
+          rows with the same index (and the same key columns of
+          `drop_duplicates_mode`) with the new rows, so that each tile
+          doesn't need to be merged with `list_and_merge_pq_files()` later
+        With a write mode, files are written to temporary files and renamed
+        so that the data of a tile is not lost if the process is interrupted
+    :param num_threads: number of tiles to write in parallel; only with a
+        `write_mode`
+    :param max_rows_per_file: max number of rows per file, `None` to write
+        each tile in a single file; only with a `write_mode`
+    :param row_group_size: max number of rows per row group, `None` for the
+        `pyarrow` default; only with a `write_mode`
+    :param drop_duplicates_mode: see `list_and_merge_pq_files()`; only with
+        "merge", where the new rows are always kept
 
     E.g., in case of partition using `date`, the file layout looks like:
     ```
@@ -1160,12 +2015,342 @@ def to_partitioned_parquet(
         #  how to do it. Either setting permissions to read-only before writing.
         #  Or having a list of files that will be written and ensure that none of
         #  those files already existing.
-        pq.write_to_dataset(
-            table,
+        removed_files: List[str] = []
+        written_files = {}
+        if write_mode is None:
+
+            def _collect_written_file(written_file: Any) -> None:
+                written_files[written_file.path] = written_file.metadata
+
+            pq.write_to_dataset(
+                table,
+                dst_dir,
+                partition_cols=partition_columns,
+                filesystem=filesystem,
+                file_visitor=_collect_written_file,
+            )
+        else:
+            removed_files, written_files = _write_parquet_tiles(
+                df,
+                table,
+                partition_columns,
+                dst_dir,
+                filesystem,
+                write_mode,
+                num_threads,
+                max_rows_per_file,
+                row_group_size,
+                drop_duplicates_mode,
+            )
+    if update_manifest is None:
+        update_manifest = (
+            load_parquet_manifest(dst_dir, aws_profile=aws_profile) is not None
+        )
+    if update_manifest:
+        update_parquet_manifest(
             dst_dir,
-            partition_cols=partition_columns,
-            filesystem=filesystem,
+            added_files=written_files,
+            removed_files=removed_files,
+            aws_profile=aws_profile,
+        )
+
+
+def _get_drop_duplicates_params(
+    columns: List[str], drop_duplicates_mode: Optional[str]
+) -> Tuple[List[str], Optional[str]]:
+    """
+    Get the columns identifying duplicated rows for `list_and_merge_pq_files()`.
+
+    :param columns: data columns
+    :param drop_duplicates_mode: see `list_and_merge_pq_files()`
+    :return: columns identifying the duplicates and column whose value
+        determines the kept row, if any (see `hdatafr.remove_duplicates()`)
+    """
+    # TODO(gp): hparquet is general and we should pass the columns to remove
+    #  or perform the transform after.
+    if drop_duplicates_mode is None:
+        # Drop duplicates on all non-metadata columns.
+        duplicate_columns = list(columns)
+        for col_name in ["knowledge_timestamp", "end_download_timestamp"]:
+            if col_name in duplicate_columns:
+                duplicate_columns.remove(col_name)
+        control_column = None
+    elif drop_duplicates_mode == "bid_ask":
+        # Drop duplicates on timestamp index.
+        duplicate_columns = ["timestamp", "exchange_id"]
+        control_column = None
+    elif drop_duplicates_mode == "ohlcv":
+        # Drop duplicates on timestamp and keep one with largest volume.
+        duplicate_columns = ["timestamp", "exchange_id"]
+        control_column = "volume"
+    else:
+        hdbg.dfatal("Supported drop duplicates modes: ohlcv, bid_ask")
+    return duplicate_columns, control_column
+
+
+def _hash_rows(batch: pa.RecordBatch, columns: List[str]) -> np.ndarray:
+    """
+    Compute a 64-bit hash of the values in `columns` for each row of a batch.
+    """
+    df = batch.select(columns).to_pandas()
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashes
+
+
+def _isin_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of `[v in sorted_values for v in values]`.
+    """
+    idxs = np.searchsorted(sorted_values, values)
+    idxs = np.minimum(idxs, max(len(sorted_values) - 1, 0))
+    mask = np.zeros(len(values), dtype=bool)
+    if len(sorted_values) > 0:
+        mask = sorted_values[idxs] == values
+    return mask
+
+
+class _HashSet:
+    """
+    Set of 64-bit hashes stored in sorted arrays.
+
+    Like in a binary counter, the arrays have decreasing sizes and adding
+    values merges the arrays with a size smaller than the new values, so each
+    value is merged O(log n) times, instead of sorting all the values every
+    time some are added.
+    """
+
+    def __init__(self) -> None:
+        self._arrays: List[np.ndarray] = []
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of `[v in self for v in values]`.
+        """
+        mask = np.zeros(len(values), dtype=bool)
+        for sorted_values in self._arrays:
+            mask |= _isin_sorted(values, sorted_values)
+        return mask
+
+    def add(self, values: np.ndarray) -> None:
+        """
+        Add values that are not in the set yet.
+        """
+        values = np.sort(values)
+        while self._arrays and len(self._arrays[-1]) <= len(values):
+            # Merging sorted arrays with a stable sort takes linear time.
+            values = np.sort(
+                np.concatenate([self._arrays.pop(), values]), kind="stable"
+            )
+        self._arrays.append(values)
+
+
+def _get_rows_to_keep(
+    dataset: ds.Dataset,
+    duplicate_columns: List[str],
+    control_column: str,
+    batch_size: int,
+) -> np.ndarray:
+    """
+    Find the row to keep for each key, like `hdatafr.remove_duplicates()`.
+
+    `hdatafr.remove_duplicates()` sorts the rows by `control_column` and keeps
+    the first row of each key, i.e., the row with the smallest value. Ties are
+    broken keeping the first row.
+
+    :return: sorted positions of the rows to keep in the dataset
+    """
+    keep_hashes = np.array([], dtype=np.uint64)
+    keep_values = np.array([], dtype=np.float64)
+    keep_positions = np.array([], dtype=np.int64)
+    offset = 0
+    for batch in dataset.to_batches(
+        columns=duplicate_columns + [control_column], batch_size=batch_size
+    ):
+        hashes = _hash_rows(batch, duplicate_columns)
+        values = batch.column(control_column).to_numpy(zero_copy_only=False)
+        positions = np.arange(offset, offset + batch.num_rows)
+        offset += batch.num_rows
+        hashes = np.concatenate([keep_hashes, hashes])
+        values = np.concatenate([keep_values, values.astype(np.float64)])
+        positions = np.concatenate([keep_positions, positions])
+        # Sort by key, then by control value and position, and keep the first
+        # row of each key. NaN values are sorted last, like in pandas.
+        idxs = np.lexsort((positions, values, hashes))
+        hashes = hashes[idxs]
+        is_first = np.ones(len(hashes), dtype=bool)
+        is_first[1:] = hashes[1:] != hashes[:-1]
+        idxs = idxs[is_first]
+        keep_hashes = hashes[is_first]
+        keep_values = values[idxs]
+        keep_positions = positions[idxs]
+    return np.sort(keep_positions)
+
+
+def _merge_pq_files_streaming(
+    file_paths: List[str],
+    dst_path: str,
+    filesystem: Any,
+    duplicate_columns: List[str],
+    control_column: Optional[str],
+    batch_size: int,
+) -> None:
+    """
+    Merge Parquet files removing the duplicates, one batch at a time.
+
+    Instead of materializing all the data, only the 64-bit hashes of the
+    keys of the rows already written are kept in memory, so the memory
+    footprint is bounded by the number of unique keys. The rows are written in
+    the order of the input files.
+
+    Rows are compared only through the hashes of their keys, so two rows with
+    different keys and the same hash are considered duplicated and one of
+    them is dropped. With 64-bit hashes this is expected to happen with
+    probability ~n^2 / 2^65 for n unique keys, e.g., ~3e-6 for 10M keys.
+
+    :param file_paths: files to merge
+    :param dst_path: path of the resulting file
+    :param filesystem: S3 filesystem or `None` for local filesystem
+    :param duplicate_columns: see `_get_drop_duplicates_params()`
+    :param control_column: see `_get_drop_duplicates_params()`
+    :param batch_size: max number of rows to process at once
+    """
+    dataset = ds.dataset(
+        file_paths, format="parquet", filesystem=filesystem, partitioning=None
+    )
+    hdbg.dassert_is_subset(duplicate_columns, dataset.schema.names)
+    if control_column is not None:
+        # Find the rows to keep in a first pass, so that the data can be
+        # written in a single pass afterwards.
+        keep_positions = _get_rows_to_keep(
+            dataset, duplicate_columns, control_column, batch_size
         )
+    else:
+        seen_hashes = _HashSet()
+    offset = 0
+    with pq.ParquetWriter(
+        dst_path, dataset.schema, filesystem=filesystem
+    ) as writer:
+        for batch in dataset.to_batches(batch_size=batch_size):
+            if control_column is not None:
+                positions = np.arange(offset, offset + batch.num_rows)
+                offset += batch.num_rows
+                mask = _isin_sorted(positions, keep_positions)
+            else:
+                hashes = _hash_rows(batch, duplicate_columns)
+                # Keep the first occurrence of each key in the batch, if the
+                # key was not seen in the previous batches.
+                _, first_idxs = np.unique(hashes, return_index=True)
+                mask = np.zeros(batch.num_rows, dtype=bool)
+                mask[first_idxs] = True
+                mask &= ~seen_hashes.contains(hashes)
+                seen_hashes.add(hashes[mask])
+            writer.write_batch(batch.filter(pa.array(mask)))
+
+
+def _merge_pq_files_in_memory(
+    file_paths: List[str],
+    dst_path: str,
+    filesystem: Any,
+    drop_duplicates_mode: Optional[str],
+) -> None:
+    """
+    Merge Parquet files removing the duplicates, loading all the data.
+
+    The params are the same as in `_merge_pq_files_streaming()`.
+    """
+    # Read all files in target folder.
+    # `partitioning=None` is required to read the dataset without
+    # partitioning columns. See CmTask7324 for details.
+    # https://github.com/cryptokaizen/cmamp/issues/7324
+    data = pq.ParquetDataset(
+        file_paths, filesystem=filesystem, partitioning=None
+    ).read()
+    data = data.to_pandas()
+    duplicate_columns, control_column = _get_drop_duplicates_params(
+        data.columns.to_list(), drop_duplicates_mode
+    )
+    data = hdatafr.remove_duplicates(data, duplicate_columns, control_column)
+    if filesystem:
+        pq.write_table(
+            pa.Table.from_pandas(data), dst_path, filesystem=filesystem
+        )
+    else:
+        data.to_parquet(dst_path)
+
+
+def _merge_pq_folder(
+    folder: str,
+    file_name: str,
+    filesystem: Any,
+    drop_duplicates_mode: Optional[str],
+    merge_mode: str,
+    batch_size: int,
+) -> Optional[Tuple[List[str], str]]:
+    """
+    Merge the Parquet files in a leaf folder of a dataset into a single file.
+
+    The params are the same as in `list_and_merge_pq_files()`.
+
+    :return: the merged files and the resulting file, `None` if the folder
+        doesn't need to be merged
+    """
+    # Get files per folder and merge if there are multiple ones.
+    if filesystem:
+        # Use specialized S3 filesystem function to list Parquet files efficiently.
+        folder_files = filesystem.ls(folder)
+    else:
+        # For local filesystem, use os.listdir
+        folder_files = [os.path.join(folder, f) for f in os.listdir(folder)]
+    # Skip temporary files left by an interrupted merge.
+    folder_files = sorted(f for f in folder_files if f.endswith(".parquet"))
+    hdbg.dassert_ne(
+        len(folder_files), 0, msg=f"Empty folder `{folder}` detected!"
+    )
+    if len(folder_files) == 1 and folder_files[0].endswith("/data.parquet"):
+        # If there is already single `data.parquet` file, no action is required.
+        return None
+    dst_path = f"{folder}/{file_name}"
+    # Write the merged data to a temporary file, so that the original data is
+    # not lost if the process is interrupted. The name starts with "." so that
+    # the readers of the dataset ignore it.
+    tmp_path = f"{folder}/.{file_name}.tmp"
+    if merge_mode == "in_memory":
+        _merge_pq_files_in_memory(
+            folder_files, tmp_path, filesystem, drop_duplicates_mode
+        )
+    elif merge_mode == "streaming":
+        dataset_schema = pq.read_schema(folder_files[0], filesystem=filesystem)
+        pandas_metadata = dataset_schema.pandas_metadata or {}
+        index_columns = pandas_metadata.get("index_columns", [])
+        columns = [
+            col for col in dataset_schema.names if col not in index_columns
+        ]
+        duplicate_columns, control_column = _get_drop_duplicates_params(
+            columns, drop_duplicates_mode
+        )
+        _merge_pq_files_streaming(
+            folder_files,
+            tmp_path,
+            filesystem,
+            duplicate_columns,
+            control_column,
+            batch_size,
+        )
+    else:
+        raise ValueError(f"Invalid merge_mode='{merge_mode}'")
+    # Replace the resulting file first and then remove the other files: if the
+    # process is interrupted in between the next merge removes the duplicates.
+    if filesystem:
+        filesystem.mv(tmp_path, dst_path)
+    else:
+        os.replace(tmp_path, dst_path)
+    for file_path in folder_files:
+        if file_path != dst_path:
+            if filesystem:
+                filesystem.rm(file_path)
+            else:
+                os.remove(file_path)
+    return folder_files, dst_path
 
 
 def list_and_merge_pq_files(
@@ -1174,6 +2359,9 @@ def list_and_merge_pq_files(
     file_name: str = "data.parquet",
     aws_profile: hs3.AwsProfile = None,
     drop_duplicates_mode: Optional[str] = None,
+    merge_mode: str = "in_memory",
+    num_threads: int = 1,
+    batch_size: int = 2**16,
 ) -> None:
     """
     Merge all files of the Parquet dataset.
@@ -1201,9 +2389,26 @@ def list_and_merge_pq_files(
                     data.parquet
     ```
 
+    The merged data is written to a temporary file which is then renamed, so
+    that no data is lost if the process is interrupted.
+
     :param root_dir: root directory of Parquet dataset
     :param file_name: name of the single resulting file
     :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :param drop_duplicates_mode: how to identify duplicated rows
+        - `None`: rows with the same values of all the non-metadata columns
+        - "bid_ask": rows with the same timestamp and exchange id
+        - "ohlcv": rows with the same timestamp and exchange id, keeping
+          the one with the largest volume
+    :param merge_mode: how to merge the files of a folder
+        - "in_memory": load all the data in a dataframe; the resulting file is
+          sorted by index
+        - "streaming": process the data one batch at a time, removing the
+          duplicates using a 64-bit hash of the key columns, so rows with
+          different keys are dropped in the unlikely case of a hash
+          collision; the resulting file keeps the order of the input files
+    :param num_threads: number of folders to merge in parallel
+    :param batch_size: number of rows per batch for the "streaming" mode
     """
     if aws_profile is not None:
         filesystem = hs3.get_s3fs(aws_profile)
@@ -1220,62 +2425,42 @@ def list_and_merge_pq_files(
         parquet_files = glob.glob(f"{root_dir}/**/*.parquet", recursive=True)
     _LOG.debug("Parquet files: '%s'", parquet_files)
     # Get paths only to the lowest level of dataset folders.
-    dataset_folders = {f.rsplit("/", 1)[0] for f in parquet_files}
-    for folder in dataset_folders:
-        # Get files per folder and merge if there are multiple ones.
-        if filesystem:
-            # Use specialized S3 filesystem function to list Parquet files efficiently.
-            folder_files = filesystem.ls(folder)
-        else:
-            # For local filesystem, use os.listdir
-            folder_files = [os.path.join(folder, f) for f in os.listdir(folder)]
-        hdbg.dassert_ne(
-            len(folder_files), 0, msg=f"Empty folder `{folder}` detected!"
-        )
-        if len(folder_files) == 1 and folder_files[0].endswith("/data.parquet"):
-            # If there is already single `data.parquet` file, no action is required.
-            continue
-        # Read all files in target folder.
-        # `partitioning=None` is required to read the dataset without
-        # partitioning columns. See CmTask7324 for details.
-        # https://github.com/cryptokaizen/cmamp/issues/7324
-        data = pq.ParquetDataset(
-            folder_files, filesystem=filesystem, partitioning=None
-        ).read()
-        data = data.to_pandas()
-        # Drop duplicates on all non-metadata columns.
-        # TODO(gp): hparquet is general and we should pass the columns to remove
-        #  or perform the transform after.
-        if drop_duplicates_mode is None:
-            duplicate_columns = data.columns.to_list()
-            for col_name in ["knowledge_timestamp", "end_download_timestamp"]:
-                if col_name in duplicate_columns:
-                    duplicate_columns.remove(col_name)
-            control_column = None
-        elif drop_duplicates_mode == "bid_ask":
-            # Drop duplicates on timestamp index.
-            duplicate_columns = ["timestamp", "exchange_id"]
-            control_column = None
-        elif drop_duplicates_mode == "ohlcv":
-            # Drop duplicates on timestamp and keep one with largest volume.
-            duplicate_columns = ["timestamp", "exchange_id"]
-            control_column = "volume"
-        else:
-            hdbg.dfatal("Supported drop duplicates modes: ohlcv, bid_ask")
-        data = hdatafr.remove_duplicates(data, duplicate_columns, control_column)
-        # Remove all old files and write the new, merged one.
-        if filesystem:
-            filesystem.rm(folder, recursive=True)
-            pq.write_table(
-                pa.Table.from_pandas(data),
-                folder + "/" + file_name,
-                filesystem=filesystem,
+    dataset_folders = sorted({f.rsplit("/", 1)[0] for f in parquet_files})
+    hdbg.dassert_lte(1, num_threads)
+    merge_args = (
+        file_name,
+        filesystem,
+        drop_duplicates_mode,
+        merge_mode,
+        batch_size,
+    )
+    if num_threads == 1:
+        results = [
+            _merge_pq_folder(folder, *merge_args) for folder in dataset_folders
+        ]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+            futures = [
+                executor.submit(_merge_pq_folder, folder, *merge_args)
+                for folder in dataset_folders
+            ]
+            results = [future.result() for future in futures]
+    # Keep the manifest of the dataset, if any, in sync.
+    results = [result for result in results if result is not None]
+    if results and load_parquet_manifest(root_dir, aws_profile=aws_profile):
+        removed_files = []
+        added_files = {}
+        for folder_files, dst_path in results:
+            removed_files.extend(folder_files)
+            added_files[dst_path] = pq.read_metadata(
+                dst_path, filesystem=filesystem
             )
-        else:
-            # Use os.remove for local filesystem to remove files.
-            for file_path in folder_files:
-                os.remove(file_path)
-            data.to_parquet(os.path.join(folder, file_name))
+        update_parquet_manifest(
+            root_dir,
+            added_files=added_files,
+            removed_files=removed_files,
+            aws_profile=aws_profile,
+        )
 
 
 def maybe_cast_to_int(string: str) -> Union[str, int]:
@@ -5,16 +5,34 @@ import helpers.hs3 as hs3
 """
 
 import argparse
+import collections
+import concurrent.futures
 import configparser
+import contextlib
 import copy
-import functools
 import gzip
+import io
 import logging
+import mimetypes
 import os
 import pathlib
 import pprint
 import re
-from typing import Any, Dict, List, Optional, Tuple, Union
+import tarfile
+import threading
+import time
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 _WARNING = "\033[33mWARNING\033[0m"
 
@@ -68,6 +86,17 @@ AWS_TOKYO_REGION_1 = "ap-northeast-1"
 AWS_US_REGION_1 = "us-east-1"
 AWS_REGIONS = [AWS_EUROPE_REGION_1, AWS_TOKYO_REGION_1, AWS_US_REGION_1]
 
+# Default size of the parts of multipart uploads and ranged downloads (see
+# `upload_files_to_s3()`).
+DEFAULT_PART_SIZE_IN_BYTES = 16 * 1024**2
+
+# Default max number of parts or files transferred concurrently.
+DEFAULT_NUM_TRANSFER_THREADS = 16
+
+# Default size of the blocks read with a range request when streaming a file
+# (see `open_file()`).
+DEFAULT_READ_BLOCK_SIZE_IN_BYTES = 8 * 1024**2
+
 # TODO(gp): @all separate S3 code in `helpers/hs3.py` from authentication and
 #  AWS profile code in `helpers/aws_authentication.py`.
 
@@ -336,10 +365,9 @@ def to_file(
         if mode is not None and "b" not in mode:
             raise ValueError("S3 only allows binary mode!")
         hdbg.dassert_isinstance(lines, str)
-        # Convert lines to bytes, only supported mode for S3.
-        # Also create a list of new lines as raw bytes is not supported.
-        os_sep = os.linesep
-        lines_lst = [f"{line}{os_sep}".encode() for line in lines.split(os_sep)]
+        # Convert lines to bytes, only supported mode for S3, terminating each
+        # line with a separator.
+        data = f"{lines}{os.linesep}".encode()
         # Inspect file name and path.
         hio.dassert_is_valid_file_name(file_name)
         s3fs_ = get_s3fs(aws_profile)
@@ -348,11 +376,11 @@ def to_file(
         with s3fs_.open(file_name, mode) as s3_file:
             if file_name.endswith((".gz", ".gzip")):
                 # Open and decompress gzipped file.
-                with gzip.GzipFile(fileobj=s3_file) as gzip_file:
-                    gzip_file.writelines(lines_lst)
+                with gzip.GzipFile(fileobj=s3_file, mode="wb") as gzip_file:
+                    gzip_file.write(data)
             else:
                 # Any other file.
-                s3_file.writelines(lines_lst)
+                s3_file.write(data)
             if force_flush:
                 # TODO(Nikola): Investigate S3 alternative for `os.fsync(f.fileno())`.
                 s3_file.flush()
@@ -382,58 +410,221 @@ def from_file(
     if is_s3_path(file_name):
         if encoding:
             raise ValueError("Encoding is not supported when reading from S3!")
-        # Inspect file name and path.
-        hio.dassert_is_valid_file_name(file_name)
+        # Read the file in blocks, decompressing it if needed.
+        with open_file(file_name, "rb", aws_profile=aws_profile) as f:
+            data = f.read().decode()
+    else:
+        data = hio.from_file(file_name, encoding=encoding)
+    return data
+
+
+# #############################################################################
+
+
+@contextlib.contextmanager
+def open_file(
+    file_name: str,
+    mode: str = "r",
+    *,
+    encoding: Optional[str] = None,
+    block_size: int = DEFAULT_READ_BLOCK_SIZE_IN_BYTES,
+    aws_profile: Optional[AwsProfile] = None,
+) -> Iterator[IO]:
+    """
+    Open a local or S3 file for streaming reads.
+
+    The file is never loaded in memory as a whole:
+    - S3 files are read with range requests, each fetching `block_size`
+      bytes beyond the requested data, so that sequential reads need one
+      request per block. The requests are issued synchronously on the
+      calling thread when the buffered data is exhausted, i.e., there is no
+      background prefetching
+    - files ending in `.gz` or `.gzip` are decompressed incrementally
+    - in text mode the data is decoded incrementally
+
+    ```
+    with hs3.open_file(file_name, aws_profile=aws_profile) as f:
+        for line in f:
+            ...
+    ```
+
+    :param file_name: S3 or local path
+    :param mode: "r" to read text or "rb" to read bytes
+    :param encoding: encoding to use in text mode
+    :param block_size: size in bytes of the blocks read from the file
+    :param aws_profile: AWS profile to use if and only if using an S3 path
+    :return: a file-like object
+    """
+    dassert_is_valid_aws_profile(file_name, aws_profile)
+    hdbg.dassert_in(mode, ("r", "rb"))
+    hdbg.dassert_lt(0, block_size)
+    hio.dassert_is_valid_file_name(file_name)
+    with contextlib.ExitStack() as stack:
+        if is_s3_path(file_name):
+            s3fs_ = get_s3fs(aws_profile)
+            dassert_path_exists(file_name, s3fs_)
+            f = stack.enter_context(
+                s3fs_.open(
+                    file_name,
+                    "rb",
+                    block_size=block_size,
+                    cache_type="readahead",
+                )
+            )
+        else:
+            hdbg.dassert_file_exists(file_name)
+            f = stack.enter_context(
+                open(file_name, "rb", buffering=block_size)
+            )
+        if file_name.endswith((".gz", ".gzip")):
+            f = stack.enter_context(gzip.GzipFile(fileobj=f, mode="rb"))
+        if mode == "r":
+            f = stack.enter_context(io.TextIOWrapper(f, encoding=encoding))
+        yield f
+
+
+def iter_lines(
+    file_name: str,
+    *,
+    encoding: Optional[str] = None,
+    block_size: int = DEFAULT_READ_BLOCK_SIZE_IN_BYTES,
+    aws_profile: Optional[AwsProfile] = None,
+) -> Iterator[str]:
+    """
+    Yield the lines of a local or S3 file, without the line terminator.
+
+    The memory used doesn't depend on the size of the file (see
+    `open_file()`).
+
+    Same params as `open_file()`.
+    """
+    with open_file(
+        file_name,
+        "r",
+        encoding=encoding,
+        block_size=block_size,
+        aws_profile=aws_profile,
+    ) as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def iter_chunks(
+    file_name: str,
+    *,
+    chunk_size: int = DEFAULT_READ_BLOCK_SIZE_IN_BYTES,
+    aws_profile: Optional[AwsProfile] = None,
+) -> Iterator[bytes]:
+    """
+    Yield the content of a local or S3 file in chunks of bytes.
+
+    Compressed files are decompressed (see `open_file()`), so the chunks
+    contain the uncompressed data.
+
+    :param chunk_size: max size in bytes of the chunks
+    """
+    with open_file(
+        file_name, "rb", block_size=chunk_size, aws_profile=aws_profile
+    ) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def read_byte_range(
+    file_name: str,
+    start: int,
+    end: Optional[int] = None,
+    *,
+    aws_profile: Optional[AwsProfile] = None,
+) -> bytes:
+    """
+    Read the bytes `[start, end)` of a local or S3 file.
+
+    For S3 files only the requested bytes are transferred, with a single range
+    request. The bytes are returned as stored, i.e., compressed files are not
+    decompressed.
+
+    E.g., to read the last 1KB of a large log:
+    ```
+    data = hs3.read_byte_range(file_name, -1024, aws_profile=aws_profile)
+    ```
+
+    :param start: offset of the first byte to read. A negative value counts
+        from the end of the file
+    :param end: offset after the last byte to read, `None` to read until the
+        end of the file
+    """
+    dassert_is_valid_aws_profile(file_name, aws_profile)
+    if end is not None:
+        hdbg.dassert_lte(0, start)
+        hdbg.dassert_lte(start, end)
+    if is_s3_path(file_name):
         s3fs_ = get_s3fs(aws_profile)
         dassert_path_exists(file_name, s3fs_)
-        # Open s3 file.
-        with s3fs_.open(file_name) as s3_file:
-            if file_name.endswith((".gz", ".gzip")):
-                # Open and decompress gzipped file.
-                with gzip.GzipFile(fileobj=s3_file) as gzip_file:
-                    data = gzip_file.read().decode()
-            else:
-                # Any other file.
-                data = s3_file.read().decode()
+        data: bytes = s3fs_.cat_file(file_name, start=start, end=end)
     else:
-        data = hio.from_file(file_name, encoding=encoding)
+        hdbg.dassert_file_exists(file_name)
+        with open(file_name, "rb") as f:
+            if start < 0:
+                # Read at most the entire file.
+                start = max(0, os.path.getsize(file_name) + start)
+            f.seek(start)
+            size = -1 if end is None else end - start
+            data = f.read(size)
     return data
 
 
-# TODO(Nina): consider adding support for handling dirs.
 # TODO(Grisha): consider extending for the regular file system.
 def copy_file_to_s3(
     file_path: str,
     s3_dst_file_path: str,
     aws_profile: str,
+    *,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
 ) -> None:
     """
     Copy a local file to S3.
 
+    Large files are uploaded in parts concurrently (see
+    `upload_files_to_s3()`).
+
     :param file_path: path to a file to copy
-    :param s3_dst_file_path: S3 path to copy to
+    :param s3_dst_file_path: S3 path to copy to. If it ends with `/` the file
+        is copied inside that dir, like `aws s3 cp`
     :param aws_profile: aws profile
+    :param num_threads: max number of parts uploaded concurrently
     """
     hdbg.dassert_file_exists(file_path)
     dassert_is_s3_path(s3_dst_file_path)
     dassert_is_valid_aws_profile(s3_dst_file_path, aws_profile)
-    aws_s3_cp_cmd = f"aws s3 cp {file_path} {s3_dst_file_path}"
-    if not hserver.is_inside_ecs_container():
-        # There is no `~/.aws/credentials` file inside an ECS container
-        # but the AWS credentials are received via a task role. So
-        # no need to pass the profile option.
-        aws_s3_cp_cmd += f" --profile {aws_profile}"
+    if s3_dst_file_path.endswith("/"):
+        s3_dst_file_path = os.path.join(
+            s3_dst_file_path, os.path.basename(file_path)
+        )
     _LOG.info("Copying from %s to %s", file_path, s3_dst_file_path)
-    hsystem.system(aws_s3_cp_cmd, suppress_output=False)
+    upload_files_to_s3(
+        [(file_path, s3_dst_file_path)], aws_profile, num_threads=num_threads
+    )
 
 
 def get_local_or_s3_stream(
-    file_name: str, **kwargs: Any
+    file_name: str,
+    *,
+    block_size: int = DEFAULT_READ_BLOCK_SIZE_IN_BYTES,
+    **kwargs: Any,
 ) -> Tuple[Union[S3FileSystem, str], Any]:
     """
     Get S3 stream for desired file or simply returns file name.
 
+    The S3 stream is read with synchronous range requests, each fetching
+    `block_size` bytes beyond the requested data, so that the memory used
+    doesn't depend on the size of the file.
+
     :param file_name: file name or full path to file
+    :param block_size: size in bytes of the blocks read from S3
     """
     _LOG.debug(hprint.to_str("file_name kwargs"))
     # Handle the s3fs param, if needed.
@@ -447,7 +638,9 @@ def get_local_or_s3_stream(
         s3fs_ = kwargs.pop("s3fs")
         hdbg.dassert_isinstance(s3fs_, S3FileSystem)
         dassert_path_exists(file_name, s3fs_)
-        stream = s3fs_.open(file_name)
+        stream = s3fs_.open(
+            file_name, block_size=block_size, cache_type="readahead"
+        )
     else:
         if "s3fs" in kwargs:
             _LOG.warning("Passed `s3fs` without an S3 file: ignoring it")
@@ -748,7 +941,17 @@ def generate_aws_files(
 #     `CSFY_AWS_ACCESS_KEY_ID`
 
 
-@functools.lru_cache()
+# Temporary credentials (i.e., with a session token) are read again after this
+# time, since they can be refreshed externally before they expire.
+TEMPORARY_AWS_CREDENTIALS_TTL_IN_SECS = 15 * 60
+
+# Map AWS profile -> (credentials, expiration time or `None` if they don't
+# expire).
+_AWS_CREDENTIALS_CACHE: Dict[
+    str, Tuple[Dict[str, Optional[str]], Optional[float]]
+] = {}
+
+
 def get_aws_credentials(
     aws_profile: str,
 ) -> Dict[str, Optional[str]]:
@@ -756,9 +959,34 @@ def get_aws_credentials(
     Read the AWS credentials for a given profile from `~/.aws` or from env
     vars.
 
+    The credentials are cached: permanent credentials are read once, while
+    temporary credentials are read again after
+    `TEMPORARY_AWS_CREDENTIALS_TTL_IN_SECS`.
+
     :return: a dictionary with `access_key_id`, `aws_secret_access_key`,
         `aws_region` and optionally `aws_session_token`
     """
+    with _FILESYSTEM_CACHE_LOCK:
+        if aws_profile in _AWS_CREDENTIALS_CACHE:
+            result, expiration_time = _AWS_CREDENTIALS_CACHE[aws_profile]
+            if expiration_time is None or time.time() < expiration_time:
+                return result
+    result = _read_aws_credentials(aws_profile)
+    expiration_time = None
+    if result.get("aws_session_token"):
+        expiration_time = time.time() + TEMPORARY_AWS_CREDENTIALS_TTL_IN_SECS
+    with _FILESYSTEM_CACHE_LOCK:
+        _AWS_CREDENTIALS_CACHE[aws_profile] = (result, expiration_time)
+        _FILESYSTEM_CACHE_STATS["num_credentials_reads"] += 1
+    return result
+
+
+def _read_aws_credentials(
+    aws_profile: str,
+) -> Dict[str, Optional[str]]:
+    """
+    Implement `get_aws_credentials()` without caching.
+    """
     _LOG.debug("Getting credentials for aws_profile='%s'", aws_profile)
     if aws_profile == "__mock__":
         # `mock` profile is artificial construct used only in tests.
@@ -862,36 +1090,146 @@ def get_aws_credentials(
 # ///////////////////////////////////////////////////////////////////////////////
 
 
-def get_s3fs(aws_profile: AwsProfile) -> S3FileSystem:
+# #############################################################################
+# Filesystem cache.
+# #############################################################################
+
+# Building a filesystem object creates new clients and connections, so the
+# filesystem objects are shared by all the threads of a process.
+
+_FILESYSTEM_CACHE_LOCK = threading.RLock()
+
+# Map key -> (filesystem, version of the credentials used to build it).
+_FILESYSTEM_CACHE: Dict[Tuple[Any, ...], Tuple[Any, Any]] = {}
+
+# The filesystem objects can't be shared with forked processes, since their
+# connections and event loop threads are not copied.
+_FILESYSTEM_CACHE_PID = os.getpid()
+
+_FILESYSTEM_CACHE_STATS: Dict[str, int] = collections.Counter()
+
+
+def get_cached_filesystem(
+    key: Tuple[Any, ...],
+    build_func: Callable[[], Any],
+    *,
+    version: Any = None,
+) -> Any:
+    """
+    Return a filesystem object from the process-wide cache, building it if
+    needed.
+
+    :param key: key identifying the filesystem, e.g., `("s3fs", aws_profile)`
+    :param build_func: function building the filesystem
+    :param version: the filesystem is built again if this value changes,
+        e.g., when the credentials are refreshed
+    :return: the filesystem object
+    """
+    global _FILESYSTEM_CACHE_PID
+    with _FILESYSTEM_CACHE_LOCK:
+        if os.getpid() != _FILESYSTEM_CACHE_PID:
+            _LOG.debug("Clearing the filesystem cache in a forked process")
+            _FILESYSTEM_CACHE.clear()
+            _FILESYSTEM_CACHE_PID = os.getpid()
+        if key in _FILESYSTEM_CACHE:
+            filesystem, cached_version = _FILESYSTEM_CACHE[key]
+            if cached_version == version:
+                _FILESYSTEM_CACHE_STATS["num_hits"] += 1
+                return filesystem
+        # Build the filesystem holding the lock, so that concurrent callers
+        # don't build it more than once.
+        _LOG.debug("Building filesystem for key=%s", key)
+        filesystem = build_func()
+        _FILESYSTEM_CACHE[key] = (filesystem, version)
+        _FILESYSTEM_CACHE_STATS["num_misses"] += 1
+    return filesystem
+
+
+def get_filesystem_cache_stats() -> Dict[str, int]:
+    """
+    Return the counters of the filesystem and credentials cache.
+
+    - `num_hits`: number of times a cached filesystem was reused
+    - `num_misses`: number of filesystems built, i.e., of new clients and
+      connection pools
+    - `num_credentials_reads`: number of times the AWS credentials were read
+    """
+    with _FILESYSTEM_CACHE_LOCK:
+        stats = {
+            key: _FILESYSTEM_CACHE_STATS[key]
+            for key in ["num_hits", "num_misses", "num_credentials_reads"]
+        }
+    return stats
+
+
+def clear_filesystem_cache() -> None:
+    """
+    Clear the filesystem and credentials cache and reset the counters.
+    """
+    with _FILESYSTEM_CACHE_LOCK:
+        _FILESYSTEM_CACHE.clear()
+        _AWS_CREDENTIALS_CACHE.clear()
+        _FILESYSTEM_CACHE_STATS.clear()
+
+
+def get_s3fs(
+    aws_profile: AwsProfile, *, max_pool_connections: Optional[int] = None
+) -> S3FileSystem:
     """
     Return a `s3fs` object from a given AWS profile.
 
+    The objects are cached (see `get_cached_filesystem()`), so that the
+    connections are reused across calls.
+
     :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :param max_pool_connections: max number of connections kept open by the
+        client, `None` for the `botocore` default
     """
+    config_kwargs = {}
+    if max_pool_connections is not None:
+        config_kwargs["max_pool_connections"] = max_pool_connections
     if hserver.is_ig_prod():
         # On IG prod machines we let the Docker container infer the right AWS
         # account.
         _LOG.warning("Not using AWS profile='%s'", aws_profile)
-        s3fs_ = S3FileSystem()
+        s3fs_ = get_cached_filesystem(
+            ("s3fs", None, max_pool_connections),
+            lambda: S3FileSystem(config_kwargs=config_kwargs),
+        )
     else:
         if isinstance(aws_profile, str):
             # When deploying jobs via ECS the container obtains credentials
             # based on passed task role specified in the ECS task-definition,
+            # for any profile, since there is no `~/.aws/credentials` file,
             # refer to:
             # https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-iam-roles.html
-            if aws_profile == "ck" and hserver.is_inside_ecs_container():
+            if hserver.is_inside_ecs_container():
                 _LOG.info("Fetching credentials from task IAM role")
-                s3fs_ = S3FileSystem()
+                s3fs_ = get_cached_filesystem(
+                    ("s3fs", aws_profile, max_pool_connections),
+                    lambda: S3FileSystem(config_kwargs=config_kwargs),
+                )
             else:
                 # From https://stackoverflow.com/questions/62562945
                 aws_credentials = get_aws_credentials(aws_profile)
-                _LOG.debug("%s", pprint.pformat(aws_credentials))
-                s3fs_ = S3FileSystem(
-                    anon=False,
-                    key=aws_credentials["aws_access_key_id"],
-                    secret=aws_credentials["aws_secret_access_key"],
-                    token=aws_credentials["aws_session_token"],
-                    client_kwargs={"region_name": aws_credentials["aws_region"]},
+
+                def _build_s3fs() -> S3FileSystem:
+                    _LOG.debug("%s", pprint.pformat(aws_credentials))
+                    return S3FileSystem(
+                        anon=False,
+                        key=aws_credentials["aws_access_key_id"],
+                        secret=aws_credentials["aws_secret_access_key"],
+                        token=aws_credentials["aws_session_token"],
+                        client_kwargs={
+                            "region_name": aws_credentials["aws_region"]
+                        },
+                        config_kwargs=config_kwargs,
+                    )
+
+                s3fs_ = get_cached_filesystem(
+                    ("s3fs", aws_profile, max_pool_connections),
+                    _build_s3fs,
+                    version=get_aws_credentials_version(aws_credentials),
                 )
         elif isinstance(aws_profile, S3FileSystem):
             s3fs_ = aws_profile
@@ -900,6 +1238,628 @@ def get_s3fs(aws_profile: AwsProfile) -> S3FileSystem:
     return s3fs_
 
 
+def get_aws_credentials_version(
+    aws_credentials: Dict[str, Optional[str]],
+) -> Tuple[Optional[str], ...]:
+    """
+    Return a value that changes when the credentials are refreshed.
+    """
+    version = tuple(
+        aws_credentials.get(key)
+        for key in [
+            "aws_access_key_id",
+            "aws_secret_access_key",
+            "aws_session_token",
+            "aws_region",
+        ]
+    )
+    return version
+
+
+# #############################################################################
+# Parallel transfers.
+# #############################################################################
+
+# The transfers are done in-process through `s3fs`, without shelling out to
+# the `aws` CLI:
+# - large files are split in parts transferred concurrently (multipart
+#   uploads and ranged downloads)
+# - several files are transferred concurrently
+# - the number of concurrent requests to S3 is bounded by `num_threads`
+
+# S3 requires all the parts of a multipart upload except the last one to be
+# at least 5MB, and an upload to have at most 10000 parts.
+_MIN_UPLOAD_PART_SIZE_IN_BYTES = 5 * 1024**2
+_MAX_NUM_UPLOAD_PARTS = 10000
+
+
+def _get_part_ranges(size: int, part_size: int) -> List[Tuple[int, int]]:
+    """
+    Split `size` bytes in ranges `[start, end)` of at most `part_size` bytes.
+    """
+    hdbg.dassert_lte(0, size)
+    hdbg.dassert_lt(0, part_size)
+    part_ranges = [
+        (start, min(start + part_size, size))
+        for start in range(0, size, part_size)
+    ]
+    return part_ranges
+
+
+def _get_upload_part_size(size: int, part_size: int) -> int:
+    """
+    Return the part size to upload a file of `size` bytes.
+
+    The part size is increased, if needed, so that the upload has at most
+    `_MAX_NUM_UPLOAD_PARTS` parts.
+    """
+    hdbg.dassert_lte(_MIN_UPLOAD_PART_SIZE_IN_BYTES, part_size)
+    part_size = max(part_size, -(-size // _MAX_NUM_UPLOAD_PARTS))
+    return part_size
+
+
+def _get_content_type(s3_path: str) -> Dict[str, str]:
+    """
+    Return the `ContentType` param to use for an S3 file, if it can be guessed.
+
+    E.g., this allows a web browser to display an HTML file stored on S3,
+    instead of downloading it, like `aws s3 cp` does.
+    """
+    content_type, _ = mimetypes.guess_type(s3_path)
+    params = {} if content_type is None else {"ContentType": content_type}
+    return params
+
+
+class _S3MultipartWriter(io.RawIOBase):
+    """
+    File-like object uploading the data written to it to an S3 file.
+
+    The data is buffered and uploaded in parts concurrently with a multipart
+    upload, so that a stream of unknown size (e.g., a tarball being created)
+    can be uploaded without being saved on disk.
+
+    The memory used is bounded by `(max_pending_parts + 1) * part_size`.
+    Since the size is not known in advance, at most
+    `_MAX_NUM_UPLOAD_PARTS * part_size` bytes can be written.
+
+    If an exception is raised inside a `with` block, the upload is aborted
+    and no file is created on S3.
+    """
+
+    def __init__(
+        self,
+        s3fs_: S3FileSystem,
+        s3_path: str,
+        executor: concurrent.futures.Executor,
+        *,
+        part_size: int = DEFAULT_PART_SIZE_IN_BYTES,
+        max_pending_parts: int = DEFAULT_NUM_TRANSFER_THREADS,
+    ) -> None:
+        """
+        Constructor.
+
+        :param s3fs_: filesystem to use
+        :param s3_path: path of the S3 file to write
+        :param executor: executor uploading the parts
+        :param part_size: size of the parts in bytes
+        :param max_pending_parts: max number of parts being uploaded or
+            waiting to be uploaded
+        """
+        super().__init__()
+        dassert_is_s3_path(s3_path)
+        hdbg.dassert_lte(_MIN_UPLOAD_PART_SIZE_IN_BYTES, part_size)
+        hdbg.dassert_lte(1, max_pending_parts)
+        self._s3fs = s3fs_
+        self._s3_path = s3_path
+        self._bucket, self._key, _ = s3fs_.split_path(s3_path)
+        self._executor = executor
+        self._part_size = part_size
+        self._semaphore = threading.BoundedSemaphore(max_pending_parts)
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._futures: List[concurrent.futures.Future] = []
+        self._error: Optional[BaseException] = None
+        self.num_bytes_written = 0
+
+    def __exit__(self, *args: Any) -> None:
+        exc_type = args[0]
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        hdbg.dassert(not self.closed, "Writing to a closed file")
+        self._buffer += data
+        while len(self._buffer) >= self._part_size:
+            part = bytes(self._buffer[: self._part_size])
+            del self._buffer[: self._part_size]
+            self._submit_part(part)
+        num_bytes = len(data)
+        self.num_bytes_written += num_bytes
+        return num_bytes
+
+    def close(self) -> None:
+        """
+        Upload the buffered data and complete the upload.
+        """
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                # The data fits in a single part, so there is no need for a
+                # multipart upload.
+                self._s3fs.call_s3(
+                    "put_object",
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    Body=bytes(self._buffer),
+                    **_get_content_type(self._s3_path),
+                )
+            else:
+                if self._buffer:
+                    self._submit_part(bytes(self._buffer))
+                parts = [future.result() for future in self._futures]
+                self._s3fs.call_s3(
+                    "complete_multipart_upload",
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+        except BaseException:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+        self._s3fs.invalidate_cache(self._s3_path)
+        super().close()
+
+    def abort(self) -> None:
+        """
+        Abort the upload, discarding the data written so far.
+        """
+        if self.closed:
+            return
+        _LOG.warning("Aborting upload to '%s'", self._s3_path)
+        for future in self._futures:
+            future.cancel()
+        concurrent.futures.wait(self._futures)
+        if self._upload_id is not None:
+            self._s3fs.call_s3(
+                "abort_multipart_upload",
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+            )
+        self._buffer = bytearray()
+        super().close()
+
+    def _submit_part(self, part: bytes) -> None:
+        if self._error is not None:
+            # Stop as soon as a part fails, instead of processing the rest of
+            # the stream.
+            raise self._error
+        if self._upload_id is None:
+            response = self._s3fs.call_s3(
+                "create_multipart_upload",
+                Bucket=self._bucket,
+                Key=self._key,
+                **_get_content_type(self._s3_path),
+            )
+            self._upload_id = response["UploadId"]
+        hdbg.dassert_lt(
+            len(self._futures),
+            _MAX_NUM_UPLOAD_PARTS,
+            "Too many parts: increase the part size",
+        )
+        part_number = len(self._futures) + 1
+        # Wait until there is room for another part, to bound the memory.
+        self._semaphore.acquire()
+        future = self._executor.submit(self._upload_part, part_number, part)
+        future.add_done_callback(self._on_part_done)
+        self._futures.append(future)
+
+    def _upload_part(self, part_number: int, part: bytes) -> Dict[str, Any]:
+        response = self._s3fs.call_s3(
+            "upload_part",
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=part,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def _on_part_done(self, future: concurrent.futures.Future) -> None:
+        self._semaphore.release()
+        if not future.cancelled() and future.exception() is not None:
+            self._error = future.exception()
+
+
+class _ParallelGzipWriter(io.RawIOBase):
+    """
+    File-like object compressing the data written to it with gzip in parallel.
+
+    The data is split in chunks that are compressed concurrently into
+    separate gzip members and written in order to `dst`. The concatenation
+    of gzip members is a valid gzip file (e.g., for `tar xzf` and `gzip`), and
+    `zlib` releases the GIL while compressing, so threads scale with the
+    number of cores.
+    """
+
+    def __init__(
+        self,
+        dst: Any,
+        executor: concurrent.futures.Executor,
+        *,
+        chunk_size: int = DEFAULT_PART_SIZE_IN_BYTES,
+        compresslevel: int = 6,
+        max_pending_chunks: int = DEFAULT_NUM_TRANSFER_THREADS,
+    ) -> None:
+        """
+        Constructor.
+
+        :param dst: file-like object to write the compressed data to. It is
+            not closed when this object is closed
+        :param executor: executor compressing the chunks
+        :param chunk_size: size in bytes of the uncompressed chunks
+        :param compresslevel: gzip compression level
+        :param max_pending_chunks: max number of chunks being compressed or
+            waiting to be written
+        """
+        super().__init__()
+        hdbg.dassert_lt(0, chunk_size)
+        hdbg.dassert_lte(1, max_pending_chunks)
+        self._dst = dst
+        self._executor = executor
+        self._chunk_size = chunk_size
+        self._compresslevel = compresslevel
+        self._max_pending_chunks = max_pending_chunks
+        self._buffer = bytearray()
+        self._futures: Deque[concurrent.futures.Future] = collections.deque()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        hdbg.dassert(not self.closed, "Writing to a closed file")
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            chunk = bytes(self._buffer[: self._chunk_size])
+            del self._buffer[: self._chunk_size]
+            self._submit_chunk(chunk)
+        return len(data)
+
+    def close(self) -> None:
+        """
+        Compress the buffered data and write all the compressed chunks.
+        """
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._futures:
+                # Write at least one member, so that the output is a valid
+                # gzip file also when no data is written.
+                self._submit_chunk(bytes(self._buffer))
+            while self._futures:
+                self._dst.write(self._futures.popleft().result())
+        finally:
+            for future in self._futures:
+                future.cancel()
+            self._buffer = bytearray()
+            super().close()
+
+    def _submit_chunk(self, chunk: bytes) -> None:
+        future = self._executor.submit(
+            gzip.compress, chunk, compresslevel=self._compresslevel
+        )
+        self._futures.append(future)
+        # Write the compressed chunks in order, bounding the memory.
+        while len(self._futures) > self._max_pending_chunks:
+            self._dst.write(self._futures.popleft().result())
+
+
+def _upload_file(
+    s3fs_: S3FileSystem,
+    file_path: str,
+    s3_path: str,
+    part_size: int,
+    part_executor: concurrent.futures.Executor,
+) -> None:
+    """
+    Upload a local file to S3, uploading its parts concurrently.
+
+    Each part is read from disk by the thread uploading it, so that at most
+    one part per thread is kept in memory.
+    """
+    size = os.path.getsize(file_path)
+    _LOG.debug("Uploading '%s' (%s bytes) to '%s'", file_path, size, s3_path)
+    bucket, key, _ = s3fs_.split_path(s3_path)
+    content_type = _get_content_type(s3_path)
+    if size <= part_size:
+        # Upload the file with a single request.
+        def _put_file() -> None:
+            with open(file_path, "rb") as src:
+                data = src.read()
+            s3fs_.call_s3(
+                "put_object", Bucket=bucket, Key=key, Body=data, **content_type
+            )
+
+        part_executor.submit(_put_file).result()
+        s3fs_.invalidate_cache(s3_path)
+        return
+    part_size = _get_upload_part_size(size, part_size)
+    response = s3fs_.call_s3(
+        "create_multipart_upload", Bucket=bucket, Key=key, **content_type
+    )
+    upload_id = response["UploadId"]
+
+    def _upload_part(part_number: int, start: int, end: int) -> Dict[str, Any]:
+        with open(file_path, "rb") as src:
+            src.seek(start)
+            data = src.read(end - start)
+        response = s3fs_.call_s3(
+            "upload_part",
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    futures = [
+        part_executor.submit(_upload_part, part_number, start, end)
+        for part_number, (start, end) in enumerate(
+            _get_part_ranges(size, part_size), start=1
+        )
+    ]
+    try:
+        parts = [future.result() for future in futures]
+        s3fs_.call_s3(
+            "complete_multipart_upload",
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except BaseException:
+        _LOG.warning("Aborting upload to '%s'", s3_path)
+        for future in futures:
+            future.cancel()
+        concurrent.futures.wait(futures)
+        s3fs_.call_s3(
+            "abort_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id
+        )
+        raise
+    s3fs_.invalidate_cache(s3_path)
+
+
+def _download_file(
+    s3fs_: S3FileSystem,
+    s3_path: str,
+    file_path: str,
+    part_size: int,
+    part_executor: concurrent.futures.Executor,
+) -> None:
+    """
+    Download an S3 file to a local file, downloading its parts concurrently.
+
+    The data is written to a temporary file that is renamed when the download
+    is complete, so that an interrupted download doesn't leave a partial file.
+    """
+    size = s3fs_.info(s3_path)["size"]
+    _LOG.debug("Downloading '%s' (%s bytes) to '%s'", s3_path, size, file_path)
+    dir_name = os.path.dirname(file_path)
+    if dir_name:
+        hio.create_dir(dir_name, incremental=True)
+    tmp_file_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file_path, "wb") as dst:
+            dst.truncate(size)
+            fd = dst.fileno()
+
+            def _download_part(start: int, end: int) -> None:
+                data = s3fs_.cat_file(s3_path, start=start, end=end)
+                hdbg.dassert_eq(len(data), end - start)
+                os.pwrite(fd, data, start)
+
+            futures = [
+                part_executor.submit(_download_part, start, end)
+                for start, end in _get_part_ranges(size, part_size)
+            ]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+                concurrent.futures.wait(futures)
+        os.replace(tmp_file_path, file_path)
+    finally:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+
+
+def _transfer_files(
+    transfer_func: Callable,
+    s3fs_: S3FileSystem,
+    src_dst_paths: List[Tuple[str, str]],
+    num_threads: int,
+    part_size: int,
+) -> None:
+    """
+    Transfer files concurrently with `transfer_func`.
+
+    Each file is processed by a thread of a pool, while its parts are
+    transferred by another pool, so that at most `num_threads` requests are
+    in flight across all the files.
+    """
+    hdbg.dassert_lte(1, num_threads)
+    if not src_dst_paths:
+        return
+    num_file_threads = min(num_threads, len(src_dst_paths))
+    with concurrent.futures.ThreadPoolExecutor(
+        num_threads
+    ) as part_executor, concurrent.futures.ThreadPoolExecutor(
+        num_file_threads
+    ) as file_executor:
+        futures = [
+            file_executor.submit(
+                transfer_func, s3fs_, src, dst, part_size, part_executor
+            )
+            for src, dst in src_dst_paths
+        ]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def upload_files_to_s3(
+    src_dst_paths: List[Tuple[str, str]],
+    aws_profile: AwsProfile,
+    *,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
+    part_size_in_bytes: int = DEFAULT_PART_SIZE_IN_BYTES,
+) -> None:
+    """
+    Upload local files to S3 concurrently.
+
+    :param src_dst_paths: pairs of local file path and S3 file path
+    :param aws_profile: AWS profile to use
+    :param num_threads: max number of parts uploaded concurrently
+    :param part_size_in_bytes: size of the parts of a multipart upload. Files
+        smaller than this are uploaded with a single request
+    """
+    for file_path, s3_path in src_dst_paths:
+        hdbg.dassert_file_exists(file_path)
+        dassert_is_s3_path(s3_path)
+    s3fs_ = get_s3fs(aws_profile, max_pool_connections=num_threads)
+    _transfer_files(
+        _upload_file, s3fs_, src_dst_paths, num_threads, part_size_in_bytes
+    )
+
+
+def download_files_from_s3(
+    src_dst_paths: List[Tuple[str, str]],
+    aws_profile: AwsProfile,
+    *,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
+    part_size_in_bytes: int = DEFAULT_PART_SIZE_IN_BYTES,
+) -> None:
+    """
+    Download S3 files to local files concurrently.
+
+    :param src_dst_paths: pairs of S3 file path and local file path
+    :param aws_profile: AWS profile to use
+    :param num_threads: max number of parts downloaded concurrently
+    :param part_size_in_bytes: size of the byte ranges downloaded with a
+        single request
+    """
+    for s3_path, _ in src_dst_paths:
+        dassert_is_s3_path(s3_path)
+    s3fs_ = get_s3fs(aws_profile, max_pool_connections=num_threads)
+    _transfer_files(
+        _download_file, s3fs_, src_dst_paths, num_threads, part_size_in_bytes
+    )
+
+
+def upload_dir_to_s3(
+    src_dir: str,
+    s3_dst_dir: str,
+    aws_profile: AwsProfile,
+    *,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
+    part_size_in_bytes: int = DEFAULT_PART_SIZE_IN_BYTES,
+) -> List[str]:
+    """
+    Upload all the files in a local dir to an S3 dir concurrently.
+
+    :param src_dir: local dir to upload
+    :param s3_dst_dir: S3 dir to upload to
+    :return: the S3 paths of the uploaded files
+    """
+    hdbg.dassert_dir_exists(src_dir)
+    dassert_is_s3_path(s3_dst_dir)
+    file_names = hio.listdir(
+        src_dir, "*", only_files=True, use_relative_paths=True
+    )
+    src_dst_paths = [
+        (os.path.join(src_dir, file_name), os.path.join(s3_dst_dir, file_name))
+        for file_name in sorted(file_names)
+    ]
+    upload_files_to_s3(
+        src_dst_paths,
+        aws_profile,
+        num_threads=num_threads,
+        part_size_in_bytes=part_size_in_bytes,
+    )
+    s3_paths = [s3_path for _, s3_path in src_dst_paths]
+    return s3_paths
+
+
+def download_dir_from_s3(
+    src_s3_dir: str,
+    dst_dir: str,
+    aws_profile: AwsProfile,
+    *,
+    incremental: bool = True,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
+    part_size_in_bytes: int = DEFAULT_PART_SIZE_IN_BYTES,
+) -> List[str]:
+    """
+    Download all the files in an S3 dir to a local dir concurrently.
+
+    :param src_s3_dir: S3 dir to download
+    :param dst_dir: local dir to download to
+    :param incremental: skip the files that already exist locally with the
+        same size, like `aws s3 sync`
+    :return: the local paths of the downloaded files
+    """
+    dassert_is_s3_path(src_s3_dir)
+    s3fs_ = get_s3fs(aws_profile, max_pool_connections=num_threads)
+    dassert_path_exists(src_s3_dir, s3fs_)
+    bucket, key, _ = s3fs_.split_path(src_s3_dir.rstrip("/"))
+    root_path = f"{bucket}/{key}"
+    # Map S3 path (without `s3://`) -> object metadata.
+    path_objects = s3fs_.find(src_s3_dir, detail=True)
+    src_dst_paths = []
+    for path, path_object in sorted(path_objects.items()):
+        if path_object["type"] != "file":
+            continue
+        rel_path = os.path.relpath(path, start=root_path)
+        file_path = os.path.join(dst_dir, rel_path)
+        if (
+            incremental
+            and os.path.exists(file_path)
+            and os.path.getsize(file_path) == path_object["size"]
+        ):
+            _LOG.debug("Found '%s': skipping downloading", file_path)
+            continue
+        src_dst_paths.append((f"s3://{path}", file_path))
+    _LOG.info(
+        "Downloading %s files from '%s' to '%s'",
+        len(src_dst_paths),
+        src_s3_dir,
+        dst_dir,
+    )
+    hio.create_dir(dst_dir, incremental=True)
+    download_files_from_s3(
+        src_dst_paths,
+        s3fs_,
+        num_threads=num_threads,
+        part_size_in_bytes=part_size_in_bytes,
+    )
+    file_paths = [file_path for _, file_path in src_dst_paths]
+    return file_paths
+
+
 # #############################################################################
 # Archive and retrieve data from S3.
 # #############################################################################
@@ -909,7 +1869,14 @@ def get_s3fs(aws_profile: AwsProfile) -> S3FileSystem:
 
 
 def archive_data_on_s3(
-    src_dir: str, s3_path: str, aws_profile: Optional[str], tag: str = ""
+    src_dir: str,
+    s3_path: str,
+    aws_profile: Optional[str],
+    tag: str = "",
+    *,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
+    part_size_in_bytes: int = DEFAULT_PART_SIZE_IN_BYTES,
+    compresslevel: int = 6,
 ) -> str:
     """
     Compress dir `src_dir` and save it on AWS S3 under `s3_path`.
@@ -918,12 +1885,25 @@ def archive_data_on_s3(
     The tgz is created so that when expanded a dir with the name `src_dir` is
     created.
 
+    The tarball is streamed to S3 while it is created, without writing a
+    local tgz file:
+    - the tar stream is compressed in chunks in parallel (see
+      `_ParallelGzipWriter`)
+    - the compressed stream is uploaded in parts concurrently (see
+      `_S3MultipartWriter`)
+
     :param src_dir: directory that will be compressed
     :param s3_path: full S3 path starting with `s3://`
     :param aws_profile: the profile to use. We use a string and not an
         `AwsProfile` since this is typically the outermost caller in the stack,
         and it doesn't reuse an S3 fs object
     :param tag: a tag to add to the name of the file
+    :param num_threads: max number of chunks compressed and parts uploaded
+        concurrently
+    :param part_size_in_bytes: size of the compressed chunks and of the
+        uploaded parts
+    :param compresslevel: gzip compression level
+    :return: the S3 path of the archive
     """
     _LOG.info(
         "# Archiving '%s' to '%s' with aws_profile='%s'",
@@ -940,64 +1920,76 @@ def archive_data_on_s3(
     )
     # Add a timestamp if needed.
     dst_path = hsystem.append_timestamp_tag(src_dir, tag) + ".tgz"
-    # Compress the dir.
-    # > (cd .../TestRunExperimentArchiveOnS3.test_serial1; \
-    #    tar cvzf /app/.../TestRunExperimentArchiveOnS3.test_serial1.tgz experiment.RH1E)
+    s3_file_path = os.path.join(s3_path, os.path.basename(dst_path))
+    # Compress the dir so that it expands to the original dir, e.g.,
+    # > tar tzf .../TestRunExperimentArchiveOnS3.test_serial1.tgz
     # experiment.RH1E/
     # experiment.RH1E/log.20210802-123758.txt
     # experiment.RH1E/output_metadata.json
     # ...
-    _LOG.debug("Destination path is '%s'", dst_path)
-    with htimer.TimedScope(logging.INFO, "Compressing"):
-        dir_name = os.path.dirname(src_dir)
-        base_name = os.path.basename(src_dir)
-        hdbg.dassert_ne(base_name, "", "src_dir=%s", src_dir)
-        cmd = ""
-        if dir_name != "":
-            cmd += f"cd {dir_name} && "
-        cmd += f"tar czf {dst_path} {base_name}"
-        hsystem.system(cmd)
+    base_name = os.path.basename(src_dir)
+    hdbg.dassert_ne(base_name, "", "src_dir=%s", src_dir)
+    _LOG.info("Compressing and copying '%s' to '%s'", src_dir, s3_file_path)
+    s3fs_ = get_s3fs(aws_profile, max_pool_connections=num_threads)
+    # TODO(gp): Make sure the S3 dir exists.
+    with htimer.TimedScope(
+        logging.INFO, "Compressing and copying"
+    ), concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+        with _S3MultipartWriter(
+            s3fs_,
+            s3_file_path,
+            executor,
+            part_size=part_size_in_bytes,
+            max_pending_parts=num_threads,
+        ) as s3_file:
+            with _ParallelGzipWriter(
+                s3_file,
+                executor,
+                chunk_size=part_size_in_bytes,
+                compresslevel=compresslevel,
+                max_pending_chunks=num_threads,
+            ) as gzip_file:
+                with tarfile.open(fileobj=gzip_file, mode="w|") as tar_file:
+                    tar_file.add(src_dir, arcname=base_name)
     _LOG.info(
         "The size of '%s' is %s",
-        dst_path,
-        hsystem.du(dst_path, human_format=True),
+        s3_file_path,
+        hintros.format_size(s3_file.num_bytes_written),
     )
-    # Test expanding the tgz. The package should expand to the original dir.
-    # > tar tf /app/.../TestRunExperimentArchiveOnS3.test_serial1.tgz
-    # experiment.RH1E/
-    # experiment.RH1E/log.20210802-123758.txt
-    # experiment.RH1E/output_metadata.json
-    _LOG.info("Testing archive")
-    cmd = f"tar tvf {dst_path}"
-    hsystem.system(cmd, log_level=logging.INFO, suppress_output=False)
-    # Copy to S3.
-    s3_file_path = os.path.join(s3_path, os.path.basename(dst_path))
-    _LOG.info("Copying '%s' to '%s'", dst_path, s3_file_path)
-    hdbg.dassert_file_exists(dst_path)
-    s3fs_ = get_s3fs(aws_profile)
-    # TODO(gp): Make sure the S3 dir exists.
-    s3fs_.put(dst_path, s3_file_path)
     _LOG.info("Data archived on S3 to '%s'", s3_file_path)
     return s3_file_path
 
 
 def copy_data_from_s3_to_local_dir(
-    src_s3_dir: str, dst_local_dir: str, aws_profile: str
+    src_s3_dir: str,
+    dst_local_dir: str,
+    aws_profile: str,
+    *,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
 ) -> None:
     """
     Copy data from S3 to a local dir.
 
+    Like `aws s3 sync`, the files that already exist locally with the same
+    size are not copied again (see `download_dir_from_s3()`).
+
     :param src_s3_dir: path on S3 storing the data to copy
-    :param scratch_space_path: local path on scratch space
+    :param dst_local_dir: local path to copy the data to
     :param aws_profile: AWS profile to use
+    :param num_threads: max number of parts downloaded concurrently
     """
     _LOG.debug(
         "Copying input data from %s to %s",
         src_s3_dir,
         dst_local_dir,
     )
-    cmd = f"aws s3 sync {src_s3_dir} {dst_local_dir} --profile {aws_profile}"
-    hsystem.system(cmd, suppress_output=False, log_level="echo")
+    download_dir_from_s3(
+        src_s3_dir,
+        dst_local_dir,
+        aws_profile,
+        incremental=True,
+        num_threads=num_threads,
+    )
 
 
 def retrieve_archived_data_from_s3(
@@ -1005,6 +1997,8 @@ def retrieve_archived_data_from_s3(
     dst_dir: str,
     aws_profile: Optional[str] = None,
     incremental: bool = True,
+    *,
+    num_threads: int = DEFAULT_NUM_TRANSFER_THREADS,
 ) -> str:
     """
     Retrieve tgz file from S3, unless it's already present (incremental mode).
@@ -1016,6 +2010,7 @@ def retrieve_archived_data_from_s3(
         `AwsProfile` since this is typically the outermost caller in the stack,
         and it doesn't reuse an S3 fs object
     :param incremental: skip if the tgz file is already present locally
+    :param num_threads: max number of parts downloaded concurrently
     :return: path with the local tgz file
     """
     _LOG.info(
@@ -1033,10 +2028,12 @@ def retrieve_archived_data_from_s3(
         _LOG.warning("Found '%s': skipping downloading", dst_file)
     else:
         # Download.
-        s3fs_ = get_s3fs(aws_profile)
+        s3fs_ = get_s3fs(aws_profile, max_pool_connections=num_threads)
         dassert_path_exists(s3_file_path, s3fs_)
         _LOG.debug("Getting from s3: '%s' -> '%s", s3_file_path, dst_file)
-        s3fs_.get(s3_file_path, dst_file)
+        download_files_from_s3(
+            [(s3_file_path, dst_file)], s3fs_, num_threads=num_threads
+        )
         _LOG.info("Saved to '%s'", dst_file)
     return dst_file
 
@@ -5,18 +5,36 @@ import helpers.hsql_implementation as hsqlimpl
 """
 
 import collections
+import contextlib
+import functools
+import inspect
 import io
 import logging
 import os
 import re
+import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple, Union, cast
+import uuid
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 
 import numpy as np
 import pandas as pd
 import psycopg2 as psycop
 import psycopg2.extras as extras
 import psycopg2.sql as psql
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 import helpers.hasyncio as hasynci
 import helpers.hdatetime as hdateti
@@ -180,9 +198,10 @@ def check_db_connection(
     Check whether a connection to a DB exists, in a non-blocking way.
     """
     try:
-        get_connection(
+        connection = get_connection(
             host=host, dbname=dbname, port=port, user=user, password=password
         )
+        connection.close()
         connection_exist = True
         error = None
     except psycop.OperationalError as e:
@@ -235,9 +254,11 @@ def db_connection_to_tuple(connection: DbConnection) -> DbConnectionInfo:
         - Username
         - Password
 
-    :param connection: a database connection
+    :param connection: a database connection or a `DbConnectionPool`
     :return: database connection details
     """
+    if isinstance(connection, DbConnectionPool):
+        return connection.connection_info
     info = connection.info
     ret = DbConnectionInfo(
         host=info.host,
@@ -249,11 +270,325 @@ def db_connection_to_tuple(connection: DbConnection) -> DbConnectionInfo:
     return ret
 
 
+# #############################################################################
+# Connection pool
+# #############################################################################
+
+
+class DbConnectionPool:
+    """
+    Pool of connections to a DB that are reused across requests.
+
+    A connection is borrowed with `get_connection()` (or the `connection()`
+    context manager) and returned to the pool with `put_connection()`:
+    - at least `min_size` connections are kept open
+    - at most `max_size` connections are open at the same time, and a caller
+      waits up to `timeout_in_secs` for a connection to be returned
+    - a connection is checked with a query before being borrowed, and replaced
+      if it's not usable anymore (e.g., after the DB server restarted)
+
+    The helpers in this module accept a pool in place of a connection,
+    borrowing a connection for the duration of the call, e.g.,
+    ```
+    pool = hsql.DbConnectionPool(*connection_info, max_size=4)
+    df = hsql.execute_query_to_df(pool, query)
+    ```
+    """
+
+    def __init__(
+        self,
+        host: str,
+        dbname: str,
+        port: int,
+        user: str,
+        password: str,
+        *,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout_in_secs: float = 30.0,
+        check_on_borrow: bool = True,
+        autocommit: bool = True,
+    ) -> None:
+        """
+        Constructor.
+
+        :param min_size: number of connections opened when the pool is created
+            and kept open
+        :param max_size: max number of connections open at the same time
+        :param timeout_in_secs: max time to wait for a connection to be
+            available before raising `TimeoutError`
+        :param check_on_borrow: check that a connection is alive before
+            borrowing it
+        :param autocommit: whether the connections are in autocommit mode
+        """
+        hdbg.dassert_lte(0, min_size)
+        hdbg.dassert_lte(1, max_size)
+        hdbg.dassert_lte(min_size, max_size)
+        hdbg.dassert_lt(0, timeout_in_secs)
+        self.connection_info = DbConnectionInfo(
+            host=host, dbname=dbname, port=port, user=user, password=password
+        )
+        self._min_size = min_size
+        self._max_size = max_size
+        self._timeout_in_secs = timeout_in_secs
+        self._check_on_borrow = check_on_borrow
+        self._autocommit = autocommit
+        self._condition = threading.Condition()
+        # Connections that can be borrowed.
+        self._idle_connections: Deque[DbConnection] = collections.deque()
+        # Number of open connections, either idle or borrowed.
+        self._num_connections = 0
+        self._stats: Dict[str, float] = collections.Counter()
+        self._is_closed = False
+        try:
+            for _ in range(min_size):
+                self._idle_connections.append(self._create_connection())
+        except BaseException:
+            # Don't leak the connections already opened.
+            self.close()
+            raise
+
+    def __enter__(self) -> "DbConnectionPool":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[DbConnection]:
+        """
+        Borrow a connection for the duration of a `with` block.
+        """
+        connection = self.get_connection()
+        try:
+            yield connection
+        finally:
+            self.put_connection(connection)
+
+    def get_connection(self) -> DbConnection:
+        """
+        Borrow a connection from the pool, opening a new one if needed.
+
+        :return: a connection that must be returned with `put_connection()`
+        """
+        start_time = time.monotonic()
+        deadline = start_time + self._timeout_in_secs
+        with self._condition:
+            while True:
+                hdbg.dassert(not self._is_closed, "The pool is closed")
+                if self._idle_connections:
+                    connection = self._idle_connections.pop()
+                    break
+                if self._num_connections < self._max_size:
+                    # Reserve a slot for a new connection.
+                    self._num_connections += 1
+                    connection = None
+                    break
+                remaining_secs = deadline - time.monotonic()
+                if remaining_secs <= 0:
+                    self._stats["num_timeouts"] += 1
+                    raise TimeoutError(
+                        f"No connection available after {self._timeout_in_secs}"
+                        f" secs: all {self._max_size} connections are in use"
+                    )
+                self._condition.wait(remaining_secs)
+        # Open or check the connection without holding the lock, since it
+        # requires a round trip to the DB.
+        try:
+            if connection is None:
+                connection = self._open_connection()
+            elif self._check_on_borrow and not self._is_alive(connection):
+                _LOG.warning("Replacing a connection that is not alive")
+                self._stats["num_failed_checks"] += 1
+                self._close_connection(connection)
+                connection = self._open_connection()
+        except BaseException:
+            # Release the slot of the connection that couldn't be opened.
+            with self._condition:
+                self._num_connections -= 1
+                self._condition.notify()
+            raise
+        wait_time_in_secs = time.monotonic() - start_time
+        with self._condition:
+            self._stats["num_checkouts"] += 1
+            self._stats["num_in_use"] += 1
+            self._stats["total_wait_time_in_secs"] += wait_time_in_secs
+            self._stats["max_wait_time_in_secs"] = max(
+                self._stats["max_wait_time_in_secs"], wait_time_in_secs
+            )
+        return connection
+
+    def put_connection(self, connection: DbConnection) -> None:
+        """
+        Return a borrowed connection to the pool.
+
+        A pending transaction is rolled back and the autocommit mode of the
+        pool is restored. A broken connection is closed instead of being
+        reused, and replaced if fewer than `min_size` connections are left.
+        """
+        is_usable = not connection.closed
+        if is_usable:
+            try:
+                if not connection.autocommit:
+                    connection.rollback()
+                if connection.autocommit != self._autocommit:
+                    connection.autocommit = self._autocommit
+            except psycop.Error:
+                is_usable = False
+        with self._condition:
+            self._stats["num_in_use"] -= 1
+            if is_usable and not self._is_closed:
+                self._idle_connections.append(connection)
+                replace_connection = False
+            else:
+                self._num_connections -= 1
+                self._close_connection(connection)
+                replace_connection = (
+                    not self._is_closed
+                    and self._num_connections < self._min_size
+                )
+                if replace_connection:
+                    # Reserve a slot for the new connection.
+                    self._num_connections += 1
+            self._condition.notify()
+        if replace_connection:
+            # Open the connection without holding the lock, since it requires
+            # a round trip to the DB.
+            try:
+                new_connection = self._open_connection()
+            except psycop.Error as e:
+                _LOG.warning("Error replacing a broken connection: %s", e)
+                with self._condition:
+                    self._num_connections -= 1
+                    self._condition.notify()
+                return
+            with self._condition:
+                if self._is_closed:
+                    self._num_connections -= 1
+                    self._close_connection(new_connection)
+                else:
+                    self._idle_connections.append(new_connection)
+                    self._condition.notify()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Return the metrics of the pool.
+
+        - `num_connections`: number of open connections
+        - `num_idle`: number of connections that can be borrowed
+        - `num_in_use`: number of borrowed connections
+        - `num_created`, `num_closed`: number of connections opened and closed
+          over the life of the pool
+        - `num_checkouts`: number of times a connection was borrowed
+        - `num_timeouts`: number of times no connection was available in time
+        - `num_failed_checks`: number of connections replaced since they were
+          not alive
+        - `total_wait_time_in_secs`, `max_wait_time_in_secs`: time spent by
+          the callers waiting for a connection
+        """
+        with self._condition:
+            stats = {
+                "num_connections": self._num_connections,
+                "num_idle": len(self._idle_connections),
+            }
+            for key in [
+                "num_in_use",
+                "num_created",
+                "num_closed",
+                "num_checkouts",
+                "num_timeouts",
+                "num_failed_checks",
+                "total_wait_time_in_secs",
+                "max_wait_time_in_secs",
+            ]:
+                stats[key] = self._stats[key]
+        return stats
+
+    def close(self) -> None:
+        """
+        Close the idle connections and the borrowed ones when returned.
+        """
+        with self._condition:
+            self._is_closed = True
+            while self._idle_connections:
+                self._num_connections -= 1
+                self._close_connection(self._idle_connections.pop())
+            self._condition.notify_all()
+
+    def _create_connection(self) -> DbConnection:
+        self._num_connections += 1
+        try:
+            connection = self._open_connection()
+        except BaseException:
+            self._num_connections -= 1
+            raise
+        return connection
+
+    def _open_connection(self) -> DbConnection:
+        connection = get_connection(
+            *self.connection_info, autocommit=self._autocommit
+        )
+        with self._condition:
+            self._stats["num_created"] += 1
+        return connection
+
+    def _close_connection(self, connection: DbConnection) -> None:
+        try:
+            connection.close()
+        except psycop.Error as e:
+            _LOG.debug("Error closing the connection: %s", e)
+        with self._condition:
+            self._stats["num_closed"] += 1
+
+    @staticmethod
+    def _is_alive(connection: DbConnection) -> bool:
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except psycop.Error:
+            return False
+        if not connection.autocommit:
+            connection.rollback()
+        return True
+
+
+def accept_connection_pool(func: Callable) -> Callable:
+    """
+    Allow a function taking a connection as first argument to take a pool.
+
+    When a `DbConnectionPool` is passed, a connection is borrowed for the
+    duration of the call (or of the iteration, for a generator).
+    """
+    if inspect.isgeneratorfunction(func):
+
+        @functools.wraps(func)
+        def _wrapper_gen(connection: Any, *args: Any, **kwargs: Any) -> Any:
+            if isinstance(connection, DbConnectionPool):
+                with connection.connection() as connection_:
+                    yield from func(connection_, *args, **kwargs)
+            else:
+                yield from func(connection, *args, **kwargs)
+
+        return _wrapper_gen
+
+    @functools.wraps(func)
+    def _wrapper(connection: Any, *args: Any, **kwargs: Any) -> Any:
+        if isinstance(connection, DbConnectionPool):
+            with connection.connection() as connection_:
+                return func(connection_, *args, **kwargs)
+        return func(connection, *args, **kwargs)
+
+    return _wrapper
+
+
 # #############################################################################
 # State of the whole DB
 # #############################################################################
 
 
+@accept_connection_pool
 def get_engine_version(connection: DbConnection) -> str:
     """
     Report information on the SQL engine.
@@ -269,6 +604,7 @@ def get_engine_version(connection: DbConnection) -> str:
 
 
 # TODO(gp): Test / fix this.
+@accept_connection_pool
 def get_indexes(connection: DbConnection) -> pd.DataFrame:
     res = []
     tables = get_table_names(connection)
@@ -295,6 +631,7 @@ def get_indexes(connection: DbConnection) -> pd.DataFrame:
     return tmp
 
 
+@accept_connection_pool
 def disconnect_all_clients(connection: DbConnection) -> None:
     # From https://stackoverflow.com/questions/36502401
     # Not sure this will work in our case, since it might kill our own connection.
@@ -311,6 +648,7 @@ def disconnect_all_clients(connection: DbConnection) -> None:
 # #############################################################################
 
 
+@accept_connection_pool
 def get_db_names(connection: DbConnection) -> List[str]:
     """
     Return the names of the available DBs.
@@ -325,6 +663,7 @@ def get_db_names(connection: DbConnection) -> List[str]:
     return dbs
 
 
+@accept_connection_pool
 def create_database(
     connection: DbConnection,
     dbname: str,
@@ -354,6 +693,7 @@ def create_database(
         )
 
 
+@accept_connection_pool
 def remove_database(connection: DbConnection, dbname: str) -> None:
     """
     Remove database in current environment.
@@ -375,6 +715,7 @@ def remove_database(connection: DbConnection, dbname: str) -> None:
 # #############################################################################
 
 
+@accept_connection_pool
 def get_table_names(connection: DbConnection) -> List[str]:
     """
     Report the name of the tables.
@@ -393,6 +734,7 @@ def get_table_names(connection: DbConnection) -> List[str]:
     return tables
 
 
+@accept_connection_pool
 def get_tables_size(
     connection: DbConnection,
     only_public: bool = True,
@@ -437,6 +779,7 @@ def get_tables_size(
     return df
 
 
+@accept_connection_pool
 def head_table(
     connection: DbConnection,
     table: str,
@@ -455,6 +798,7 @@ def head_table(
     return txt
 
 
+@accept_connection_pool
 def head_tables(
     connection: DbConnection,
     tables: Optional[List[str]] = None,
@@ -471,6 +815,7 @@ def head_tables(
     return txt
 
 
+@accept_connection_pool
 def get_table_columns(connection: DbConnection, table_name: str) -> List[str]:
     """
     Get column names for given table.
@@ -485,6 +830,7 @@ def get_table_columns(connection: DbConnection, table_name: str) -> List[str]:
     return columns
 
 
+@accept_connection_pool
 def find_tables_common_columns(
     connection: DbConnection,
     tables: List[str],
@@ -525,6 +871,7 @@ def find_tables_common_columns(
     return obj
 
 
+@accept_connection_pool
 def remove_table(
     connection: DbConnection, table_name: str, cascade: bool = False
 ) -> None:
@@ -541,6 +888,7 @@ def remove_table(
     connection.cursor().execute(query)
 
 
+@accept_connection_pool
 def remove_all_tables(connection: DbConnection, cascade: bool = False) -> None:
     """
     Remove all the tables from a database.
@@ -560,7 +908,18 @@ def remove_all_tables(connection: DbConnection, cascade: bool = False) -> None:
 # #############################################################################
 
 
+def _add_limit_and_offset(
+    query: str, limit: Optional[int], offset: Optional[int]
+) -> str:
+    if limit is not None:
+        query += f" LIMIT {limit}"
+    if offset is not None:
+        query += f" OFFSET {offset}"
+    return query
+
+
 # TODO(gp): -> as_df
+@accept_connection_pool
 def execute_query_to_df(
     connection: DbConnection,
     query: str,
@@ -569,9 +928,18 @@ def execute_query_to_df(
     use_timer: bool = False,
     profile: bool = False,
     verbose: bool = False,
+    *,
+    mode: str = "read_sql",
 ) -> pd.DataFrame:
     """
     Execute a query.
+
+    :param mode: how to fetch the result
+        - "read_sql": fetch the rows as Python tuples with
+          `pd.read_sql_query()`
+        - "copy": export the result with `COPY ... TO STDOUT` and parse it
+          directly into columnar arrays, which is faster and uses less memory
+          for large results (see `_execute_query_to_df_with_copy()`)
     """
     if False:
         # Ask the user before executing a query.
@@ -579,27 +947,29 @@ def execute_query_to_df(
         import helpers.hsystem as hsystem
 
         hsystem.query_yes_no("Ok to execute?")
-    if limit is not None:
-        query += f" LIMIT {limit}"
-    if offset is not None:
-        query += f" OFFSET {offset}"
+    hdbg.dassert_in(mode, ("read_sql", "copy"))
+    query = _add_limit_and_offset(query, limit, offset)
     if profile:
+        hdbg.dassert_eq(mode, "read_sql", "Can't profile a query with COPY")
         query = "EXPLAIN ANALYZE " + query
     if verbose:
         _LOG.info("> %s", query)
     # Compute.
     if use_timer:
         idx = htimer.dtimer_start(0, "Sql time")
-    cursor = connection.cursor()
-    try:
-        df = pd.read_sql_query(query, connection)
-    except psycop.OperationalError:
-        # Catch error and execute query directly to print error.
+    if mode == "copy":
+        df = _execute_query_to_df_with_copy(connection, query)
+    else:
+        cursor = connection.cursor()
         try:
-            cursor.execute(query)
-        except psycop.Error as e:
-            print(e.pgerror)
-            raise e
+            df = pd.read_sql_query(query, connection)
+        except psycop.OperationalError:
+            # Catch error and execute query directly to print error.
+            try:
+                cursor.execute(query)
+            except psycop.Error as e:
+                print(e.pgerror)
+                raise e
     if use_timer:
         htimer.dtimer_stop(idx)
     if profile:
@@ -607,6 +977,150 @@ def execute_query_to_df(
     return df
 
 
+@accept_connection_pool
+def execute_query_to_df_chunks(
+    connection: DbConnection,
+    query: str,
+    *,
+    chunk_size: int = 100000,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Execute a query yielding the result in chunks of at most `chunk_size` rows.
+
+    The rows are fetched from a named server-side cursor, so that only one
+    chunk at a time is transferred and kept in memory. No chunk is yielded if
+    the result is empty.
+
+    Named cursors exist only inside a transaction:
+    - if the connection is in autocommit mode, the query is executed in a
+      transaction that is closed when the generator is exhausted or closed
+    - otherwise the query is executed in the current transaction of the
+      caller
+
+    :param chunk_size: max number of rows per chunk
+    """
+    hdbg.dassert_lte(1, chunk_size)
+    query = _add_limit_and_offset(query, limit, offset)
+    autocommit = connection.autocommit
+    if autocommit:
+        connection.autocommit = False
+    cursor_name = f"execute_query_to_df_chunks_{uuid.uuid4().hex}"
+    try:
+        with connection.cursor(name=cursor_name) as cursor:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                columns = [column.name for column in cursor.description]
+                df = pd.DataFrame.from_records(rows, columns=columns)
+                yield df
+        if autocommit:
+            connection.commit()
+    except BaseException:
+        # Also reached when the caller stops iterating and the generator is
+        # closed.
+        if autocommit:
+            connection.rollback()
+        raise
+    finally:
+        if autocommit:
+            connection.autocommit = True
+
+
+# Map Postgres type OID -> Arrow type used to parse the output of `COPY`.
+# The OIDs are from `SELECT oid, typname FROM pg_type`. The types that are not
+# listed are parsed as strings.
+_PG_OID_TO_ARROW_TYPE = {
+    # bool.
+    16: pa.bool_(),
+    # int8, int2, int4.
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    # float4, float8, numeric.
+    700: pa.float32(),
+    701: pa.float64(),
+    1700: pa.float64(),
+    # date.
+    1082: pa.date32(),
+    # timestamp, timestamptz.
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+}
+
+
+def _execute_query_to_df_with_copy(
+    connection: DbConnection, query: str
+) -> pd.DataFrame:
+    """
+    Execute a query exporting the result with `COPY (query) TO STDOUT`.
+
+    The result is transferred in CSV format and parsed by the Arrow CSV
+    reader straight into columnar arrays, without building a Python object
+    per value. The output of `COPY` is streamed to the reader through a pipe
+    by a separate thread, so the CSV text is never held in memory in its
+    entirety.
+
+    The column types are derived from the types of the query result, with
+    the following differences from `pd.read_sql_query()`:
+    - `numeric` columns are returned as floats, instead of `Decimal` objects
+    - types not in `_PG_OID_TO_ARROW_TYPE` (e.g., `json`, `uuid`) are returned
+      as strings
+    """
+    query = query.strip().rstrip(";")
+    # Get the types of the columns without computing the result.
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM ({query}) AS query LIMIT 0")
+        column_types = {
+            column.name: _PG_OID_TO_ARROW_TYPE.get(column.type_code, pa.string())
+            for column in cursor.description
+        }
+    # Export the result in a thread writing into a pipe.
+    copy_query = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    read_fd, write_fd = os.pipe()
+    errors: List[BaseException] = []
+
+    def _export() -> None:
+        try:
+            with os.fdopen(write_fd, "wb") as write_file:
+                with connection.cursor() as cursor:
+                    cursor.copy_expert(copy_query, write_file)
+        except BaseException as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    thread = threading.Thread(target=_export, daemon=True)
+    thread.start()
+    # Parse the result. `COPY` represents NULL with an empty unquoted value,
+    # an empty string with `""`, and booleans with `t` and `f`.
+    convert_options = pacsv.ConvertOptions(
+        column_types=column_types,
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+        true_values=["t"],
+        false_values=["f"],
+    )
+    try:
+        # Closing the read end interrupts the export if the parsing fails.
+        with os.fdopen(read_fd, "rb") as read_file:
+            reader = pacsv.open_csv(read_file, convert_options=convert_options)
+            table = reader.read_all()
+    except Exception:
+        thread.join()
+        # Report the error of the export, which truncates the CSV text,
+        # unless it is caused by the parsing error closing the pipe.
+        if errors and not isinstance(errors[0], BrokenPipeError):
+            raise errors[0]
+        raise
+    thread.join()
+    if errors:
+        raise errors[0]
+    df = table.to_pandas(coerce_temporal_nanoseconds=True)
+    return df
+
+
 # #############################################################################
 # Insert
 # #############################################################################
@@ -637,6 +1151,7 @@ def csv_to_series(csv_as_txt: str, sep: str = ",") -> pd.Series:
     return srs
 
 
+@accept_connection_pool
 def copy_rows_with_copy_from(
     connection: DbConnection, df: pd.DataFrame, table_name: str
 ) -> None:
@@ -712,6 +1227,7 @@ def create_insert_on_conflict_do_nothing_query(
 
 
 # TODO(gp): -> connection, table_name, obj
+@accept_connection_pool
 def execute_insert_query(
     connection: DbConnection,
     obj: Union[pd.DataFrame, pd.Series],
@@ -730,7 +1246,7 @@ def execute_insert_query(
         df = obj
     hdbg.dassert_isinstance(df, pd.DataFrame)
     hdbg.dassert_in(table_name, get_table_names(connection))
-    _LOG.debug("df=\n%s", hpandas.df_to_str(df, use_tabulate=False))
+    _LOG.debug("df=\n%s", hpandas.df_to_str_lazy(df, use_tabulate=False))
     # Ensure the DataFrame has compatible types with
     # downstream consumers (e.g., database).
     df = df.applymap(lambda x: float(x) if isinstance(x, np.float64) else x)
@@ -745,6 +1261,7 @@ def execute_insert_query(
 
 
 # TODO(gp): -> connection, table_name, obj
+@accept_connection_pool
 def execute_insert_on_conflict_do_nothing_query(
     connection: DbConnection,
     obj: Union[pd.DataFrame, pd.Series],
@@ -768,7 +1285,7 @@ def execute_insert_on_conflict_do_nothing_query(
         df = obj
     hdbg.dassert_isinstance(df, pd.DataFrame)
     hdbg.dassert_in(table_name, get_table_names(connection))
-    _LOG.debug("df=\n%s", hpandas.df_to_str(df, use_tabulate=False))
+    _LOG.debug("df=\n%s", hpandas.df_to_str_lazy(df, use_tabulate=False))
     # Transform dataframe into list of tuples.
     values = [tuple(v) for v in df.to_numpy()]
     # Generate a query for multiple rows.
@@ -795,6 +1312,7 @@ def execute_insert_on_conflict_do_nothing_query(
         raise e
 
 
+@accept_connection_pool
 def execute_query(connection: DbConnection, query: str) -> List[tuple]:
     """
     Use for generic simple operations.
@@ -857,6 +1375,7 @@ def get_remove_duplicates_query(
     return remove_statement
 
 
+@accept_connection_pool
 def get_num_rows(connection: DbConnection, table_name: str) -> int:
     """
     Return the number of rows in a DB table.
@@ -875,6 +1394,7 @@ def get_num_rows(connection: DbConnection, table_name: str) -> int:
 # #############################################################################
 
 
+@accept_connection_pool
 def is_row_with_value_present(
     connection: DbConnection,
     table_name: str,
@@ -899,11 +1419,11 @@ def is_row_with_value_present(
     if show_db_state:
         query = f"SELECT * FROM {table_name} ORDER BY filename"
         df = execute_query_to_df(connection, query)
-        _LOG.debug("df=\n%s", hpandas.df_to_str(df, use_tabulate=False))
+        _LOG.debug("df=\n%s", hpandas.df_to_str_lazy(df, use_tabulate=False))
     # Check if the required row is available.
     query = f"SELECT {field_name} FROM {table_name} WHERE {field_name}='{target_value}'"
     df = execute_query_to_df(connection, query)
-    _LOG.debug("df=\n%s", hpandas.df_to_str(df, use_tabulate=False))
+    _LOG.debug("df=\n%s", hpandas.df_to_str_lazy(df, use_tabulate=False))
     # Package results.
     success = df.shape[0] > 0
     result = None
@@ -1,6 +1,7 @@
 import logging
 import tempfile
 import time
+import unittest.mock as umock
 from typing import Any, Callable, Generator, Tuple
 
 import numpy as np
@@ -940,5 +941,67 @@ class TestCacheEnableCheckOnlyIfPresent1(_ResetGlobalCacheHelper):
         self._execute_and_check_state(f, cf, 2, 2, exp_cf_state=cache_from)
 
 
+# #############################################################################
+
+
+class TestCacheMemLimits1(_ResetGlobalCacheHelper):
+    def test_lru1(self) -> None:
+        """
+        Verify that the least recently used entry is evicted from the memory
+        cache.
+        """
+        f, cf = self._get_f_cf_functions(
+            use_disk_cache=False, mem_cache_max_entries=2
+        )
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="no_cache")
+        self._execute_and_check_state(f, cf, 2, 2, exp_cf_state="no_cache")
+        # Use (1, 1) so that (2, 2) is the least recently used.
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="mem")
+        # Adding a new entry evicts (2, 2).
+        self._execute_and_check_state(f, cf, 3, 3, exp_cf_state="no_cache")
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="mem")
+        self._execute_and_check_state(f, cf, 2, 2, exp_cf_state="no_cache")
+        self.assertIn("mem cache evictions=2", cf.get_function_cache_info())
+
+    def test_ttl1(self) -> None:
+        """
+        Verify that an expired entry is not served from the memory cache.
+        """
+        f, cf = self._get_f_cf_functions(use_disk_cache=False, mem_cache_ttl=0.1)
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="no_cache")
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="mem")
+        time.sleep(0.2)
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="no_cache")
+        self.assertIn("expirations=1", cf.get_function_cache_info())
+
+    def test_tracking1(self) -> None:
+        """
+        Verify that the entries of the memory cache are tracked without
+        listing the cache dir on each miss.
+        """
+        f, cf = self._get_f_cf_functions(
+            use_disk_cache=False, mem_cache_max_entries=2
+        )
+        with umock.patch.object(
+            cf, "_get_mem_cache_item", wraps=cf._get_mem_cache_item
+        ) as get_item_mock:
+            for val in range(1, 5):
+                self._execute_and_check_state(
+                    f, cf, val, val, exp_cf_state="no_cache"
+                )
+        # The cache dir is listed only once, inspecting `func_code.py` and the
+        # first entry, and then each entry is inspected when it's stored.
+        self.assertEqual(get_item_mock.call_count, 5)
+        self.assertIn("mem cache evictions=2", cf.get_function_cache_info())
+        # Clear the cache from outside the cached function.
+        hcache.clear_global_cache("mem", self.cache_tag)
+        self._execute_and_check_state(f, cf, 4, 4, exp_cf_state="no_cache")
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="no_cache")
+        # Check that no entry was evicted after clearing the cache.
+        self._execute_and_check_state(f, cf, 4, 4, exp_cf_state="mem")
+        self._execute_and_check_state(f, cf, 1, 1, exp_cf_state="mem")
+        self.assertIn("mem cache evictions=2", cf.get_function_cache_info())
+
+
 # TODO(gp): Add a test for verbose mode in __call__
 # TODO(gp): get_function_cache_info
@@ -1,9 +1,14 @@
+import asyncio
+import concurrent.futures
 import json
 import logging
 import os
 import pickle
-from typing import Any, Dict
+import time
+import timeit
+from typing import Any, Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -92,6 +97,91 @@ def _dummy_cached_function(x: int) -> int:
     return res
 
 
+@hcacsimp.simple_cache(
+    cache_type="json", write_through=True, disk_backend="sharded"
+)
+def _sharded_function(x: int) -> int:
+    """
+    Return x plus 1 and cache it using a sharded disk cache.
+
+    :param x: The input integer
+    :return: value (x + 1)
+    """
+    _sharded_function.call_count += 1
+    res = x + 1
+    return res
+
+
+# Initialize the call counter for the sharded function.
+_sharded_function.call_count = 0
+
+
+@hcacsimp.simple_cache(cache_type="json", write_through=True, process_safe=True)
+def _process_safe_function(x: int) -> int:
+    """
+    Return x plus 2 and cache it in a disk cache shared among processes.
+
+    :param x: The input integer
+    :return: value (x + 2)
+    """
+    res = x + 2
+    return res
+
+
+@hcacsimp.simple_cache(cache_type="json", max_entries=2)
+def _bounded_function(x: int) -> int:
+    """
+    Return x minus 1 and cache it in a bounded memory cache.
+
+    :param x: The input integer
+    :return: value (x - 1)
+    """
+    res = x - 1
+    return res
+
+
+@hcacsimp.async_simple_cache(cache_type="json", exclude_keys=["cache_mode"])
+async def _async_function(x: int, cache_mode: str = "") -> int:
+    """
+    Return x times 2 after yielding to the event loop.
+
+    :param x: The input integer
+    :param cache_mode: The caching behavior, handled by the decorator
+    :return: value (x * 2)
+    :raises ValueError: If x is negative
+    """
+    _ = cache_mode
+    _async_function.call_count += 1
+    await asyncio.sleep(0.01)
+    if x < 0:
+        raise ValueError(f"Invalid x={x}")
+    res = x * 2
+    return res
+
+
+# Initialize the call counter for the async function.
+_async_function.call_count = 0
+
+
+@hcacsimp.async_simple_cache(cache_type="json", batch=True)
+async def _async_batch_function(xs: List[int], offset: int = 0) -> List[int]:
+    """
+    Return x plus offset for each input, recording the inputs of each call.
+
+    :param xs: The input integers
+    :param offset: The value to add
+    :return: values (x + offset)
+    """
+    _async_batch_function.calls.append(list(xs))
+    await asyncio.sleep(0.01)
+    res = [x + offset for x in xs]
+    return res
+
+
+# Initialize the list of calls for the async batch function.
+_async_batch_function.calls = []
+
+
 # #############################################################################
 # BaseCacheTest
 # #############################################################################
@@ -133,6 +223,21 @@ class BaseCacheTest(hunitest.TestCase):
         hcacsimp.set_cache_property(
             "system", "_dummy_cached_function", "type", "json"
         )
+        hcacsimp.set_cache_property("system", "_sharded_function", "type", "json")
+        hcacsimp.set_cache_property(
+            "system", "_sharded_function", "disk_backend", "sharded"
+        )
+        hcacsimp.set_cache_property(
+            "system", "_process_safe_function", "type", "json"
+        )
+        hcacsimp.set_cache_property(
+            "system", "_process_safe_function", "process_safe", True
+        )
+        hcacsimp.set_cache_property("system", "_bounded_function", "type", "json")
+        hcacsimp.set_cache_property("system", "_async_function", "type", "json")
+        hcacsimp.set_cache_property(
+            "system", "_async_batch_function", "type", "json"
+        )
 
     def tear_down_test(self) -> None:
         """
@@ -148,6 +253,11 @@ class BaseCacheTest(hunitest.TestCase):
             "_refreshable_function",
             "_kwarg_func",
             "_dummy_cached_function",
+            "_sharded_function",
+            "_process_safe_function",
+            "_bounded_function",
+            "_async_function",
+            "_async_batch_function",
         ]:
             # Reset both disk and in-memory cache.
             hcacsimp.reset_cache(func_name=func_name, interactive=False)
@@ -220,6 +330,23 @@ class Test_flush_cache_to_disk(BaseCacheTest):
         # Assert that the value for key '{"args": [3], "kwargs": {}}' is 6.
         self.assertEqual(disk_cache['{"args": [3], "kwargs": {}}'], 6)
 
+    def test3(self) -> None:
+        """
+        Verify that a process safe cache is flushed when the file is missing.
+        """
+        _process_safe_function(1)
+        # Remove the disk cache, so that the next flush creates it again while
+        # holding the lock.
+        hcacsimp.reset_disk_cache("_process_safe_function", interactive=False)
+        # Run.
+        _process_safe_function(2)
+        # Check output.
+        disk_cache = hcacsimp.get_disk_cache("_process_safe_function")
+        self.assertEqual(
+            disk_cache,
+            {'{"args": [1], "kwargs": {}}': 3, '{"args": [2], "kwargs": {}}': 4},
+        )
+
 
 # #############################################################################
 # Test_reset_mem_cache
@@ -562,3 +689,581 @@ class Test__refreshable_function(BaseCacheTest):
             2,
             "Function should be re-called when force_refresh is enabled.",
         )
+
+
+# #############################################################################
+# Test_ShardedDiskCache
+# #############################################################################
+
+
+class Test_ShardedDiskCache(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Verify that values written to the cache are read back after reopening
+        it.
+        """
+        dir_name = os.path.join(self.get_scratch_space(), "cache.shards")
+        cache = hcacsimp.ShardedDiskCache(dir_name, "pickle", num_shards=4)
+        cache.put_many([(str(i), {"val": i}) for i in range(20)])
+        # Reopen the cache.
+        cache = hcacsimp.ShardedDiskCache(dir_name, "pickle")
+        # Check output.
+        self.assertEqual(len(cache), 20)
+        self.assertEqual(cache.get("7"), (True, {"val": 7}))
+        self.assertEqual(cache.get("missing"), (False, None))
+
+    def test2(self) -> None:
+        """
+        Verify that compaction drops the superseded records.
+        """
+        dir_name = os.path.join(self.get_scratch_space(), "cache.shards")
+        cache = hcacsimp.ShardedDiskCache(dir_name, "json", num_shards=2)
+        for i in range(3):
+            cache.put("key", i)
+        self.assertGreater(cache.get_stats()["dead_bytes"], 0)
+        # Run.
+        cache.compact()
+        # Check output.
+        self.assertEqual(cache.get_stats()["dead_bytes"], 0)
+        self.assertEqual(cache.get("key"), (True, 2))
+        cache = hcacsimp.ShardedDiskCache(dir_name, "json")
+        self.assertEqual(cache.to_dict(), {"key": 2})
+
+    def test3(self) -> None:
+        """
+        Verify that a partially written record is ignored.
+        """
+        dir_name = os.path.join(self.get_scratch_space(), "cache.shards")
+        cache = hcacsimp.ShardedDiskCache(dir_name, "json", num_shards=1)
+        cache.put("key", 1)
+        # Simulate a crash in the middle of a write.
+        with open(os.path.join(dir_name, "shard_000.bin"), "ab") as f:
+            f.write(b"\x05\x00")
+        # Run.
+        cache = hcacsimp.ShardedDiskCache(dir_name, "json")
+        cache.put("key2", 2)
+        # Check output.
+        self.assertEqual(cache.to_dict(), {"key": 1, "key2": 2})
+
+
+def _write_to_process_safe_cache(dir_name: str, worker_id: int) -> None:
+    """
+    Write entries to a process-safe cache from a worker process.
+    """
+    cache = hcacsimp.ShardedDiskCache(
+        dir_name, "pickle", num_shards=2, process_safe=True
+    )
+    for i in range(50):
+        cache.put(f"{worker_id}_{i}", i)
+
+
+# #############################################################################
+# Test_ShardedDiskCache_process_safe
+# #############################################################################
+
+
+class Test_ShardedDiskCache_process_safe(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Verify that a cache sees the entries written by another cache on the
+        same directory, without reopening it.
+        """
+        dir_name = os.path.join(self.get_scratch_space(), "cache.shards")
+        cache1 = hcacsimp.ShardedDiskCache(dir_name, "json", process_safe=True)
+        cache2 = hcacsimp.ShardedDiskCache(dir_name, "json", process_safe=True)
+        cache1.put("key", 1)
+        self.assertEqual(cache2.get("key"), (True, 1))
+        # Compact from the first cache and write from the second one.
+        cache1.put("key", 2)
+        cache1.compact()
+        cache2.put("key2", 3)
+        # Check output.
+        self.assertEqual(cache1.to_dict(), {"key": 2, "key2": 3})
+        self.assertEqual(cache2.to_dict(), {"key": 2, "key2": 3})
+
+    def test2(self) -> None:
+        """
+        Verify that no entry is lost when many processes write concurrently.
+        """
+        dir_name = os.path.join(self.get_scratch_space(), "cache.shards")
+        num_workers = 4
+        with concurrent.futures.ProcessPoolExecutor(num_workers) as executor:
+            futures = [
+                executor.submit(_write_to_process_safe_cache, dir_name, worker_id)
+                for worker_id in range(num_workers)
+            ]
+            for future in futures:
+                future.result()
+        # Check output.
+        cache = hcacsimp.ShardedDiskCache(dir_name, "pickle", process_safe=True)
+        self.assertEqual(len(cache), num_workers * 50)
+        self.assertEqual(cache.get("3_49"), (True, 49))
+
+
+# #############################################################################
+# Test__sharded_function
+# #############################################################################
+
+
+class Test__sharded_function(BaseCacheTest):
+    def test1(self) -> None:
+        """
+        Verify that a value written through is loaded lazily from disk.
+        """
+        _sharded_function.call_count = 0
+        _sharded_function(1)
+        # Reset the in-memory cache, so that the value comes from disk.
+        hcacsimp.reset_mem_cache("_sharded_function")
+        res: int = _sharded_function(1)
+        # Check output.
+        self.assertEqual(res, 2)
+        self.assertEqual(_sharded_function.call_count, 1)
+        self.assertTrue(os.path.isdir("cache._sharded_function.shards"))
+        self.assertIn(
+            "_sharded_function", hcacsimp.get_cache_func_names("disk")
+        )
+
+    def test2(self) -> None:
+        """
+        Verify that the disk cache contains the expected key and value.
+        """
+        _sharded_function(3)
+        # Run.
+        disk_cache: Dict[str, Any] = hcacsimp.get_disk_cache(
+            "_sharded_function"
+        )
+        # Check output.
+        self.assertEqual(disk_cache, {'{"args": [3], "kwargs": {}}': 4})
+
+
+# #############################################################################
+# Test_BoundedMemCache
+# #############################################################################
+
+
+class Test_BoundedMemCache(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Verify that LRU evicts the least recently used entry.
+        """
+        evicted = []
+        cache = hcacsimp.BoundedMemCache(
+            max_entries=2,
+            on_evict=lambda key, value, reason: evicted.append((key, reason)),
+        )
+        cache["a"] = 1
+        cache["b"] = 2
+        # Use "a", so that "b" is the least recently used.
+        _ = cache["a"]
+        # Run.
+        cache["c"] = 3
+        # Check output.
+        self.assertEqual(sorted(cache.keys()), ["a", "c"])
+        self.assertEqual(evicted, [("b", "capacity")])
+
+    def test2(self) -> None:
+        """
+        Verify that LFU evicts the least frequently used entry.
+        """
+        cache = hcacsimp.BoundedMemCache(max_entries=2, eviction_policy="lfu")
+        cache["a"] = 1
+        cache["b"] = 2
+        # Use "a" twice and "b" once.
+        for key in ["a", "a", "b"]:
+            _ = cache[key]
+        # Run.
+        cache["c"] = 3
+        cache["d"] = 4
+        # Check output.
+        self.assertEqual(sorted(cache.keys()), ["a", "d"])
+
+    def test3(self) -> None:
+        """
+        Verify that an entry expires after its TTL.
+        """
+        cache = hcacsimp.BoundedMemCache(ttl=0.1)
+        cache["a"] = 1
+        self.assertIn("a", cache)
+        # Run.
+        time.sleep(0.2)
+        # Check output.
+        self.assertNotIn("a", cache)
+        self.assertEqual(len(cache), 0)
+
+    def test4(self) -> None:
+        """
+        Verify that the cache is bounded by the size of its values.
+        """
+        cache = hcacsimp.BoundedMemCache(max_bytes=150)
+        cache["a"] = "a" * 100
+        # Run.
+        cache["b"] = "b" * 100
+        # Check output.
+        self.assertEqual(list(cache.keys()), ["b"])
+        self.assertLessEqual(cache.get_num_bytes(), 150)
+
+    def test5(self) -> None:
+        """
+        Verify that the expired entries are not counted.
+        """
+        cache = hcacsimp.BoundedMemCache(ttl=0.1)
+        cache["a"] = 1
+        cache["b"] = 2
+        time.sleep(0.2)
+        cache["c"] = 3
+        # Run.
+        num_entries = len(cache)
+        # Check output.
+        self.assertEqual(num_entries, 1)
+        self.assertEqual(list(cache.keys()), ["c"])
+
+    def test6(self) -> None:
+        """
+        Verify that the entries dropped before setting the callback are not
+        reported.
+        """
+        evicted = []
+        cache = hcacsimp.BoundedMemCache(max_entries=2)
+        cache.update({"a": 1, "b": 2, "c": 3})
+        cache.set_on_evict(
+            lambda key, value, reason: evicted.append((key, reason))
+        )
+        # Run.
+        cache["d"] = 4
+        # Check output.
+        self.assertEqual(sorted(cache.keys()), ["c", "d"])
+        self.assertEqual(evicted, [("b", "capacity")])
+
+    def test7(self) -> None:
+        """
+        Verify that an entry added if there is room is the first to evict.
+        """
+        cache = hcacsimp.BoundedMemCache(max_entries=2)
+        cache["a"] = 1
+        # Run.
+        is_added1 = cache.add_if_room("b", 2)
+        is_added2 = cache.add_if_room("c", 3)
+        cache["d"] = 4
+        # Check output.
+        self.assertTrue(is_added1)
+        self.assertFalse(is_added2)
+        self.assertEqual(sorted(cache.keys()), ["a", "d"])
+
+
+# #############################################################################
+# Test__bounded_function
+# #############################################################################
+
+
+class Test__bounded_function(BaseCacheTest):
+    def test1(self) -> None:
+        """
+        Verify that evictions are reported in the performance stats.
+        """
+        hcacsimp.enable_cache_perf("_bounded_function")
+        for x in range(4):
+            _bounded_function(x)
+        # Run.
+        stats: str = hcacsimp.get_cache_perf_stats("_bounded_function")
+        # Check output.
+        self.assertEqual(len(hcacsimp.get_mem_cache("_bounded_function")), 2)
+        self.assertIn("misses=4", stats)
+        self.assertIn("evictions=2", stats)
+
+    def test2(self) -> None:
+        """
+        Verify that flushing doesn't change the entries of the memory cache.
+        """
+        _bounded_function(0)
+        _bounded_function(1)
+        hcacsimp.flush_cache_to_disk("_bounded_function")
+        # Use 0, so that 1 is evicted.
+        _bounded_function(0)
+        _bounded_function(2)
+        # Run.
+        hcacsimp.flush_cache_to_disk("_bounded_function")
+        # Check output.
+        mem_cache = hcacsimp.get_mem_cache("_bounded_function")
+        self.assertEqual(
+            list(mem_cache.keys()),
+            ['{"args": [0], "kwargs": {}}', '{"args": [2], "kwargs": {}}'],
+        )
+        disk_cache = hcacsimp.get_disk_cache("_bounded_function")
+        self.assertEqual(len(disk_cache), 3)
+
+
+# #############################################################################
+# Test__async_function
+# #############################################################################
+
+
+class Test__async_function(BaseCacheTest):
+    def set_up_test(self) -> None:
+        super().set_up_test()
+        _async_function.call_count = 0
+
+    def test1(self) -> None:
+        """
+        Verify that concurrent calls with the same key are executed once.
+        """
+
+        async def _run() -> List[int]:
+            res = await asyncio.gather(*[_async_function(3) for _ in range(5)])
+            return res
+
+        hcacsimp.enable_cache_perf("_async_function")
+        # Run.
+        res = asyncio.run(_run())
+        # Check output.
+        self.assertEqual(res, [6] * 5)
+        self.assertEqual(_async_function.call_count, 1)
+        stats = hcacsimp.get_cache_perf_stats("_async_function")
+        self.assertIn("hits=4", stats)
+        self.assertIn("misses=1", stats)
+
+    def test2(self) -> None:
+        """
+        Verify the `cache_mode` semantics.
+        """
+        asyncio.run(_async_function(2))
+        # Run.
+        res1 = asyncio.run(_async_function(2))
+        res2 = asyncio.run(_async_function(2, cache_mode="REFRESH_CACHE"))
+        res3 = asyncio.run(_async_function(2, cache_mode="DISABLE_CACHE"))
+        # Check output.
+        self.assertEqual([res1, res2, res3], [4, 4, 4])
+        self.assertEqual(_async_function.call_count, 3)
+        with self.assertRaises(ValueError):
+            asyncio.run(_async_function(5, cache_mode="HIT_CACHE_OR_ABORT"))
+        self.assertEqual(_async_function.call_count, 3)
+
+    def test3(self) -> None:
+        """
+        Verify that a failure is propagated to all the waiting callers.
+        """
+
+        async def _run() -> List[Any]:
+            res = await asyncio.gather(
+                _async_function(-1), _async_function(-1), return_exceptions=True
+            )
+            return res
+
+        # Run.
+        res = asyncio.run(_run())
+        # Check output.
+        self.assertEqual([type(r) for r in res], [ValueError, ValueError])
+        self.assertEqual(_async_function.call_count, 1)
+        self.assertEqual(len(hcacsimp.get_mem_cache("_async_function")), 0)
+        self.assertEqual(hcacsimp._IN_FLIGHT, {})
+
+    def test4(self) -> None:
+        """
+        Verify that cancelling a caller doesn't cancel the waiting callers.
+        """
+
+        async def _run() -> int:
+            task1 = asyncio.create_task(_async_function(4))
+            # Let the first caller start the computation.
+            await asyncio.sleep(0)
+            task2 = asyncio.create_task(_async_function(4))
+            await asyncio.sleep(0)
+            task1.cancel()
+            res = await task2
+            return res
+
+        # Run.
+        res = asyncio.run(_run())
+        # Check output.
+        self.assertEqual(res, 8)
+        self.assertEqual(_async_function.call_count, 2)
+        self.assertEqual(hcacsimp._IN_FLIGHT, {})
+
+
+# #############################################################################
+# Test__async_batch_function
+# #############################################################################
+
+
+class Test__async_batch_function(BaseCacheTest):
+    def set_up_test(self) -> None:
+        super().set_up_test()
+        _async_batch_function.calls = []
+
+    def test1(self) -> None:
+        """
+        Verify that only the misses are passed to the function.
+        """
+        asyncio.run(_async_batch_function([1, 2], offset=10))
+        # Run.
+        res = asyncio.run(_async_batch_function([2, 3, 1, 4, 3], offset=10))
+        # Check output.
+        self.assertEqual(res, [12, 13, 11, 14, 13])
+        self.assertEqual(_async_batch_function.calls, [[1, 2], [3, 4]])
+
+    def test2(self) -> None:
+        """
+        Verify that the keyword arguments are part of the item keys.
+        """
+        asyncio.run(_async_batch_function([1, 2]))
+        # Run.
+        res = asyncio.run(_async_batch_function([1, 2], offset=1))
+        # Check output.
+        self.assertEqual(res, [2, 3])
+        self.assertEqual(_async_batch_function.calls, [[1, 2], [1, 2]])
+
+    def test3(self) -> None:
+        """
+        Verify that concurrent batches don't compute the same item twice.
+        """
+
+        async def _run() -> List[List[int]]:
+            res = await asyncio.gather(
+                _async_batch_function([1, 2]), _async_batch_function([2, 3])
+            )
+            return res
+
+        # Run.
+        res = asyncio.run(_run())
+        # Check output.
+        self.assertEqual(res, [[1, 2], [2, 3]])
+        self.assertEqual(_async_batch_function.calls, [[1, 2], [3]])
+
+
+# #############################################################################
+# Test_get_cache_key
+# #############################################################################
+
+
+class Test_get_cache_key(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Verify that the key of scalar arguments is the same as `json.dumps()`.
+        """
+        args = (1, 2.5, "a\"b", None, True, float("nan"))
+        kwargs = {"b": "x", "a": 3}
+        # Run.
+        actual = hcacsimp.get_cache_key(args, kwargs)
+        # Check output.
+        expected = json.dumps(
+            {"args": args, "kwargs": kwargs}, sort_keys=True, default=str
+        )
+        self.assertEqual(actual, expected)
+
+    def test2(self) -> None:
+        """
+        Verify that arrays differing only in values hidden by `str()` get
+        different keys.
+        """
+        arr1 = np.zeros(10000)
+        arr2 = np.zeros(10000)
+        arr2[5000] = 1.0
+        self.assertEqual(str(arr1), str(arr2))
+        # Run.
+        key1 = hcacsimp.get_cache_key((arr1,), {})
+        key2 = hcacsimp.get_cache_key((arr2,), {})
+        # Check output.
+        self.assertNotEqual(key1, key2)
+        self.assertEqual(key1, hcacsimp.get_cache_key((np.zeros(10000),), {}))
+
+    def test3(self) -> None:
+        """
+        Verify that the key of pandas objects depends on their content.
+        """
+        df1 = pd.DataFrame({"a": range(1000), "b": 1.0})
+        df2 = df1.copy()
+        df2.loc[500, "b"] = 2.0
+        # Run.
+        key1 = hcacsimp.get_cache_key((), {"df": df1})
+        key2 = hcacsimp.get_cache_key((), {"df": df2})
+        # Check output.
+        self.assertNotEqual(key1, key2)
+        self.assertEqual(key1, hcacsimp.get_cache_key((), {"df": df1.copy()}))
+        self.assertNotEqual(
+            hcacsimp.get_cache_key((df1["a"],), {}),
+            hcacsimp.get_cache_key((df1["a"].rename("c"),), {}),
+        )
+
+
+# #############################################################################
+# Test_get_cache_key_performance
+# #############################################################################
+
+
+class Test_get_cache_key_performance(hunitest.TestCase):
+    """
+    Compare the per-call overhead of building a key with `json.dumps()` and
+    with `get_cache_key()`.
+    """
+
+    def test_scalars(self) -> None:
+        """
+        Verify that the fast path builds the same key faster.
+        """
+        args = (1, 2.5, "abc")
+        kwargs = {"flag": True}
+        # Run.
+        json_dumps_time, get_cache_key_time = self._test_performance(
+            args, kwargs
+        )
+        # Check output.
+        self.assertEqual(
+            hcacsimp.get_cache_key(args, kwargs),
+            self._json_dumps_key(args, kwargs),
+        )
+        self.assertLess(get_cache_key_time, json_dumps_time)
+
+    def test_dataframe(self) -> None:
+        """
+        Verify that hashing a df is faster than converting it to string.
+        """
+        df = pd.DataFrame(
+            np.random.randint(0, 100, size=(10000, 10)), columns=list("ABCDEFGHIJ")
+        )
+        # Run.
+        json_dumps_time, get_cache_key_time = self._test_performance((df,), {})
+        # Check output.
+        self.assertLess(get_cache_key_time, json_dumps_time)
+
+    def test_array(self) -> None:
+        """
+        Verify that hashing an array stays cheap.
+
+        Hashing all the values is slower than the truncated `str()` of the
+        array, which however gives the same key to different arrays.
+        """
+        arr = np.random.rand(100000)
+        # Run.
+        _, get_cache_key_time = self._test_performance((arr,), {})
+        # Check output.
+        self.assertLess(get_cache_key_time, 0.02)
+
+    @staticmethod
+    def _json_dumps_key(args: Any, kwargs: Any) -> str:
+        """
+        Build the key as it was done before `get_cache_key()`.
+        """
+        key = json.dumps(
+            {"args": args, "kwargs": kwargs}, sort_keys=True, default=str
+        )
+        return key
+
+    def _test_performance(
+        self, args: Any, kwargs: Any
+    ) -> Tuple[float, float]:
+        """
+        Time building a key with `json.dumps()` and with `get_cache_key()`.
+
+        :return: the times per call in secs
+        """
+        num_calls = 100
+        json_dumps_time = timeit.timeit(
+            lambda: self._json_dumps_key(args, kwargs), number=num_calls
+        )
+        json_dumps_time /= num_calls
+        get_cache_key_time = timeit.timeit(
+            lambda: hcacsimp.get_cache_key(args, kwargs), number=num_calls
+        )
+        get_cache_key_time /= num_calls
+        _LOG.info("json.dumps per call=%.1f us", json_dumps_time * 1e6)
+        _LOG.info("get_cache_key per call=%.1f us", get_cache_key_time * 1e6)
+        return json_dumps_time, get_cache_key_time
@@ -1,9 +1,12 @@
 import logging
 import os
+from typing import Callable, Optional, Tuple
 
 import pandas as pd
+import pyarrow.parquet as pq
 
 import helpers.hcsv as hcsv
+import helpers.hio as hio
 import helpers.hunit_test as hunitest
 
 _LOG = logging.getLogger(__name__)
@@ -64,3 +67,127 @@ class Test_to_typed_csv(hunitest.TestCase):
         hcsv.to_typed_csv(df, test_csv_path)
         self.assertTrue(os.path.exists(test_csv_types_path))
         os.remove(test_csv_types_path)
+
+
+# #############################################################################
+# Test_convert_csv_to_partitioned_pq
+# #############################################################################
+
+
+class Test_convert_csv_to_partitioned_pq(hunitest.TestCase):
+    @staticmethod
+    def get_test_df() -> pd.DataFrame:
+        """
+        Return a df with data for 3 assets interleaved.
+        """
+        num_rows = 300
+        df = pd.DataFrame(
+            {
+                "asset": [f"A{i % 3}" for i in range(num_rows)],
+                "ts": range(num_rows),
+                "price": [float(i) / 7 for i in range(num_rows)],
+            }
+        )
+        return df
+
+    def test_partition_col1(self) -> None:
+        """
+        Check that each asset is saved in a partition, in the original order.
+        """
+        df, csv_path, pq_dir = self._write_test_csv()
+        # Run.
+        file_names = hcsv.convert_csv_to_partitioned_pq(
+            csv_path,
+            pq_dir,
+            partition_col="asset",
+            # Use small blocks to process many chunks.
+            block_size_in_bytes=512,
+            num_threads=3,
+        )
+        # Check output.
+        self.assertEqual(sorted(file_names), ["A0", "A1", "A2"])
+        for key, file_name in file_names.items():
+            self.assertEqual(
+                file_name, os.path.join(pq_dir, f"asset={key}", "data.parquet")
+            )
+            actual = pd.read_parquet(file_name)
+            # The partition column is encoded in the path.
+            expected = df[df["asset"] == key].reset_index(drop=True)
+            expected = expected.drop(columns="asset")
+            self.assert_equal(str(actual), str(expected))
+        # The temporary files are removed.
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(pq_dir, "asset=A0"))),
+            ["data.parquet"],
+        )
+
+    def test_key_func1(self) -> None:
+        """
+        Check the conversion with a pandas key function and preprocessor.
+        """
+        df, csv_path, pq_dir = self._write_test_csv()
+
+        def _preprocess(df: pd.DataFrame) -> pd.DataFrame:
+            df = df[df["ts"] % 2 == 0]
+            return df
+
+        key_func = lambda df: df.groupby(df["asset"].str.lower())
+        # Run.
+        file_names = hcsv.convert_csv_to_partitioned_pq(
+            csv_path,
+            pq_dir,
+            key_func=key_func,
+            chunk_preprocessor=_preprocess,
+            block_size_in_bytes=512,
+        )
+        # Check output.
+        self.assertEqual(sorted(file_names), ["a0", "a1", "a2"])
+        actual = pd.read_parquet(os.path.join(pq_dir, "a1.parquet"))
+        expected = df[(df["asset"] == "A1") & (df["ts"] % 2 == 0)]
+        expected = expected.reset_index(drop=True)
+        self.assert_equal(str(actual), str(expected))
+
+    def test_null_key1(self) -> None:
+        """
+        Check that the rows with a null key are saved in their own partition.
+        """
+        self._test_null_key(chunk_preprocessor=None)
+
+    def test_null_key2(self) -> None:
+        """
+        Same as `test_null_key1()` but splitting the chunks in pandas.
+        """
+        self._test_null_key(chunk_preprocessor=lambda df: df)
+
+    def _test_null_key(self, chunk_preprocessor: Optional[Callable]) -> None:
+        scratch_dir = self.get_scratch_space()
+        csv_path = os.path.join(scratch_dir, "data.csv")
+        hio.to_file(csv_path, "k,v\n1,a\n,b\n2,c\n1,d\n")
+        pq_dir = os.path.join(scratch_dir, "pq")
+        # Run.
+        file_names = hcsv.convert_csv_to_partitioned_pq(
+            csv_path,
+            pq_dir,
+            partition_col="k",
+            chunk_preprocessor=chunk_preprocessor,
+        )
+        # Check output.
+        self.assertEqual(len(file_names), 3)
+        self.assertIn("__HIVE_DEFAULT_PARTITION__", file_names)
+        actual = pd.read_parquet(file_names["__HIVE_DEFAULT_PARTITION__"])
+        self.assertEqual(actual["v"].tolist(), ["b"])
+        # The output can be read as a Hive-partitioned dataset.
+        table = pq.ParquetDataset(pq_dir, partitioning="hive").read()
+        actual = sorted(
+            zip(table["v"].to_pylist(), table["k"].is_null().to_pylist())
+        )
+        expected = [("a", False), ("b", True), ("c", False), ("d", False)]
+        self.assertEqual(actual, expected)
+
+    def _write_test_csv(self) -> Tuple[pd.DataFrame, str, str]:
+        scratch_dir = self.get_scratch_space()
+        df = self.get_test_df()
+        csv_path = os.path.join(scratch_dir, "data.csv")
+        df.to_csv(csv_path, index=False)
+        pq_dir = os.path.join(scratch_dir, "pq")
+        return df, csv_path, pq_dir
@@ -1,9 +1,14 @@
 import asyncio
+import io
 import logging
-from typing import Optional
+import time
+from typing import List, Optional, Tuple
+
+import pytest
 
 import helpers.hasyncio as hasynci
 import helpers.hdatetime as hdateti
+import helpers.hdbg as hdbg
 import helpers.hlogging as hloggin
 import helpers.hunit_test as hunitest
 import helpers.hwall_clock_time as hwacltim
@@ -91,3 +96,184 @@ class Test_hlogging_asyncio1(hunitest.TestCase):
             hwacltim.set_wall_clock_time(get_wall_clock_time)
             # Run.
             self.run_test(event_loop, get_wall_clock_time)
+
+
+# #############################################################################
+
+
+class Test_ResourceUsageSampler1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Check that a sample is reused within the sampling interval.
+        """
+        sampler = hloggin.ResourceUsageSampler(
+            report_cpu_usage=True, sampling_interval_in_secs=3600.0
+        )
+        # Run.
+        usage1 = sampler.get_usage()
+        usage2 = sampler.get_usage()
+        # Check output.
+        self.assertIs(usage1, usage2)
+        memory_use, cpu_use = usage1
+        self.assertEqual(len(memory_use), 3)
+        self.assertIsInstance(cpu_use, float)
+
+    def test2(self) -> None:
+        """
+        Check that a sample is refreshed after the sampling interval.
+        """
+        sampler = hloggin.ResourceUsageSampler(
+            report_cpu_usage=False, sampling_interval_in_secs=0.0
+        )
+        # Run.
+        usage1 = sampler.get_usage()
+        usage2 = sampler.get_usage()
+        # Check output.
+        self.assertIsNot(usage1, usage2)
+        self.assertIsNone(usage2[1])
+
+
+# #############################################################################
+
+
+def _get_test_logger(
+    name: str, stream: io.StringIO
+) -> Tuple[logging.Logger, logging.Handler]:
+    """
+    Build a logger writing to `stream` with the custom formatter.
+    """
+    logger = logging.getLogger(name)
+    # Do not pollute the output of the root logger.
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(
+        hloggin.CustomFormatter(
+            report_memory_usage=True, report_cpu_usage=True
+        )
+    )
+    logger.addHandler(handler)
+    return logger, handler
+
+
+class Test_set_queue_handler1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Check that the records are emitted in order by the listener.
+        """
+        stream = io.StringIO()
+        logger, handler = _get_test_logger(
+            "Test_set_queue_handler1.test1", stream
+        )
+        listener = hloggin.set_queue_handler(logger, [handler])
+        # Run.
+        for i in range(3):
+            logger.info("i=%s", i)
+        hloggin.stop_queue_listener(listener)
+        logger.handlers.clear()
+        # Check output.
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        for i, line in enumerate(lines):
+            self.assertIn(" test_hlogging.py test1:", line)
+            self.assertTrue(line.endswith(f" i={i}"), line)
+
+    def test2(self) -> None:
+        """
+        Check that the asyncio task name is captured on the calling thread.
+        """
+        stream = io.StringIO()
+        logger, handler = _get_test_logger(
+            "Test_set_queue_handler1.test2", stream
+        )
+        listener = hloggin.set_queue_handler(logger, [handler])
+
+        async def _workload() -> None:
+            asyncio.current_task().set_name("workload")
+            logger.debug("inside the task")
+
+        # Run.
+        hasynci.run(_workload(), event_loop=None)
+        hloggin.stop_queue_listener(listener)
+        logger.handlers.clear()
+        # Check output.
+        actual = stream.getvalue()
+        self.assertIn(" workload test_hlogging.py _workload:", actual)
+        self.assertIn("inside the task", actual)
+
+    def test3(self) -> None:
+        """
+        Check that the message is rendered on the calling thread.
+        """
+        stream = io.StringIO()
+        logger, handler = _get_test_logger(
+            "Test_set_queue_handler1.test3", stream
+        )
+        listener = hloggin.set_queue_handler(logger, [handler])
+        values = [1, 2]
+        # Run.
+        logger.info("values=%s", values)
+        # Modify the object before the listener formats the record.
+        values.append(3)
+        logger.info("no args")
+        hloggin.stop_queue_listener(listener)
+        logger.handlers.clear()
+        # Check output.
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(" values=[1, 2]"), lines[0])
+        self.assertTrue(lines[1].endswith(" no args"), lines[1])
+        for line in lines:
+            self.assertNotIn("%%", line)
+
+
+# #############################################################################
+
+
+@pytest.mark.slow("~3 seconds.")
+class Test_set_queue_handler_performance1(hunitest.TestCase):
+    """
+    Measure the latency of a logging call on the calling thread.
+    """
+
+    @staticmethod
+    def _get_latencies(use_queue_handler: bool) -> List[float]:
+        num_records = 20000
+        stream = io.StringIO()
+        name = f"Test_set_queue_handler_performance1.{use_queue_handler}"
+        logger, handler = _get_test_logger(name, stream)
+        if use_queue_handler:
+            listener = hloggin.set_queue_handler(logger, [handler])
+        latencies = []
+        for i in range(num_records):
+            start = time.perf_counter()
+            logger.info("i=%s", i)
+            latencies.append(time.perf_counter() - start)
+        if use_queue_handler:
+            hloggin.stop_queue_listener(listener)
+        logger.handlers.clear()
+        hdbg.dassert_eq(len(stream.getvalue().splitlines()), num_records)
+        latencies.sort()
+        return latencies
+
+    def test1(self) -> None:
+        # Run.
+        sync_latencies = self._get_latencies(use_queue_handler=False)
+        queue_latencies = self._get_latencies(use_queue_handler=True)
+        # Check output.
+        medians = []
+        for mode, latencies in [
+            ("sync", sync_latencies),
+            ("queue", queue_latencies),
+        ]:
+            num_records = len(latencies)
+            median = latencies[num_records // 2]
+            medians.append(median)
+            _LOG.info(
+                "mode=%s mean=%.1fus p50=%.1fus p99=%.1fus",
+                mode,
+                1e6 * sum(latencies) / num_records,
+                1e6 * median,
+                1e6 * latencies[int(num_records * 0.99)],
+            )
+        self.assertLess(medians[1], medians[0])
@@ -5,6 +5,7 @@ import logging
 import os
 import re
 import time
+import unittest.mock as umock
 import uuid
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -1296,6 +1297,114 @@ class Test_df_to_str(hunitest.TestCase):
         """
         self.assert_equal(actual, expected, fuzzy_match=True)
 
+    def test_df_to_str11(self) -> None:
+        """
+        Test that `-0.0` is replaced with `0.0` in the printed rows of a
+        truncated dataframe, without modifying the input.
+        """
+        test_data = {
+            "dummy_value_1": [1, 2, 3, 4, 5],
+            "dummy_value_2": [-0.0, 1.0, -0.0, 2.0, -0.0],
+        }
+        df = pd.DataFrame(data=test_data)
+        actual = hpandas.df_to_str(df, handle_signed_zeros=True, num_rows=2)
+        expected = r"""
+           dummy_value_1  dummy_value_2
+        0              1            0.0
+        ...
+        4              5            0.0"""
+        self.assert_equal(actual, expected, fuzzy_match=True)
+        # The input is not modified.
+        self.assertTrue(np.signbit(df["dummy_value_2"].iloc[0]))
+
+    def test_df_to_str12(self) -> None:
+        """
+        Test that `-0.0` is replaced with `0.0` in the table printed with
+        `tabulate` for a truncated dataframe.
+        """
+        pytest.importorskip("tabulate")
+        test_data = {
+            "dummy_value_1": [1, 2, 3, 4, 5],
+            "dummy_value_2": [-0.0, 1.0, -0.0, 2.0, -0.0],
+        }
+        df = pd.DataFrame(data=test_data)
+        # Run.
+        actual = hpandas.df_to_str(
+            df, handle_signed_zeros=True, num_rows=2, use_tabulate=True
+        )
+        # Check output.
+        self.assertNotIn("-0", actual)
+        self.assertIn("|  2 |               3 |               0 |", actual)
+
+
+# #############################################################################
+# Test_df_to_str_lazy
+# #############################################################################
+
+
+class Test_df_to_str_lazy(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Test that the lazy object is printed like `df_to_str()`.
+        """
+        df = Test_df_to_str.get_test_data()
+        # Run.
+        actual = str(hpandas.df_to_str_lazy(df, tag="df"))
+        # Check output.
+        expected = hpandas.df_to_str(df, tag="df")
+        self.assert_equal(actual, expected)
+
+    def test2(self) -> None:
+        """
+        Test that the dataframe is not converted when the log level is off.
+        """
+        df = Test_df_to_str.get_test_data()
+        logger = logging.getLogger(f"{__name__}.test_df_to_str_lazy2")
+        logger.setLevel(logging.INFO)
+        with umock.patch.object(
+            hpandas, "df_to_str", wraps=hpandas.df_to_str
+        ) as df_to_str_mock:
+            # Run.
+            logger.debug("df=\n%s", hpandas.df_to_str_lazy(df))
+            # Check output.
+            self.assertEqual(df_to_str_mock.call_count, 0)
+            logger.info("df=\n%s", hpandas.df_to_str_lazy(df))
+            # The message is formatted by each handler emitting it.
+            self.assertLess(0, df_to_str_mock.call_count)
+
+
+# #############################################################################
+# Test_df_to_str_lazy_performance1
+# #############################################################################
+
+
+@pytest.mark.slow("~3 seconds.")
+class Test_df_to_str_lazy_performance1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Compare the cost of a disabled debug log call with a dataframe.
+        """
+        df = pd.DataFrame(np.random.rand(100000, 20))
+        logger = logging.getLogger(f"{__name__}.test_df_to_str_lazy_perf1")
+        logger.setLevel(logging.INFO)
+        num_iters = 100
+        # Run.
+        start_time = time.perf_counter()
+        for _ in range(num_iters):
+            logger.debug("df=\n%s", hpandas.df_to_str(df))
+        eager_time = (time.perf_counter() - start_time) / num_iters
+        start_time = time.perf_counter()
+        for _ in range(num_iters):
+            logger.debug("df=\n%s", hpandas.df_to_str_lazy(df))
+        lazy_time = (time.perf_counter() - start_time) / num_iters
+        _LOG.info(
+            "Cost per call: eager=%.6f secs, lazy=%.6f secs",
+            eager_time,
+            lazy_time,
+        )
+        # Check output.
+        self.assertLess(lazy_time, eager_time)
+
 
 # #############################################################################
 # Test_assemble_df_rows
@@ -2906,6 +3015,131 @@ class Test_compare_dfs(hunitest.TestCase):
             )
 
 
+# #############################################################################
+# Test_compute_df_diff_summary
+# #############################################################################
+
+
+class Test_compute_df_diff_summary(hunitest.TestCase):
+    @staticmethod
+    def get_test_dfs() -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Build dfs with differences, NaNs, and a shuffled index.
+        """
+        index = pd.date_range(
+            "2022-01-01 21:01:00+00:00", periods=5, freq="1min"
+        )
+        df1 = pd.DataFrame(
+            {
+                "tsA": [1.0, 2.0, 3.0, np.nan, 5.0],
+                "tsB": [4.0, 5.0, 6.0, 7.0, 3e-9],
+                "tsC": [7.0, 8.0, 9.0, 10.0, 11.0],
+            },
+            index=index,
+        )
+        df2 = pd.DataFrame(
+            {
+                "tsB": [0.0, 5.0, 5.8, 7.0, 0.0],
+                "tsA": [1.1, 2.0, 3.0, 4.0, 5.0],
+            },
+            index=index,
+        )
+        # Drop the first row and reverse the order of the rows.
+        df2 = df2.iloc[1:].iloc[::-1]
+        return df1, df2
+
+    def test1(self) -> None:
+        """
+        Check the summary with "inner" modes and "diff".
+        """
+        df1, df2 = self.get_test_dfs()
+        df1_copy = df1.copy()
+        df2_copy = df2.copy()
+        # Run.
+        stats_df, offending_cells_df = hpandas.compute_df_diff_summary(
+            df1, df2, row_mode="inner", column_mode="inner", diff_threshold=0.1
+        )
+        # Check output.
+        actual = hpandas.df_to_str(stats_df)
+        expected = r"""
+             max_abs_diff  max_rel_diff  num_violations
+        tsA           0.0      0.000000               1
+        tsB           0.2      3.448276               1
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+        actual = hpandas.df_to_str(offending_cells_df)
+        expected = r"""
+                                  column  df1  df2  abs_diff  rel_diff
+        2022-01-01 21:03:00+00:00    tsB  6.0  5.8       0.2  3.448276
+        2022-01-01 21:04:00+00:00    tsA  NaN  4.0       NaN       NaN
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+        # Check that the inputs are not modified.
+        hunitest.compare_df(df1, df1_copy)
+        hunitest.compare_df(df2, df2_copy)
+
+    def test2(self) -> None:
+        """
+        Check "pct_change" with a limited number of offending cells.
+        """
+        df1, df2 = self.get_test_dfs()
+        df1 = df1[["tsA", "tsB"]].iloc[1:]
+        df2 = df2.sort_index() * 1.1
+        # Run.
+        stats_df, offending_cells_df = hpandas.compute_df_diff_summary(
+            df1,
+            df2,
+            diff_mode="pct_change",
+            diff_threshold=5.0,
+            num_offending_cells=3,
+        )
+        # Check output.
+        actual = hpandas.df_to_str(stats_df)
+        expected = r"""
+             max_abs_diff  max_rel_diff  num_violations
+        tsA           0.5      9.090909               4
+        tsB           0.7      9.090909               3
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+        actual = hpandas.df_to_str(offending_cells_df)
+        expected = r"""
+                                  column  df1  df2  abs_diff  rel_diff
+        2022-01-01 21:02:00+00:00    tsA  2.0  2.2       0.2  9.090909
+        2022-01-01 21:02:00+00:00    tsB  5.0  5.5       0.5  9.090909
+        2022-01-01 21:03:00+00:00    tsA  3.0  3.3       0.3  9.090909
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+
+    def test3(self) -> None:
+        """
+        Check that the result does not depend on the chunk size.
+        """
+        np.random.seed(0)
+        df1 = pd.DataFrame(np.random.rand(1000, 4), columns=list("abcd"))
+        df2 = df1 + np.random.normal(scale=1e-3, size=df1.shape)
+        df2.iloc[::7, 1] = np.nan
+        kwargs = {"num_offending_cells": 20}
+        # Run.
+        stats_df1, offending_cells_df1 = hpandas.compute_df_diff_summary(
+            df1, df2, chunk_size=1000, **kwargs
+        )
+        stats_df2, offending_cells_df2 = hpandas.compute_df_diff_summary(
+            df1, df2, chunk_size=33, **kwargs
+        )
+        # Check output.
+        hunitest.compare_df(stats_df1, stats_df2)
+        hunitest.compare_df(offending_cells_df1, offending_cells_df2)
+        self.assertEqual(offending_cells_df1.shape[0], 20)
+
+    def test_invalid_input(self) -> None:
+        """
+        Check that non-numeric columns are rejected.
+        """
+        df = pd.DataFrame({"a": ["x", "y"]})
+        with self.assertRaises(AssertionError):
+            hpandas.compute_df_diff_summary(df, df)
+
+
 # #############################################################################
 # Test_subset_multiindex_df
 # #############################################################################
@@ -1,11 +1,18 @@
 import datetime
+import functools
 import logging
+import multiprocessing
 import os
+import queue
 import random
-from typing import Any, List, Optional, Tuple
+import resource
+import time
+from typing import Any, Callable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import pyarrow
+import pyarrow.compute
 import pyarrow.parquet as parquet
 import pytest
 
@@ -180,6 +187,20 @@ class TestParquet1(hunitest.TestCase):
         # Check.
         _compare_dfs(self, df, df2)
 
+    def test_write_and_read_report_stats1(self) -> None:
+        """
+        Read all the columns from the file reporting its size.
+        """
+        df, file_name = self.write_data_as_parquet()
+        # Run.
+        with self.assertLogs(hparque._LOG, level=logging.INFO) as cm:
+            df2 = hparque.from_parquet(
+                file_name, log_level=logging.INFO, report_stats=True
+            )
+        # Check output.
+        _compare_dfs(self, df, df2)
+        self.assertIn(f"Loaded '{file_name}' (size=", cm.output[0])
+
     def test_write_and_read_one_column1(self) -> None:
         """
         - Read back one column of the data from the file.
@@ -1019,6 +1040,187 @@ class TestToPartitionedDataset(hunitest.TestCase):
         self.assert_equal(actual, expected, fuzzy_match=True)
 
 
+# #############################################################################
+# TestToPartitionedDatasetWriteMode1
+# #############################################################################
+
+
+class TestToPartitionedDatasetWriteMode1(hunitest.TestCase):
+    @staticmethod
+    def get_test_data(
+        start: str, close: float, knowledge_timestamp: str
+    ) -> pd.DataFrame:
+        """
+        Build 3 minutes of data for 2 assets.
+        """
+        index = pd.date_range(start, periods=3, freq="T", name="timestamp")
+        df = pd.concat(
+            [
+                pd.DataFrame({"asset": asset, "close": close}, index=index)
+                for asset in ["A", "B"]
+            ]
+        )
+        df["knowledge_timestamp"] = pd.Timestamp(knowledge_timestamp)
+        return df
+
+    def write(self, df: pd.DataFrame, dst_dir: str, write_mode: str) -> None:
+        hparque.to_partitioned_parquet(
+            df,
+            ["asset"],
+            dst_dir,
+            write_mode=write_mode,
+            num_threads=2,
+            update_manifest=True,
+        )
+
+    def get_tile_files(self, dst_dir: str) -> List[str]:
+        file_names = sorted(os.listdir(os.path.join(dst_dir, "asset=A")))
+        return file_names
+
+    def check_data(self, dst_dir: str, expected: str) -> None:
+        df = hparque.from_parquet(dst_dir)
+        df = df.reset_index().sort_values(["asset", "timestamp", "close"])
+        df = df.reset_index(drop=True)
+        actual = hpandas.df_to_str(df, num_rows=None, print_shape_info=False)
+        self.assert_equal(actual, expected, fuzzy_match=True)
+        # The manifest is kept in sync.
+        manifest = hparque.load_parquet_manifest(dst_dir)
+        self.assertEqual(manifest, hparque.build_parquet_manifest(dst_dir))
+
+    def test_append1(self) -> None:
+        """
+        Test that appending adds a file to each tile.
+        """
+        dst_dir = self.get_scratch_space()
+        df = self.get_test_data("2022-01-01 00:00", 1.0, "2022-01-02")
+        self.write(df, dst_dir, "append")
+        # Run.
+        df = self.get_test_data("2022-01-01 00:02", 2.0, "2022-01-03")
+        self.write(df, dst_dir, "append")
+        # Check output.
+        self.assertEqual(len(self.get_tile_files(dst_dir)), 2)
+        expected = r"""
+        timestamp  close knowledge_timestamp asset
+        0  2022-01-01 00:00:00    1.0          2022-01-02     A
+        1  2022-01-01 00:01:00    1.0          2022-01-02     A
+        2  2022-01-01 00:02:00    1.0          2022-01-02     A
+        3  2022-01-01 00:02:00    2.0          2022-01-03     A
+        4  2022-01-01 00:03:00    2.0          2022-01-03     A
+        5  2022-01-01 00:04:00    2.0          2022-01-03     A
+        6  2022-01-01 00:00:00    1.0          2022-01-02     B
+        7  2022-01-01 00:01:00    1.0          2022-01-02     B
+        8  2022-01-01 00:02:00    1.0          2022-01-02     B
+        9  2022-01-01 00:02:00    2.0          2022-01-03     B
+        10 2022-01-01 00:03:00    2.0          2022-01-03     B
+        11 2022-01-01 00:04:00    2.0          2022-01-03     B
+        """
+        self.check_data(dst_dir, expected)
+
+    def test_overwrite1(self) -> None:
+        """
+        Test that overwriting replaces the data of each tile.
+        """
+        dst_dir = self.get_scratch_space()
+        df = self.get_test_data("2022-01-01 00:00", 1.0, "2022-01-02")
+        self.write(df, dst_dir, "append")
+        self.write(df, dst_dir, "append")
+        # Run.
+        df = self.get_test_data("2022-01-01 00:05", 3.0, "2022-01-03")
+        self.write(df.iloc[:4], dst_dir, "overwrite")
+        # Check output.
+        self.assertEqual(self.get_tile_files(dst_dir), ["data.parquet"])
+        expected = r"""
+        timestamp  close knowledge_timestamp asset
+        0 2022-01-01 00:05:00    3.0          2022-01-03     A
+        1 2022-01-01 00:06:00    3.0          2022-01-03     A
+        2 2022-01-01 00:07:00    3.0          2022-01-03     A
+        3 2022-01-01 00:05:00    3.0          2022-01-03     B
+        """
+        self.check_data(dst_dir, expected)
+
+    def test_merge1(self) -> None:
+        """
+        Test that merging removes the duplicates keeping the new rows.
+        """
+        dst_dir = self.get_scratch_space()
+        df = self.get_test_data("2022-01-01 00:00", 1.0, "2022-01-02")
+        self.write(df, dst_dir, "append")
+        # Run.
+        df = self.get_test_data("2022-01-01 00:02", 1.0, "2022-01-03")
+        self.write(df, dst_dir, "merge")
+        # Check output.
+        self.assertEqual(self.get_tile_files(dst_dir), ["data.parquet"])
+        expected = r"""
+        timestamp  close knowledge_timestamp asset
+        0 2022-01-01 00:00:00    1.0          2022-01-02     A
+        1 2022-01-01 00:01:00    1.0          2022-01-02     A
+        2 2022-01-01 00:02:00    1.0          2022-01-03     A
+        3 2022-01-01 00:03:00    1.0          2022-01-03     A
+        4 2022-01-01 00:04:00    1.0          2022-01-03     A
+        5 2022-01-01 00:00:00    1.0          2022-01-02     B
+        6 2022-01-01 00:01:00    1.0          2022-01-02     B
+        7 2022-01-01 00:02:00    1.0          2022-01-03     B
+        8 2022-01-01 00:03:00    1.0          2022-01-03     B
+        9 2022-01-01 00:04:00    1.0          2022-01-03     B
+        """
+        self.check_data(dst_dir, expected)
+
+    def test_merge2(self) -> None:
+        """
+        Test that merging replaces the rows with the same index.
+        """
+        dst_dir = self.get_scratch_space()
+        df = self.get_test_data("2022-01-01 00:00", 1.0, "2022-01-02")
+        self.write(df, dst_dir, "append")
+        # Run.
+        df = self.get_test_data("2022-01-01 00:01", 2.0, "2022-01-03")
+        self.write(df[df["asset"] == "A"], dst_dir, "merge")
+        # Check output.
+        self.assertEqual(self.get_tile_files(dst_dir), ["data.parquet"])
+        expected = r"""
+        timestamp  close knowledge_timestamp asset
+        0 2022-01-01 00:00:00    1.0          2022-01-02     A
+        1 2022-01-01 00:01:00    2.0          2022-01-03     A
+        2 2022-01-01 00:02:00    2.0          2022-01-03     A
+        3 2022-01-01 00:03:00    2.0          2022-01-03     A
+        4 2022-01-01 00:00:00    1.0          2022-01-02     B
+        5 2022-01-01 00:01:00    1.0          2022-01-02     B
+        6 2022-01-01 00:02:00    1.0          2022-01-02     B
+        """
+        self.check_data(dst_dir, expected)
+
+    def test_file_size1(self) -> None:
+        """
+        Test splitting the data of each tile in files and row groups.
+        """
+        index = pd.date_range("2022-01-01", periods=5, freq="T")
+        df = pd.DataFrame({"asset": "A", "close": range(5)}, index=index)
+        dst_dir = self.get_scratch_space()
+        # Run.
+        hparque.to_partitioned_parquet(
+            df,
+            ["asset"],
+            dst_dir,
+            write_mode="overwrite",
+            max_rows_per_file=2,
+            row_group_size=1,
+        )
+        # Check output.
+        file_names = self.get_tile_files(dst_dir)
+        self.assertEqual(
+            file_names, ["data-0.parquet", "data-1.parquet", "data-2.parquet"]
+        )
+        actual = [
+            parquet.read_metadata(
+                os.path.join(dst_dir, "asset=A", file_name)
+            ).num_row_groups
+            for file_name in file_names
+        ]
+        self.assertEqual(actual, [2, 2, 1])
+        actual = hparque.from_parquet(dst_dir)["close"].tolist()
+        self.assertEqual(actual, list(range(5)))
+
+
 # #############################################################################
 
 
@@ -1226,6 +1428,159 @@ class TestListAndMergePqFilesMixedUnits(hunitest.TestCase):
         _ = hparque.from_parquet(merged_file_name)
 
 
+# #############################################################################
+# TestListAndMergePqFilesStreaming1
+# #############################################################################
+
+
+class TestListAndMergePqFilesStreaming1(hunitest.TestCase):
+    def write_test_data(
+        self, *, duplicate_volume: float = 10.0, root_dir: Optional[str] = None
+    ) -> str:
+        """
+        Write 2 overlapping files in each of 2 leaf folders.
+
+        :param duplicate_volume: volume of the duplicated row in the second
+            file
+        :param root_dir: dir to write the data to, the scratch dir by default
+        """
+        if root_dir is None:
+            root_dir = self.get_scratch_space()
+        for currency_pair in ["ADA_USDT", "BTC_USDT"]:
+            dir_name = os.path.join(root_dir, f"currency_pair={currency_pair}")
+            timestamps = pd.date_range("2022-01-01", periods=4, freq="T")
+            for i, (start, volume) in enumerate([(0, 10.0), (2, 20.0)]):
+                df = pd.DataFrame(
+                    {
+                        "timestamp": timestamps[start : start + 2],
+                        "exchange_id": "binance",
+                        "close": [1.0 + start, 2.0 + start],
+                        "volume": volume,
+                    }
+                )
+                # Make the last row of the first file a duplicate of the first
+                # row of the second file.
+                if i == 1:
+                    df["timestamp"] = timestamps[start - 1 : start + 1]
+                    df.loc[0, "close"] = 2.0
+                    df.loc[0, "volume"] = duplicate_volume
+                file_name = os.path.join(dir_name, f"{i}.parquet")
+                hparque.to_parquet(df, file_name)
+        return root_dir
+
+    def test_streaming1(self) -> None:
+        """
+        Test that the streaming mode removes the same rows as the in-memory
+        mode.
+        """
+        root_dir = self.write_test_data()
+        # Run.
+        hparque.list_and_merge_pq_files(
+            root_dir, merge_mode="streaming", num_threads=2, batch_size=1
+        )
+        # Check output.
+        for currency_pair in ["ADA_USDT", "BTC_USDT"]:
+            dir_name = os.path.join(root_dir, f"currency_pair={currency_pair}")
+            self.assertEqual(os.listdir(dir_name), ["data.parquet"])
+        actual = hparque.from_parquet(root_dir)
+        actual_str = hpandas.df_to_str(actual, num_rows=None)
+        expected = r"""
+                     timestamp exchange_id  close  volume currency_pair
+        0  2022-01-01 00:00:00     binance    1.0    10.0      ADA_USDT
+        1  2022-01-01 00:01:00     binance    2.0    10.0      ADA_USDT
+        2  2022-01-01 00:02:00     binance    4.0    20.0      ADA_USDT
+        3  2022-01-01 00:00:00     binance    1.0    10.0      BTC_USDT
+        4  2022-01-01 00:01:00     binance    2.0    10.0      BTC_USDT
+        5  2022-01-01 00:02:00     binance    4.0    20.0      BTC_USDT
+        """
+        self.assert_equal(actual_str, expected, fuzzy_match=True)
+
+    def test_streaming_ohlcv1(self) -> None:
+        """
+        Test that the streaming mode keeps the row with the smallest volume,
+        like the in-memory mode.
+        """
+        root_dir = self.write_test_data(duplicate_volume=5.0)
+        # Run.
+        hparque.list_and_merge_pq_files(
+            root_dir,
+            drop_duplicates_mode="ohlcv",
+            merge_mode="streaming",
+            batch_size=1,
+        )
+        # Check output.
+        actual = hparque.from_parquet(
+            root_dir, filters=[("currency_pair", "==", "ADA_USDT")]
+        )
+        self.assertEqual(actual["close"].tolist(), [1.0, 2.0, 4.0])
+        self.assertEqual(actual["volume"].tolist(), [10.0, 5.0, 20.0])
+
+    def test_streaming_ohlcv2(self) -> None:
+        """
+        Test that the streaming and in-memory modes keep the same rows.
+        """
+        scratch_dir = self.get_scratch_space()
+        for duplicate_volume in [5.0, 10.0, 30.0]:
+            streaming_dir = os.path.join(
+                scratch_dir, f"streaming.{duplicate_volume}"
+            )
+            self.write_test_data(
+                duplicate_volume=duplicate_volume, root_dir=streaming_dir
+            )
+            in_memory_dir = os.path.join(
+                scratch_dir, f"in_memory.{duplicate_volume}"
+            )
+            self.write_test_data(
+                duplicate_volume=duplicate_volume, root_dir=in_memory_dir
+            )
+            # Run.
+            hparque.list_and_merge_pq_files(
+                streaming_dir,
+                drop_duplicates_mode="ohlcv",
+                merge_mode="streaming",
+                batch_size=1,
+            )
+            hparque.list_and_merge_pq_files(
+                in_memory_dir, drop_duplicates_mode="ohlcv"
+            )
+            # Check output.
+            actual = self._read_sorted(streaming_dir)
+            expected = self._read_sorted(in_memory_dir)
+            self.assert_equal(actual, expected)
+            self.assertEqual(len(actual.split("\n")), 7)
+
+    def test_update_manifest1(self) -> None:
+        """
+        Test that merging the files keeps the manifest in sync.
+        """
+        root_dir = self.write_test_data()
+        hparque.build_parquet_manifest(root_dir)
+        # Run.
+        hparque.list_and_merge_pq_files(root_dir, merge_mode="streaming")
+        # Check output.
+        actual = hparque.load_parquet_manifest(root_dir)
+        self.assertEqual(
+            sorted(actual["files"]),
+            [
+                "currency_pair=ADA_USDT/data.parquet",
+                "currency_pair=BTC_USDT/data.parquet",
+            ],
+        )
+        expected = hparque.build_parquet_manifest(root_dir)
+        self.assertEqual(actual, expected)
+
+    @staticmethod
+    def _read_sorted(root_dir: str) -> str:
+        """
+        Read the data of a dataset sorted by currency pair and timestamp.
+        """
+        df = hparque.from_parquet(root_dir)
+        df = df.sort_values(["currency_pair", "timestamp"])
+        df = df.reset_index(drop=True)
+        df_as_str = hpandas.df_to_str(df, num_rows=None)
+        return df_as_str
+
+
 # #############################################################################
 
 
@@ -1335,6 +1690,551 @@ class TestYieldParquetTiles(hunitest.TestCase):
         self.assertEqual(max_date.month, end_month)
         self.assertEqual(max_date.year, end_year)
 
+    def test_prefetch1(self) -> None:
+        """
+        Test that prefetching tiles returns the same tiles in the same order.
+        """
+        self.generate_test_data()
+        file_name = self.get_scratch_space()
+        start_date = datetime.date(2021, 11, 1)
+        end_date = datetime.date(2022, 2, 1)
+        columns = ["asset_id", "price"]
+        # Run.
+        actual = list(
+            hparque.yield_parquet_tiles_by_year(
+                file_name, start_date, end_date, columns, num_prefetched_tiles=2
+            )
+        )
+        # Check output.
+        expected = list(
+            hparque.yield_parquet_tiles_by_year(
+                file_name, start_date, end_date, columns
+            )
+        )
+        self.assertEqual(len(actual), len(expected))
+        for actual_tile, expected_tile in zip(actual, expected):
+            self.assert_equal(str(actual_tile), str(expected_tile))
+        # Run.
+        actual = list(
+            hparque.yield_parquet_tiles_by_assets(
+                file_name,
+                [100, 200, 300],
+                "asset_id",
+                1,
+                columns,
+                num_prefetched_tiles=2,
+            )
+        )
+        # Check output.
+        actual = [tile["asset_id"].unique().tolist() for tile in actual]
+        self.assertEqual(actual, [[100], [200], [300]])
+
+
+# #############################################################################
+# Test_yield_prefetched_tiles1
+# #############################################################################
+
+
+class Test_yield_prefetched_tiles1(hunitest.TestCase):
+    def get_read_tile_funcs(
+        self, num_tiles: int, started: List[int]
+    ) -> List[Callable[[], pd.DataFrame]]:
+        """
+        Build functions returning a tile and recording when they start.
+        """
+
+        def _read_tile(idx: int) -> pd.DataFrame:
+            started.append(idx)
+            return pd.DataFrame({"idx": [idx]})
+
+        return [functools.partial(_read_tile, i) for i in range(num_tiles)]
+
+    def test_bounded1(self) -> None:
+        """
+        Test that at most `num_prefetched_tiles` tiles are read ahead.
+        """
+        started: List[int] = []
+        read_tile_funcs = self.get_read_tile_funcs(10, started)
+        # Run.
+        generator_ = hparque._yield_prefetched_tiles(read_tile_funcs, 2)
+        tile = next(generator_)
+        # Check output.
+        self.assertEqual(tile["idx"].tolist(), [0])
+        self.assertLessEqual(len(started), 2)
+        tile = next(generator_)
+        self.assertEqual(tile["idx"].tolist(), [1])
+        self.assertLessEqual(len(started), 3)
+        # Stop early: the remaining tiles are not read.
+        generator_.close()
+        self.assertLessEqual(len(started), 4)
+
+    def test_no_prefetch1(self) -> None:
+        """
+        Test that each tile is read only when requested.
+        """
+        started: List[int] = []
+        read_tile_funcs = self.get_read_tile_funcs(3, started)
+        # Run.
+        generator_ = hparque._yield_prefetched_tiles(read_tile_funcs, 0)
+        # Check output.
+        for i in range(3):
+            tile = next(generator_)
+            self.assertEqual(tile["idx"].tolist(), [i])
+            self.assertEqual(started, list(range(i + 1)))
+
+
+# #############################################################################
+# TestYieldParquetTiles_performance1
+# #############################################################################
+
+
+@pytest.mark.requires_ck_infra
+@pytest.mark.requires_aws
+@pytest.mark.skipif(
+    not hserver.is_CK_S3_available(),
+    reason="Run only if CK S3 is available",
+)
+class TestYieldParquetTiles_performance1(hmoto.S3Mock_TestCase):
+    """
+    Compare the throughput of reading tiles from S3 with and without
+    prefetching, while the consumer processes each tile.
+    """
+
+    @pytest.mark.slow("~10 seconds.")
+    def test1(self) -> None:
+        # Upload 12 months of minute data for 2 assets to the mocked bucket.
+        index = pd.date_range(
+            "2022-01-01", "2022-12-31 23:59", freq="T", name="end_ts"
+        )
+        df = pd.DataFrame(
+            {"price": np.arange(len(index), dtype=float)}, index=index
+        )
+        df = pd.concat([df.assign(asset_id=100), df.assign(asset_id=200)])
+        df["year"] = df.index.year
+        df["month"] = df.index.month
+        local_dir = self.get_scratch_space()
+        hparque.to_partitioned_parquet(
+            df, ["asset_id", "year", "month"], local_dir
+        )
+        s3fs_ = hs3.get_s3fs(self.mock_aws_profile)
+        s3_dir = f"s3://{self.bucket_name}/tiles"
+        s3fs_.put(local_dir, s3_dir, recursive=True)
+        # Run.
+        for num_prefetched_tiles in [0, 2, 4]:
+            generator_ = hparque.yield_parquet_tiles_by_year(
+                s3_dir,
+                datetime.date(2022, 1, 1),
+                datetime.date(2022, 12, 31),
+                ["asset_id", "price"],
+                num_prefetched_tiles=num_prefetched_tiles,
+            )
+            start_time = time.time()
+            num_rows = 0
+            for tile in generator_:
+                # Simulate processing the tile.
+                time.sleep(0.05)
+                num_rows += len(tile)
+            elapsed_time = time.time() - start_time
+            print(
+                f"num_prefetched_tiles={num_prefetched_tiles}: "
+                f"{num_rows / elapsed_time:.0f} rows/s, "
+                f"elapsed_time={elapsed_time:.2f} s"
+            )
+            # Check output.
+            self.assertEqual(num_rows, len(df))
+
+
+# #############################################################################
+# TestParquetManifest1
+# #############################################################################
+
+
+class TestParquetManifest1(hunitest.TestCase):
+    def write_test_data(self, *, update_manifest: bool = False) -> str:
+        """
+        Write one file per asset, year and month, like in
+        `TestYieldParquetTiles`.
+        """
+        asset_ids = [100, 200, 300, 400]
+        dates = ["2021-11-01", "2021-12-01", "2022-01-01", "2022-02-01"]
+        dates = map(pd.Timestamp, dates)
+        multi_index = pd.MultiIndex.from_product(
+            [dates, asset_ids], names=["end_ts", "asset_id"]
+        )
+        df = pd.DataFrame({"price": list(range(1, 17))}, index=multi_index)
+        df["year"] = df.index.get_level_values(0).year
+        df["month"] = df.index.get_level_values(0).month
+        df = df.reset_index(level=1)
+        partition_columns = ["asset_id", "year", "month"]
+        dst_dir = self.get_scratch_space()
+        hparque.to_partitioned_parquet(
+            df, partition_columns, dst_dir, update_manifest=update_manifest
+        )
+        return dst_dir
+
+    def test_build_manifest1(self) -> None:
+        """
+        Test that the manifest stores partitions and statistics of the files.
+        """
+        dst_dir = self.write_test_data()
+        # Run.
+        hparque.build_parquet_manifest(dst_dir)
+        manifest = hparque.load_parquet_manifest(dst_dir)
+        # Check output.
+        self.assertEqual(len(manifest["files"]), 16)
+        rel_path = [
+            rel_path
+            for rel_path in manifest["files"]
+            if rel_path.startswith("asset_id=200/year=2021/month=12/")
+        ]
+        self.assertEqual(len(rel_path), 1)
+        file_manifest = manifest["files"][rel_path[0]]
+        actual = str(file_manifest["partition"])
+        expected = "{'asset_id': 200, 'year': 2021, 'month': 12}"
+        self.assert_equal(actual, expected)
+        self.assertEqual(file_manifest["num_rows"], 1)
+        stats = file_manifest["row_groups"][0]["stats"]
+        self.assertEqual(stats["price"], [6, 6])
+        self.assertEqual(
+            stats["end_ts"], [{"timestamp": "2021-12-01T00:00:00"}] * 2
+        )
+
+    def test_prune_row_groups1(self) -> None:
+        """
+        Test that row groups are pruned using their statistics.
+        """
+        dst_dir = self.get_scratch_space()
+        df = pd.DataFrame(
+            {"price": range(10)},
+            index=pd.date_range("2022-01-01", periods=10, freq="D", name="ts"),
+        )
+        file_name = os.path.join(dst_dir, "data.parquet")
+        table = pyarrow.Table.from_pandas(df)
+        parquet.write_table(table, file_name, row_group_size=3)
+        manifest = hparque.build_parquet_manifest(dst_dir)
+        filters = [
+            [("price", ">=", 4), ("price", "<", 6)],
+            [("ts", "==", pd.Timestamp("2022-01-10"))],
+        ]
+        # Run.
+        actual = hparque.prune_parquet_files(manifest, filters)
+        # Check output.
+        self.assertEqual(actual, {"data.parquet": [1, 3]})
+        # Read the data using only the selected row groups.
+        actual = hparque.from_parquet(
+            dst_dir, filters=filters, use_manifest=True
+        )
+        expected = hparque.from_parquet(dst_dir, filters=filters)
+        self.assert_equal(str(actual), str(expected))
+        self.assertEqual(actual["price"].tolist(), [4, 5, 9])
+
+    def test_from_parquet1(self) -> None:
+        """
+        Test that reading with the manifest is equivalent to reading without.
+        """
+        dst_dir = self.write_test_data()
+        hparque.build_parquet_manifest(dst_dir)
+        schema = [
+            ("asset_id", pyarrow.int64()),
+            ("year", pyarrow.int64()),
+            ("month", pyarrow.int64()),
+        ]
+        filters = [
+            [("asset_id", "in", [100, 300]), ("year", "==", 2022)],
+            [("price", ">", 14)],
+        ]
+        for columns in [None, ["asset_id", "price"]]:
+            # Run.
+            actual = hparque.from_parquet(
+                dst_dir,
+                columns=columns,
+                filters=filters,
+                schema=schema,
+                use_manifest=True,
+            )
+            # Check output.
+            expected = hparque.from_parquet(
+                dst_dir, columns=columns, filters=filters, schema=schema
+            )
+            actual = actual.sort_values(["asset_id", "price"])
+            expected = expected.sort_values(["asset_id", "price"])
+            self.assert_equal(
+                hpandas.df_to_str(actual, num_rows=None),
+                hpandas.df_to_str(expected, num_rows=None),
+            )
+            self.assertEqual(actual.dtypes.to_dict(), expected.dtypes.to_dict())
+
+    def test_from_parquet_no_match1(self) -> None:
+        """
+        Test reading with a filter that excludes all the files.
+        """
+        dst_dir = self.write_test_data(update_manifest=True)
+        filters = [("asset_id", "==", 500)]
+        # Run.
+        df = hparque.from_parquet(dst_dir, filters=filters, use_manifest=True)
+        # Check output.
+        self.assertEqual(len(df), 0)
+        self.assertIn("price", df.columns)
+
+    def test_update_manifest1(self) -> None:
+        """
+        Test that `to_partitioned_parquet()` updates the manifest.
+        """
+        dst_dir = self.write_test_data(update_manifest=True)
+        manifest = hparque.load_parquet_manifest(dst_dir)
+        self.assertEqual(len(manifest["files"]), 16)
+        # Add a new tile.
+        df = pd.DataFrame(
+            {"asset_id": [500], "price": [17], "year": [2022], "month": [3]},
+            index=pd.DatetimeIndex(["2022-03-01"], name="end_ts"),
+        )
+        # Run.
+        hparque.to_partitioned_parquet(
+            df, ["asset_id", "year", "month"], dst_dir, update_manifest=True
+        )
+        # Check output.
+        manifest = hparque.load_parquet_manifest(dst_dir)
+        self.assertEqual(len(manifest["files"]), 17)
+        expected = hparque.build_parquet_manifest(dst_dir)
+        self.assertEqual(manifest, expected)
+
+    def test_update_manifest2(self) -> None:
+        """
+        Test that `to_partitioned_parquet()` updates an existing manifest by
+        default.
+        """
+        dst_dir = self.write_test_data(update_manifest=True)
+        # Add a new tile.
+        df = pd.DataFrame(
+            {"asset_id": [500], "price": [17], "year": [2022], "month": [3]},
+            index=pd.DatetimeIndex(["2022-03-01"], name="end_ts"),
+        )
+        # Run.
+        hparque.to_partitioned_parquet(
+            df, ["asset_id", "year", "month"], dst_dir
+        )
+        # Check output.
+        df = hparque.from_parquet(dst_dir, use_manifest=True)
+        self.assertEqual(len(df), 17)
+
+    def test_from_parquet_partition_types1(self) -> None:
+        """
+        Test reading a partition column with both int and string values.
+        """
+        df = pd.DataFrame(
+            {"asset": ["1", "BTC"], "price": [1.0, 2.0]},
+            index=pd.DatetimeIndex(["2022-01-01", "2022-01-02"], name="end_ts"),
+        )
+        dst_dir = self.get_scratch_space()
+        hparque.to_partitioned_parquet(
+            df, ["asset"], dst_dir, update_manifest=True
+        )
+        filters = [("asset", "==", "BTC")]
+        # Run.
+        actual = hparque.from_parquet(
+            dst_dir, filters=filters, use_manifest=True
+        )
+        # Check output.
+        expected = hparque.from_parquet(dst_dir, filters=filters)
+        self.assertEqual(
+            hpandas.df_to_str(actual, num_rows=None),
+            hpandas.df_to_str(expected, num_rows=None),
+        )
+        self.assertEqual(actual["price"].tolist(), [2.0])
+
+    def test_yield_tiles_by_year1(self) -> None:
+        """
+        Test `yield_parquet_tiles_by_year()` with the manifest.
+        """
+        dst_dir = self.write_test_data(update_manifest=True)
+        start_date = datetime.date(2021, 12, 1)
+        end_date = datetime.date(2022, 1, 2)
+        asset_ids = [300, 400]
+        columns = ["asset_id", "price"]
+        # Run.
+        generator_ = hparque.yield_parquet_tiles_by_year(
+            dst_dir,
+            start_date,
+            end_date,
+            columns,
+            asset_ids=asset_ids,
+            use_manifest=True,
+        )
+        actual = pd.concat(generator_)
+        # Check output.
+        generator_ = hparque.yield_parquet_tiles_by_year(
+            dst_dir, start_date, end_date, columns, asset_ids=asset_ids
+        )
+        expected = pd.concat(generator_)
+        self.assert_equal(str(actual), str(expected))
+        self.assertEqual(actual["price"].tolist(), [7, 8, 11, 12])
+
+
+# #############################################################################
+# TestFromParquetAsArrow1
+# #############################################################################
+
+
+class TestFromParquetAsArrow1(hunitest.TestCase):
+    def write_test_data(self) -> str:
+        df = _get_df_example1()
+        df["year"] = df.index.year
+        dst_dir = self.get_scratch_space()
+        hparque.to_partitioned_parquet(df, ["instr", "year"], dst_dir)
+        return dst_dir
+
+    def test_table1(self) -> None:
+        """
+        Test that converting the table gives the same data as `from_parquet()`.
+        """
+        dst_dir = self.write_test_data()
+        columns = ["instr", "val1"]
+        filters = [("instr", "in", ["A", "C"]), ("val1", ">", 50)]
+        # Run.
+        table = hparque.from_parquet_as_arrow(
+            dst_dir, columns=columns, filters=filters
+        )
+        # Check output.
+        self.assertIsInstance(table, pyarrow.Table)
+        # The index column is also read.
+        self.assertEqual(
+            table.column_names, ["instr", "val1", "__index_level_0__"]
+        )
+        actual = hparque.arrow_to_pandas(table)
+        expected = hparque.from_parquet(
+            dst_dir, columns=columns, filters=filters
+        )
+        _compare_dfs(self, actual, expected)
+
+    def test_batches1(self) -> None:
+        """
+        Test reading the data lazily in batches.
+        """
+        dst_dir = self.write_test_data()
+        filters = [("instr", "==", "B")]
+        # Run.
+        batches = hparque.from_parquet_as_arrow(
+            dst_dir,
+            columns=["val2"],
+            filters=filters,
+            as_batches=True,
+            batch_size=10,
+        )
+        # Check output.
+        num_rows = 0
+        val2_sum = 0
+        for batch in batches:
+            self.assertLessEqual(batch.num_rows, 10)
+            num_rows += batch.num_rows
+            val2_sum += pyarrow.compute.sum(batch.column("val2")).as_py()
+        expected = hparque.from_parquet(dst_dir, filters=filters)
+        self.assertEqual(num_rows, len(expected))
+        self.assertEqual(val2_sum, expected["val2"].sum())
+
+
+def _get_peak_rss_increase_in_mb(
+    func: Callable[[], Any], *, timeout_in_secs: float = 60.0
+) -> float:
+    """
+    Return the increase of the peak RSS caused by running `func` in a new
+    process.
+
+    :param timeout_in_secs: maximum time to wait for the result
+    """
+
+    def _run(result_queue: multiprocessing.Queue) -> None:
+        rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        _ = func()
+        rss_end = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # `ru_maxrss` is in KB on Linux.
+        result_queue.put((rss_end - rss_start) / 1024)
+
+    # Use `fork` so that `func` doesn't need to be pickled.
+    ctx = multiprocessing.get_context("fork")
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_run, args=(result_queue,))
+    process.start()
+    try:
+        rss_increase: float = result_queue.get(timeout=timeout_in_secs)
+    except queue.Empty:
+        # The process died or is stuck.
+        process.kill()
+        process.join()
+        hdbg.dfatal(
+            f"The process returned no result: exitcode={process.exitcode}"
+        )
+    process.join()
+    hdbg.dassert_eq(process.exitcode, 0)
+    return rss_increase
+
+
+@pytest.mark.slow("~3 seconds.")
+class TestFromParquetAsArrow_performance1(hunitest.TestCase):
+    """
+    Compare the peak memory of reading a wide table with and without Pandas.
+    """
+
+    def test1(self) -> None:
+        num_rows = 200_000
+        num_cols = 40
+        df = pd.DataFrame(
+            np.random.default_rng(0).random((num_rows, num_cols)),
+            columns=[f"col{i}" for i in range(num_cols)],
+        )
+        dst_dir = self.get_scratch_space()
+        # Use multiple row groups so that the data can be read in batches.
+        table = pyarrow.Table.from_pandas(df)
+        file_name = os.path.join(dst_dir, "data.parquet")
+        parquet.write_table(table, file_name, row_group_size=num_rows // 20)
+        _LOG.info("data_size=%.1f MB", df.memory_usage().sum() / 2**20)
+        # Free the memory before forking the processes.
+        del df, table
+
+        def _sum_batches(columns: Optional[List[str]]) -> float:
+            batches = hparque.from_parquet_as_arrow(
+                dst_dir, columns=columns, as_batches=True
+            )
+            return sum(
+                pyarrow.compute.sum(batch.column("col0")).as_py()
+                for batch in batches
+            )
+
+        funcs = {
+            "no_op": lambda: None,
+            "from_parquet": lambda: hparque.from_parquet(dst_dir),
+            "from_parquet_as_arrow": lambda: hparque.from_parquet_as_arrow(
+                dst_dir
+            ),
+            "from_parquet_as_arrow(as_batches=True)": lambda: _sum_batches(
+                None
+            ),
+            "from_parquet_as_arrow(columns=['col0'], as_batches=True)": (
+                lambda: _sum_batches(["col0"])
+            ),
+        }
+        # Run.
+        rss_increases = {}
+        for tag, func in funcs.items():
+            rss_increases[tag] = _get_peak_rss_increase_in_mb(func)
+            _LOG.info(
+                "%s: peak_rss_increase=%.1f MB", tag, rss_increases[tag]
+            )
+        # Check output.
+        # Reading the entire table with Arrow saves only the conversion to
+        # Pandas, which is too small to check reliably, while reading in
+        # batches avoids materializing the entire table.
+        pandas_rss_increase = rss_increases["from_parquet"]
+        self.assertLess(
+            rss_increases["from_parquet_as_arrow(as_batches=True)"],
+            pandas_rss_increase,
+        )
+        self.assertLess(
+            rss_increases[
+                "from_parquet_as_arrow(columns=['col0'], as_batches=True)"
+            ],
+            pandas_rss_increase / 2,
+        )
+
 
 # #############################################################################
 
@@ -1,5 +1,9 @@
+import concurrent.futures
+import gzip
+import io
 import logging
 import os
+import unittest.mock as umock
 from typing import Generator, Tuple
 
 import pytest
@@ -150,6 +154,104 @@ class TestToFileAndFromFile1(hmoto.S3Mock_TestCase):
         self.assert_equal(actual, expected)
 
 
+# #############################################################################
+# TestStreamingReads1
+# #############################################################################
+
+
+@pytest.mark.requires_ck_infra
+@pytest.mark.requires_aws
+@pytest.mark.skipif(
+    not hserver.is_CK_S3_available(),
+    reason="Run only if CK S3 is available",
+)
+class TestStreamingReads1(hmoto.S3Mock_TestCase):
+    """
+    Check the streaming reads from S3.
+    """
+
+    file_content = "\n".join(f"line_mock{i}" for i in range(1000))
+
+    def test_iter_lines1(self) -> None:
+        """
+        Verify that the lines of a compressed file are read in small blocks.
+        """
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        s3_path = f"s3://{self.bucket_name}/mock.txt.gz"
+        hs3.to_file(self.file_content, s3_path, aws_profile=moto_s3fs)
+        # Run.
+        lines = list(
+            hs3.iter_lines(s3_path, block_size=1024, aws_profile=moto_s3fs)
+        )
+        # Check output.
+        self.assertEqual(lines, self.file_content.split("\n"))
+
+    def test_read_byte_range1(self) -> None:
+        """
+        Verify that the header and the tail of a file are read.
+        """
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        s3_path = f"s3://{self.bucket_name}/mock.txt"
+        hs3.to_file(self.file_content, s3_path, aws_profile=moto_s3fs)
+        # Run.
+        header = hs3.read_byte_range(s3_path, 0, 11, aws_profile=moto_s3fs)
+        tail = hs3.read_byte_range(s3_path, -13, aws_profile=moto_s3fs)
+        # Check output.
+        self.assertEqual(header, b"line_mock0\n")
+        self.assertEqual(tail, b"line_mock999\n")
+
+
+# #############################################################################
+# TestStreamingReads2
+# #############################################################################
+
+
+class TestStreamingReads2(hunitest.TestCase):
+    """
+    Check the streaming reads from local files.
+    """
+
+    file_content = "\n".join(f"line_mock{i}" for i in range(1000))
+
+    def test_iter_lines1(self) -> None:
+        """
+        Verify that the lines of a compressed file are read in small blocks.
+        """
+        file_name = os.path.join(self.get_scratch_space(), "mock.txt.gz")
+        hio.to_file(file_name, self.file_content, use_gzip=True)
+        # Run.
+        lines = list(hs3.iter_lines(file_name, block_size=1024))
+        # Check output.
+        self.assertEqual(lines, self.file_content.split("\n"))
+
+    def test_iter_chunks1(self) -> None:
+        """
+        Verify that a file is read in chunks of the requested size.
+        """
+        file_name = os.path.join(self.get_scratch_space(), "mock.txt")
+        hio.to_file(file_name, self.file_content)
+        # Run.
+        chunks = list(hs3.iter_chunks(file_name, chunk_size=1000))
+        # Check output.
+        self.assertEqual(b"".join(chunks), self.file_content.encode())
+        self.assertEqual([len(chunk) for chunk in chunks[:-1]], [1000] * 12)
+
+    def test_read_byte_range1(self) -> None:
+        """
+        Verify that the header and the tail of a file are read.
+        """
+        file_name = os.path.join(self.get_scratch_space(), "mock.txt")
+        hio.to_file(file_name, self.file_content)
+        # Run.
+        header = hs3.read_byte_range(file_name, 0, 11)
+        tail = hs3.read_byte_range(file_name, -12)
+        whole = hs3.read_byte_range(file_name, -(10**6))
+        # Check output.
+        self.assertEqual(header, b"line_mock0\n")
+        self.assertEqual(tail, b"line_mock999")
+        self.assertEqual(whole, self.file_content.encode())
+
+
 # #############################################################################
 # TestListdir1
 # #############################################################################
@@ -471,9 +573,316 @@ class Test_get_s3_bucket_from_stage(hunitest.TestCase):
         self.assert_equal(actual, expected, fuzzy_match=True)
 
 
+# #############################################################################
+# Test_get_s3fs_cache1
+# #############################################################################
+
+
+class Test_get_s3fs_cache1(hunitest.TestCase):
+    """
+    Check the cache of the filesystems and credentials used by `get_s3fs()`.
+    """
+
+    # Credentials for the artificial AWS profile `test_cache`.
+    env_vars = {
+        "TEST_CACHE_AWS_ACCESS_KEY_ID": "mock_key_id",
+        "TEST_CACHE_AWS_SECRET_ACCESS_KEY": "mock_secret_access_key",
+        "TEST_CACHE_AWS_DEFAULT_REGION": "us-east-1",
+    }
+
+    def set_up_test(self) -> None:
+        hs3.clear_filesystem_cache()
+
+    def tear_down_test(self) -> None:
+        hs3.clear_filesystem_cache()
+
+    @pytest.fixture(autouse=True)
+    def setup_teardown_test(self) -> Generator:
+        self.set_up_test()
+        yield
+        self.tear_down_test()
+
+    def test_reuse1(self) -> None:
+        """
+        Check that the filesystem is built only once.
+        """
+        with umock.patch.dict(hs3.os.environ, self.env_vars):
+            # Run.
+            s3fs1 = hs3.get_s3fs("test_cache")
+            s3fs2 = hs3.get_s3fs("test_cache")
+        # Check output.
+        self.assertIs(s3fs1, s3fs2)
+        actual = str(hs3.get_filesystem_cache_stats())
+        expected = "{'num_hits': 1, 'num_misses': 1, 'num_credentials_reads': 1}"
+        self.assert_equal(actual, expected)
+
+    def test_max_pool_connections1(self) -> None:
+        """
+        Check that the size of the connection pool is passed to the client.
+        """
+        with umock.patch.dict(hs3.os.environ, self.env_vars):
+            # Run.
+            s3fs1 = hs3.get_s3fs("test_cache")
+            s3fs2 = hs3.get_s3fs("test_cache", max_pool_connections=64)
+        # Check output.
+        self.assertIsNot(s3fs1, s3fs2)
+        self.assertEqual(s3fs2.config_kwargs, {"max_pool_connections": 64})
+        actual = str(hs3.get_filesystem_cache_stats())
+        expected = "{'num_hits': 0, 'num_misses': 2, 'num_credentials_reads': 1}"
+        self.assert_equal(actual, expected)
+
+    def test_refresh_credentials1(self) -> None:
+        """
+        Check that temporary credentials are read again when they expire.
+        """
+        env_vars = {**self.env_vars, "TEST_CACHE_AWS_SESSION_TOKEN": "token1"}
+        with umock.patch.dict(hs3.os.environ, env_vars), umock.patch.object(
+            hs3, "TEMPORARY_AWS_CREDENTIALS_TTL_IN_SECS", 0
+        ):
+            s3fs1 = hs3.get_s3fs("test_cache")
+            # The credentials are refreshed with the same values.
+            s3fs2 = hs3.get_s3fs("test_cache")
+            # The credentials are refreshed with a new token.
+            hs3.os.environ["TEST_CACHE_AWS_SESSION_TOKEN"] = "token2"
+            s3fs3 = hs3.get_s3fs("test_cache")
+        # Check output.
+        self.assertIs(s3fs1, s3fs2)
+        self.assertIsNot(s3fs2, s3fs3)
+        self.assertEqual(s3fs3.token, "token2")
+        actual = str(hs3.get_filesystem_cache_stats())
+        expected = "{'num_hits': 1, 'num_misses': 2, 'num_credentials_reads': 3}"
+        self.assert_equal(actual, expected)
+
+    def test_threads1(self) -> None:
+        """
+        Check that concurrent callers share the same filesystem.
+        """
+        with umock.patch.dict(hs3.os.environ, self.env_vars):
+            # Run.
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                s3fss = list(
+                    executor.map(lambda _: hs3.get_s3fs("test_cache"), range(32))
+                )
+        # Check output.
+        self.assertEqual(len({id(s3fs_) for s3fs_ in s3fss}), 1)
+        self.assertEqual(hs3.get_filesystem_cache_stats()["num_misses"], 1)
+
+    def test_ecs1(self) -> None:
+        """
+        Check that the task role is used inside ECS for any profile.
+        """
+        with umock.patch.object(
+            hs3.hserver, "is_inside_ecs_container", return_value=True
+        ), umock.patch.object(hs3, "get_aws_credentials") as mock_credentials:
+            # Run.
+            s3fs_ = hs3.get_s3fs("test_cache")
+        # Check output.
+        mock_credentials.assert_not_called()
+        self.assertIsNone(s3fs_.key)
+        self.assertIsNone(s3fs_.secret)
+
+
 _AWS_PROFILE = "ck"
 
 
+# #############################################################################
+# Test_get_part_ranges1
+# #############################################################################
+
+
+class Test_get_part_ranges1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Check that the last part is shorter when the size is not a multiple
+        of the part size.
+        """
+        # Run.
+        actual = hs3._get_part_ranges(10, 4)
+        # Check output.
+        expected = [(0, 4), (4, 8), (8, 10)]
+        self.assertEqual(actual, expected)
+
+    def test2(self) -> None:
+        """
+        Check that an empty file has no parts.
+        """
+        # Run.
+        actual = hs3._get_part_ranges(0, 4)
+        # Check output.
+        self.assertEqual(actual, [])
+
+
+# #############################################################################
+# Test_ParallelGzipWriter1
+# #############################################################################
+
+
+class Test_ParallelGzipWriter1(hunitest.TestCase):
+    def helper(self, data: bytes, chunk_size: int) -> bytes:
+        dst = io.BytesIO()
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            with hs3._ParallelGzipWriter(
+                dst, executor, chunk_size=chunk_size, max_pending_chunks=2
+            ) as gzip_file:
+                # Write in pieces not aligned with the chunks.
+                for start in range(0, len(data), 7):
+                    gzip_file.write(data[start : start + 7])
+        compressed: bytes = dst.getvalue()
+        return compressed
+
+    def test1(self) -> None:
+        """
+        Check that data compressed in multiple chunks is decompressed to the
+        original data.
+        """
+        data = b"".join(f"line {i}\n".encode() for i in range(1000))
+        # Run.
+        compressed = self.helper(data, chunk_size=100)
+        # Check output.
+        self.assertEqual(gzip.decompress(compressed), data)
+
+    def test2(self) -> None:
+        """
+        Check that a valid gzip file is written when there is no data.
+        """
+        # Run.
+        compressed = self.helper(b"", chunk_size=100)
+        # Check output.
+        self.assertEqual(gzip.decompress(compressed), b"")
+
+
+# #############################################################################
+# TestTransfer1
+# #############################################################################
+
+
+@pytest.mark.requires_ck_infra
+@pytest.mark.requires_aws
+@pytest.mark.skipif(
+    not hserver.is_CK_S3_available(),
+    reason="Run only if CK S3 is available",
+)
+class TestTransfer1(hmoto.S3Mock_TestCase):
+    """
+    Check the parallel transfers between a local dir and S3.
+    """
+
+    # Use the smallest part size allowed by S3, so that the big file is
+    # transferred in multiple parts.
+    part_size = 5 * 1024**2
+
+    def create_src_dir(self) -> str:
+        """
+        Create a dir with a file bigger than a part, an empty file and a
+        nested file.
+        """
+        src_dir = os.path.join(self.get_scratch_space(), "experiment.RH1E")
+        hio.create_dir(os.path.join(src_dir, "result_0"), incremental=False)
+        with open(os.path.join(src_dir, "big.bin"), "wb") as f:
+            f.write(os.urandom(2 * self.part_size + 123))
+        hio.to_file(os.path.join(src_dir, "empty.txt"), "")
+        hio.to_file(os.path.join(src_dir, "result_0", "log.txt"), "line_mock")
+        return src_dir
+
+    def check_same_dirs(self, dir1: str, dir2: str) -> None:
+        file_names1 = hio.listdir(dir1, "*", True, True)
+        file_names2 = hio.listdir(dir2, "*", True, True)
+        self.assertEqual(sorted(file_names1), sorted(file_names2))
+        for file_name in file_names1:
+            with open(os.path.join(dir1, file_name), "rb") as f1, open(
+                os.path.join(dir2, file_name), "rb"
+            ) as f2:
+                self.assertEqual(f1.read(), f2.read(), msg=file_name)
+
+    def test_upload_and_download_dir1(self) -> None:
+        """
+        Check that a dir is the same after an upload and a download.
+        """
+        src_dir = self.create_src_dir()
+        s3_dir = f"s3://{self.bucket_name}/dir"
+        dst_dir = os.path.join(self.get_scratch_space(), "dst")
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        # Run.
+        hs3.upload_dir_to_s3(
+            src_dir,
+            s3_dir,
+            moto_s3fs,
+            num_threads=2,
+            part_size_in_bytes=self.part_size,
+        )
+        file_paths = hs3.download_dir_from_s3(
+            s3_dir,
+            dst_dir,
+            moto_s3fs,
+            num_threads=2,
+            part_size_in_bytes=1024**2,
+        )
+        # Check output.
+        self.assertEqual(len(file_paths), 3)
+        self.check_same_dirs(src_dir, dst_dir)
+        # Check that the files already downloaded are skipped.
+        file_paths = hs3.download_dir_from_s3(s3_dir, dst_dir, moto_s3fs)
+        self.assertEqual(file_paths, [])
+
+    def test_copy_file_to_s3_1(self) -> None:
+        """
+        Check that a file is copied inside an S3 dir ending with `/` and its
+        content type is set.
+        """
+        file_path = os.path.join(self.get_scratch_space(), "dashboard.html")
+        hio.to_file(file_path, "<html></html>")
+        s3_dir = f"s3://{self.bucket_name}/build/"
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        # Run.
+        hs3.copy_file_to_s3(file_path, s3_dir, moto_s3fs)
+        # Check output.
+        s3_path = f"{s3_dir}dashboard.html"
+        self.assertEqual(moto_s3fs.cat(s3_path), b"<html></html>")
+        content_type = moto_s3fs.info(s3_path)["ContentType"]
+        self.assertEqual(content_type, "text/html")
+
+    def test_archive_and_retrieve1(self) -> None:
+        """
+        Check that an archived dir expands to the original dir.
+        """
+        src_dir = self.create_src_dir()
+        s3_dir = f"s3://{self.bucket_name}/archive"
+        dst_dir = os.path.join(self.get_scratch_space(), "dst")
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        # Run.
+        s3_file_path = hs3.archive_data_on_s3(
+            src_dir,
+            s3_dir,
+            moto_s3fs,
+            tag="test",
+            num_threads=2,
+            part_size_in_bytes=self.part_size,
+        )
+        tgz_file = hs3.retrieve_archived_data_from_s3(
+            s3_file_path, dst_dir, moto_s3fs, incremental=False
+        )
+        expanded_dir = hs3.expand_archived_data(tgz_file, dst_dir)
+        # Check output.
+        self.check_same_dirs(src_dir, expanded_dir)
+
+    def test_abort1(self) -> None:
+        """
+        Check that no file is created when writing a stream fails.
+        """
+        s3_path = f"s3://{self.bucket_name}/aborted.bin"
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        # Run.
+        with self.assertRaises(ValueError):
+            with concurrent.futures.ThreadPoolExecutor(2) as executor:
+                with hs3._S3MultipartWriter(
+                    moto_s3fs, s3_path, executor, part_size=self.part_size
+                ) as s3_file:
+                    s3_file.write(os.urandom(2 * self.part_size))
+                    raise ValueError("Failure while writing")
+        # Check output.
+        self.assertFalse(moto_s3fs.exists(s3_path))
+
+
 # #############################################################################
 # Test_s3_get_credentials1
 # #############################################################################
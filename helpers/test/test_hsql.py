@@ -1,6 +1,22 @@
+import logging
+import os
+import threading
+import time
+import unittest.mock as umock
+from typing import Any, Generator
+
+import pandas as pd
+import psycopg2
+import pytest
+
+import helpers.hgit as hgit
 import helpers.hsql as hsql
+import helpers.hsql_implementation as hsqlimpl
+import helpers.hsql_test as hsqltest
 import helpers.hunit_test as hunitest
 
+_LOG = logging.getLogger(__name__)
+
 
 class TestCreateInOperator(hunitest.TestCase):
     def test_create_in_operator1(self) -> None:
@@ -22,3 +38,336 @@ class TestCreateInOperator(hunitest.TestCase):
         actual = hsql.create_in_operator(values, column)
         expected = "exchange_id IN ('ftx')"
         self.assertEqual(actual, expected)
+
+
+# #############################################################################
+# _FakeConnection
+# #############################################################################
+
+
+class _FakeConnection:
+    """
+    Connection to a DB that can be made to fail the liveness check.
+    """
+
+    def __init__(self) -> None:
+        self.closed = 0
+        self.autocommit = True
+        self.is_alive = True
+
+    def cursor(self) -> umock.MagicMock:
+        cursor = umock.MagicMock()
+        if not self.is_alive:
+            cursor.__enter__.return_value.execute.side_effect = (
+                psycopg2.OperationalError("server closed the connection")
+            )
+        return cursor
+
+    def close(self) -> None:
+        self.closed = 1
+
+    def rollback(self) -> None:
+        pass
+
+
+# #############################################################################
+# TestDbConnectionPool1
+# #############################################################################
+
+
+class TestDbConnectionPool1(hunitest.TestCase):
+    """
+    Check `DbConnectionPool` without a DB.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup_teardown_test(self) -> Generator:
+        with umock.patch.object(
+            hsqlimpl,
+            "get_connection",
+            side_effect=lambda *args, **kwargs: _FakeConnection(),
+        ):
+            yield
+
+    def get_pool(self, **kwargs: Any) -> hsql.DbConnectionPool:
+        pool = hsql.DbConnectionPool(
+            "localhost", "db", 5432, "user", "password", **kwargs
+        )
+        return pool
+
+    def test_reuse1(self) -> None:
+        """
+        Check that a returned connection is reused.
+        """
+        pool = self.get_pool(min_size=1, max_size=2)
+        # Run.
+        with pool.connection() as connection1:
+            pass
+        with pool.connection() as connection2:
+            pass
+        # Check output.
+        self.assertIs(connection1, connection2)
+        stats = pool.get_stats()
+        self.assertEqual(stats["num_created"], 1)
+        self.assertEqual(stats["num_checkouts"], 2)
+        self.assertEqual(stats["num_in_use"], 0)
+
+    def test_timeout1(self) -> None:
+        """
+        Check that borrowing times out when all the connections are in use.
+        """
+        pool = self.get_pool(min_size=0, max_size=1, timeout_in_secs=0.1)
+        connection = pool.get_connection()
+        # Run.
+        with self.assertRaises(TimeoutError):
+            pool.get_connection()
+        # Check output.
+        pool.put_connection(connection)
+        stats = pool.get_stats()
+        self.assertEqual(stats["num_timeouts"], 1)
+        self.assertEqual(stats["num_connections"], 1)
+
+    def test_wait1(self) -> None:
+        """
+        Check that a caller waits for a connection to be returned.
+        """
+        pool = self.get_pool(min_size=0, max_size=1)
+        connection1 = pool.get_connection()
+        timer = threading.Timer(0.1, pool.put_connection, args=[connection1])
+        timer.start()
+        # Run.
+        connection2 = pool.get_connection()
+        # Check output.
+        timer.join()
+        self.assertIs(connection1, connection2)
+        self.assertLess(0, pool.get_stats()["max_wait_time_in_secs"])
+
+    def test_reconnect1(self) -> None:
+        """
+        Check that a connection that is not alive is replaced on borrow.
+        """
+        pool = self.get_pool(min_size=1, max_size=1)
+        with pool.connection() as connection1:
+            # Simulate a restart of the DB server.
+            connection1.is_alive = False
+        # Run.
+        with pool.connection() as connection2:
+            pass
+        # Check output.
+        self.assertIsNot(connection1, connection2)
+        self.assertTrue(connection1.closed)
+        stats = pool.get_stats()
+        self.assertEqual(stats["num_failed_checks"], 1)
+        self.assertEqual(stats["num_created"], 2)
+        self.assertEqual(stats["num_closed"], 1)
+
+    def test_replace1(self) -> None:
+        """
+        Check that a broken connection is replaced to keep `min_size`
+        connections open.
+        """
+        pool = self.get_pool(min_size=1, max_size=2)
+        connection1 = pool.get_connection()
+        connection1.close()
+        # Run.
+        pool.put_connection(connection1)
+        # Check output.
+        stats = pool.get_stats()
+        self.assertEqual(stats["num_connections"], 1)
+        self.assertEqual(stats["num_idle"], 1)
+        self.assertEqual(stats["num_created"], 2)
+        with pool.connection() as connection2:
+            self.assertIsNot(connection1, connection2)
+
+    def test_autocommit1(self) -> None:
+        """
+        Check that the autocommit mode is restored when a connection is
+        returned.
+        """
+        pool = self.get_pool(min_size=1, max_size=1)
+        with pool.connection() as connection1:
+            connection1.autocommit = False
+        # Run.
+        with pool.connection() as connection2:
+            pass
+        # Check output.
+        self.assertIs(connection1, connection2)
+        self.assertTrue(connection2.autocommit)
+
+    def test_init_failure1(self) -> None:
+        """
+        Check that the connections are closed if the pool can't be created.
+        """
+        connection = _FakeConnection()
+        side_effect = [connection, psycopg2.OperationalError("refused")]
+        with umock.patch.object(
+            hsqlimpl, "get_connection", side_effect=side_effect
+        ):
+            # Run.
+            with self.assertRaises(psycopg2.OperationalError):
+                self.get_pool(min_size=2, max_size=2)
+        # Check output.
+        self.assertTrue(connection.closed)
+
+    def test_accept_pool1(self) -> None:
+        """
+        Check that a helper borrows a connection from a pool.
+        """
+        pool = self.get_pool(min_size=1, max_size=1)
+        # Run.
+        hsql.execute_query(pool, "SELECT 1")
+        # Check output.
+        stats = pool.get_stats()
+        self.assertEqual(stats["num_checkouts"], 1)
+        self.assertEqual(stats["num_in_use"], 0)
+
+
+# #############################################################################
+# TestExecuteQueryToDf1
+# #############################################################################
+
+
+class TestExecuteQueryToDf1(hsqltest.TestImOmsDbHelper):
+    """
+    Check the different ways of fetching the result of a query.
+    """
+
+    table_name = "test_execute_query_to_df"
+
+    @classmethod
+    def get_id(cls) -> int:
+        return hash(cls.__name__) % 1000
+
+    @classmethod
+    def _get_compose_file(cls) -> str:
+        file_name = f"tmp.helpers_postgres.docker-compose.{cls.get_id()}.yml"
+        return os.path.join(hgit.get_amp_abs_path(), file_name)
+
+    @classmethod
+    def _get_service_name(cls) -> str:
+        return f"helpers_postgres{cls.get_id()}"
+
+    @classmethod
+    def _get_db_env_path(cls) -> str:
+        file_name = f"tmp.helpers_postgres.env.{cls.get_id()}"
+        return os.path.join(hgit.get_amp_abs_path(), file_name)
+
+    @classmethod
+    def _get_postgres_db(cls) -> str:
+        return "helpers_postgres_db_local"
+
+    def create_table(self, num_rows: int) -> None:
+        """
+        Create a table with `num_rows` rows of market data.
+        """
+        hsql.remove_table(self.connection, self.table_name)
+        query = f"""
+        CREATE TABLE {self.table_name} (
+            id BIGINT,
+            timestamp TIMESTAMP WITH TIME ZONE,
+            currency_pair VARCHAR(255),
+            close DOUBLE PRECISION,
+            is_valid BOOLEAN
+        )
+        """
+        hsql.execute_query(self.connection, query)
+        query = f"""
+        INSERT INTO {self.table_name}
+        SELECT
+            i,
+            TIMESTAMP WITH TIME ZONE '2022-01-01 00:00:00+00'
+                + i * INTERVAL '1 minute',
+            CASE WHEN i % 3 = 0 THEN NULL ELSE 'BTC_USDT' END,
+            i / 10.0,
+            i % 2 = 0
+        FROM generate_series(1, {num_rows}) AS i
+        """
+        hsql.execute_query(self.connection, query)
+
+    def tear_down_test(self) -> None:
+        hsql.remove_table(self.connection, self.table_name)
+
+    @pytest.fixture(autouse=True)
+    def setup_teardown_test(self) -> Generator:
+        yield
+        self.tear_down_test()
+
+    def test_copy1(self) -> None:
+        """
+        Check that the "copy" mode returns the same result as "read_sql".
+        """
+        self.create_table(100)
+        query = f"SELECT * FROM {self.table_name} ORDER BY id"
+        # Run.
+        expected = hsql.execute_query_to_df(self.connection, query)
+        actual = hsql.execute_query_to_df(self.connection, query, mode="copy")
+        # Check output.
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_chunks1(self) -> None:
+        """
+        Check that the chunks concatenate to the result of "read_sql".
+        """
+        self.create_table(100)
+        query = f"SELECT * FROM {self.table_name} ORDER BY id"
+        # Run.
+        expected = hsql.execute_query_to_df(self.connection, query)
+        chunks = list(
+            hsql.execute_query_to_df_chunks(
+                self.connection, query, chunk_size=30
+            )
+        )
+        # Check output.
+        self.assertEqual([len(chunk) for chunk in chunks], [30, 30, 30, 10])
+        actual = pd.concat(chunks, ignore_index=True)
+        pd.testing.assert_frame_equal(actual, expected)
+        # The connection is back in autocommit mode.
+        self.assertTrue(self.connection.autocommit)
+
+    def test_chunks2(self) -> None:
+        """
+        Check that stopping the iteration closes the transaction.
+        """
+        self.create_table(100)
+        query = f"SELECT * FROM {self.table_name} ORDER BY id"
+        # Run.
+        chunks = hsql.execute_query_to_df_chunks(
+            self.connection, query, chunk_size=30
+        )
+        chunk = next(chunks)
+        chunks.close()
+        # Check output.
+        self.assertEqual(len(chunk), 30)
+        self.assertTrue(self.connection.autocommit)
+        num_rows = hsql.get_num_rows(self.connection, self.table_name)
+        self.assertEqual(num_rows, 100)
+
+    @pytest.mark.slow("~30 seconds.")
+    def test_performance1(self) -> None:
+        """
+        Compare the number of rows per second fetched with the different modes.
+        """
+        num_rows = 1000000
+        self.create_table(num_rows)
+        query = f"SELECT * FROM {self.table_name}"
+
+        def _read_sql() -> None:
+            hsql.execute_query_to_df(self.connection, query)
+
+        def _copy() -> None:
+            hsql.execute_query_to_df(self.connection, query, mode="copy")
+
+        def _chunks() -> None:
+            for _ in hsql.execute_query_to_df_chunks(self.connection, query):
+                pass
+
+        for func in [_read_sql, _copy, _chunks]:
+            start_time = time.perf_counter()
+            func()
+            elapsed_time = time.perf_counter() - start_time
+            _LOG.warning(
+                "%s: %.2f secs, %.0f rows/sec",
+                func.__name__,
+                elapsed_time,
+                num_rows / elapsed_time,
+            )
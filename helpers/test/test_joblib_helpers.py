@@ -1,10 +1,11 @@
 import logging
 import os
 import time
-from typing import Any, List, Optional, Union
+from typing import Any, List, Optional, Tuple, Union
 
 import pytest
 
+import helpers.hio as hio
 import helpers.hjoblib as hjoblib
 import helpers.hprint as hprint
 import helpers.hunit_test as hunitest
@@ -410,6 +411,541 @@ val1=4, val2=8, incremental=True, num_attempts=1, kwargs={'hello4': 'world8', 'g
             )
 
 
+# #############################################################################
+# Test_parallel_execute_iter1
+# #############################################################################
+
+
+class Test_parallel_execute_iter1(hunitest.TestCase):
+    """
+    Execute a workload of 5 tasks that all succeed, streaming the results.
+    """
+
+    def test_serial1(self) -> None:
+        num_threads = "serial"
+        backend = ""
+        self._run_test(num_threads, backend)
+
+    def test_parallel_loky1(self) -> None:
+        num_threads = "2"
+        backend = "loky"
+        self._run_test(num_threads, backend)
+
+    def test_parallel_asyncio_threading1(self) -> None:
+        num_threads = "3"
+        backend = "asyncio_threading"
+        self._run_test(num_threads, backend)
+
+    def test_parallel_asyncio_threading2(self) -> None:
+        """
+        Check that with one task in flight the results are in task order.
+        """
+        workload = get_workload1(randomize=False)
+        # Run.
+        res = _run_parallel_execute_iter(
+            self, workload, 3, "asyncio_threading", max_num_in_flight=1
+        )
+        # Check output.
+        self.assertEqual([task_idx for task_idx, _ in res], list(range(5)))
+
+    def test_parallel_asyncio_multiprocessing1(self) -> None:
+        num_threads = "2"
+        backend = "asyncio_multiprocessing"
+        self._run_test(num_threads, backend)
+
+    def test_spill1(self) -> None:
+        """
+        Check that the results are saved to disk.
+        """
+        workload = get_workload1(randomize=True)
+        spill_dir = os.path.join(self.get_scratch_space(), "results")
+        # Run.
+        res = _run_parallel_execute_iter(
+            self, workload, 2, "asyncio_threading", spill_dir=spill_dir
+        )
+        # Check output.
+        file_names = [file_name for _, file_name in res]
+        for file_name in file_names:
+            self.assertEqual(os.path.dirname(file_name), spill_dir)
+        actual = _outcome_to_string(
+            [hjoblib.load_spilled_result(file_name) for file_name in file_names]
+        )
+        self.assert_equal(actual, Test_parallel_execute1.EXPECTED_RETURN)
+
+    def test_abort1(self) -> None:
+        """
+        Check that a failing task is propagated.
+        """
+        workload = get_workload3(randomize=False)
+        # Run.
+        with self.assertRaises(ValueError) as cm:
+            _run_parallel_execute_iter(
+                self, workload, 2, "asyncio_threading", max_num_in_flight=2
+            )
+        # Check output.
+        actual = str(cm.exception)
+        self.assert_equal(actual, Test_parallel_execute3.EXPECTED_STRING1)
+
+    def _run_test(self, num_threads: Union[str, int], backend: str) -> None:
+        workload = get_workload1(randomize=True)
+        # Run.
+        res = _run_parallel_execute_iter(self, workload, num_threads, backend)
+        # Check output.
+        self.assertEqual(sorted(task_idx for task_idx, _ in res), list(range(5)))
+        actual = _outcome_to_string([res_tmp for _, res_tmp in res])
+        self.assert_equal(actual, Test_parallel_execute1.EXPECTED_RETURN)
+
+
+# #############################################################################
+# Test_parallel_execute_retry1
+# #############################################################################
+
+
+def flaky_workload_function(
+    counter_file: str,
+    num_failures: int,
+    mode: str,
+    #
+    **kwargs: Any,
+) -> str:
+    """
+    Execute a workload that fails the first `num_failures` times.
+
+    The number of executions is stored in `counter_file`, so that it is
+    shared across processes.
+
+    :param mode: how to fail
+        - "raise": raise an exception
+        - "timeout": raise a `TimeoutError`
+        - "hang": sleep longer than any test timeout
+        - "die": kill the process executing the function
+    """
+    _ = kwargs
+    count = 0
+    if os.path.exists(counter_file):
+        count = int(hio.from_file(counter_file))
+    count += 1
+    hio.to_file(counter_file, str(count))
+    if count <= num_failures:
+        if mode == "raise":
+            raise ValueError(f"Failure {count}")
+        if mode == "timeout":
+            raise TimeoutError(f"Timeout {count}")
+        if mode == "hang":
+            time.sleep(60)
+        if mode == "die":
+            os._exit(1)
+    res = f"count={count}"
+    return res
+
+
+class Test_parallel_execute_retry1(hunitest.TestCase):
+    """
+    Execute a task that fails and is retried.
+    """
+
+    def test_raise1(self) -> None:
+        """
+        Check that a failing task is retried until it succeeds.
+        """
+        # Run.
+        res, log_txt = self._run_test("raise", 2, 3, None)
+        # Check output.
+        self.assertEqual(res, ["count=3"])
+        self.assertIn("attempt 1/3 exception='Failure 1'", log_txt)
+        self.assertIn("num_retries=2", log_txt)
+        self.assertIn("num_timeouts=0", log_txt)
+
+    def test_raise2(self) -> None:
+        """
+        Check that the error is returned after all the attempts fail.
+        """
+        # Run.
+        res, log_txt = self._run_test("raise", 3, 2, None)
+        # Check output.
+        self.assertEqual(res, ["Failure 2"])
+        self.assertIn("num_retries=1", log_txt)
+        self.assertIn("error=True", log_txt)
+
+    def test_hang1(self) -> None:
+        """
+        Check that a task that times out is killed and retried.
+        """
+        # Run.
+        res, log_txt = self._run_test("hang", 1, 2, 1.0)
+        # Check output.
+        self.assertEqual(res, ["count=2"])
+        self.assertIn("timed out after", log_txt)
+        self.assertIn("num_timeouts=1", log_txt)
+
+    def test_timeout1(self) -> None:
+        """
+        Check that a `TimeoutError` raised by the task is not counted as a
+        timeout.
+        """
+        # Run.
+        res, log_txt = self._run_test("timeout", 1, 2, None)
+        # Check output.
+        self.assertEqual(res, ["count=2"])
+        self.assertIn("num_retries=1", log_txt)
+        self.assertIn("num_timeouts=0", log_txt)
+
+    def test_num_attempts1(self) -> None:
+        """
+        Check that the workload function doesn't retry on its own.
+        """
+        workload = get_workload1(randomize=False)
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        # Run.
+        res = hjoblib.parallel_execute(
+            workload, False, "serial", True, True, 3, log_file
+        )
+        # Check output.
+        for res_tmp in res:
+            self.assertIn("num_attempts=1", res_tmp)
+
+    def test_die1(self) -> None:
+        """
+        Check that a task whose process dies is retried.
+        """
+        # Run.
+        res, log_txt = self._run_test("die", 1, 2, 10.0)
+        # Check output.
+        self.assertEqual(res, ["count=2"])
+        self.assertIn("died with exitcode=1", log_txt)
+        self.assertIn("num_retries=1", log_txt)
+
+    def _run_test(
+        self,
+        mode: str,
+        num_failures: int,
+        num_attempts: int,
+        timeout_in_secs: Optional[float],
+    ) -> Tuple[List[Any], str]:
+        scratch_dir = self.get_scratch_space()
+        counter_file = os.path.join(scratch_dir, "counter.txt")
+        task = ((counter_file, num_failures, mode), {})
+        workload = (
+            flaky_workload_function,
+            "flaky_workload_function",
+            [task],
+        )
+        dry_run = False
+        num_threads = "serial"
+        incremental = True
+        abort_on_error = False
+        log_file = os.path.join(scratch_dir, "log.txt")
+        res = hjoblib.parallel_execute(
+            workload,
+            dry_run,
+            num_threads,
+            incremental,
+            abort_on_error,
+            num_attempts,
+            log_file,
+            timeout_in_secs=timeout_in_secs,
+        )
+        log_txt = hio.from_file(log_file)
+        return res, log_txt
+
+
+# #############################################################################
+# Test_schedule_workload_by_cost1
+# #############################################################################
+
+
+class Test_schedule_workload_by_cost1(hunitest.TestCase):
+    def test_cost_func1(self) -> None:
+        """
+        Check that the tasks are ordered longest-first.
+        """
+        workload = get_workload1(randomize=True)
+        # Use `val1` as cost.
+        cost_func = lambda task: task[0][0]
+        # Run.
+        workload, makespan = hjoblib.schedule_workload_by_cost(
+            workload, 2, cost_func=cost_func
+        )
+        # Check output.
+        _, _, tasks = workload
+        self.assertEqual([task[0][0] for task in tasks], [4, 3, 2, 1, 0])
+        # Thread 1 executes [4, 1, 0] and thread 2 executes [3, 2].
+        self.assertEqual(makespan, 5.0)
+
+    def test_log_file1(self) -> None:
+        """
+        Check that the costs are read from the log of a previous execution.
+        """
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        workload = get_workload3(randomize=False)
+        hjoblib.parallel_execute(
+            workload, False, "serial", True, False, 1, log_file
+        )
+        # Run.
+        costs = hjoblib.estimate_task_costs(workload, log_file=log_file)
+        # Check output.
+        runtimes = hjoblib.get_task_runtimes_from_log(log_file)
+        # The failing task is not considered.
+        self.assertEqual(len(runtimes), 5)
+        _, _, tasks = workload
+        self.assertEqual(len(costs), len(tasks))
+        for task, cost in zip(tasks[:5], costs[:5]):
+            self.assertEqual(cost, runtimes[hjoblib.get_task_key(task)])
+        # The failing task gets the average cost.
+        self.assertAlmostEqual(costs[5], sum(costs[:5]) / 5)
+
+    def test_parallel_execute1(self) -> None:
+        """
+        Check that the predicted and actual makespan are logged.
+        """
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        workload = get_workload1(randomize=False)
+        hjoblib.parallel_execute(
+            workload, False, "serial", True, True, 1, log_file
+        )
+        # Run.
+        res = hjoblib.parallel_execute(
+            workload,
+            False,
+            "2",
+            True,
+            True,
+            1,
+            log_file,
+            backend="asyncio_threading",
+            schedule_by_cost=True,
+        )
+        # Check output.
+        actual = _outcome_to_string(res)
+        self.assert_equal(actual, Test_parallel_execute1.EXPECTED_RETURN)
+        log_txt = hio.from_file(log_file)
+        self.assertIn("predicted_makespan_in_secs=", log_txt)
+        self.assertIn("actual_makespan_in_secs=", log_txt)
+
+    def test_parallel_execute2(self) -> None:
+        """
+        Check that the results are in the order of the tasks.
+        """
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        workload = get_workload1(randomize=False)
+        # Execute the tasks in reverse order.
+        cost_func = lambda task: task[0][0]
+        # Run.
+        res = hjoblib.parallel_execute(
+            workload,
+            False,
+            "serial",
+            True,
+            True,
+            1,
+            log_file,
+            schedule_by_cost=True,
+            cost_func=cost_func,
+        )
+        # Check output.
+        for i, res_tmp in enumerate(res):
+            self.assertIn(f"val1={i},", res_tmp)
+
+    def test_parallel_execute_iter1(self) -> None:
+        """
+        Check that the tasks are executed longest-first.
+        """
+        workload = get_workload1(randomize=False)
+        cost_func = lambda task: task[0][0]
+        # Run.
+        res = _run_parallel_execute_iter(
+            self,
+            workload,
+            "serial",
+            "asyncio_threading",
+            schedule_by_cost=True,
+            cost_func=cost_func,
+        )
+        # Check output.
+        self.assertEqual([task_idx for task_idx, _ in res], [4, 3, 2, 1, 0])
+        for task_idx, res_tmp in res:
+            self.assertIn(f"val1={task_idx},", res_tmp)
+
+
+# #############################################################################
+# Test_predict_makespan1
+# #############################################################################
+
+
+class Test_predict_makespan1(hunitest.TestCase):
+    def test1(self) -> None:
+        # Run.
+        makespan1 = hjoblib.predict_makespan([1, 1, 1, 1, 4], 2)
+        makespan2 = hjoblib.predict_makespan([4, 1, 1, 1, 1], 2)
+        # Check output.
+        self.assertEqual(makespan1, 6.0)
+        self.assertEqual(makespan2, 4.0)
+
+
+# #############################################################################
+# Test_split_list_in_tasks_by_cost1
+# #############################################################################
+
+
+class Test_split_list_in_tasks_by_cost1(hunitest.TestCase):
+    def test1(self) -> None:
+        list_in = ["a", "b", "c", "d", "e"]
+        costs = [5.0, 4.0, 3.0, 3.0, 3.0]
+        # Run.
+        list_out = hjoblib.split_list_in_tasks_by_cost(list_in, costs, 2)
+        # Check output.
+        self.assertEqual(list_out, [["a", "d"], ["b", "c", "e"]])
+
+
+# #############################################################################
+# Test_WorkerPool1
+# #############################################################################
+
+
+def _get_pid(val: int) -> int:
+    """
+    Return the pid of the process executing the function.
+    """
+    if val == -1:
+        raise ValueError(f"Error: val={val}")
+    if val == -2:
+        os._exit(1)
+    return os.getpid()
+
+
+class Test_WorkerPool1(hunitest.TestCase):
+    def test_max_tasks1(self) -> None:
+        """
+        Check that a worker is replaced after `max_tasks_per_worker` tasks.
+        """
+        with hjoblib.WorkerPool(1, max_tasks_per_worker=2) as worker_pool:
+            # Run.
+            pids = [worker_pool.run(_get_pid, None, i) for i in range(5)]
+            stats = worker_pool.get_stats()
+        # Check output.
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pids[2], pids[3])
+        self.assertEqual(len(set(pids)), 3)
+        self.assertNotIn(os.getpid(), pids)
+        expected = {
+            "num_tasks": 5,
+            "num_started_workers": 3,
+            "num_recycled_workers": 2,
+        }
+        self.assertEqual(stats, expected)
+
+    def test_max_rss1(self) -> None:
+        """
+        Check that a worker is replaced when it uses too much memory.
+        """
+        with hjoblib.WorkerPool(1, max_rss_in_mb=0.1) as worker_pool:
+            # Run.
+            pids = [worker_pool.run(_get_pid, None, i) for i in range(3)]
+        # Check output.
+        self.assertEqual(len(set(pids)), 3)
+
+    def test_error1(self) -> None:
+        """
+        Check that an exception is propagated and the worker is reused.
+        """
+        with hjoblib.WorkerPool(1) as worker_pool:
+            pid1 = worker_pool.run(_get_pid, None, 0)
+            # Run.
+            with self.assertRaises(ValueError) as cm:
+                worker_pool.run(_get_pid, None, -1)
+            pid2 = worker_pool.run(_get_pid, None, 0)
+        # Check output.
+        self.assertIn("Error: val=-1 (in subprocess)", str(cm.exception))
+        self.assertEqual(pid1, pid2)
+
+    def test_died1(self) -> None:
+        """
+        Check that a worker that dies is replaced.
+        """
+        with hjoblib.WorkerPool(1) as worker_pool:
+            pid1 = worker_pool.run(_get_pid, None, 0)
+            # Run.
+            with self.assertRaises(ChildProcessError):
+                worker_pool.run(_get_pid, None, -2)
+            pid2 = worker_pool.run(_get_pid, None, 0)
+        # Check output.
+        self.assertNotEqual(pid1, pid2)
+
+    def test_parallel_execute1(self) -> None:
+        """
+        Execute a workload with the threading backend using a worker pool.
+        """
+        workload = get_workload1(randomize=True)
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        with hjoblib.WorkerPool(2, max_tasks_per_worker=2) as worker_pool:
+            # Run.
+            res = hjoblib.parallel_execute(
+                workload,
+                False,
+                2,
+                True,
+                True,
+                1,
+                log_file,
+                backend="threading",
+                worker_pool=worker_pool,
+            )
+            stats = worker_pool.get_stats()
+        # Check output.
+        actual = _outcome_to_string(res)
+        self.assert_equal(actual, Test_parallel_execute1.EXPECTED_RETURN)
+        self.assertEqual(stats["num_tasks"], 5)
+        log_txt = hio.from_file(log_file)
+        self.assertEqual(log_txt.count("execution_mode=worker_pool"), 5)
+
+
+# #############################################################################
+# Test_WorkerPool_performance1
+# #############################################################################
+
+
+class Test_WorkerPool_performance1(hunitest.TestCase):
+    """
+    Compare the per-task time of `processify` and of a worker pool.
+    """
+
+    def test1(self) -> None:
+        tasks = [((i, 2 * i), {}) for i in range(20)]
+        workload: hjoblib.Workload = (
+            workload_function,
+            "workload_function",
+            tasks,
+        )
+        scratch_dir = self.get_scratch_space()
+        # Run.
+        log_file1 = os.path.join(scratch_dir, "log.processify.txt")
+        hjoblib.parallel_execute(
+            workload, False, 2, True, True, 1, log_file1, backend="threading"
+        )
+        log_file2 = os.path.join(scratch_dir, "log.worker_pool.txt")
+        with hjoblib.WorkerPool(2, max_tasks_per_worker=10) as worker_pool:
+            hjoblib.parallel_execute(
+                workload,
+                False,
+                2,
+                True,
+                True,
+                1,
+                log_file2,
+                backend="threading",
+                worker_pool=worker_pool,
+            )
+        # Check output.
+        runtimes1 = hjoblib.get_task_runtimes_from_log(log_file1)
+        runtimes2 = hjoblib.get_task_runtimes_from_log(log_file2)
+        mean1 = sum(runtimes1.values()) / len(runtimes1)
+        mean2 = sum(runtimes2.values()) / len(runtimes2)
+        print(f"processify: {mean1 * 1e3:.2f} ms / task")
+        print(f"worker_pool: {mean2 * 1e3:.2f} ms / task")
+        self.assertEqual(len(runtimes1), len(tasks))
+        self.assertEqual(len(runtimes2), len(tasks))
+
+
 # #############################################################################
 
 
@@ -513,6 +1049,37 @@ def _helper_fail(
     self_.assert_equal(actual, expected_assertion)
 
 
+
+def _run_parallel_execute_iter(
+    self_: Any,
+    workload: hjoblib.Workload,
+    num_threads: Union[str, int],
+    backend: str,
+    **kwargs: Any,
+) -> List[Tuple[int, Any]]:
+    """
+    Run a workload with `parallel_execute_iter()` and collect the results.
+    """
+    incremental = True
+    abort_on_error = True
+    num_attempts = 1
+    log_file = os.path.join(self_.get_scratch_space(), "log.txt")
+    #
+    res = list(
+        hjoblib.parallel_execute_iter(
+            workload,
+            num_threads,
+            incremental,
+            abort_on_error,
+            num_attempts,
+            log_file,
+            backend=backend,
+            **kwargs,
+        )
+    )
+    _LOG.debug("res=%s", str(res))
+    return res
+
 # # To observe the output in real-time.
 # if __name__ == "__main__":
 #     hdbg.init_logger(verbosity=logging.INFO)